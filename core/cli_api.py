@@ -1,5 +1,6 @@
 import os
 import subprocess
+from collections.abc import Mapping
 from enum import Enum
 from datetime import datetime, timedelta
 import json
@@ -24,6 +25,8 @@ class Command(Enum):
 import psutil
 import requests
 import sys
+import threading
+import time
 
 TELEGRAM_UTILS_PATH = '/etc/dijiq/core/scripts/telegrambot'
 ONLINE_USERS_URL = "http://127.0.0.1:25413/online"
@@ -32,6 +35,8 @@ FAILED_STATUSES = {'rejected', 'failed', 'canceled', 'cancelled', 'error'}
 EXPIRED_STATUSES = {'expired'}
 PENDING_STATUSES = {'pending', 'pending_approval', 'processing', 'waiting', 'unpaid'}
 SERVER_INFO_SECTIONS = {'overview', 'business', 'customers', 'tech', 'traffic', 'alerts', 'full'}
+CPU_SAMPLE_INTERVAL_SECONDS = 5
+CPU_BLOCKING_SAMPLE_SECONDS = 0.1
 
 # region Custom Exceptions
 
@@ -205,11 +210,11 @@ def _bump_order_bucket(bucket: dict, status: str, price: float):
 def _iter_named_user_records(users):
     if isinstance(users, dict):
         for username, data in users.items():
-            if isinstance(data, dict):
+            if isinstance(data, Mapping):
                 yield str(data.get("username") or username), data
     elif isinstance(users, list):
         for data in users:
-            if isinstance(data, dict) and data.get("username"):
+            if isinstance(data, Mapping) and data.get("username"):
                 yield str(data.get("username")), data
 
 
@@ -393,6 +398,7 @@ def _collect_vpn_and_live_users(api_client_module=None) -> tuple[dict, dict]:
         "unhealthy": 0,
         "active_configs": 0,
         "servers": [],
+        "snapshot_age_seconds": None,
         "error": None,
     }
     live_users = {"by_server": {}, "by_username": {}, "unavailable_servers": set()}
@@ -401,9 +407,13 @@ def _collect_vpn_and_live_users(api_client_module=None) -> tuple[dict, dict]:
             _ensure_telegram_utils_path()
             from utils import api_client as api_client_module
         multi_api = api_client_module.MultiServerAPI()
-        for index, (server, client) in enumerate(multi_api.iter_clients(include_disabled=True)):
+        # The shared snapshot is fetched in parallel and cached for the whole
+        # bot, so opening the dashboard usually costs no panel round-trips.
+        entries = multi_api.get_user_snapshot_entries(include_disabled=True)
+        vpn["snapshot_age_seconds"] = multi_api.get_user_snapshot_age(include_disabled=True)
+        for entry in entries:
+            index, server, client, users = entry["index"], entry["server"], entry["client"], entry["users"]
             server_id = str(server.get("id") or getattr(client, "server_id", None) or f"server{index + 1}")
-            users = client.get_users()
             healthy = users is not None
             active_count = multi_api.active_user_count(users) if healthy else None
             weight = _safe_weight(server.get("weight", 1))
@@ -618,8 +628,56 @@ def _collect_language_stats(language_module, translations_module) -> dict:
     return {"total": total_prefs, "languages": languages}
 
 
-def build_server_info_snapshot(now=None) -> dict:
-    '''Collects server information as structured data.'''
+class _CpuSampler:
+    """Samples CPU usage in the background so dashboards never sleep for it.
+
+    The bot starts it at startup; until the first sample lands ``read()``
+    returns ``None`` unless the caller can afford a short blocking sample.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.percent = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        psutil.cpu_percent(interval=None)  # baseline for this thread
+        while True:
+            time.sleep(self.interval)
+            self.percent = psutil.cpu_percent(interval=None)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="dijiq-cpu-sampler", daemon=True)
+                self._thread.start()
+        return self
+
+    def read(self, blocking: bool = False) -> float | None:
+        self.start()
+        if self.percent is not None:
+            return self.percent
+        if blocking:
+            return psutil.cpu_percent(interval=CPU_BLOCKING_SAMPLE_SECONDS)
+        return None
+
+
+_cpu_sampler = _CpuSampler(CPU_SAMPLE_INTERVAL_SECONDS)
+
+
+def start_cpu_sampler():
+    '''Starts the background CPU sampler so the first dashboard has a reading.'''
+    _cpu_sampler.start()
+
+
+def build_server_info_snapshot(now=None, blocking_cpu_sample: bool = False) -> dict:
+    '''Collects server information as structured data.
+
+    ``blocking_cpu_sample`` lets one-shot callers (the CLI) spend a short
+    blocking sample instead of reporting CPU as N/A before the background
+    sampler has run.
+    '''
     _ensure_telegram_utils_path()
     from utils import payment_records, referral, language, translations, api_client, reseller
 
@@ -641,7 +699,7 @@ def build_server_info_snapshot(now=None) -> dict:
     return {
         "generated_at": now,
         "system": {
-            "cpu_percent": psutil.cpu_percent(interval=1),
+            "cpu_percent": _cpu_sampler.read(blocking=blocking_cpu_sample),
             "ram_percent": ram.percent,
             "ram_used_mb": ram.used // (1024 * 1024),
             "ram_total_mb": ram.total // (1024 * 1024),
@@ -680,6 +738,18 @@ def _format_orders(bucket: dict) -> str:
     )
 
 
+def _snapshot_age_text(age) -> str:
+    if age is None:
+        return "N/A"
+    age = int(age)
+    return f"{age}s ago" if age < 120 else f"{age // 60}m ago"
+
+
+def _cpu_text(system: dict) -> str:
+    cpu_percent = system.get("cpu_percent")
+    return f"{cpu_percent}%" if cpu_percent is not None else "N/A"
+
+
 def _online_text(online: dict) -> str:
     return str(online.get("count")) if online.get("count") is not None else "N/A"
 
@@ -803,7 +873,7 @@ def _format_tech_section(snapshot: dict) -> list[str]:
     online = snapshot.get("online", {})
     vpn = snapshot.get("vpn", {})
     output = ["🖥️ **Tech**"]
-    output.append(f"CPU: {system.get('cpu_percent', 0)}%")
+    output.append(f"CPU: {_cpu_text(system)}")
     output.append(f"RAM: {system.get('ram_percent', 0)}% ({system.get('ram_used_mb', 0)}MB/{system.get('ram_total_mb', 0)}MB)")
     output.append(f"Disk: {system.get('disk_percent', 0)}% ({system.get('disk_used_gb', 0)}GB/{system.get('disk_total_gb', 0)}GB)")
     output.append(f"Online Users: {_online_text(online)}")
@@ -816,6 +886,7 @@ def _format_tech_section(snapshot: dict) -> list[str]:
         f"{vpn.get('healthy', 0)} healthy • {vpn.get('unhealthy', 0)} unhealthy"
     )
     output.append(f"Active Configs: {vpn.get('active_configs', 0)}")
+    output.append(f"User Snapshot: {_snapshot_age_text(vpn.get('snapshot_age_seconds'))}")
     for server in _notable_servers(vpn):
         health = "healthy" if server.get("healthy") else "unhealthy"
         load_ratio = server.get("load_ratio")
@@ -931,7 +1002,7 @@ def format_server_info(snapshot: dict) -> str:
     output.append(f"Status: {_dashboard_status(snapshot)}")
     output.append("")
     output.append("🖥️ **System**")
-    output.append(f"CPU: {system.get('cpu_percent', 0)}% • RAM: {system.get('ram_percent', 0)}% ({system.get('ram_used_mb', 0)}MB/{system.get('ram_total_mb', 0)}MB)")
+    output.append(f"CPU: {_cpu_text(system)} • RAM: {system.get('ram_percent', 0)}% ({system.get('ram_used_mb', 0)}MB/{system.get('ram_total_mb', 0)}MB)")
     output.append(f"Disk: {system.get('disk_percent', 0)}% ({system.get('disk_used_gb', 0)}GB/{system.get('disk_total_gb', 0)}GB)")
     output.append(f"Online Users: {online_text}")
     if online.get("status") not in (None, "ok"):
@@ -943,6 +1014,7 @@ def format_server_info(snapshot: dict) -> str:
         f"{vpn.get('healthy', 0)} healthy • {vpn.get('unhealthy', 0)} unhealthy"
     )
     output.append(f"Active Configs: {vpn.get('active_configs', 0)}")
+    output.append(f"User Snapshot: {_snapshot_age_text(vpn.get('snapshot_age_seconds'))}")
     for server in _notable_servers(vpn):
         health = "healthy" if server.get("healthy") else "unhealthy"
         load_ratio = server.get("load_ratio")
@@ -1015,7 +1087,7 @@ def format_server_info(snapshot: dict) -> str:
 def server_info(section: str = "full") -> str | None:
     '''Retrieves server information.'''
     try:
-        snapshot = build_server_info_snapshot()
+        snapshot = build_server_info_snapshot(blocking_cpu_sample=True)
         if str(section or "full").lower() == "full":
             return format_server_info(snapshot)
         return format_server_info_section(snapshot, section)
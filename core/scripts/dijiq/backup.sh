@@ -7,6 +7,25 @@ if [ ! -d "$BACKUP_DIR" ]; then
     mkdir -p "$BACKUP_DIR"
 fi
 
+TELEGRAM_ENV_FILE="/etc/dijiq/core/scripts/telegrambot/.env"
+PAYMENTS_DB="/etc/dijiq/core/scripts/telegrambot/payments.sqlite3"
+PAYMENT_RECORDS_SCRIPT="/etc/dijiq/core/scripts/telegrambot/utils/payment_records.py"
+if [ -f "$PAYMENTS_DB" ] && grep -qE '^DIJIQ_PAYMENT_STORE=sqlite' "$TELEGRAM_ENV_FILE" 2>/dev/null; then
+    python3 "$PAYMENT_RECORDS_SCRIPT" export >/dev/null || echo "Warning: could not export payments database to payments.json"
+fi
+RESELLERS_DB="/etc/dijiq/core/scripts/telegrambot/resellers.sqlite3"
+RESELLER_STORE_SCRIPT="/etc/dijiq/core/scripts/telegrambot/utils/reseller_store.py"
+if [ -f "$RESELLERS_DB" ] && grep -qE '^DIJIQ_RESELLER_STORE=sqlite' "$TELEGRAM_ENV_FILE" 2>/dev/null; then
+    python3 "$RESELLER_STORE_SCRIPT" export >/dev/null || echo "Warning: could not export resellers database to resellers.json"
+fi
+PAYMENTS_JOURNAL="/etc/dijiq/core/scripts/telegrambot/payments.journal.jsonl"
+if [ -s "$PAYMENTS_JOURNAL" ] && grep -qE '^DIJIQ_PAYMENT_STORE=journal' "$TELEGRAM_ENV_FILE" 2>/dev/null; then
+    if ! python3 "$PAYMENT_RECORDS_SCRIPT" compact >/dev/null; then
+        echo "Backup failed: could not fold the payment journal into payments.json"
+        exit 1
+    fi
+fi
+
 shopt -s nullglob dotglob
 FILES_TO_BACKUP=(
     /etc/dijiq/*.env
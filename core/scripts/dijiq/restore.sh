@@ -176,6 +176,23 @@ else
     restore_telegram_state_files "$RESTORE_DIR"
 fi
 
+PAYMENTS_DB="$TARGET_DIR/core/scripts/telegrambot/payments.sqlite3"
+if [ -f "$PAYMENTS_DB" ] && grep -qE '^DIJIQ_PAYMENT_STORE=sqlite' "$TARGET_DIR/core/scripts/telegrambot/.env" 2>/dev/null; then
+    python3 "$TARGET_DIR/core/scripts/telegrambot/utils/payment_records.py" migrate >/dev/null || echo "Warning: could not import payments.json into the payments database"
+fi
+RESELLERS_DB="$TARGET_DIR/core/scripts/telegrambot/resellers.sqlite3"
+if [ -f "$RESELLERS_DB" ] && grep -qE '^DIJIQ_RESELLER_STORE=sqlite' "$TARGET_DIR/core/scripts/telegrambot/.env" 2>/dev/null; then
+    python3 "$TARGET_DIR/core/scripts/telegrambot/utils/reseller_store.py" migrate >/dev/null || echo "Warning: could not import resellers.json into the resellers database"
+fi
+
+# Backups fold the payment journal into payments.json, so a journal left on
+# disk belongs to the state being replaced. Move it aside rather than deleting
+# it, so payments recorded since the backup can still be recovered by hand.
+PAYMENTS_JOURNAL="$TARGET_DIR/core/scripts/telegrambot/payments.journal.jsonl"
+if [ -f "$PAYMENTS_JOURNAL" ]; then
+    mv "$PAYMENTS_JOURNAL" "$PAYMENTS_JOURNAL.pre_restore_$timestamp" || echo "Warning: could not move the previous payment journal aside"
+fi
+
 rm -rf "$RESTORE_DIR"
 echo "dijiq configuration restored successfully."
 
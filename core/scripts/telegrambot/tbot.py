@@ -8,6 +8,8 @@ import os
 from utils.telegram_safe import safe_reply_to, safe_send_message
 
 EXPIRED_CLEANUP_INTERVAL_SECONDS = 3600
+TRAFFIC_MONITOR_INTERVAL_SECONDS = 300
+TRAFFIC_MONITOR_FULL_SCAN_SECONDS = 7200
 
 
 def _int_env(name, default, minimum=1):
@@ -152,13 +154,18 @@ def expired_cleanup_monitoring_thread():
 
 def traffic_monitoring_thread():
     """Background thread to notify users when nearing traffic quota"""
+    last_full_scan = 0
     while True:
         try:
-            monitor_user_traffic()
+            # Incremental passes only evaluate users whose usage moved; a
+            # periodic full scan re-checks everyone against the alerts file.
+            full_scan = time.time() - last_full_scan >= TRAFFIC_MONITOR_FULL_SCAN_SECONDS
+            monitor_user_traffic(full_scan=full_scan)
+            if full_scan:
+                last_full_scan = time.time()
         except Exception as e:
             print(f"Error in traffic monitoring: {e}")
-        # Check every 2 hours
-        time.sleep(7200)
+        time.sleep(TRAFFIC_MONITOR_INTERVAL_SECONDS)
 
 def automated_backup_thread():
     """Background thread to run automated backups every 3 hours"""
@@ -187,10 +194,19 @@ def run_polling_forever():
             retry_delay_seconds = min(max_retry_delay_seconds, retry_delay_seconds * 2)
 
 if __name__ == '__main__':
+    start_user_snapshot_refresher()
+    try:
+        start_cpu_sampler()
+    except Exception as e:
+        print(f"Error starting CPU sampler: {e}")
     monitor_thread = threading.Thread(target=monitoring_thread, daemon=True)
     monitor_thread.start()
     version_thread = threading.Thread(target=version_monitoring, daemon=True)
     version_thread.start()
+    try:
+        start_payment_webhook_receiver()
+    except Exception as e:
+        print(f"Error starting payment webhook receiver: {e}")
     payment_thread = threading.Thread(target=payment_monitoring_thread, daemon=True)
     payment_thread.start()
     expired_cleanup_thread = threading.Thread(target=expired_cleanup_monitoring_thread, daemon=True)
@@ -199,4 +215,8 @@ if __name__ == '__main__':
     traffic_thread.start()
     backup_thread = threading.Thread(target=automated_backup_thread, daemon=True)
     backup_thread.start()
+    try:
+        resume_broadcast_jobs()
+    except Exception as e:
+        print(f"Error resuming broadcast jobs: {e}")
     run_polling_forever()
@@ -14,6 +14,7 @@ from .payment_setup import *
 from .edit_plans import *
 from .payments import *
 from .payment_records import *
+from .payment_webhook import *
 from .receipt_checker import *
 from .renewal import *
 from .purchase_plan import *
@@ -10,20 +10,44 @@ or ``None`` on any failure (network error, 4xx, 5xx).  Callers should check
 ``if result is None`` to detect failures.
 """
 
+import asyncio
+import atexit
+import codecs
 import json
 import os
+import random
+import re
 import requests
 import threading
 import time
+from collections import deque
+from collections.abc import Mapping
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 
+from utils.user_record import PANEL_FIELDS, UserRecord
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - fan-out falls back to the thread pool
+    aiohttp = None
+
 
 TELEGRAM_ENV_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env'))
 _HTTP_POOL_CONNECTIONS = 8
 _HTTP_POOL_MAXSIZE = 16
 _thread_local = threading.local()
+USER_CHANGE_LOG_LIMIT = 50000
+# A refresher that has not published for this many refresh intervals has
+# stalled; readers then refresh synchronously.
+SNAPSHOT_MAX_AGE_REFRESH_INTERVALS = 3
+
+# Conditional GET state: (session key, url) -> {"etag": ..., "payload": ...}
+_conditional_cache = {}
+_conditional_cache_lock = threading.Lock()
+_transfer_stats = {}
 
 
 def _float_env(name, default, minimum=0.1):
@@ -42,6 +66,298 @@ def get_api_write_timeout_seconds() -> float:
     return _float_env("DIJIQ_API_WRITE_TIMEOUT_SECONDS", 10)
 
 
+def get_snapshot_refresh_seconds() -> float:
+    return _float_env("DIJIQ_SNAPSHOT_REFRESH_SECONDS", 20, minimum=1)
+
+
+def get_bulk_workers_per_server() -> int:
+    return int(_float_env("DIJIQ_BULK_WORKERS_PER_SERVER", 4, minimum=1))
+
+
+def _remember_conditional(key, etag, payload, size):
+    with _conditional_cache_lock:
+        if etag:
+            _conditional_cache[key] = {"etag": etag, "payload": payload, "size": size}
+        else:
+            _conditional_cache.pop(key, None)
+
+
+# Panel user fields the bot reads; everything else is dropped while parsing.
+USER_RECORD_FIELDS = tuple(PANEL_FIELDS)
+USERS_STREAM_CHUNK_SIZE = 64 * 1024
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+def compact_user_record(record):
+    """Return a panel user record as a shared ``UserRecord``.
+
+    Only ``USER_RECORD_FIELDS`` are kept; values that are not mappings pass
+    through unchanged.
+    """
+    converted = UserRecord.of(record)
+    return record if converted is None else converted
+
+
+class UsersStreamReader:
+    """Incremental decoder for a users-list response body.
+
+    Feed it the body chunk by chunk; each user record is decoded as soon as
+    it is complete and compacted with ``compact_user_record``, so the full
+    document and its unused fields are never held in memory at once. The
+    result keeps the panel's shape (dict keyed by username, or list).
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._result = None
+        self._closing = None
+        self._done = False
+
+    def feed(self, chunk: bytes):
+        self.size += len(chunk)
+        self._buffer += self._text.decode(chunk)
+        self._drain(final=False)
+
+    def close(self):
+        """Finish decoding and return the users payload; raises ``ValueError``."""
+        self._buffer += self._text.decode(b"", final=True)
+        self._drain(final=True)
+        if not self._done:
+            raise ValueError("users list is truncated")
+        if self._buffer.strip():
+            raise ValueError("unexpected data after the users list")
+        return self._result
+
+    def _drain(self, final: bool):
+        buffer = self._buffer
+        pos = _JSON_WHITESPACE.match(buffer).end()
+        while not self._done and pos < len(buffer):
+            if self._closing is None:
+                opener = buffer[pos]
+                if opener == "{":
+                    self._result, self._closing = {}, "}"
+                elif opener == "[":
+                    self._result, self._closing = [], "]"
+                elif not final:
+                    break
+                else:
+                    # Not a users collection; decode it whole like response.json().
+                    self._result, pos = self._decoder.raw_decode(buffer, pos)
+                    self._done = True
+                    break
+                pos += 1
+            elif buffer[pos] == self._closing:
+                self._done = True
+                pos += 1
+            elif buffer[pos] == ",":
+                pos += 1
+            else:
+                try:
+                    key, record, end = self._decode_item(buffer, pos)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    break
+                # A number at the very end of the buffer may still be growing.
+                if end >= len(buffer) and not final:
+                    break
+                if self._closing == "}":
+                    self._result[key] = compact_user_record(record)
+                else:
+                    self._result.append(compact_user_record(record))
+                pos = end
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()
+        self._buffer = buffer[pos:]
+
+    def _decode_item(self, buffer: str, pos: int):
+        key = None
+        if self._closing == "}":
+            key, pos = self._decoder.raw_decode(buffer, pos)
+            if not isinstance(key, str):
+                raise ValueError("users object key is not a string")
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer):
+                raise json.JSONDecodeError("Expecting ':' delimiter", buffer, pos)
+            if buffer[pos] != ":":
+                raise ValueError(f"Expecting ':' delimiter at char {pos}")
+            pos = _JSON_WHITESPACE.match(buffer, pos + 1).end()
+        record, pos = self._decoder.raw_decode(buffer, pos)
+        return key, record, pos
+
+
+def _record_transfer(server_id: str, size: int, saved: int | None = None):
+    """Count a users-list download; ``saved`` is set for 304 responses."""
+    with _conditional_cache_lock:
+        stats = _transfer_stats.setdefault(server_id, {"requests": 0, "not_modified": 0, "bytes": 0, "bytes_saved": 0})
+        stats["requests"] += 1
+        stats["bytes"] += size
+        if saved is not None:
+            stats["not_modified"] += 1
+            stats["bytes_saved"] += saved
+
+
+def get_transfer_stats(server_id: str | None = None) -> dict:
+    """Return conditional GET counters, per server or for one server."""
+    with _conditional_cache_lock:
+        if server_id is not None:
+            return dict(_transfer_stats.get(server_id, {}))
+        return {key: dict(value) for key, value in _transfer_stats.items()}
+
+
+def reset_transfer_stats():
+    with _conditional_cache_lock:
+        _transfer_stats.clear()
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a server whose breaker is open."""
+
+
+class CircuitBreaker:
+    """Per-server breaker shared by every thread talking to that server.
+
+    The breaker looks at the last ``window`` calls. It opens when at least
+    ``min_calls`` were made and either the failure rate or the rate of calls
+    slower than ``slow_call_seconds`` crosses its threshold. An open breaker
+    rejects calls for ``open_seconds``, then lets a single probe through
+    (half-open). A good probe closes the breaker and a bad one reopens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        name: str,
+        window: int | None = None,
+        min_calls: int | None = None,
+        failure_rate: float | None = None,
+        slow_call_seconds: float | None = None,
+        slow_call_rate: float | None = None,
+        open_seconds: float | None = None,
+    ):
+        self.name = name
+        self.window = int(window or _float_env("DIJIQ_BREAKER_WINDOW", 20, minimum=1))
+        self.min_calls = int(min_calls or _float_env("DIJIQ_BREAKER_MIN_CALLS", 5, minimum=1))
+        self.failure_rate = failure_rate or _float_env("DIJIQ_BREAKER_FAILURE_RATE", 0.5, minimum=0.01)
+        self.slow_call_seconds = slow_call_seconds or _float_env("DIJIQ_BREAKER_SLOW_SECONDS", 3)
+        self.slow_call_rate = slow_call_rate or _float_env("DIJIQ_BREAKER_SLOW_RATE", 0.8, minimum=0.01)
+        self.open_seconds = open_seconds or _float_env("DIJIQ_BREAKER_OPEN_SECONDS", 30)
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=self.window)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def _current_state(self, now: float) -> str:
+        if self._state == self.OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, success: bool, elapsed: float):
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            now = time.monotonic()
+            if self._state == self.HALF_OPEN:
+                if success and not slow:
+                    self._state = self.CLOSED
+                    self._calls.clear()
+                else:
+                    self._open(now)
+                return
+            if self._state == self.OPEN:
+                return
+            self._calls.append((success, slow))
+            if len(self._calls) < self.min_calls:
+                return
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, was_slow in self._calls if was_slow)
+            if failures / len(self._calls) >= self.failure_rate or slow_calls / len(self._calls) >= self.slow_call_rate:
+                self._open(now)
+
+    def _open(self, now: float):
+        if self._state != self.OPEN:
+            print(f"[APIClient] Circuit opened for {self.name}")
+        self._state = self.OPEN
+        self._opened_at = now
+        self._probe_in_flight = False
+        self._calls.clear()
+
+    def snapshot(self) -> dict:
+        """Return a status dict for admin views."""
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            calls = len(self._calls)
+            failures = sum(1 for ok, _ in self._calls if not ok)
+            slow_calls = sum(1 for _, was_slow in self._calls if was_slow)
+            retry_in = max(0.0, self.open_seconds - (now - self._opened_at)) if state == self.OPEN else None
+        return {
+            "state": state,
+            "calls": calls,
+            "failure_rate": failures / calls if calls else 0.0,
+            "slow_rate": slow_calls / calls if calls else 0.0,
+            "retry_in": retry_in,
+        }
+
+
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(base_url: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a server base URL."""
+    with _circuit_breakers_lock:
+        breaker = _circuit_breakers.get(base_url)
+        if breaker is None:
+            breaker = CircuitBreaker(base_url)
+            _circuit_breakers[base_url] = breaker
+        return breaker
+
+
+def reset_circuit_breakers():
+    with _circuit_breakers_lock:
+        _circuit_breakers.clear()
+
+
+def provisional_user_record(traffic_limit, expiration_days, unlimited: bool = False, note: str | None = None) -> dict:
+    """Record cached for a just-created user until its server is fetched again.
+
+    The panel stamps ``account_creation_date`` with the creation day, so the
+    record carries today's date in the same form.
+    """
+    return {
+        "max_download_bytes": int(traffic_limit or 0) * 1024 ** 3,
+        "expiration_days": expiration_days,
+        "account_creation_date": datetime.now().strftime("%Y-%m-%d"),
+        "upload_bytes": 0,
+        "download_bytes": 0,
+        "blocked": False,
+        "unlimited_user": bool(unlimited),
+        "note": note,
+    }
+
+
 def _get_thread_session(session_key) -> requests.Session:
     """Return a per-thread pooled HTTP session for a server/auth pair."""
     sessions = getattr(_thread_local, "api_sessions", None)
@@ -167,6 +483,9 @@ def save_server_configs(servers: list[dict]) -> bool:
 class APIClient:
     """HTTP client for the dijiq REST API."""
 
+    # Users-list reads can be fanned out through AsyncMultiServerAPI.
+    supports_async_reads = True
+
     def __init__(self, server_config: dict | None = None):
         load_dotenv(TELEGRAM_ENV_PATH)
 
@@ -197,12 +516,33 @@ class APIClient:
     def session(self) -> requests.Session:
         return _get_thread_session(self._session_key)
 
-    def _request(self, method: str, url: str, *, data: dict | None = None, headers: dict | None = None, timeout: float | None = None):
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return get_circuit_breaker(self.base_url)
+
+    def is_available(self) -> bool:
+        """False while this server's breaker is open and not ready for a probe."""
+        return self.breaker.state != CircuitBreaker.OPEN
+
+    def _request(self, method: str, url: str, *, data: dict | None = None, headers: dict | None = None, timeout: float | None = None, stream: bool = False):
         request_headers = {**self.headers}
         if headers:
             request_headers.update(headers)
         timeout = timeout if timeout is not None else get_api_read_timeout_seconds()
-        return self.session.request(method, url, headers=request_headers, json=data, timeout=timeout)
+        if not url.startswith(self.base_url):
+            return self.session.request(method, url, headers=request_headers, json=data, timeout=timeout, stream=stream)
+
+        breaker = self.breaker
+        if not breaker.allow_request():
+            raise CircuitOpenError(f"circuit open for server {self.server_id}")
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, url, headers=request_headers, json=data, timeout=timeout, stream=stream)
+        except Exception:
+            breaker.record(False, time.monotonic() - started)
+            raise
+        breaker.record(response.status_code < 500, time.monotonic() - started)
+        return response
 
     def _get(self, url: str):
         try:
@@ -213,6 +553,37 @@ class APIClient:
             print(f"[APIClient] GET {url} failed: {e}")
             return None
 
+    def _get_users_conditional(self, url: str):
+        """Streamed users-list GET with ``If-None-Match``.
+
+        A 304 reuses the payload cached for the ETag; a 200 body is decoded
+        incrementally by ``UsersStreamReader``.
+        """
+        key = (self._session_key, url)
+        with _conditional_cache_lock:
+            cached = _conditional_cache.get(key)
+        headers = {"If-None-Match": cached["etag"]} if cached else None
+        reader = UsersStreamReader()
+        try:
+            response = self._request("GET", url, headers=headers, timeout=get_api_read_timeout_seconds(), stream=True)
+            if response.status_code >= 300:
+                # Reading the body releases the streamed connection to the pool.
+                size = len(response.content or b"")
+                if response.status_code == 304 and cached is not None:
+                    _record_transfer(self.server_id, size, saved=cached["size"])
+                    return cached["payload"]
+                response.raise_for_status()
+            for chunk in response.iter_content(USERS_STREAM_CHUNK_SIZE):
+                reader.feed(chunk)
+            payload = reader.close()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"[APIClient] GET {url} failed: {e}")
+            return None
+
+        _record_transfer(self.server_id, reader.size)
+        _remember_conditional(key, response.headers.get("ETag"), payload, reader.size)
+        return payload
+
     def _post(self, url: str, data: dict):
         try:
             response = self._request("POST", url, data=data, headers={'Content-Type': 'application/json'}, timeout=get_api_write_timeout_seconds())
@@ -229,7 +600,6 @@ class APIClient:
         try:
             response = self._request("PATCH", url, data=data, headers={'Content-Type': 'application/json'}, timeout=get_api_write_timeout_seconds())
             response.raise_for_status()
-            MultiServerAPI.invalidate_all_caches()
             try:
                 return response.json()
             except ValueError:
@@ -242,7 +612,6 @@ class APIClient:
         try:
             response = self._request("DELETE", url, timeout=get_api_write_timeout_seconds())
             response.raise_for_status()
-            MultiServerAPI.invalidate_all_caches()
             try:
                 return response.json()
             except ValueError:
@@ -256,15 +625,21 @@ class APIClient:
     # ------------------------------------------------------------------ #
 
     def get_users(self):
-        """Return list or dict of all users, or ``None`` on failure."""
-        return self._get(self.users_endpoint)
+        """Return list or dict of all users, or ``None`` on failure.
+
+        Uses a conditional request, so an unchanged list is not downloaded
+        again when the panel sends ETags. The body is parsed as it streams in
+        and each record keeps only ``USER_RECORD_FIELDS``. The returned
+        payload may be shared with the conditional cache and must be treated
+        as read-only.
+        """
+        return self._get_users_conditional(self.users_endpoint)
 
     def get_user(self, username: str):
         """Return a single user's detail dict, or ``None`` if not found / on failure."""
         return self._get(f"{self.users_endpoint}{username}")
 
-    def add_user(self, username: str, traffic_limit: int, expiration_days: int, unlimited: bool = False, note: str | None = None):
-        """Create a new user. Returns response data or ``None`` on failure."""
+    def _create_user(self, username: str, traffic_limit: int, expiration_days: int, unlimited: bool = False, note: str | None = None):
         payload = {
             "username": username,
             "traffic_limit": traffic_limit,
@@ -273,17 +648,40 @@ class APIClient:
         }
         if note is not None:
             payload["note"] = note
-        result = self._post(self.users_endpoint, payload)
+        return self._post(self.users_endpoint, payload)
+
+    def add_user(self, username: str, traffic_limit: int, expiration_days: int, unlimited: bool = False, note: str | None = None):
+        """Create a new user. Returns response data or ``None`` on failure."""
+        result = self._create_user(username, traffic_limit, expiration_days, unlimited=unlimited, note=note)
         if result is not None:
-            MultiServerAPI.record_created_user(self.server_id, username)
+            MultiServerAPI.record_created_user(
+                self.server_id,
+                username,
+                provisional_user_record(traffic_limit, expiration_days, unlimited=unlimited, note=note),
+            )
         return result
 
+    def _refetch_user(self, username: str, current_username: str | None = None):
+        """Write a user's post-mutation record through to the cached snapshots.
+
+        Falls back to dropping every cache when the record cannot be read.
+        """
+        current_username = current_username or username
+        record = self.get_user(current_username)
+        if record is None:
+            MultiServerAPI.invalidate_all_caches()
+            return
+        MultiServerAPI.record_updated_user(self.server_id, username, current_username, record)
+
     def update_user(self, username: str, data: dict):
         """Patch one or more fields of an existing user.
 
         Returns the API response dict, or ``None`` on failure.
         """
-        return self._patch(f"{self.users_endpoint}{username}", data)
+        result = self._patch(f"{self.users_endpoint}{username}", data)
+        if result is not None:
+            self._refetch_user(username, data.get("new_username"))
+        return result
 
     def reset_user(self, username: str):
         """Reset a user through the panel reset endpoint."""
@@ -291,18 +689,22 @@ class APIClient:
         try:
             response = self._request("GET", url, timeout=get_api_write_timeout_seconds())
             response.raise_for_status()
-            MultiServerAPI.invalidate_all_caches()
             try:
-                return response.json()
+                result = response.json()
             except ValueError:
-                return {"message": "Reset successfully."}
+                result = {"message": "Reset successfully."}
         except requests.exceptions.RequestException as e:
             print(f"[APIClient] GET {url} failed: {e}")
             return None
+        self._refetch_user(username)
+        return result
 
     def delete_user(self, username: str):
         """Delete a user. Returns response data or ``None`` on failure."""
-        return self._delete(f"{self.users_endpoint}{username}")
+        result = self._delete(f"{self.users_endpoint}{username}")
+        if result is not None:
+            MultiServerAPI.record_deleted_user(self.server_id, username)
+        return result
 
     def get_user_uri(self, username: str):
         """Return subscription URI data dict, or ``None`` on failure."""
@@ -344,6 +746,13 @@ class MultiServerAPI:
     _user_snapshot_refresh_lock = threading.Lock()
     _creation_cache = None
     _user_snapshot_cache = {}
+    _user_change_lock = threading.Lock()
+    _user_payloads = {}
+    _user_change_log = deque(maxlen=USER_CHANGE_LOG_LIMIT)
+    _user_change_version = 0
+    _user_change_floor = 0
+    _user_snapshot_generation = 0
+    _server_write_generations = {}
 
     def __init__(self):
         self.servers = get_server_configs()
@@ -388,6 +797,15 @@ class MultiServerAPI:
                 entry["users"] = entry["client"].get_users()
             return entries
 
+        async_api = get_async_multi_server_api()
+        if async_api is not None and all(getattr(entry["client"], "supports_async_reads", False) for entry in entries):
+            try:
+                users_by_entry = async_api.fetch_users([entry["client"] for entry in entries])
+            except Exception as e:
+                print(f"[MultiServerAPI] Async fan-out failed, using threads: {e}")
+            else:
+                return [{**entry, "users": users} for entry, users in zip(entries, users_by_entry)]
+
         results = [None] * len(entries)
 
         def fetch_users(entry):
@@ -407,13 +825,197 @@ class MultiServerAPI:
         return results
 
     def _build_user_snapshot(self, include_disabled: bool = False) -> dict:
+        entries = self._fetch_users_for_servers(include_disabled=include_disabled)
+        self._record_user_changes(entries)
         return {
             "created_at": time.monotonic(),
             "signature": (bool(include_disabled), self._servers_signature(self.servers)),
             "include_disabled": bool(include_disabled),
-            "entries": self._fetch_users_for_servers(include_disabled=include_disabled),
+            "entries": entries,
+            "username_index": self._build_username_index(entries),
         }
 
+    @staticmethod
+    def _build_username_index(entries: list[dict]) -> dict:
+        """Map lower-cased usernames to ``(entry position, username, record)`` in server order."""
+        index = {}
+        for position, entry in enumerate(entries):
+            users = entry.get("users")
+            if isinstance(users, dict):
+                items = users.items()
+            elif isinstance(users, list):
+                items = ((item.get("username"), item) for item in users if isinstance(item, Mapping))
+            else:
+                continue
+            for username, record in items:
+                if username:
+                    index.setdefault(str(username).lower(), []).append((position, str(username), record))
+        return index
+
+    @staticmethod
+    def _records_by_username(users) -> dict:
+        if isinstance(users, dict):
+            return {str(name): record for name, record in users.items() if name}
+        records = {}
+        for item in users if isinstance(users, list) else ():
+            if isinstance(item, Mapping) and item.get("username"):
+                records[str(item["username"])] = item
+        return records
+
+    @classmethod
+    def _record_user_changes(cls, entries: list[dict]):
+        """Diff each server's new users payload with the previous one.
+
+        Changed, added and removed usernames are appended to the change log
+        under a new version. A server seen for the first time is logged with
+        ``None`` as username, meaning "every user on this server".
+        """
+        with cls._user_change_lock:
+            version = cls._user_change_version + 1
+            changes = []
+            for entry in entries:
+                users = entry.get("users")
+                if users is None:
+                    continue
+                server_id = entry["server"].get("id")
+                previous = cls._user_payloads.get(server_id)
+                if previous is not None and previous["payload"] is users:
+                    continue
+                records = cls._records_by_username(users)
+                cls._user_payloads[server_id] = {"payload": users, "records": records}
+                if previous is None:
+                    changes.append((version, server_id, None))
+                    continue
+                old_records = previous["records"]
+                changes.extend(
+                    (version, server_id, username)
+                    for username, record in records.items()
+                    if old_records.get(username) != record
+                )
+                changes.extend(
+                    (version, server_id, username)
+                    for username in old_records
+                    if username not in records
+                )
+
+            if not changes:
+                return
+            log = cls._user_change_log
+            for change in changes:
+                if len(log) == log.maxlen:
+                    cls._user_change_floor = log[0][0]
+                log.append(change)
+            cls._user_change_version = version
+
+    def get_user_changes(
+        self,
+        since_version: int | None = None,
+        include_disabled: bool = True,
+        force_refresh: bool = False,
+        cache_ttl_seconds: float | None = None,
+    ):
+        """Return ``(version, changes)`` for users changed after ``since_version``.
+
+        The snapshot is refreshed first, like ``iter_all_users``. ``changes``
+        is a list of ``(client, username, record)`` where ``record`` is None
+        for deleted users. It is None when ``since_version`` is missing or
+        older than the retained log, and the caller must then do a full scan.
+        Pass the returned version back on the next call.
+        """
+        snapshot = self._get_user_snapshot(
+            include_disabled=include_disabled,
+            force_refresh=force_refresh,
+            cache_ttl_seconds=cache_ttl_seconds,
+        )
+        cls = self.__class__
+        with cls._user_change_lock:
+            version = cls._user_change_version
+            if since_version is None or since_version < cls._user_change_floor or since_version > version:
+                return version, None
+            changed = {
+                (server_id, username)
+                for change_version, server_id, username in cls._user_change_log
+                if change_version > since_version
+            }
+            payloads = dict(cls._user_payloads)
+
+        changes = []
+        for entry in snapshot.get("entries", []):
+            server_id = entry["server"].get("id")
+            users = entry.get("users")
+            if users is None:
+                continue
+            payload_state = payloads.get(server_id)
+            if payload_state is not None and payload_state["payload"] is users:
+                records = payload_state["records"]
+            else:
+                records = self._records_by_username(users)
+            if (server_id, None) in changed:
+                changes.extend((entry["client"], username, record) for username, record in records.items())
+                continue
+            for changed_server_id, username in changed:
+                if changed_server_id == server_id and username is not None:
+                    changes.append((entry["client"], username, records.get(username)))
+        return version, changes
+
+    @classmethod
+    def _publish_refreshed_snapshots(cls, servers: list[dict], server_data: dict):
+        """Install snapshots assembled from the background refresher's per-server data.
+
+        A snapshot is only replaced once every server it covers has data from
+        the current cache generation.
+        """
+        signature_servers = cls._servers_signature(servers)
+        snapshots = {}
+        for include_disabled in (True, False):
+            entries = []
+            for server in servers:
+                if not (include_disabled or server.get("enabled", True)):
+                    continue
+                data = server_data.get(server["id"])
+                if data is None:
+                    break
+                entries.append({
+                    "server": server,
+                    "client": data["client"],
+                    "index": len(entries),
+                    "users": data["users"],
+                    "fetched_at": data["fetched_at"],
+                    "error": data.get("error"),
+                    "write_generation": data.get("write_generation", 0),
+                })
+            else:
+                snapshots[include_disabled] = {
+                    "created_at": min((entry["fetched_at"] for entry in entries), default=time.monotonic()),
+                    "signature": (include_disabled, signature_servers),
+                    "include_disabled": include_disabled,
+                    "entries": entries,
+                    "username_index": cls._build_username_index(entries),
+                }
+
+        if not snapshots:
+            return
+        with cls._creation_cache_lock:
+            if any(
+                entry["write_generation"] != cls._server_write_generations.get(entry["server"]["id"], 0)
+                for snapshot in snapshots.values()
+                for entry in snapshot["entries"]
+            ):
+                # A write was applied after this data was taken; keep the
+                # written-through snapshot until the refresher catches up.
+                return
+            cache = dict(cls._user_snapshot_cache)
+            cache.update(snapshots)
+            cls._user_snapshot_cache = cache
+
+    def get_user_snapshot_age(self, include_disabled: bool = True) -> float | None:
+        """Seconds since the oldest server in the cached snapshot was fetched."""
+        with self._creation_cache_lock:
+            cached = self.__class__._user_snapshot_cache.get(bool(include_disabled))
+        if cached is None:
+            return None
+        return max(0.0, time.monotonic() - cached.get("created_at", 0))
+
     def _get_user_snapshot(
         self,
         include_disabled: bool = False,
@@ -425,8 +1027,23 @@ class MultiServerAPI:
         now = time.monotonic()
         cache_key = bool(include_disabled)
 
+        refresher = _snapshot_refresher
+        refresher_running = refresher is not None and refresher.is_running()
+
         with self._creation_cache_lock:
             cached = self.__class__._user_snapshot_cache.get(cache_key)
+            stalled = refresher_running and cached is not None and refresher.is_stalled(now)
+            if (
+                not force_refresh
+                and cached is not None
+                and cached.get("signature") == signature
+                and refresher_running
+                and not stalled
+            ):
+                # The background refresher keeps this current; serve the last
+                # good data without waiting for a panel.
+                self.last_user_snapshot_cache_hit = True
+                return cached
             if (
                 not force_refresh
                 and cached is not None
@@ -439,7 +1056,9 @@ class MultiServerAPI:
 
             has_matching_cached = cached is not None and cached.get("signature") == signature
 
-        refresh_acquired = self.__class__._user_snapshot_refresh_lock.acquire(blocking=not has_matching_cached or force_refresh)
+        refresh_acquired = self.__class__._user_snapshot_refresh_lock.acquire(
+            blocking=not has_matching_cached or force_refresh or stalled
+        )
         if not refresh_acquired:
             self.last_user_snapshot_cache_hit = True
             return cached
@@ -458,9 +1077,13 @@ class MultiServerAPI:
                     self.last_user_snapshot_cache_hit = True
                     return cached
 
+            write_generations = dict(self.__class__._server_write_generations)
             snapshot = self._build_user_snapshot(include_disabled=include_disabled)
             with self._creation_cache_lock:
-                self.__class__._user_snapshot_cache[cache_key] = snapshot
+                # A write that landed during the fetch is missing from this
+                # snapshot, so only cache it when no server was written to.
+                if self.__class__._server_write_generations == write_generations:
+                    self.__class__._user_snapshot_cache[cache_key] = snapshot
             self.last_user_snapshot_cache_hit = False
             return snapshot
         finally:
@@ -470,12 +1093,14 @@ class MultiServerAPI:
     def invalidate_read_snapshot_cache(cls):
         with cls._creation_cache_lock:
             cls._user_snapshot_cache = {}
+            cls._user_snapshot_generation += 1
 
     @classmethod
     def invalidate_all_caches(cls):
         with cls._creation_cache_lock:
             cls._creation_cache = None
             cls._user_snapshot_cache = {}
+            cls._user_snapshot_generation += 1
 
     def invalidate_user_snapshot_cache(self):
         self.__class__.invalidate_read_snapshot_cache()
@@ -490,7 +1115,9 @@ class MultiServerAPI:
         else:
             return 0
         for user in iterable:
-            if isinstance(user, dict) and not bool(user.get("blocked", False)):
+            if isinstance(user, UserRecord):
+                count += not user.blocked
+            elif isinstance(user, Mapping) and not bool(user.get("blocked", False)):
                 count += 1
         return count
 
@@ -501,7 +1128,7 @@ class MultiServerAPI:
             names.update(str(name) for name in users.keys() if name)
         elif isinstance(users, list):
             for item in users:
-                if isinstance(item, dict) and item.get("username"):
+                if isinstance(item, Mapping) and item.get("username"):
                     names.add(str(item["username"]))
         return names
 
@@ -624,28 +1251,152 @@ class MultiServerAPI:
         }
 
     @classmethod
-    def record_created_user(cls, server_id: str, username: str):
+    def record_created_user(cls, server_id: str, username: str, record: dict | None = None):
+        """Insert a created user into the cached snapshots; repeated calls are no-ops."""
         if not username:
             return
-        with cls._creation_cache_lock:
-            cls._user_snapshot_cache = {}
-            cached = cls._creation_cache
-            if cached is None:
-                return
-            usernames = cached.setdefault("usernames", set())
-            if username in usernames:
-                return
-            usernames.add(username)
-            for state in cached.get("servers", []):
-                client = state.get("client")
-                state_server_id = getattr(client, "server_id", None) or (state.get("server") or {}).get("id")
-                if state_server_id != server_id:
+        cls._apply_user_writes(created=[(server_id, username, record or {"blocked": False})])
+
+    @classmethod
+    def record_updated_user(cls, server_id: str, username: str, current_username: str, record: dict):
+        """Replace a user's cached record after a successful edit or rename."""
+        cls._apply_user_writes(updated=[(server_id, username, current_username, record)])
+
+    @classmethod
+    def record_deleted_user(cls, server_id: str, username: str):
+        cls._apply_user_writes(deleted=[(server_id, username)])
+
+    @staticmethod
+    def _patched_users(users, drops=frozenset(), puts=None, inserts=None):
+        """Return a copy of a server's users with ``drops`` removed, ``puts`` set
+        and ``inserts`` added when missing.
+
+        Also returns the records that were removed or replaced, keyed by username.
+        """
+        puts = puts or {}
+        inserts = inserts or {}
+        if isinstance(users, dict):
+            removed = {username: users[username] for username in set(drops) | set(puts) if username in users}
+            patched = {username: record for username, record in users.items() if username not in drops}
+            patched.update(puts)
+            for username, record in inserts.items():
+                patched.setdefault(username, record)
+            return patched, removed
+        if isinstance(users, list):
+            removed = {}
+            patched = []
+            for record in users:
+                username = record.get("username") if isinstance(record, Mapping) else None
+                if username is not None and (username in drops or username in puts):
+                    removed[username] = record
                     continue
-                if state.get("healthy"):
-                    state["active_count"] = int(state.get("active_count") or 0) + 1
-                    weight = _safe_weight(state.get("weight", 1))
-                    state["load_ratio"] = state["active_count"] / weight
-                break
+                patched.append(record)
+            present = {record.get("username") for record in patched if isinstance(record, Mapping)}
+            patched.extend(UserRecord({**record, "username": username}) for username, record in puts.items())
+            patched.extend(
+                UserRecord({**record, "username": username}) for username, record in inserts.items()
+                if username not in present and username not in puts
+            )
+            return patched, removed
+        return users, {}
+
+    @staticmethod
+    def _is_active_record(record) -> bool:
+        return isinstance(record, Mapping) and not bool(record.get("blocked", False))
+
+    @classmethod
+    def _apply_user_writes(cls, created=(), updated=(), deleted=()):
+        """Write successful mutations through to the cached snapshots.
+
+        ``created`` holds ``(server_id, username, record)``, ``updated`` holds
+        ``(server_id, username, current_username, record)`` and ``deleted``
+        holds ``(server_id, username)``. Snapshot entries are copied, never
+        mutated, because their payloads may be shared with the conditional GET
+        cache. Only the affected servers' write generations move, so the
+        background refresher refetches just those servers.
+        """
+        writes = {}
+
+        def server_writes(server_id):
+            return writes.setdefault(server_id, {"drops": set(), "puts": {}, "inserts": {}})
+
+        for server_id, username, record in created:
+            server_writes(server_id)["inserts"][username] = compact_user_record(record)
+        for server_id, username, current_username, record in updated:
+            if current_username != username:
+                server_writes(server_id)["drops"].add(username)
+            server_writes(server_id)["puts"][current_username] = compact_user_record(record)
+        for server_id, username in deleted:
+            server_writes(server_id)["drops"].add(username)
+        if not writes:
+            return
+
+        with cls._creation_cache_lock:
+            for server_id in writes:
+                cls._server_write_generations[server_id] = cls._server_write_generations.get(server_id, 0) + 1
+
+            removed_by_server = {}
+            snapshots = {}
+            for key, snapshot in cls._user_snapshot_cache.items():
+                entries = []
+                changed = False
+                for entry in snapshot.get("entries", []):
+                    server_id = entry["server"].get("id")
+                    if server_id in writes and entry.get("users") is not None:
+                        users, removed = cls._patched_users(entry["users"], **writes[server_id])
+                        removed_by_server.setdefault(server_id, {}).update(removed)
+                        entry = {**entry, "users": users}
+                        changed = True
+                    entries.append(entry)
+                if changed:
+                    snapshot = {**snapshot, "entries": entries, "username_index": cls._build_username_index(entries)}
+                snapshots[key] = snapshot
+            cls._user_snapshot_cache = snapshots
+            cls._apply_creation_cache_writes(created, updated, deleted, removed_by_server)
+
+        refresher = _snapshot_refresher
+        if refresher is not None:
+            refresher.apply_user_writes(writes)
+
+    @classmethod
+    def _apply_creation_cache_writes(cls, created, updated, deleted, removed_by_server):
+        """Keep the creation cache's usernames and per-server load in step with writes.
+
+        Must be called with ``_creation_cache_lock`` held.
+        """
+        cached = cls._creation_cache
+        if cached is None:
+            return
+        usernames = cached.setdefault("usernames", set())
+        active_delta = {}
+
+        def add_delta(server_id, amount):
+            active_delta[server_id] = active_delta.get(server_id, 0) + amount
+
+        for server_id, username, record in created:
+            if username not in usernames:
+                usernames.add(username)
+                add_delta(server_id, int(cls._is_active_record(record)))
+        for server_id, username, current_username, record in updated:
+            previous = removed_by_server.get(server_id, {}).get(username)
+            if previous is None and current_username != username:
+                previous = removed_by_server.get(server_id, {}).get(current_username)
+            usernames.discard(username)
+            usernames.add(current_username)
+            if previous is not None:
+                add_delta(server_id, int(cls._is_active_record(record)) - int(cls._is_active_record(previous)))
+        for server_id, username in deleted:
+            usernames.discard(username)
+            previous = removed_by_server.get(server_id, {}).get(username)
+            if previous is not None:
+                add_delta(server_id, -int(cls._is_active_record(previous)))
+
+        for state in cached.get("servers", []):
+            client = state.get("client")
+            state_server_id = getattr(client, "server_id", None) or (state.get("server") or {}).get("id")
+            if state.get("healthy") and active_delta.get(state_server_id):
+                state["active_count"] = max(0, int(state.get("active_count") or 0) + active_delta[state_server_id])
+                state["load_ratio"] = state["active_count"] / _safe_weight(state.get("weight", 1))
 
     def create_user_with_retry(self, username_allocator, creator, fallback_client: APIClient | None = None):
         with self.__class__._creation_write_lock:
@@ -675,6 +1426,113 @@ class MultiServerAPI:
 
             return last_username, None, last_client
 
+    @staticmethod
+    def _run_bulk(items: list[tuple], operation) -> list[tuple]:
+        """Run ``operation(*item)`` for ``(client, username, ...)`` items.
+
+        Items are grouped by server and each server gets its own pool of at
+        most ``DIJIQ_BULK_WORKERS_PER_SERVER`` workers, so one slow panel does
+        not hold up the others. Returns ``(client, username, result)`` in
+        input order; ``result`` is ``None`` for failed items.
+        """
+        results = [None] * len(items)
+        groups = {}
+        for position, item in enumerate(items):
+            if item[0] is not None:
+                groups.setdefault(item[0].server_id, []).append(position)
+
+        workers = get_bulk_workers_per_server()
+        executors = []
+        future_to_position = {}
+        try:
+            for server_id, positions in groups.items():
+                executor = ThreadPoolExecutor(
+                    max_workers=min(workers, len(positions)),
+                    thread_name_prefix=f"dijiq-bulk-{server_id}",
+                )
+                executors.append(executor)
+                for position in positions:
+                    future_to_position[executor.submit(operation, *items[position])] = position
+            for future in as_completed(future_to_position):
+                position = future_to_position[future]
+                try:
+                    results[position] = future.result()
+                except Exception as e:
+                    print(f"[MultiServerAPI] Bulk operation for {items[position][1]} failed: {e}")
+        finally:
+            for executor in executors:
+                executor.shutdown(wait=True)
+        return [(item[0], item[1], result) for item, result in zip(items, results)]
+
+    def bulk_add_users(self, items) -> list[tuple]:
+        """Create many users. ``items`` are ``(client, username, options)`` where
+        ``options`` holds ``add_user`` keyword arguments.
+
+        Created users are written through to the cached snapshots once for the batch.
+        """
+        items = [(client, username, dict(options)) for client, username, options in items]
+
+        def create(client, username, options):
+            return client._create_user(username, **options)
+
+        results = self._run_bulk(items, create)
+        self._apply_user_writes(created=[
+            (client.server_id, username, provisional_user_record(
+                options.get("traffic_limit"),
+                options.get("expiration_days"),
+                unlimited=options.get("unlimited", False),
+                note=options.get("note"),
+            ))
+            for (client, username, options), (_, _, result) in zip(items, results)
+            if result is not None
+        ])
+        return results
+
+    def bulk_update_users(self, items) -> list[tuple]:
+        """Patch many users. ``items`` are ``(client, username, data)``.
+
+        Each updated record is read back in the same worker and written
+        through to the cached snapshots once for the batch.
+        """
+        items = list(items)
+        records = {}
+
+        def update(client, username, data):
+            result = client._patch(f"{client.users_endpoint}{username}", data)
+            if result is not None:
+                current_username = data.get("new_username") or username
+                records[(client.server_id, username)] = (current_username, client.get_user(current_username))
+            return result
+
+        results = self._run_bulk(items, update)
+        updated = []
+        for client, username, result in results:
+            if result is None:
+                continue
+            current_username, record = records.get((client.server_id, username), (username, None))
+            if record is None:
+                self.invalidate_all_caches()
+                return results
+            updated.append((client.server_id, username, current_username, record))
+        self._apply_user_writes(updated=updated)
+        return results
+
+    def bulk_delete_users(self, items) -> list[tuple]:
+        """Delete many users. ``items`` are ``(client, username)``.
+
+        Deleted users are removed from the cached snapshots once for the batch.
+        """
+        items = list(items)
+
+        def delete(client, username):
+            return client._delete(f"{client.users_endpoint}{username}")
+
+        results = self._run_bulk(items, delete)
+        self._apply_user_writes(deleted=[
+            (client.server_id, username) for client, username, result in results if result is not None
+        ])
+        return results
+
     def get_server_statuses(self) -> list[dict]:
         statuses = []
         for entry in self._fetch_users_for_servers(include_disabled=True):
@@ -689,6 +1547,7 @@ class MultiServerAPI:
                 "healthy": healthy,
                 "active_count": active_count if healthy else None,
                 "load_ratio": (active_count / weight) if healthy else None,
+                "breaker": entry["client"].breaker.snapshot(),
             })
         return statuses
 
@@ -703,6 +1562,14 @@ class MultiServerAPI:
                 usernames.update(self.extract_usernames(users))
         return usernames
 
+    def fetch_server_users(self, include_disabled: bool = False) -> list[dict]:
+        """Fetch every server's users list concurrently, bypassing the snapshot cache.
+
+        Returns ``{"server", "client", "index", "users"}`` entries in server
+        order; ``users`` is ``None`` for a server that failed.
+        """
+        return self._fetch_users_for_servers(include_disabled=include_disabled)
+
     def get_user_snapshot_entries(
         self,
         include_disabled: bool = True,
@@ -745,7 +1612,23 @@ class MultiServerAPI:
             self.last_user_snapshot_cache_stale = not fresh
             return list(cached.get("entries", []))
 
-    def find_user(self, username: str, preferred_server_id: str | None = None):
+    def _cached_snapshot_for_lookup(self):
+        """Return ``(snapshot, fresh)`` for the newest cached snapshot covering every server."""
+        ttl = self._user_snapshot_cache_ttl_seconds()
+        now = time.monotonic()
+        all_enabled = all(server.get("enabled", True) for server in self.servers)
+        with self._creation_cache_lock:
+            for include_disabled in (True, False):
+                if not include_disabled and not all_enabled:
+                    continue
+                cached = self.__class__._user_snapshot_cache.get(include_disabled)
+                signature = (include_disabled, self._servers_signature(self.servers))
+                if cached is None or cached.get("signature") != signature or "username_index" not in cached:
+                    continue
+                return cached, ttl > 0 and now - cached.get("created_at", 0) < ttl
+        return None, False
+
+    def _find_user_serially(self, username: str, preferred_server_id: str | None = None):
         if preferred_server_id:
             client = self.get_client(preferred_server_id)
             if client:
@@ -760,6 +1643,52 @@ class MultiServerAPI:
                 return client, user
         return None, None
 
+    def find_user(self, username: str, preferred_server_id: str | None = None, full_user: bool = True):
+        """Locate ``username`` across servers, answering from the user snapshot when possible.
+
+        The snapshot says which server holds the user, so only that server is
+        queried for the full panel record. Callers that only need the owning
+        client or the compact ``UserRecord`` fields pass ``full_user=False``
+        and a fresh snapshot answers directly. Users missing from a
+        fresh snapshot are only looked up on the preferred server and on
+        servers whose snapshot fetch failed. Without any snapshot every server
+        is queried in turn. A server whose circuit breaker is open is answered
+        from the snapshot, stale or not, instead of being queried.
+        """
+        snapshot, fresh = self._cached_snapshot_for_lookup()
+        if snapshot is None or not username:
+            return self._find_user_serially(username, preferred_server_id)
+
+        entries = snapshot.get("entries", [])
+        matches = snapshot["username_index"].get(str(username).lower(), [])
+        exact = [match for match in matches if match[1] == username]
+        candidates = exact or matches
+        if candidates:
+            preferred = [
+                match for match in candidates
+                if preferred_server_id and entries[match[0]]["server"].get("id") == preferred_server_id
+            ]
+            position, _, record = (preferred or candidates)[0]
+            client = entries[position]["client"]
+            if (fresh and not full_user) or not client.is_available():
+                return client, dict(record) if isinstance(record, Mapping) else record
+            user = client.get_user(username)
+            if user is not None:
+                return client, user
+            return self._find_user_serially(username, preferred_server_id)
+
+        if not fresh:
+            return self._find_user_serially(username, preferred_server_id)
+
+        for entry in entries:
+            server_id = entry["server"].get("id")
+            if entry.get("users") is not None and server_id != preferred_server_id:
+                continue
+            user = entry["client"].get_user(username)
+            if user is not None:
+                return entry["client"], user
+        return None, None
+
     def iter_all_users(
         self,
         include_disabled: bool = True,
@@ -780,5 +1709,337 @@ class MultiServerAPI:
                     yield client, username, data
             elif isinstance(users, list):
                 for data in users:
-                    if isinstance(data, dict):
+                    if isinstance(data, Mapping):
                         yield client, data.get("username"), data
+
+
+class AsyncAPIClient:
+    """aiohttp version of an APIClient's users-list read.
+
+    It shares the sync client's ETag cache, circuit breaker and transfer
+    counters, so sync and async reads of the same server stay consistent.
+    """
+
+    def __init__(self, client: APIClient, session):
+        self.client = client
+        self.session = session
+
+    async def get_users(self):
+        client = self.client
+        url = client.users_endpoint
+        key = (client._session_key, url)
+        with _conditional_cache_lock:
+            cached = _conditional_cache.get(key)
+        headers = dict(client.headers)
+        if cached:
+            headers["If-None-Match"] = cached["etag"]
+
+        breaker = client.breaker
+        if not breaker.allow_request():
+            print(f"[AsyncAPIClient] GET {url} failed: circuit open for server {client.server_id}")
+            return None
+        reader = UsersStreamReader()
+        started = time.monotonic()
+        try:
+            async with self.session.get(
+                url,
+                headers=headers,
+                timeout=aiohttp.ClientTimeout(total=get_api_read_timeout_seconds()),
+            ) as response:
+                status = response.status
+                etag = response.headers.get("ETag")
+                if status < 300:
+                    async for chunk in response.content.iter_chunked(USERS_STREAM_CHUNK_SIZE):
+                        reader.feed(chunk)
+                    size = reader.size
+                else:
+                    size = len(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record(False, time.monotonic() - started)
+            print(f"[AsyncAPIClient] GET {url} failed: {e!r}")
+            return None
+        except ValueError as e:
+            breaker.record(True, time.monotonic() - started)
+            print(f"[AsyncAPIClient] GET {url} failed: {e}")
+            return None
+        breaker.record(status < 500, time.monotonic() - started)
+
+        if status == 304 and cached is not None:
+            _record_transfer(client.server_id, size, saved=cached["size"])
+            return cached["payload"]
+        if status >= 300:
+            print(f"[AsyncAPIClient] GET {url} failed: HTTP {status}")
+            return None
+        try:
+            payload = reader.close()
+        except ValueError as e:
+            print(f"[AsyncAPIClient] GET {url} failed: {e}")
+            return None
+        _record_transfer(client.server_id, size)
+        _remember_conditional(key, etag, payload, size)
+        return payload
+
+
+class AsyncMultiServerAPI:
+    """Fans panel reads out from one event loop thread over one aiohttp pool.
+
+    Every server shares a keep-alive connector with a per-host limit, so a
+    fleet refresh costs a single thread and takes as long as the slowest
+    server. Sync code calls the blocking ``fetch_users`` facade.
+    """
+
+    def __init__(self, limit: int | None = None, limit_per_host: int | None = None):
+        self.limit = int(limit or _float_env("DIJIQ_ASYNC_POOL_LIMIT", 100, minimum=1))
+        self.limit_per_host = int(limit_per_host or _float_env("DIJIQ_ASYNC_PER_HOST_LIMIT", 4, minimum=1))
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    def _ensure_loop(self):
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._session = None
+                self._thread = threading.Thread(target=self._loop.run_forever, name="dijiq-async-api", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def _get_session(self):
+        # Only called on the loop thread.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=30,
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def run(self, coro, timeout: float | None = None):
+        """Run ``coro`` on the shared loop and block until it finishes."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result(timeout)
+
+    async def fetch_users_async(self, clients: list[APIClient]) -> list:
+        session = self._get_session()
+
+        async def fetch(client):
+            try:
+                return await AsyncAPIClient(client, session).get_users()
+            except Exception as e:
+                print(f"[AsyncMultiServerAPI] Fetch users for {client.server_id} failed: {e!r}")
+                return None
+
+        return await asyncio.gather(*(fetch(client) for client in clients))
+
+    def fetch_users(self, clients: list[APIClient]) -> list:
+        """Return each client's users payload (``None`` on failure), in order."""
+        return self.run(self.fetch_users_async(list(clients)))
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+            session, self._session = self._session, None
+        if loop is None or not loop.is_running():
+            return
+        if session is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(5)
+            except Exception:
+                pass
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_async_api = None
+_async_api_lock = threading.Lock()
+
+
+def get_async_multi_server_api() -> AsyncMultiServerAPI | None:
+    """Return the shared fan-out client, or ``None`` when aiohttp is unavailable."""
+    global _async_api
+    if aiohttp is None:
+        return None
+    with _async_api_lock:
+        if _async_api is None:
+            _async_api = AsyncMultiServerAPI()
+            atexit.register(_async_api.close)
+        return _async_api
+
+
+class UserSnapshotRefresher:
+    """Daemon that keeps the MultiServerAPI user snapshots warm.
+
+    A scheduler thread submits each server's ``get_users`` to a small pool on
+    its own jittered interval, so a slow panel only delays its own entry. A
+    failed fetch keeps that server's last good users. While the refresher runs,
+    readers are served the published snapshot without waiting for a panel,
+    unless the refresher itself has stopped publishing for
+    ``SNAPSHOT_MAX_AGE_REFRESH_INTERVALS`` intervals. A panel that keeps
+    failing does not count: its failed fetches are published too.
+    Writes are patched into the per-server data as they happen; a fetch that
+    was in flight during a write is dropped and repeated. Full cache
+    invalidations discard all data fetched before them.
+    """
+
+    def __init__(self, interval_seconds: float | None = None, jitter_ratio: float = 0.2, workers: int | None = None):
+        self.interval_seconds = interval_seconds or get_snapshot_refresh_seconds()
+        self.jitter_ratio = jitter_ratio
+        self.workers = workers or MultiServerAPI._max_parallel_workers(64)
+        self._lock = threading.Lock()
+        self._servers = []
+        self._server_data = {}
+        self._next_due = {}
+        self._inflight = set()
+        self._generation = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self.last_published_at = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def stall_timeout(self) -> float:
+        return self.interval_seconds * SNAPSHOT_MAX_AGE_REFRESH_INTERVALS
+
+    def is_stalled(self, now: float | None = None) -> bool:
+        """True when no fetch, good or failed, has been published for too long."""
+        last_published_at = self.last_published_at
+        if last_published_at is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - last_published_at >= self.stall_timeout()
+
+    def start(self):
+        if self.is_running():
+            return self
+        self._stop.clear()
+        self.last_published_at = time.monotonic()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="dijiq-snapshot")
+        self._thread = threading.Thread(target=self._run, name="dijiq-snapshot-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def _next_interval(self) -> float:
+        return self.interval_seconds * (1 + random.uniform(-self.jitter_ratio, self.jitter_ratio))
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._schedule()
+            except Exception as e:
+                print(f"[UserSnapshotRefresher] Scheduling failed: {e}")
+            self._stop.wait(0.5)
+
+    def _schedule(self):
+        servers = get_server_configs()
+        generation = MultiServerAPI._user_snapshot_generation
+        now = time.monotonic()
+        with self._lock:
+            self._servers = servers
+            server_ids = {server["id"] for server in servers}
+            for server_id in list(self._server_data):
+                if server_id not in server_ids:
+                    self._server_data.pop(server_id, None)
+                    self._next_due.pop(server_id, None)
+            if generation != self._generation:
+                # Something was written; refetch every server right away.
+                self._generation = generation
+                self._next_due = {}
+            due = [
+                server for server in servers
+                if server["id"] not in self._inflight and now >= self._next_due.get(server["id"], 0)
+            ]
+            self._inflight.update(server["id"] for server in due)
+        for server in due:
+            self._executor.submit(self.refresh_server, server)
+
+    def apply_user_writes(self, writes: dict):
+        """Patch written-through mutations into the per-server data."""
+        with self._lock:
+            for server_id, server_writes in writes.items():
+                data = self._server_data.get(server_id)
+                if data is None or data["users"] is None:
+                    continue
+                users, _ = MultiServerAPI._patched_users(data["users"], **server_writes)
+                self._server_data[server_id] = {
+                    **data,
+                    "users": users,
+                    "write_generation": MultiServerAPI._server_write_generations.get(server_id, 0),
+                }
+
+    def refresh_server(self, server: dict):
+        """Fetch one server's users and republish the snapshots."""
+        generation = MultiServerAPI._user_snapshot_generation
+        write_generation = MultiServerAPI._server_write_generations.get(server["id"], 0)
+        client = APIClient(server)
+        try:
+            users = client.get_users()
+        except Exception as e:
+            print(f"[UserSnapshotRefresher] Fetch users for {server.get('id')} failed: {e}")
+            users = None
+        fetched_at = time.monotonic()
+
+        with self._lock:
+            self._inflight.discard(server["id"])
+            self._next_due[server["id"]] = fetched_at + self._next_interval()
+            previous = self._server_data.get(server["id"])
+            if MultiServerAPI._server_write_generations.get(server["id"], 0) != write_generation:
+                # A write landed during the fetch, so this payload may predate
+                # it. Keep the patched data and fetch again right away.
+                self._next_due[server["id"]] = 0
+                users = None
+            elif users is not None or previous is None or previous["generation"] != generation:
+                self._server_data[server["id"]] = {
+                    "client": client,
+                    "users": users,
+                    "fetched_at": fetched_at,
+                    "generation": generation,
+                    "write_generation": write_generation,
+                    "error": None if users is not None else "refresh failed",
+                }
+            else:
+                previous["error"] = "refresh failed"
+            servers = list(self._servers) or get_server_configs()
+            current = MultiServerAPI._user_snapshot_generation
+            server_data = {
+                server_id: data for server_id, data in self._server_data.items()
+                if data["generation"] == current
+            }
+
+        if users is not None:
+            MultiServerAPI._record_user_changes([{"server": server, "users": users}])
+        MultiServerAPI._publish_refreshed_snapshots(servers, server_data)
+        self.last_published_at = time.monotonic()
+
+
+_snapshot_refresher = None
+_snapshot_refresher_lock = threading.Lock()
+
+
+def start_user_snapshot_refresher(force: bool = False) -> UserSnapshotRefresher | None:
+    """Start the background refresher when ``DIJIQ_SNAPSHOT_REFRESHER`` is enabled."""
+    global _snapshot_refresher
+    load_dotenv(TELEGRAM_ENV_PATH)
+    enabled = str(os.getenv("DIJIQ_SNAPSHOT_REFRESHER", "")).strip().lower() in {"1", "true", "yes", "on"}
+    if not (enabled or force):
+        return None
+    with _snapshot_refresher_lock:
+        if _snapshot_refresher is None:
+            _snapshot_refresher = UserSnapshotRefresher()
+        return _snapshot_refresher.start()
+
+
+def stop_user_snapshot_refresher():
+    global _snapshot_refresher
+    with _snapshot_refresher_lock:
+        if _snapshot_refresher is not None:
+            _snapshot_refresher.stop()
+            _snapshot_refresher = None
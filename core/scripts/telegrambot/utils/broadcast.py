@@ -3,11 +3,12 @@ from utils.command import bot, is_admin, ADMIN_USER_IDS
 from utils.common import create_main_markup
 from utils.api_client import MultiServerAPI
 from utils.reseller import get_all_resellers
-from utils import test_config_store
+from utils import broadcast_jobs, json_store, notification_queue, test_config_store
+from utils.notification_queue import is_permanent_broadcast_failure
 import re
-import json
 import os
 import time
+from collections.abc import Mapping
 from datetime import datetime, timedelta
 
 BROADCAST_FAILED_USERS_PATH = "/etc/dijiq/core/scripts/telegrambot/broadcast_failed_users.json"
@@ -17,10 +18,7 @@ TEST_CONFIGS_FILE = "/etc/dijiq/core/scripts/telegrambot/test_configs.json"
 
 def load_failed_broadcast_users():
     try:
-        if not os.path.exists(BROADCAST_FAILED_USERS_PATH):
-            return set()
-        with open(BROADCAST_FAILED_USERS_PATH, 'r') as f:
-            data = json.load(f)
+        data = json_store.read(BROADCAST_FAILED_USERS_PATH, [], strict=True)
         if not isinstance(data, list):
             return set()
         return {str(user_id) for user_id in data}
@@ -31,9 +29,7 @@ def load_failed_broadcast_users():
 
 def save_failed_broadcast_users(user_ids):
     try:
-        os.makedirs(os.path.dirname(BROADCAST_FAILED_USERS_PATH), exist_ok=True)
-        with open(BROADCAST_FAILED_USERS_PATH, 'w') as f:
-            json.dump(sorted({str(user_id) for user_id in user_ids}), f)
+        json_store.write(BROADCAST_FAILED_USERS_PATH, sorted({str(user_id) for user_id in user_ids}), compact=True)
     except Exception as e:
         print(f"Failed to save broadcast failed users list: {str(e)}")
 
@@ -46,19 +42,6 @@ def reset_failed_broadcast_users():
         print(f"Failed to reset broadcast failed users list: {str(e)}")
 
 
-def is_permanent_broadcast_failure(error_msg):
-    """Return True when Telegram indicates this recipient should stay excluded."""
-    lowered = error_msg.lower()
-    permanent_error_terms = [
-        "blocked",
-        "deactivated",
-        "chat not found",
-        "user is bot",
-        "forbidden",
-    ]
-    return any(term in lowered for term in permanent_error_terms)
-
-
 def iter_paid_user_records():
     """Yield paid-user records from every configured VPN server."""
     multi_api = MultiServerAPI()
@@ -228,7 +211,7 @@ def get_user_ids(filter_type):
             telegram_id = _extract_paid_telegram_id(username)
             if telegram_id is None:
                 return
-            blocked = details.get('blocked', False) if isinstance(details, dict) else False
+            blocked = details.get('blocked', False) if isinstance(details, Mapping) else False
             if not blocked:
                 active_paid_ids.add(telegram_id)
 
@@ -312,7 +295,7 @@ def get_user_ids(filter_type):
             if telegram_id is None:
                 return
 
-            blocked = details.get('blocked', False) if isinstance(details, dict) else False
+            blocked = details.get('blocked', False) if isinstance(details, Mapping) else False
 
             if filter_type == 'all':
                 user_ids.add(telegram_id)
@@ -489,76 +472,130 @@ def send_broadcast(message, target, target_label, explicit_user_ids=None):
             print(f"Failed to send exclusion log file: {str(e)}")
         return
 
-    admin_id = message.from_user.id
-        
-    # Track users by result
-    success_users = []  # List of user IDs that received the message
-    failed_by_error = {}  # Dict: error_message -> list of user IDs
-    newly_failed_user_ids = set()
-    
     skipped_count = total_pool - len(user_ids)
     status_msg = bot.reply_to(message, f"Broadcasting message to {len(user_ids)} users (pool: {total_pool} total, {skipped_count} pre-excluded)...")
-    last_status_update = 0
-    
-    for user_id in user_ids:
-        try:
-            bot.send_message(int(user_id), broadcast_text)
-            success_users.append(str(user_id))
-            time.sleep(0.05)  # Rate limit: ~20 messages/second to avoid Telegram throttling
-        except Exception as e:
-            error_msg = str(e)
-            # Simplify common error messages for grouping
-            if "blocked" in error_msg.lower():
-                error_key = "Bot was blocked by the user"
-            elif "deactivated" in error_msg.lower():
-                error_key = "User is deactivated"
-            elif "chat not found" in error_msg.lower():
-                error_key = "Chat not found"
-            elif "user is bot" in error_msg.lower():
-                error_key = "User is a bot"
-            elif "forbidden" in error_msg.lower():
-                error_key = "Forbidden - User unavailable"
-            elif "bad request" in error_msg.lower():
-                error_key = "Bad Request"
-            else:
-                error_key = error_msg[:50]  # Truncate long error messages
-            
-            # Add user ID to the appropriate error group
-            if error_key not in failed_by_error:
-                failed_by_error[error_key] = []
-            failed_by_error[error_key].append(str(user_id))
-            if is_permanent_broadcast_failure(error_msg):
-                newly_failed_user_ids.add(str(user_id))
-            print(f"Failed to send broadcast to {user_id}: {error_msg}")
-            
-        # Update status every 10 users, but avoid editing too frequently.
-        processed = len(success_users) + sum(len(u) for u in failed_by_error.values())
-        now_monotonic = time.monotonic()
-        should_update_status = (
-            processed == len(user_ids)
-            or (processed % 10 == 0 and now_monotonic - last_status_update >= 3)
+
+    # The job is checkpointed to disk and sent on the shared notification
+    # queue, so the handler returns right away and a restart resumes it.
+    state = broadcast_jobs.create_job(
+        user_ids,
+        broadcast_text,
+        target_label=target_label,
+        total_pool=total_pool,
+        excluded_by_reason=excluded_by_reason,
+        admin_id=message.from_user.id,
+        chat_id=message.chat.id,
+        status_message_id=status_msg.message_id,
+    )
+    _update_broadcast_status(state)
+    return _start_broadcast_job(state["id"])
+
+
+def create_broadcast_control_markup(job_id, status):
+    markup = types.InlineKeyboardMarkup()
+    if status == broadcast_jobs.STATUS_PAUSED:
+        markup.add(types.InlineKeyboardButton("▶️ Resume", callback_data=f"broadcast:resume:{job_id}"))
+    else:
+        markup.add(types.InlineKeyboardButton("⏸ Pause", callback_data=f"broadcast:pause:{job_id}"))
+    markup.add(types.InlineKeyboardButton("⏹ Cancel", callback_data=f"broadcast:cancel:{job_id}"))
+    return markup
+
+
+def _update_broadcast_status(state):
+    skipped_count = state["total_pool"] - state["total"]
+    label = "Paused" if state["status"] == broadcast_jobs.STATUS_PAUSED else "Broadcasting"
+    try:
+        bot.edit_message_text(
+            f"{label}: {state['cursor']}/{state['total']} attempted ({skipped_count} skipped from {state['total_pool']} pool)...",
+            chat_id=state["chat_id"],
+            message_id=state["status_message_id"],
+            reply_markup=create_broadcast_control_markup(state["id"], state["status"]),
         )
-        if should_update_status:
-            try:
-                bot.edit_message_text(
-                    f"Broadcasting: {processed}/{len(user_ids)} attempted ({skipped_count} skipped from {total_pool} pool)...",
-                    chat_id=status_msg.chat.id,
-                    message_id=status_msg.message_id
-                )
-                last_status_update = now_monotonic
-            except Exception as e:
-                print(f"Failed to update broadcast progress message: {str(e)}")
-    
+    except Exception as e:
+        print(f"Failed to update broadcast progress message: {str(e)}")
+
+
+def _broadcast_progress_callback():
+    last_status_update = [0]
+
+    def report_progress(state):
+        # Edit the status message at most every 3 seconds.
+        now_monotonic = time.monotonic()
+        if state["status"] == broadcast_jobs.STATUS_RUNNING and now_monotonic - last_status_update[0] < 3:
+            return
+        _update_broadcast_status(state)
+        last_status_update[0] = now_monotonic
+
+    return report_progress
+
+
+def _submit_broadcast_chunk(chat_ids, text):
+    return notification_queue.broadcast_message(bot, chat_ids, text)
+
+
+def _start_broadcast_job(job_id):
+    return broadcast_jobs.start_job(
+        job_id,
+        _submit_broadcast_chunk,
+        on_progress=_broadcast_progress_callback(),
+        on_finish=_finish_broadcast,
+    )
+
+
+def resume_broadcast_jobs():
+    """Restart broadcasts that were still running when the bot stopped."""
+    resumed = []
+    for state in broadcast_jobs.pending_jobs():
+        print(f"Resuming broadcast job {state['id']} at {state['cursor']}/{state['total']}")
+        resumed.append(_start_broadcast_job(state["id"]))
+    return resumed
+
+
+@bot.callback_query_handler(func=lambda call: (call.data or "").startswith("broadcast:") and is_admin(call.from_user.id))
+def handle_broadcast_control(call):
+    _, action, job_id = call.data.split(":", 2)
+    if action == "pause":
+        state = broadcast_jobs.pause_job(job_id)
+        notice = "Broadcast will pause after the current batch."
+    elif action == "resume":
+        state = broadcast_jobs.load_job(job_id)
+        if broadcast_jobs.resume_job(job_id, _submit_broadcast_chunk, _broadcast_progress_callback(), _finish_broadcast):
+            notice = "Broadcast resumed."
+        else:
+            state = None
+    elif action == "cancel":
+        state, stopped = broadcast_jobs.cancel_job(job_id)
+        notice = "Broadcast cancelled."
+        if state is not None and stopped:
+            _finish_broadcast(state)
+    else:
+        state = None
+
+    if state is None:
+        bot.answer_callback_query(call.id, "This broadcast has already finished.")
+        return
+    bot.answer_callback_query(call.id, notice)
+
+
+def _finish_broadcast(state):
+    job_id = state["id"]
+    target_label = state.get("target_label", "")
+    total_pool = state.get("total_pool", state["total"])
+    excluded_by_reason = state.get("excluded_by_reason") or {}
+    failed_by_error = state.get("failed_by_error") or {}
+    success_users = broadcast_jobs.success_users(state)
+    newly_failed_user_ids = set(state.get("permanent_failures") or [])
+
     # Update failed users list
     if newly_failed_user_ids:
         existing_failed = load_failed_broadcast_users()
         existing_failed.update(newly_failed_user_ids)
         save_failed_broadcast_users(existing_failed)
-    
+
     # Calculate counts
     success_count = len(success_users)
     fail_count = sum(len(users) for users in failed_by_error.values())
-    
+
     # Generate and send log file
     log_filepath = generate_broadcast_log(
         target_label=target_label,
@@ -566,10 +603,10 @@ def send_broadcast(message, target, target_label, explicit_user_ids=None):
         success_users=success_users,
         failed_by_error=failed_by_error,
         excluded_by_reason=excluded_by_reason,
-        broadcast_text=broadcast_text,
-        admin_id=admin_id
+        broadcast_text=state["text"],
+        admin_id=state.get("admin_id")
     )
-    
+
     # Build summary for admin message
     excluded_total = sum(len(v) for v in excluded_by_reason.values())
     error_summary = ""
@@ -577,15 +614,20 @@ def send_broadcast(message, target, target_label, explicit_user_ids=None):
         error_summary = "\n\n📋 Error Breakdown:"
         for error_msg, users in failed_by_error.items():
             error_summary += f"\n  • {error_msg}: {len(users)}"
-    
+
     excluded_summary = ""
     if excluded_by_reason:
         excluded_summary = "\n\n🚫 Exclusion Breakdown:"
         for reason, users in excluded_by_reason.items():
             excluded_summary += f"\n  • {reason}: {len(users)}"
 
+    cancelled_note = ""
+    if state["status"] == broadcast_jobs.STATUS_CANCELLED:
+        cancelled_note = f"⏹ Cancelled after {state['cursor']}/{state['total']} recipients\n"
+
     final_report = (
-        "📢 Broadcast Completed\n\n"
+        f"📢 Broadcast {'Cancelled' if cancelled_note else 'Completed'}\n\n"
+        f"{cancelled_note}"
         f"Target: {target_label}\n"
         f"Pool Size: {total_pool}\n"
         f"✅ Successful: {success_count}\n"
@@ -595,17 +637,19 @@ def send_broadcast(message, target, target_label, explicit_user_ids=None):
         f"{excluded_summary}\n\n"
         f"📄 Detailed log file sent below."
     )
-    
-    bot.reply_to(message, final_report, reply_markup=create_main_markup(is_admin=True))
-    
+
+    chat_id = state["chat_id"]
+    bot.send_message(chat_id, final_report, reply_markup=create_main_markup(is_admin=True))
+
     # Send the log file to the admin
     try:
         with open(log_filepath, 'rb') as log_file:
             bot.send_document(
-                message.chat.id,
+                chat_id,
                 log_file,
                 caption=f"📊 Broadcast Log - {target_label}"
             )
     except Exception as e:
         print(f"Failed to send broadcast log file: {str(e)}")
-        bot.reply_to(message, f"⚠️ Could not send log file: {str(e)}")
+        bot.send_message(chat_id, f"⚠️ Could not send log file: {str(e)}")
+    broadcast_jobs.delete_job(job_id)
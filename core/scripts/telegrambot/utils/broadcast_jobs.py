@@ -0,0 +1,277 @@
+"""
+Persistent, checkpointed broadcast jobs.
+
+A job is stored as two files next to the bot's other state:
+
+* ``broadcast_job_<id>.recipients.json`` - the recipient list, written once.
+* ``broadcast_job_<id>.json`` - status, cursor, success count and failure
+  buckets, rewritten after every chunk of ``BROADCAST_CHECKPOINT_EVERY`` sends.
+
+Recipients are sent in chunks through the shared notification queue. After a
+restart a running job resumes at its cursor, so at most one chunk is resent.
+Successful recipients are not listed in the checkpoint. They are derived from
+the sent prefix of the recipient list minus the failures.
+"""
+
+import glob
+import os
+import secrets
+import threading
+from datetime import datetime
+
+from utils import json_store
+
+BROADCAST_JOBS_DIR = "/etc/dijiq/core/scripts/telegrambot"
+BROADCAST_CHECKPOINT_EVERY = 100
+
+STATUS_RUNNING = "running"
+STATUS_PAUSED = "paused"
+STATUS_CANCELLED = "cancelled"
+STATUS_COMPLETED = "completed"
+FINISHED_STATUSES = {STATUS_CANCELLED, STATUS_COMPLETED}
+
+_runners = {}
+_runners_lock = threading.Lock()
+
+
+def _job_path(job_id):
+    return os.path.join(BROADCAST_JOBS_DIR, f"broadcast_job_{job_id}.json")
+
+
+def _recipients_path(job_id):
+    return os.path.join(BROADCAST_JOBS_DIR, f"broadcast_job_{job_id}.recipients.json")
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def broadcast_error_key(error_msg):
+    """Simplify common Telegram errors so the report can group recipients."""
+    lowered = error_msg.lower()
+    if "blocked" in lowered:
+        return "Bot was blocked by the user"
+    if "deactivated" in lowered:
+        return "User is deactivated"
+    if "chat not found" in lowered:
+        return "Chat not found"
+    if "user is bot" in lowered:
+        return "User is a bot"
+    if "forbidden" in lowered:
+        return "Forbidden - User unavailable"
+    if "bad request" in lowered:
+        return "Bad Request"
+    return error_msg[:50]  # Truncate long error messages
+
+
+def create_job(recipients, text, **metadata):
+    """Persist a new running job and return its state.
+
+    ``metadata`` is stored as-is (target label, admin and chat ids, exclusions).
+    """
+    job_id = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{secrets.token_hex(3)}"
+    recipients = [str(user_id) for user_id in recipients]
+    os.makedirs(BROADCAST_JOBS_DIR, exist_ok=True)
+    json_store.write(_recipients_path(job_id), recipients, compact=True)
+    state = dict(metadata)
+    state.update({
+        "id": job_id,
+        "status": STATUS_RUNNING,
+        "text": text,
+        "total": len(recipients),
+        "cursor": 0,
+        "succeeded": 0,
+        "failed_by_error": {},
+        "permanent_failures": [],
+        "created_at": _now(),
+        "updated_at": _now(),
+    })
+    json_store.write(_job_path(job_id), state, compact=True)
+    return state
+
+
+def load_job(job_id):
+    state = json_store.load(_job_path(job_id), None)
+    return state if isinstance(state, dict) else None
+
+
+def load_recipients(job_id):
+    recipients = json_store.read(_recipients_path(job_id), [])
+    return recipients if isinstance(recipients, list) else []
+
+
+def list_jobs():
+    jobs = []
+    for path in sorted(glob.glob(os.path.join(BROADCAST_JOBS_DIR, "broadcast_job_*.json"))):
+        if path.endswith(".recipients.json"):
+            continue
+        state = json_store.load(path, None)
+        if isinstance(state, dict) and state.get("id"):
+            jobs.append(state)
+    return jobs
+
+
+def delete_job(job_id):
+    for path in (_job_path(job_id), _recipients_path(job_id)):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        json_store.invalidate(path)
+
+
+def success_users(state, recipients=None):
+    """Recipients in the sent prefix that did not fail."""
+    if recipients is None:
+        recipients = load_recipients(state["id"])
+    failed = {user_id for users in state.get("failed_by_error", {}).values() for user_id in users}
+    return [user_id for user_id in recipients[:state.get("cursor", 0)] if user_id not in failed]
+
+
+def _set_status(job_id, status):
+    def mutate(state):
+        if not isinstance(state, dict) or state.get("status") in FINISHED_STATUSES:
+            return None
+        state["status"] = status
+        state["updated_at"] = _now()
+        return dict(state)
+
+    return json_store.update(_job_path(job_id), mutate, default=None, compact=True)
+
+
+class BroadcastJobRunner(threading.Thread):
+    """Send one job's remaining recipients chunk by chunk.
+
+    ``submit(chat_ids, text)`` must return a NotificationJob. ``on_progress``
+    runs after every checkpoint, and ``on_finish`` runs once the job is
+    completed or cancelled.
+    """
+
+    def __init__(self, job_id, submit, on_progress=None, on_finish=None, checkpoint_every=None):
+        super().__init__(name=f"dijiq-broadcast-{job_id}", daemon=True)
+        self.job_id = job_id
+        self.submit = submit
+        self.on_progress = on_progress
+        self.on_finish = on_finish
+        self.checkpoint_every = checkpoint_every or BROADCAST_CHECKPOINT_EVERY
+        self.requested_status = None
+        self.finishing = False
+
+    def run(self):
+        try:
+            self._run()
+        finally:
+            with _runners_lock:
+                if _runners.get(self.job_id) is self:
+                    del _runners[self.job_id]
+
+    def _run(self):
+        state = load_job(self.job_id)
+        if state is None:
+            return
+        recipients = load_recipients(self.job_id)
+        permanent = set(state.get("permanent_failures", []))
+
+        while True:
+            with _runners_lock:
+                requested = self.requested_status
+                if requested is not None or state["cursor"] >= len(recipients):
+                    # From here on a resume waits for this runner to wind
+                    # down instead of withdrawing the request.
+                    self.finishing = True
+                    break
+            chunk = recipients[state["cursor"]:state["cursor"] + self.checkpoint_every]
+            job = self.submit([int(user_id) for user_id in chunk], state["text"])
+            job.wait()
+
+            state["succeeded"] += len(job.succeeded)
+            for user_id, error_msg in job.failed.items():
+                state["failed_by_error"].setdefault(broadcast_error_key(error_msg), []).append(str(user_id))
+                print(f"Failed to send broadcast to {user_id}: {error_msg}")
+            permanent.update(str(user_id) for user_id in job.permanent_failures)
+            state["permanent_failures"] = sorted(permanent)
+            state["cursor"] += len(chunk)
+            self._checkpoint(state)
+            self._notify(self.on_progress, state)
+
+        if requested == STATUS_PAUSED:
+            state["status"] = STATUS_PAUSED
+            self._checkpoint(state)
+            self._notify(self.on_progress, state)
+            return
+
+        state["status"] = requested or STATUS_COMPLETED
+        self._checkpoint(state)
+        self._notify(self.on_finish, state)
+
+    def _checkpoint(self, state):
+        state["updated_at"] = _now()
+        json_store.write(_job_path(self.job_id), state, compact=True)
+
+    @staticmethod
+    def _notify(callback, state):
+        if callback is None:
+            return
+        try:
+            callback(dict(state))
+        except Exception as e:
+            print(f"Broadcast job callback failed: {e}")
+
+
+def start_job(job_id, submit, on_progress=None, on_finish=None):
+    """Start (or return the already running) runner for ``job_id``."""
+    with _runners_lock:
+        runner = _runners.get(job_id)
+        if runner is not None and runner.is_alive():
+            return runner
+        runner = BroadcastJobRunner(job_id, submit, on_progress=on_progress, on_finish=on_finish)
+        _runners[job_id] = runner
+        runner.start()
+        return runner
+
+
+def pause_job(job_id):
+    """Stop a running job after its current chunk; returns the new state or None."""
+    with _runners_lock:
+        runner = _runners.get(job_id)
+        if runner is not None and runner.is_alive():
+            runner.requested_status = STATUS_PAUSED
+            return load_job(job_id)
+    return _set_status(job_id, STATUS_PAUSED)
+
+
+def cancel_job(job_id):
+    """Cancel a job; a live runner stops after its current chunk and reports.
+
+    Returns ``(state, stopped_immediately)`` where the second item tells the
+    caller it must report the cancelled job itself.
+    """
+    with _runners_lock:
+        runner = _runners.get(job_id)
+        if runner is not None and runner.is_alive():
+            runner.requested_status = STATUS_CANCELLED
+            return load_job(job_id), False
+    return _set_status(job_id, STATUS_CANCELLED), True
+
+
+def resume_job(job_id, submit, on_progress=None, on_finish=None):
+    """Resume a paused job; a pause the live runner has not acted on yet is withdrawn."""
+    while True:
+        with _runners_lock:
+            runner = _runners.get(job_id)
+            if runner is None or not runner.is_alive():
+                break
+            if not runner.finishing:
+                if runner.requested_status == STATUS_PAUSED:
+                    runner.requested_status = None
+                return runner
+        runner.join()
+    state = _set_status(job_id, STATUS_RUNNING)
+    if state is None:
+        return None
+    return start_job(job_id, submit, on_progress=on_progress, on_finish=on_finish)
+
+
+def pending_jobs():
+    """Jobs that were running when the bot stopped."""
+    return [state for state in list_jobs() if state.get("status") == STATUS_RUNNING]
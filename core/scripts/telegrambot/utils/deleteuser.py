@@ -12,13 +12,13 @@ def handle_cancel_delete(call):
 
 @bot.message_handler(func=lambda message: is_admin(message.from_user.id) and message.text == '❌ Delete User')
 def delete_user(message):
-    markup = types.InlineKeyboardMarkup()
-    cancel_button = types.InlineKeyboardButton("❌ Cancel", callback_data="cancel_delete")
-    markup.add(cancel_button)
-
-    msg = bot.reply_to(message, "Enter username:", reply_markup=markup)
-    bot.register_next_step_handler(msg, process_delete_user)
-
+    markup = types.InlineKeyboardMarkup()
+    cancel_button = types.InlineKeyboardButton("❌ Cancel", callback_data="cancel_delete")
+    markup.add(cancel_button)
+
+    msg = bot.reply_to(message, "Enter username:", reply_markup=markup)
+    bot.register_next_step_handler(msg, process_delete_user)
+
 def process_delete_user(message):
     username = message.text.strip().lower()
 
@@ -29,14 +29,14 @@ def process_delete_user(message):
     if not username:
         bot.reply_to(message, "Username cannot be empty. Operation canceled.", reply_markup=create_main_markup(is_admin=True))
         return
-
-    multi_api = MultiServerAPI()
-    api_client, _ = multi_api.find_user(username)
-
-    bot.send_chat_action(message.chat.id, 'typing')
-    result = api_client.delete_user(username) if api_client else None
-
-    if result is None:
-        bot.reply_to(message, f"Error: Failed to delete user '{username}'. They may not exist.", reply_markup=create_main_markup(is_admin=True))
-    else:
-        bot.reply_to(message, f"User '{username}' removed successfully.", reply_markup=create_main_markup(is_admin=True))
+
+    multi_api = MultiServerAPI()
+    api_client, _ = multi_api.find_user(username, full_user=False)
+
+    bot.send_chat_action(message.chat.id, 'typing')
+    result = api_client.delete_user(username) if api_client else None
+
+    if result is None:
+        bot.reply_to(message, f"Error: Failed to delete user '{username}'. They may not exist.", reply_markup=create_main_markup(is_admin=True))
+    else:
+        bot.reply_to(message, f"User '{username}' removed successfully.", reply_markup=create_main_markup(is_admin=True))
@@ -1,18 +1,15 @@
 from telebot import types
 from utils.command import bot, is_admin
 from utils.common import create_main_markup
-import json
-import os
+from utils import json_store
+import copy
 
 PLANS_FILE = '/etc/dijiq/core/scripts/telegrambot/plans.json'
 
 def load_plans():
-    try:
-        if os.path.exists(PLANS_FILE):
-            with open(PLANS_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
-        pass
+    plans = json_store.read(PLANS_FILE)
+    if plans is not None:
+        return copy.deepcopy(plans)
     return {
         "40": {"price": 1.20, "days": 30},
         "60": {"price": 1.50, "days": 30},
@@ -20,9 +17,7 @@ def load_plans():
     }
 
 def save_plans(plans):
-    os.makedirs(os.path.dirname(PLANS_FILE), exist_ok=True)
-    with open(PLANS_FILE, 'w') as f:
-        json.dump(plans, f, indent=4)
+    json_store.write(PLANS_FILE, plans)
 
 def create_plans_markup():
     markup = types.InlineKeyboardMarkup(row_width=3)
@@ -1,6 +1,5 @@
-import json
-import os
 from telebot import types
+from utils import json_store
 from utils.command import bot, is_admin
 from utils.common import create_main_markup
 from utils.translations import BUTTON_TRANSLATIONS
@@ -8,12 +7,9 @@ from utils.translations import BUTTON_TRANSLATIONS
 SUPPORT_FILE = '/etc/dijiq/core/scripts/telegrambot/support_info.json'
 
 def load_support_info():
-    try:
-        if os.path.exists(SUPPORT_FILE):
-            with open(SUPPORT_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
-        pass
+    info = json_store.read(SUPPORT_FILE)
+    if info is not None:
+        return dict(info)
     return {
         "text": "Need help? Contact our support:\n\n"
                "📱 Telegram: @your_support_username\n"
@@ -22,9 +18,7 @@ def load_support_info():
     }
 
 def save_support_info(text):
-    os.makedirs(os.path.dirname(SUPPORT_FILE), exist_ok=True)
-    with open(SUPPORT_FILE, 'w') as f:
-        json.dump({"text": text}, f, indent=4)
+    json_store.write(SUPPORT_FILE, {"text": text})
 
 def get_support_text():
     info = load_support_info()
@@ -1,10 +1,14 @@
+import functools
 import io
 import hashlib
+import heapq
 import json
 import os
 import re
 import threading
-from concurrent.futures import ThreadPoolExecutor
+import time
+from collections.abc import Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 try:
@@ -49,17 +53,19 @@ except ImportError:
 
     types = _Types()
 
+from utils import json_store, notification_queue, reseller_store
 from utils.api_client import MultiServerAPI
 from utils.command import bot, is_admin
 from utils.language import get_user_language
 from utils.translations import get_button_text, get_message_text
+from utils.user_record import UserRecord, parse_account_creation_time
 
 
 TEST_CONFIGS_FILE = '/etc/dijiq/core/scripts/telegrambot/test_configs.json'
-PAYMENTS_FILE = '/etc/dijiq/core/scripts/telegrambot/payments.json'
 RESELLERS_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.json'
 STATE_FILE = '/etc/dijiq/core/scripts/telegrambot/expired_user_cleanup.json'
 SCHEDULE_FILE = '/etc/dijiq/core/scripts/telegrambot/expired_cleanup_schedule.json'
+INDEX_FILE = '/etc/dijiq/core/scripts/telegrambot/expired_cleanup_index.json'
 
 GB_BYTES = 1024 ** 3
 TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
@@ -116,6 +122,8 @@ ADMIN_CLEANUP_REVIEW_EXECUTOR = ThreadPoolExecutor(
     thread_name_prefix="dijiq-expired-review",
 )
 RECOVERED_TEST_BATCH_SIZE = _int_env("DIJIQ_EXPIRED_RECOVERED_TEST_BATCH_SIZE", 25)
+FULL_RECONCILE_INTERVAL_SECONDS = _int_env("DIJIQ_EXPIRED_FULL_RECONCILE_SECONDS", 24 * 3600)
+NOTIFY_LANE_WORKERS = _int_env("DIJIQ_EXPIRED_NOTIFY_WORKERS", 4)
 ADMIN_CLEANUP_REVIEW_INFLIGHT_LOCK = threading.Lock()
 ADMIN_CLEANUP_REVIEW_INFLIGHT = set()
 ADMIN_CLEANUP_FILTER_DESCRIPTIONS = {
@@ -159,12 +167,18 @@ RESELLER_CLEANUP_METADATA_FIELDS = (
     'cleanup_last_state',
 )
 TEST_CLEANUP_METADATA_FIELDS = RESELLER_CLEANUP_METADATA_FIELDS + ('server_id',)
+PAYMENT_CLEANUP_METADATA_FIELDS = RESELLER_CLEANUP_METADATA_FIELDS
 RECOVERED_TEST_USERNAME_RE = re.compile(r'^t([1-9]\d*)([a-z]*)$', re.IGNORECASE)
 RECOVERED_TEST_NOTE_RE = re.compile(r'(?:^|\|\s*)📝\s*test_config\s*(?:\||$)', re.IGNORECASE)
 RECOVERED_TEST_NOTE_TIME_RE = re.compile(r'📅\s*(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2})(?::(\d{2}))?')
 MAX_TELEGRAM_USER_ID = (2 ** 63) - 1
 
 _cleanup_lock = threading.RLock()
+# MultiServerAPI change-stream version seen by the last successful pass. It is
+# only meaningful inside this process, so the first pass after a restart is a
+# full reconcile.
+_user_change_version = None
+_last_pass_report = None
 _cleanup_refresh_lock = threading.Lock()
 _cleanup_refresh_state = {
     'running': False,
@@ -285,20 +299,30 @@ def _format_time(value):
 
 
 def _load_json_file(path, default):
-    try:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                data = json.load(f)
-                return data if data is not None else default
-    except Exception:
-        pass
-    return default
+    return json_store.load(path, default)
 
 
 def _save_json_file(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
+    json_store.write(path, data)
+
+
+def _load_payment_records():
+    from utils.payment_records import load_payments
+
+    return load_payments()
+
+
+def _save_payment_cleanup_metadata(stale_payments, dirty_ids):
+    from utils.payment_records import update_payment_record_fields
+
+    dirty_ids = {str(payment_id) for payment_id in (dirty_ids or set())}
+    for payment_id in dirty_ids:
+        source = stale_payments.get(payment_id) if isinstance(stale_payments, dict) else None
+        if not isinstance(source, dict):
+            continue
+        fields = {field: source[field] for field in PAYMENT_CLEANUP_METADATA_FIELDS if field in source}
+        removed = [field for field in PAYMENT_CLEANUP_METADATA_FIELDS if field not in source]
+        update_payment_record_fields(payment_id, fields, remove=removed)
 
 
 def _load_current_test_configs_for_cleanup():
@@ -335,14 +359,14 @@ def _save_test_cleanup_metadata(stale_configs, dirty_ids):
 
 def _load_current_resellers_for_cleanup_save():
     try:
-        from utils import reseller as reseller_store
+        from utils import reseller as reseller_module
 
-        original_path = reseller_store.RESELLERS_FILE
-        reseller_store.RESELLERS_FILE = RESELLERS_FILE
+        original_path = reseller_module.RESELLERS_FILE
+        reseller_module.RESELLERS_FILE = RESELLERS_FILE
         try:
-            return reseller_store.load_resellers()
+            return reseller_module.load_resellers()
         finally:
-            reseller_store.RESELLERS_FILE = original_path
+            reseller_module.RESELLERS_FILE = original_path
     except Exception:
         data = _load_json_file(RESELLERS_FILE, {})
         return data if isinstance(data, dict) else {}
@@ -350,15 +374,15 @@ def _load_current_resellers_for_cleanup_save():
 
 def _save_current_resellers_for_cleanup_save(resellers):
     try:
-        from utils import reseller as reseller_store
+        from utils import reseller as reseller_module
 
-        original_path = reseller_store.RESELLERS_FILE
-        reseller_store.RESELLERS_FILE = RESELLERS_FILE
+        original_path = reseller_module.RESELLERS_FILE
+        reseller_module.RESELLERS_FILE = RESELLERS_FILE
         try:
-            reseller_store.save_resellers(resellers if isinstance(resellers, dict) else {})
+            reseller_module.save_resellers(resellers if isinstance(resellers, dict) else {})
             return
         finally:
-            reseller_store.RESELLERS_FILE = original_path
+            reseller_module.RESELLERS_FILE = original_path
     except Exception:
         _save_json_file(RESELLERS_FILE, resellers if isinstance(resellers, dict) else {})
 
@@ -379,7 +403,7 @@ def _get_reseller_config_by_ref(resellers, ref):
     return None
 
 
-def _find_latest_reseller_config(latest_resellers, ref, source_config):
+def _find_latest_reseller_config(latest_resellers, ref, source_config, get_config_index=None):
     if not isinstance(latest_resellers, dict) or len(ref) < 3:
         return None
     reseller = latest_resellers.get(str(ref[1]))
@@ -401,14 +425,13 @@ def _find_latest_reseller_config(latest_resellers, ref, source_config):
         if indexed_username == source_username and (not source_server_id or indexed_server_id == source_server_id):
             return indexed
 
-    for config in configs:
-        if not isinstance(config, dict):
-            continue
-        username = str(config.get('username') or '').strip().lower()
-        server_id = str(config.get('server_id') or '').strip()
-        if username == source_username and (not source_server_id or server_id == source_server_id):
-            return config
-    return None
+    # Only a moved config needs the index; callers share one lazily built copy.
+    if get_config_index is None:
+        config_index = reseller_store.ResellerConfigIndex(latest_resellers)
+    else:
+        config_index = get_config_index()
+    matches = config_index.find_configs(source_username, source_server_id, reseller_id=ref[1])
+    return matches[0][2] if matches else None
 
 
 def _save_reseller_cleanup_metadata(stale_resellers, dirty_refs):
@@ -418,9 +441,12 @@ def _save_reseller_cleanup_metadata(stale_resellers, dirty_refs):
         return
 
     latest_resellers = _load_current_resellers_for_cleanup_save()
+    get_config_index = functools.lru_cache(maxsize=None)(
+        lambda: reseller_store.ResellerConfigIndex(latest_resellers if isinstance(latest_resellers, dict) else {})
+    )
     for ref in refs:
         source_config = _get_reseller_config_by_ref(stale_resellers, ref)
-        target_config = _find_latest_reseller_config(latest_resellers, ref, source_config)
+        target_config = _find_latest_reseller_config(latest_resellers, ref, source_config, get_config_index)
         if source_config is None or target_config is None:
             continue
         for field in RESELLER_CLEANUP_METADATA_FIELDS:
@@ -481,42 +507,6 @@ def _safe_gb(byte_count):
     return round(float(byte_count) / GB_BYTES, 3)
 
 
-def _parse_account_creation_time(value):
-    if isinstance(value, datetime):
-        return value
-    if not value:
-        return None
-
-    text = str(value).strip()
-    if not text:
-        return None
-    if text.endswith('Z'):
-        text = f"{text[:-1]}+00:00"
-    try:
-        return datetime.fromisoformat(text)
-    except (TypeError, ValueError):
-        return None
-
-
-def _expiration_deadline(user_data):
-    if not isinstance(user_data, dict):
-        return None
-    expiration_days = _safe_int(user_data.get('expiration_days'))
-    created_at = _parse_account_creation_time(user_data.get('account_creation_date'))
-    if expiration_days is None or expiration_days < 0 or created_at is None:
-        return None
-    return created_at + timedelta(days=expiration_days)
-
-
-def _days_remaining(user_data, now=None):
-    expiration_days = _safe_int((user_data or {}).get('expiration_days'))
-    deadline = _expiration_deadline(user_data)
-    if deadline is None:
-        return expiration_days
-    current_date = (now or datetime.now()).date()
-    return (deadline.date() - current_date).days
-
-
 def _state_key(server_id, username):
     return f"{server_id or 'primary'}:{username}"
 
@@ -560,58 +550,47 @@ def _is_already_missing_record(record):
 
 
 def is_user_expired(user_data, now=None):
-    if not isinstance(user_data, dict):
-        return False
-
-    if not bool(user_data.get('blocked', False)):
+    record = UserRecord.of(user_data)
+    if record is None or not record.blocked:
         return False
 
-    expiration_days = _safe_int(user_data.get('expiration_days'))
-    if expiration_days is not None and expiration_days <= 0:
+    if record.expiration_days is not None and record.expiration_days <= 0:
         return True
 
-    deadline = _expiration_deadline(user_data)
-    if deadline is not None and (now or datetime.now()).date() >= deadline.date():
+    if record.deadline is not None and (now or datetime.now()).date() >= record.deadline.date():
         return True
 
-    max_download_bytes = _safe_bytes(user_data.get('max_download_bytes'))
-    if max_download_bytes > 0:
-        used_bytes = (
-            _safe_bytes(user_data.get('upload_bytes'))
-            + _safe_bytes(user_data.get('download_bytes'))
-        )
-        if used_bytes >= max_download_bytes:
-            return True
+    return bool(record.quota_bytes) and record.total_bytes >= record.quota_bytes
 
-    return False
+
+def _live_expiry_deadline(user_data):
+    """Midnight of the day a blocked, not yet expired user turns expired by date."""
+    record = UserRecord.of(user_data)
+    if record is None or not record.blocked or record.deadline is None:
+        return None
+    return datetime.combine(record.deadline.date(), datetime.min.time())
 
 
 def capture_last_state(user_data, now=None):
-    upload_bytes = _safe_bytes(user_data.get('upload_bytes'))
-    download_bytes = _safe_bytes(user_data.get('download_bytes'))
-    max_download_bytes = _safe_bytes(user_data.get('max_download_bytes'))
-    used_bytes = upload_bytes + download_bytes
-    expiration_deadline = _expiration_deadline(user_data)
-    remaining_bytes = None
-    if max_download_bytes > 0:
-        remaining_bytes = max(0, max_download_bytes - used_bytes)
+    record = UserRecord.of(user_data or {})
+    max_download_bytes = record.quota_bytes or 0
 
     return {
         'captured_at': _now_str(now),
-        'days_remaining': _days_remaining(user_data, now=now),
-        'account_creation_date': user_data.get('account_creation_date'),
+        'days_remaining': record.days_remaining(now),
+        'account_creation_date': record.account_creation_date,
         'expiration_date': (
-            expiration_deadline.date().isoformat()
-            if expiration_deadline is not None
+            record.deadline.date().isoformat()
+            if record.deadline is not None
             else None
         ),
-        'gb_remaining': _safe_gb(remaining_bytes),
+        'gb_remaining': _safe_gb(record.remaining_bytes),
         'gb_limit': _safe_gb(max_download_bytes) if max_download_bytes > 0 else None,
-        'gb_used': _safe_gb(used_bytes),
-        'blocked': bool(user_data.get('blocked', False)),
-        'status': user_data.get('status'),
-        'upload_bytes': upload_bytes,
-        'download_bytes': download_bytes,
+        'gb_used': _safe_gb(record.total_bytes),
+        'blocked': bool(record.blocked),
+        'status': record.status,
+        'upload_bytes': record.upload_bytes or 0,
+        'download_bytes': record.download_bytes or 0,
         'max_download_bytes': max_download_bytes,
     }
 
@@ -854,10 +833,11 @@ def _clear_state_delete_metadata(entry):
 def _load_cleanup_record_stores():
     return {
         'test_configs': _load_current_test_configs_for_cleanup(),
-        'payments': _load_json_file(PAYMENTS_FILE, {}),
-        'resellers': _load_json_file(RESELLERS_FILE, {}),
+        'payments': _load_payment_records(),
+        'resellers': _load_current_resellers_for_cleanup_save(),
         '_dirty': set(),
         '_test_dirty_ids': set(),
+        '_payment_dirty_ids': set(),
         '_reseller_dirty_refs': set(),
     }
 
@@ -872,7 +852,10 @@ def _save_dirty_cleanup_record_stores(stores):
             stores.get('_test_dirty_ids') or set(),
         )
     if 'payments' in dirty:
-        _save_json_file(PAYMENTS_FILE, stores.get('payments') if isinstance(stores.get('payments'), dict) else {})
+        _save_payment_cleanup_metadata(
+            stores.get('payments') if isinstance(stores.get('payments'), dict) else {},
+            stores.get('_payment_dirty_ids') or set(),
+        )
     if 'resellers' in dirty:
         _save_reseller_cleanup_metadata(
             stores.get('resellers') if isinstance(stores.get('resellers'), dict) else {},
@@ -881,6 +864,8 @@ def _save_dirty_cleanup_record_stores(stores):
     dirty.clear()
     if isinstance(stores.get('_test_dirty_ids'), set):
         stores['_test_dirty_ids'].clear()
+    if isinstance(stores.get('_payment_dirty_ids'), set):
+        stores['_payment_dirty_ids'].clear()
     if isinstance(stores.get('_reseller_dirty_refs'), set):
         stores['_reseller_dirty_refs'].clear()
 
@@ -908,6 +893,13 @@ def _mark_test_ref_dirty(stores, ref):
     _mark_store_dirty(stores, 'test_configs')
 
 
+def _mark_payment_ref_dirty(stores, ref):
+    if not isinstance(stores, dict) or len(ref) < 2:
+        return
+    stores.setdefault('_payment_dirty_ids', set()).add(str(ref[1]))
+    _mark_store_dirty(stores, 'payments')
+
+
 def _clear_candidate_delete_metadata(candidate, stores=None):
     ref = candidate.get('_record_ref') or ()
     if not ref:
@@ -927,19 +919,19 @@ def _clear_candidate_delete_metadata(candidate, stores=None):
         return
 
     if kind == 'payment':
-        data = stores.get('payments') if isinstance(stores, dict) else _load_json_file(PAYMENTS_FILE, {})
+        data = stores.get('payments') if isinstance(stores, dict) else _load_payment_records()
         entry = data.get(ref[1]) if isinstance(data, dict) else None
         if isinstance(entry, dict):
             for key in ('cleanup_deleted_at', 'cleanup_delete_result', 'cleanup_error'):
                 entry.pop(key, None)
             if stores is not None:
-                _mark_store_dirty(stores, 'payments')
+                _mark_payment_ref_dirty(stores, ref)
             else:
-                _save_json_file(PAYMENTS_FILE, data)
+                _save_payment_cleanup_metadata(data, {str(ref[1])})
         return
 
     if kind == 'reseller':
-        data = stores.get('resellers') if isinstance(stores, dict) else _load_json_file(RESELLERS_FILE, {})
+        data = stores.get('resellers') if isinstance(stores, dict) else _load_current_resellers_for_cleanup_save()
         reseller = data.get(ref[1]) if isinstance(data, dict) else None
         configs = reseller.get('configs', []) if isinstance(reseller, dict) else []
         if isinstance(configs, list) and 0 <= ref[2] < len(configs) and isinstance(configs[ref[2]], dict):
@@ -962,11 +954,11 @@ def _completed_payment(record):
 def _iter_named_user_records(users):
     if isinstance(users, dict):
         for username, data in users.items():
-            if isinstance(data, dict):
+            if isinstance(data, Mapping):
                 yield str(data.get('username') or username), data
     elif isinstance(users, list):
         for data in users:
-            if isinstance(data, dict) and data.get('username'):
+            if isinstance(data, Mapping) and data.get('username'):
                 yield str(data.get('username')), data
 
 
@@ -1121,7 +1113,7 @@ def discover_cleanup_candidates(include_already_missing=False, include_deleted=F
                 '_record_was_deleted': was_deleted,
             })
 
-    payments = stores.get('payments') if isinstance(stores, dict) else _load_json_file(PAYMENTS_FILE, {})
+    payments = stores.get('payments') if isinstance(stores, dict) else _load_payment_records()
     if isinstance(payments, dict):
         for payment_id, record in payments.items():
             if not _completed_payment(record):
@@ -1141,7 +1133,7 @@ def discover_cleanup_candidates(include_already_missing=False, include_deleted=F
                 '_record_was_deleted': was_deleted,
             })
 
-    resellers = stores.get('resellers') if isinstance(stores, dict) else _load_json_file(RESELLERS_FILE, {})
+    resellers = stores.get('resellers') if isinstance(stores, dict) else _load_current_resellers_for_cleanup_save()
     if isinstance(resellers, dict):
         for reseller_id, reseller_data in resellers.items():
             if not isinstance(reseller_data, dict):
@@ -1332,7 +1324,7 @@ def discover_already_missing_cleanup_candidates(state):
     return candidates
 
 
-def _scan_server_cleanup_candidates(multi_api, now=None):
+def _scan_server_cleanup_candidates(multi_api, now=None, upcoming=None):
     candidates = []
     lookup_context = _new_server_lookup_context()
     if multi_api is None:
@@ -1351,7 +1343,13 @@ def _scan_server_cleanup_candidates(multi_api, now=None):
             continue
 
         for username, user_data in _iter_named_user_records(users):
-            if not username or not is_user_expired(user_data, now=now):
+            if not username:
+                continue
+            if not is_user_expired(user_data, now=now):
+                if upcoming is not None:
+                    deadline = _live_expiry_deadline(user_data)
+                    if deadline is not None:
+                        upcoming.append((_format_time(deadline), server_id, username))
                 continue
             candidates.append({
                 'source': 'server_user',
@@ -1398,7 +1396,7 @@ def _recovered_test_used_at(user_data):
         seconds = note_match.group(3) or '00'
         return f"{note_match.group(1)} {note_match.group(2)}:{seconds}"
 
-    created_at = _parse_account_creation_time((user_data or {}).get('account_creation_date'))
+    created_at = parse_account_creation_time((user_data or {}).get('account_creation_date'))
     if created_at is not None:
         return created_at.strftime(TIMESTAMP_FORMAT)
     return _now_str()
@@ -1550,18 +1548,18 @@ def _update_candidate_record(candidate, fields, stores=None):
         return
 
     if kind == 'payment':
-        data = stores.get('payments') if isinstance(stores, dict) else _load_json_file(PAYMENTS_FILE, {})
+        data = stores.get('payments') if isinstance(stores, dict) else _load_payment_records()
         entry = data.get(ref[1]) if isinstance(data, dict) else None
         if isinstance(entry, dict):
             _apply_fields(entry, fields)
             if stores is not None:
-                _mark_store_dirty(stores, 'payments')
+                _mark_payment_ref_dirty(stores, ref)
             else:
-                _save_json_file(PAYMENTS_FILE, data)
+                _save_payment_cleanup_metadata(data, {str(ref[1])})
         return
 
     if kind == 'reseller':
-        data = stores.get('resellers') if isinstance(stores, dict) else _load_json_file(RESELLERS_FILE, {})
+        data = stores.get('resellers') if isinstance(stores, dict) else _load_current_resellers_for_cleanup_save()
         reseller = data.get(ref[1]) if isinstance(data, dict) else None
         configs = reseller.get('configs', []) if isinstance(reseller, dict) else []
         if isinstance(configs, list) and 0 <= ref[2] < len(configs) and isinstance(configs[ref[2]], dict):
@@ -1668,12 +1666,131 @@ def _notify_candidate(candidate, grace_hours, last_state=None, missing=False):
         except Exception as e:
             print(f"Failed to build renewal cleanup action for {candidate.get('username')}: {e}")
 
-        bot.send_message(int(recipient_id), message, parse_mode='Markdown', reply_markup=markup)
+        notification_queue.send_message(bot, int(recipient_id), message, parse_mode='Markdown', reply_markup=markup)
         return None
     except Exception as e:
         return str(e)
 
 
+class _CleanupPipeline:
+    """Notification lane, outcome counts and per-phase timings for one cleanup pass.
+
+    Notices are sent from a small thread pool while the pass keeps walking
+    candidates (the shared notification queue still enforces Telegram's
+    limits). Their outcomes are applied to the pass state on the caller's
+    thread by ``finish_notifications``, so state and record stores are only
+    ever touched under ``_cleanup_lock``. In dry-run mode nothing is sent
+    and every notice counts as delivered.
+    """
+
+    def __init__(self, dry_run=False, workers=None):
+        self.dry_run = dry_run
+        self.workers = workers or NOTIFY_LANE_WORKERS
+        self.timings = {}
+        self.counts = {'notified': 0, 'notification_failed': 0, 'deleted': 0, 'delete_failed': 0}
+        self._pending = []
+        self._executor = None
+        self._lap_started = time.monotonic()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to ``phase``."""
+        now = time.monotonic()
+        self.timings[phase] = round(self.timings.get(phase, 0) + now - self._lap_started, 3)
+        self._lap_started = now
+
+    def notify(self, candidate, grace_hours, on_result, last_state=None, missing=False):
+        """Queue a cleanup notice; ``on_result(notification_error)`` runs in ``finish_notifications``."""
+        if self.dry_run:
+            future = Future()
+            future.set_result(None)
+        else:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="dijiq-expired-notify",
+                )
+            future = self._executor.submit(
+                _notify_candidate,
+                candidate,
+                grace_hours,
+                last_state=last_state,
+                missing=missing,
+            )
+        self._pending.append((future, on_result))
+
+    def finish_notifications(self):
+        pending, self._pending = self._pending, []
+        for future, on_result in pending:
+            try:
+                notification_error = future.result()
+            except Exception as e:
+                notification_error = str(e)
+            self.counts['notification_failed' if notification_error else 'notified'] += 1
+            on_result(notification_error)
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _apply_cleanup_notice(state, key, candidate, now_value, grace_hours, last_state, record_stores, notification_error):
+    state[key] = _state_entry(
+        candidate,
+        now_value,
+        grace_hours,
+        notification_error=notification_error,
+        last_state=last_state,
+    )
+    _update_candidate_record(
+        candidate,
+        _metadata_fields('notified', now_value, notification_error=notification_error, last_state=last_state),
+        stores=record_stores,
+    )
+
+
+def _apply_recovered_test_notice(state, key, candidate, now_value, grace_hours, last_state, recovery_stats, notification_error):
+    entry = state.get(key) if isinstance(state.get(key), dict) else None
+    previous_entry = entry or {}
+    attempts = _safe_int(previous_entry.get('recovery_attempts'), 0) + 1
+    if notification_error:
+        if not entry:
+            state[key] = _manual_review_entry(candidate, now_value, last_state=last_state)
+            entry = state[key]
+        entry.update({
+            'telegram_user_id': candidate.get('telegram_user_id'),
+            'cleanup_status': 'manual_review',
+            'cleanup_error': 'notification_failed',
+            'notification_error': notification_error,
+            'recovery_source': 'verified_orphan_test',
+            'recovery_attempts': attempts,
+            'recovery_last_attempt_at': now_value,
+            'last_checked_at': now_value,
+            'last_state': last_state,
+        })
+        recovery_stats['notification_failed'] += 1
+        return
+
+    recovered_entry = _state_entry(
+        candidate,
+        now_value,
+        grace_hours,
+        notification_error=None,
+        last_state=last_state,
+    )
+    recovered_entry.update({
+        'recovery_source': 'verified_orphan_test',
+        'recovered_at': now_value,
+        'recovery_attempts': attempts,
+        'recovery_last_attempt_at': now_value,
+    })
+    if previous_entry.get('first_seen_at'):
+        recovered_entry['first_seen_at'] = previous_entry.get('first_seen_at')
+    state[key] = recovered_entry
+    recovery_stats['notified'] += 1
+
+
 def _state_entry(candidate, now_value, grace_hours, notification_error=None, last_state=None):
     return {
         'username': candidate.get('username'),
@@ -1759,62 +1876,345 @@ def _mark_deleted(state, key, candidate, status, now_value, last_state=None, del
     _update_candidate_record(candidate, fields, stores=stores)
 
 
-def run_expired_user_cleanup(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None, multi_api=None):
-    now = now or datetime.now()
+def _delete_due_users(multi_api, state, due_deletions, now_value, record_stores, pipeline=None):
+    """Delete every user past its grace period in one batch and record the outcomes.
+
+    ``bulk_delete_users`` runs each server's deletes on its own bounded pool.
+    A dry-run pipeline only counts the deletes that would be attempted.
+    """
+    deletable = [item for item in due_deletions if item[4] is not None]
+    if pipeline is not None and pipeline.dry_run:
+        pipeline.counts['deleted'] += len(deletable)
+        pipeline.counts['delete_failed'] += len(due_deletions) - len(deletable)
+        return
+    results = multi_api.bulk_delete_users(
+        [(api_client, candidate.get('username')) for _, _, candidate, _, api_client in deletable]
+    ) if deletable else []
+    delete_results = {id(item): result for item, (_, _, result) in zip(deletable, results)}
+
+    for item in due_deletions:
+        key, entry, candidate, last_state, _ = item
+        if delete_results.get(id(item)) is None:
+            if pipeline is not None:
+                pipeline.counts['delete_failed'] += 1
+            entry['cleanup_status'] = 'delete_failed'
+            entry['cleanup_error'] = 'delete_failed'
+            entry['last_checked_at'] = now_value
+            _update_candidate_record(
+                candidate,
+                _metadata_fields('delete_failed', now_value, cleanup_error='delete_failed', last_state=last_state),
+                stores=record_stores,
+            )
+            continue
+
+        if pipeline is not None:
+            pipeline.counts['deleted'] += 1
+        _mark_deleted(state, key, candidate, 'deleted', now_value, last_state=last_state, delete_result='deleted', stores=record_stores)
+
+
+def _merge_state_and_server_candidates(state, server_candidates, local_candidates, lookup_context, recovered_tests=()):
+    state_candidates = discover_state_cleanup_candidates(state)
+    already_missing_candidates = discover_already_missing_cleanup_candidates(state)
+    return _merge_cleanup_candidates(
+        discover_matching_cleanup_candidates(
+            _merge_cleanup_candidates(server_candidates, state_candidates, already_missing_candidates),
+            include_already_missing=True,
+            local_candidates=local_candidates,
+            lookup_context=lookup_context,
+        ),
+        recovered_tests,
+        state_candidates,
+        already_missing_candidates,
+        server_candidates,
+    )
+
+
+def _full_cleanup_candidates(state, multi_api, now, upcoming=None, dry_run=False):
     now_value = _now_str(now)
+    record_stores = _load_cleanup_record_stores()
+    server_candidates, lookup_context = _scan_server_cleanup_candidates(multi_api, now=now, upcoming=upcoming)
+    recovered_test_candidates = _discover_verified_orphan_tests(
+        server_candidates,
+        lookup_context,
+        record_stores,
+        now_value,
+    )
+    # The backfill writes the test-config store directly, so a dry run skips it.
+    recovery_backfill = None if dry_run else _backfill_verified_orphan_tests(
+        recovered_test_candidates,
+        record_stores,
+        now_value,
+    )
+    selected_recovered_tests = _select_recovered_test_batch(
+        recovered_test_candidates,
+        state,
+    )
+    recovery_stats = {
+        'verified': len(recovered_test_candidates),
+        'selected': len(selected_recovered_tests),
+        'notified': 0,
+        'notification_failed': 0,
+        'backfill_created': int((recovery_backfill or {}).get('created', 0)),
+        'history_added': int((recovery_backfill or {}).get('history_added', 0)),
+    }
+    local_candidates = discover_cleanup_candidates(
+        include_already_missing=True,
+        include_deleted=True,
+        stores=record_stores,
+    )
+    _migrate_unambiguous_legacy_primary_state(state, lookup_context, local_candidates)
+    candidates = _merge_state_and_server_candidates(
+        state,
+        server_candidates,
+        local_candidates,
+        lookup_context,
+        recovered_tests=selected_recovered_tests,
+    )
+    return candidates, lookup_context, record_stores, recovery_stats
 
-    with _cleanup_lock:
-        state = _load_json_file(STATE_FILE, {})
-        if not isinstance(state, dict):
-            state = {}
 
-        multi_api = multi_api or MultiServerAPI()
-        record_stores = _load_cleanup_record_stores()
-        server_candidates, lookup_context = _scan_server_cleanup_candidates(multi_api, now=now)
-        recovered_test_candidates = _discover_verified_orphan_tests(
-            server_candidates,
-            lookup_context,
-            record_stores,
-            now_value,
-        )
-        recovery_backfill = _backfill_verified_orphan_tests(
-            recovered_test_candidates,
-            record_stores,
-            now_value,
-        )
-        selected_recovered_tests = _select_recovered_test_batch(
-            recovered_test_candidates,
-            state,
+def _poll_user_changes(multi_api):
+    """Return ``(version, changes)`` from the API change stream, or ``(None, None)``."""
+    get_user_changes = getattr(multi_api, 'get_user_changes', None)
+    if not callable(get_user_changes):
+        return None, None
+    try:
+        return get_user_changes(_user_change_version, include_disabled=True)
+    except Exception:
+        return None, None
+
+
+def _snapshot_server_users(multi_api):
+    servers = []
+    for index, entry in enumerate(multi_api.get_user_snapshot_entries(include_disabled=True)):
+        client = entry.get('client')
+        if client is None:
+            continue
+        server_id = str(
+            (entry.get('server') or {}).get('id')
+            or getattr(client, 'server_id', None)
+            or f'server{index + 1}'
         )
-        recovery_stats = {
-            'verified': len(recovered_test_candidates),
-            'selected': len(selected_recovered_tests),
-            'notified': 0,
-            'notification_failed': 0,
-            'backfill_created': int((recovery_backfill or {}).get('created', 0)),
-            'history_added': int((recovery_backfill or {}).get('history_added', 0)),
-        }
-        local_candidates = discover_cleanup_candidates(
+        servers.append((server_id, client, entry.get('users')))
+    return servers
+
+
+def _find_server_user(users, username):
+    if isinstance(users, Mapping):
+        user_data = users.get(username)
+        return user_data if isinstance(user_data, Mapping) else None
+    return _find_user_in_records(users, username)
+
+
+def _index_deadline(entry, user_data, now, grace_hours=EXPIRED_CLEANUP_GRACE_HOURS):
+    """When a user next needs a cleanup look if its live record does not change."""
+    status = entry.get('cleanup_status') if isinstance(entry, dict) else None
+    if isinstance(entry, dict) and status not in DELETE_RESULTS and status != 'renewed':
+        if status in ('server_unavailable', 'delete_failed'):
+            return now
+        if status == 'manual_review':
+            return None
+        return _effective_delete_after(entry, grace_hours=grace_hours)
+    if user_data is None or is_user_expired(user_data, now=now):
+        return None
+    return _live_expiry_deadline(user_data)
+
+
+def _load_cleanup_index():
+    index = _load_json_file(INDEX_FILE, {})
+    if not isinstance(index, dict):
+        return {}
+    deadlines = [
+        tuple(item)
+        for item in index.get('deadlines') or []
+        if isinstance(item, list) and len(item) == 3
+    ]
+    heapq.heapify(deadlines)
+    index['deadlines'] = deadlines
+    return index
+
+
+def _save_cleanup_index(index):
+    _save_json_file(INDEX_FILE, {
+        **index,
+        'deadlines': [list(item) for item in index.get('deadlines', [])],
+    })
+
+
+def _build_cleanup_index(state, upcoming, now, grace_hours):
+    deadlines = set(upcoming or ())
+    for entry in state.values():
+        if not isinstance(entry, dict) or not entry.get('username'):
+            continue
+        deadline = _index_deadline(entry, None, now, grace_hours=grace_hours)
+        if deadline is not None:
+            deadlines.add((_format_time(deadline), str(entry.get('server_id') or 'primary'), str(entry['username'])))
+    deadlines = list(deadlines)
+    heapq.heapify(deadlines)
+    return {
+        'full_reconcile_at': _now_str(now),
+        'grace_hours': grace_hours,
+        'deadlines': deadlines,
+    }
+
+
+def _full_reconcile_due(index, grace_hours, now):
+    reconciled_at = _parse_time(index.get('full_reconcile_at'))
+    if reconciled_at is None or reconciled_at > now or index.get('grace_hours') != grace_hours:
+        return True
+    return now - reconciled_at >= timedelta(seconds=FULL_RECONCILE_INTERVAL_SECONDS)
+
+
+def _incremental_cleanup_candidates(state, deadlines, changes, multi_api, now):
+    """Build candidates only for index entries that fell due and users that changed.
+
+    ``deadlines`` is the index heap; due entries are popped from it. Returns
+    ``(candidates, lookup_context, record_stores, keys)`` where ``keys`` maps
+    every examined ``server:username`` (lower-cased) to ``(server_id, username)``.
+    """
+    now_value = _now_str(now)
+    keys = {}
+    while deadlines and deadlines[0][0] <= now_value:
+        _deadline, server_id, username = heapq.heappop(deadlines)
+        keys.setdefault(_state_key(server_id, username).lower(), (server_id, username))
+    for client, username, _user_data in changes or ():
+        server_id = str(getattr(client, 'server_id', None) or 'primary')
+        keys.setdefault(_state_key(server_id, username).lower(), (server_id, username))
+    if not keys:
+        return [], None, None, keys
+
+    record_stores = _load_cleanup_record_stores()
+    usernames = {username.lower() for _server_id, username in keys.values()}
+    local_candidates = [
+        candidate
+        for candidate in discover_cleanup_candidates(
             include_already_missing=True,
             include_deleted=True,
             stores=record_stores,
         )
-        _migrate_unambiguous_legacy_primary_state(state, lookup_context, local_candidates)
-        state_candidates = discover_state_cleanup_candidates(state)
-        already_missing_candidates = discover_already_missing_cleanup_candidates(state)
-        candidates = _merge_cleanup_candidates(
-            discover_matching_cleanup_candidates(
-                _merge_cleanup_candidates(server_candidates, state_candidates, already_missing_candidates),
-                include_already_missing=True,
-                local_candidates=local_candidates,
-                lookup_context=lookup_context,
-            ),
-            selected_recovered_tests,
-            state_candidates,
-            already_missing_candidates,
-            server_candidates,
+        if candidate['username'].lower() in usernames
+    ]
+    names = {username for _server_id, username in keys.values()}
+    names.update(candidate['username'] for candidate in local_candidates)
+
+    # Only the examined usernames go into the lookup context, but from every
+    # server, so serverless local records still resolve to a unique server.
+    lookup_context = _new_server_lookup_context()
+    for server_id, client, users in _snapshot_server_users(multi_api):
+        matched = None
+        if users is not None:
+            matched = {}
+            for username in names:
+                user_data = _find_server_user(users, username)
+                if user_data is not None:
+                    matched[username] = user_data
+        _remember_server_users(lookup_context, server_id, client, matched)
+
+    server_candidates = []
+    touched_state = {}
+    for key, (server_id, username) in keys.items():
+        state_key = _state_key(server_id, username)
+        if isinstance(state.get(state_key), dict):
+            touched_state[state_key] = state[state_key]
+        match = lookup_context['exact'].get(key)
+        if match and is_user_expired(match[1], now=now):
+            server_candidates.append({
+                'source': 'server_user',
+                'username': username,
+                'server_id': server_id,
+                '_user_data': match[1],
+                '_lookup_status': 'found',
+                '_api_client': match[0],
+            })
+
+    candidates = _merge_state_and_server_candidates(
+        touched_state,
+        server_candidates,
+        local_candidates,
+        lookup_context,
+    )
+    return candidates, lookup_context, record_stores, keys
+
+
+def _reindex_cleanup_keys(deadlines, state, lookup_context, keys, now, grace_hours):
+    indexed = set(deadlines)
+    for key, (server_id, username) in keys.items():
+        match = lookup_context['exact'].get(key) if lookup_context else None
+        deadline = _index_deadline(
+            state.get(_state_key(server_id, username)),
+            match[1] if match else None,
+            now,
+            grace_hours=grace_hours,
         )
+        if deadline is None:
+            continue
+        item = (_format_time(deadline), server_id, username)
+        if item not in indexed:
+            heapq.heappush(deadlines, item)
+            indexed.add(item)
+
+
+def run_expired_user_cleanup(
+    grace_hours=EXPIRED_CLEANUP_GRACE_HOURS,
+    now=None,
+    multi_api=None,
+    full_reconcile=None,
+    dry_run=False,
+):
+    """Run one cleanup pass and return the saved state.
+
+    With an API change stream available, most passes are incremental: they
+    only examine users whose persisted index deadline (delete-after or live
+    expiry date) has passed or whose live record changed since the previous
+    pass. A full reconcile of every server and local record runs on the first
+    pass in a process, every ``FULL_RECONCILE_INTERVAL_SECONDS``, or when
+    ``full_reconcile`` is true.
+
+    Notices go out on a notification lane while candidates are still being
+    walked, and due deletes run as one per-server batch; both are folded back
+    into state before it is saved. With ``dry_run`` nothing is sent, deleted
+    or saved, and the returned state shows what the pass would have done.
+    Outcome counts and per-phase timings are in ``get_last_cleanup_pass_report()``.
+    """
+    global _last_pass_report, _user_change_version
+
+    now = now or datetime.now()
+    now_value = _now_str(now)
+
+    with _cleanup_lock:
+        state = _load_json_file(STATE_FILE, {})
+        if not isinstance(state, dict):
+            state = {}
 
+        multi_api = multi_api or MultiServerAPI()
+        pipeline = _CleanupPipeline(dry_run=dry_run)
+        change_version, changes = _poll_user_changes(multi_api)
+        index = _load_cleanup_index() if changes is not None else {}
+        if full_reconcile is None:
+            full_reconcile = _full_reconcile_due(index, grace_hours, now)
+        full_reconcile = full_reconcile or changes is None
+
+        recovery_stats = {'verified': 0, 'notified': 0, 'notification_failed': 0}
+        upcoming = []
+        if full_reconcile:
+            candidates, lookup_context, record_stores, recovery_stats = _full_cleanup_candidates(
+                state,
+                multi_api,
+                now,
+                upcoming=upcoming,
+                dry_run=dry_run,
+            )
+        else:
+            candidates, lookup_context, record_stores, index_keys = _incremental_cleanup_candidates(
+                state,
+                index['deadlines'],
+                changes,
+                multi_api,
+                now,
+            )
+        pipeline.lap('discover')
+
+        due_deletions = []
         for candidate in candidates:
             username = candidate.get('username')
             if candidate.get('_server_id_inferred') and candidate.get('_record_ref'):
@@ -1904,49 +2304,15 @@ def run_expired_user_cleanup(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None,
 
             if candidate.get('_recovered_orphan_test'):
                 last_state = capture_last_state(user_data, now=now)
-                notification_error = _notify_candidate(
+                pipeline.notify(
                     candidate,
                     grace_hours,
+                    functools.partial(
+                        _apply_recovered_test_notice,
+                        state, key, candidate, now_value, grace_hours, last_state, recovery_stats,
+                    ),
                     last_state=last_state,
-                    missing=False,
                 )
-                previous_entry = entry if isinstance(entry, dict) else {}
-                attempts = _safe_int(previous_entry.get('recovery_attempts'), 0) + 1
-                if notification_error:
-                    if not entry:
-                        state[key] = _manual_review_entry(candidate, now_value, last_state=last_state)
-                        entry = state[key]
-                    entry.update({
-                        'telegram_user_id': candidate.get('telegram_user_id'),
-                        'cleanup_status': 'manual_review',
-                        'cleanup_error': 'notification_failed',
-                        'notification_error': notification_error,
-                        'recovery_source': 'verified_orphan_test',
-                        'recovery_attempts': attempts,
-                        'recovery_last_attempt_at': now_value,
-                        'last_checked_at': now_value,
-                        'last_state': last_state,
-                    })
-                    recovery_stats['notification_failed'] += 1
-                    continue
-
-                recovered_entry = _state_entry(
-                    candidate,
-                    now_value,
-                    grace_hours,
-                    notification_error=None,
-                    last_state=last_state,
-                )
-                recovered_entry.update({
-                    'recovery_source': 'verified_orphan_test',
-                    'recovered_at': now_value,
-                    'recovery_attempts': attempts,
-                    'recovery_last_attempt_at': now_value,
-                })
-                if previous_entry.get('first_seen_at'):
-                    recovered_entry['first_seen_at'] = previous_entry.get('first_seen_at')
-                state[key] = recovered_entry
-                recovery_stats['notified'] += 1
                 continue
 
             if not entry:
@@ -1954,24 +2320,16 @@ def run_expired_user_cleanup(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None,
                 if candidate.get('source') == 'server_user':
                     state[key] = _manual_review_entry(candidate, now_value, last_state=last_state)
                     continue
-                notification_error = _notify_candidate(
+                pipeline.notify(
                     candidate,
                     grace_hours,
+                    functools.partial(
+                        _apply_cleanup_notice,
+                        state, key, candidate, now_value, grace_hours, last_state, record_stores,
+                    ),
                     last_state=last_state,
                     missing=lookup_status == 'missing',
                 )
-                state[key] = _state_entry(
-                    candidate,
-                    now_value,
-                    grace_hours,
-                    notification_error=notification_error,
-                    last_state=last_state,
-                )
-                _update_candidate_record(
-                    candidate,
-                    _metadata_fields('notified', now_value, notification_error=notification_error, last_state=last_state),
-                    stores=record_stores,
-                )
                 continue
 
             if entry.get('cleanup_status') == 'manual_review':
@@ -2010,22 +2368,45 @@ def run_expired_user_cleanup(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None,
 
             last_state = entry.get('last_state') or capture_last_state(user_data, now=now)
             entry['last_state'] = last_state
-            delete_result = api_client.delete_user(username) if api_client else None
-            if delete_result is None:
-                entry['cleanup_status'] = 'delete_failed'
-                entry['cleanup_error'] = 'delete_failed'
-                entry['last_checked_at'] = now_value
-                _update_candidate_record(
-                    candidate,
-                    _metadata_fields('delete_failed', now_value, cleanup_error='delete_failed', last_state=last_state),
-                    stores=record_stores,
-                )
-                continue
-
-            _mark_deleted(state, key, candidate, 'deleted', now_value, last_state=last_state, delete_result='deleted', stores=record_stores)
+            due_deletions.append((key, entry, candidate, last_state, api_client))
 
-        _save_dirty_cleanup_record_stores(record_stores)
-        _save_json_file(STATE_FILE, state)
+        pipeline.lap('process')
+        try:
+            _delete_due_users(multi_api, state, due_deletions, now_value, record_stores, pipeline=pipeline)
+            pipeline.lap('delete')
+            pipeline.finish_notifications()
+            pipeline.lap('notify')
+        finally:
+            pipeline.close()
+
+        if not dry_run:
+            if record_stores is not None:
+                _save_dirty_cleanup_record_stores(record_stores)
+                _save_json_file(STATE_FILE, state)
+            if change_version is not None:
+                if full_reconcile:
+                    index = _build_cleanup_index(state, upcoming, now, grace_hours)
+                else:
+                    _reindex_cleanup_keys(index['deadlines'], state, lookup_context, index_keys, now, grace_hours)
+                _save_cleanup_index(index)
+                _user_change_version = change_version
+        pipeline.lap('save')
+
+        _last_pass_report = {
+            'finished_at': _now_str(now),
+            'dry_run': bool(dry_run),
+            'full_reconcile': bool(full_reconcile),
+            'candidates': len(candidates),
+            **pipeline.counts,
+            'timings': dict(pipeline.timings),
+        }
+        print(
+            "[ExpiredCleanup] pass "
+            f"full={int(full_reconcile)} dry_run={int(bool(dry_run))} candidates={len(candidates)} "
+            + " ".join(f"{name}={count}" for name, count in pipeline.counts.items())
+            + " timings="
+            + ",".join(f"{phase}:{seconds}s" for phase, seconds in pipeline.timings.items())
+        )
         if recovery_stats['verified']:
             print(
                 "[ExpiredCleanup] recovered_tests "
@@ -2037,6 +2418,11 @@ def run_expired_user_cleanup(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None,
         return state
 
 
+def get_last_cleanup_pass_report():
+    """Counts and per-phase timings of the most recent cleanup pass, or None."""
+    return _last_pass_report
+
+
 def run_expired_user_cleanup_with_metadata(grace_hours=EXPIRED_CLEANUP_GRACE_HOURS, now=None, multi_api=None):
     started_at = now or datetime.now()
     metadata = _load_cleanup_schedule_metadata()
@@ -2063,6 +2449,7 @@ def run_expired_user_cleanup_with_metadata(grace_hours=EXPIRED_CLEANUP_GRACE_HOU
         'last_finished_at': _now_str(finished_at),
         'last_success_at': _now_str(finished_at),
         'last_error': None,
+        'last_pass': get_last_cleanup_pass_report(),
     })
     _save_cleanup_schedule_metadata(metadata)
     return state
@@ -0,0 +1,258 @@
+"""
+Shared storage helpers for the bot's JSON state files.
+
+Every module that keeps state in ``/etc/dijiq/core/scripts/telegrambot/*.json``
+goes through this module instead of hand-rolling ``json.load`` / ``json.dump``:
+
+* ``read`` returns a parsed document cached per file and revalidated by the
+  file's ``(mtime, size, inode)``, so unchanged files are parsed once.  The
+  returned object is shared and must be treated as read-only.
+* ``load`` returns a private, freshly parsed copy for read-modify-write code.
+* ``write`` and ``update`` replace the file atomically (temp file, fsync,
+  rename) while holding a per-file thread lock and an ``fcntl`` lock on
+  ``<path>.lock`` shared with other processes.
+* ``get_stats`` exposes per-file read/write counters, latency and bytes.
+
+Set ``DIJIQ_JSON_STORE_COMPACT=1`` to write every document without
+indentation.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows fallback
+    fcntl = None
+
+
+class JsonStoreError(RuntimeError):
+    pass
+
+
+_registry_lock = threading.Lock()
+_path_locks = {}
+_cache = {}
+_stats = {}
+
+
+def _key(path):
+    return os.path.abspath(str(path))
+
+
+def _signature(stat_result):
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+
+def _compact_by_default():
+    return str(os.getenv("DIJIQ_JSON_STORE_COMPACT", "")).strip().lower() in {"1", "true", "yes", "on"}
+
+
+def _path_lock(key):
+    with _registry_lock:
+        state = _path_locks.get(key)
+        if state is None:
+            state = {"lock": threading.RLock(), "depth": 0, "handle": None}
+            _path_locks[key] = state
+        return state
+
+
+def _record(key, kind, seconds=0.0, size=0):
+    with _registry_lock:
+        stats = _stats.setdefault(key, {
+            "reads": 0,
+            "cache_hits": 0,
+            "read_seconds": 0.0,
+            "read_bytes": 0,
+            "writes": 0,
+            "write_seconds": 0.0,
+            "write_bytes": 0,
+        })
+        if kind == "hit":
+            stats["cache_hits"] += 1
+        else:
+            stats[f"{kind}s"] += 1
+            stats[f"{kind}_seconds"] += seconds
+            stats[f"{kind}_bytes"] += size
+
+
+@contextmanager
+def file_lock(path):
+    """Hold the per-file thread lock and the cross-process ``fcntl`` lock.
+
+    Re-entrant within a thread, so ``update`` can be called while the lock is
+    already held for a larger transaction.
+    """
+    key = _key(path)
+    state = _path_lock(key)
+    with state["lock"]:
+        if state["depth"] == 0:
+            os.makedirs(os.path.dirname(key), exist_ok=True)
+            handle = open(f"{key}.lock", "a")
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            state["handle"] = handle
+        state["depth"] += 1
+        try:
+            yield
+        finally:
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                handle = state["handle"]
+                state["handle"] = None
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+                handle.close()
+
+
+def _parse(key):
+    """Parse ``key`` and return ``(data, signature)``; ``(None, None)`` if missing."""
+    started = time.perf_counter()
+    try:
+        with open(key, "rb") as handle:
+            signature = _signature(os.fstat(handle.fileno()))
+            raw = handle.read()
+    except FileNotFoundError:
+        return None, None
+    data = json.loads(raw) if raw.strip() else None
+    _record(key, "read", time.perf_counter() - started, len(raw))
+    return data, signature
+
+
+def _fallback(key, default, strict, error):
+    if strict:
+        raise JsonStoreError(f"Failed to read {key}: {error}") from error
+    return copy.deepcopy(default)
+
+
+def read(path, default=None, strict=False):
+    """Return the cached document at ``path`` (shared, do not mutate)."""
+    key = _key(path)
+    try:
+        signature = _signature(os.stat(key))
+    except OSError:
+        _cache.pop(key, None)
+        return copy.deepcopy(default)
+
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == signature:
+        _record(key, "hit")
+        return cached[1]
+
+    try:
+        data, signature = _parse(key)
+    except Exception as e:
+        _cache.pop(key, None)
+        return _fallback(key, default, strict, e)
+    if data is None:
+        return copy.deepcopy(default)
+    _cache[key] = (signature, data)
+    return data
+
+
+def load(path, default=None, strict=False):
+    """Return a private, freshly parsed copy of the document at ``path``."""
+    key = _key(path)
+    try:
+        data, _ = _parse(key)
+    except Exception as e:
+        return _fallback(key, default, strict, e)
+    return copy.deepcopy(default) if data is None else data
+
+
+def _serialize(data, indent, compact, ensure_ascii):
+    if compact is None:
+        compact = _compact_by_default()
+    if compact:
+        return json.dumps(data, separators=(",", ":"), ensure_ascii=ensure_ascii)
+    return json.dumps(data, indent=indent, ensure_ascii=ensure_ascii) + "\n"
+
+
+def _write_unlocked(key, data, indent, compact, ensure_ascii=True):
+    parent = os.path.dirname(key)
+    os.makedirs(parent, exist_ok=True)
+    payload = _serialize(data, indent, compact, ensure_ascii).encode("utf-8")
+    tmp_path = f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+    started = time.perf_counter()
+    try:
+        with open(tmp_path, "wb") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, key)
+        try:
+            directory_fd = os.open(parent, os.O_RDONLY)
+            try:
+                os.fsync(directory_fd)
+            finally:
+                os.close(directory_fd)
+        except OSError:
+            pass
+    finally:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except OSError:
+            pass
+    _record(key, "write", time.perf_counter() - started, len(payload))
+    try:
+        return _signature(os.stat(key))
+    except OSError:
+        return None
+
+
+def write(path, data, indent=4, compact=None, ensure_ascii=True, cache=False):
+    """Atomically replace the document at ``path`` with ``data``.
+
+    Non-ASCII text is ``\\u`` escaped, as with ``json.dump``, unless
+    ``ensure_ascii`` is false. With ``cache`` set, ``data`` becomes the
+    cached copy, as after ``update``, and must not be mutated afterwards.
+    """
+    key = _key(path)
+    with file_lock(key):
+        _cache.pop(key, None)
+        signature = _write_unlocked(key, data, indent, compact, ensure_ascii)
+        if cache and signature is not None:
+            _cache[key] = (signature, data)
+
+
+def update(path, mutator, default=None, indent=4, compact=None, strict=False, ensure_ascii=True):
+    """Run ``mutator(document)`` under the file lock and persist the result.
+
+    ``mutator`` edits the document in place; its return value is returned.
+    The mutated document becomes the cached copy, so it must not be retained
+    by the caller.
+    """
+    key = _key(path)
+    with file_lock(key):
+        data = load(key, default=default, strict=strict)
+        result = mutator(data)
+        _cache.pop(key, None)
+        signature = _write_unlocked(key, data, indent, compact, ensure_ascii)
+        if signature is not None:
+            _cache[key] = (signature, data)
+        return result
+
+
+def invalidate(path=None):
+    if path is None:
+        _cache.clear()
+    else:
+        _cache.pop(_key(path), None)
+
+
+def get_stats(path=None):
+    """Return read/write counters, keyed by absolute path unless ``path`` is given."""
+    with _registry_lock:
+        if path is not None:
+            return dict(_stats.get(_key(path), {}))
+        return {key: dict(value) for key, value in _stats.items()}
+
+
+def reset_stats():
+    with _registry_lock:
+        _stats.clear()
@@ -1,46 +1,50 @@
-import os
-import json
 from telebot import types
+from utils import json_store
 from utils.command import bot
 from utils.translations import LANGUAGES, BUTTON_TRANSLATIONS
 
 # Path to store user language preferences - using relative path for better compatibility
 LANGUAGE_PREFS_FILE = '/etc/dijiq/core/scripts/telegrambot/user_languages.json'
+DEFAULT_USER_LANGUAGE = "en"
+
+
+def _cached_user_languages():
+    """Return the shared preferences dict. Callers must not mutate it."""
+    languages = json_store.read(LANGUAGE_PREFS_FILE, {})
+    return languages if isinstance(languages, dict) else {}
+
 
 def load_user_languages():
     """Load user language preferences from file"""
-    if os.path.exists(LANGUAGE_PREFS_FILE):
-        try:
-            with open(LANGUAGE_PREFS_FILE, 'r') as f:
-                return json.load(f)
-        except Exception:
-            return {}
-    return {}
+    return dict(_cached_user_languages())
 
 def save_user_languages(languages_data):
     """Save user language preferences to file"""
     try:
-        # Ensure directory exists
-        os.makedirs(os.path.dirname(LANGUAGE_PREFS_FILE), exist_ok=True)
-        with open(LANGUAGE_PREFS_FILE, 'w') as f:
-            json.dump(languages_data, f, indent=2)
+        json_store.write(LANGUAGE_PREFS_FILE, languages_data, indent=2)
     except Exception as e:
         print(f"Error saving language preferences: {e}")
 
 # Function to get user language - this overrides the one in translations.py
 def get_user_language(user_id):
     """Get the language preference for a user"""
-    user_id_str = str(user_id)
-    languages = load_user_languages()
-    return languages.get(user_id_str, "en")
+    return _cached_user_languages().get(str(user_id), DEFAULT_USER_LANGUAGE)
+
+def get_user_languages(user_ids):
+    """Resolve language preferences for many users with a single lookup."""
+    languages = _cached_user_languages()
+    return {user_id: languages.get(str(user_id), DEFAULT_USER_LANGUAGE) for user_id in user_ids}
 
 # Function to set user language - this overrides the one in translations.py
 def set_user_language(user_id, language_code):
     """Set the language preference for a user"""
-    user_id_str = str(user_id)
-    languages = load_user_languages()
-    languages[user_id_str] = language_code
-    save_user_languages(languages)
+    def mutate(languages):
+        languages[str(user_id)] = language_code
+
+    try:
+        json_store.update(LANGUAGE_PREFS_FILE, mutate, default={}, indent=2)
+    except Exception as e:
+        print(f"Error saving language preferences: {e}")
 
 @bot.message_handler(func=lambda message: any(
     message.text == translations["language"] 
@@ -7,6 +7,7 @@ import requests
 import re
 import time
 import threading
+from collections.abc import Mapping
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from telebot import types
@@ -136,7 +137,7 @@ def _iter_users_from_snapshot_entries(entries):
                 yield client, username, data
         elif isinstance(users, list):
             for data in users:
-                if isinstance(data, dict):
+                if isinstance(data, Mapping):
                     yield client, data.get("username"), data
 
 
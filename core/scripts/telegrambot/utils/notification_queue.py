@@ -0,0 +1,322 @@
+"""Shared outbound Telegram message queue.
+
+Broadcasts, traffic alerts and cleanup notices all submit here, so the bot as a
+whole stays under Telegram's global and per-chat limits. A small pool of worker
+threads drains the queue through a token bucket; 429 responses pause delivery
+for the ``retry_after`` Telegram asks for and the message is retried.
+"""
+import heapq
+import itertools
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future
+
+
+DEFAULT_GLOBAL_RATE = 25
+DEFAULT_PER_CHAT_INTERVAL_SECONDS = 1.0
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_RETRIES = 3
+MAX_RETRY_AFTER_SECONDS = 300
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+
+
+def _int_env(name, default, minimum=1):
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def get_global_rate():
+    return _int_env("DIJIQ_NOTIFY_RATE", DEFAULT_GLOBAL_RATE)
+
+
+def get_worker_count():
+    return _int_env("DIJIQ_NOTIFY_WORKERS", DEFAULT_WORKERS)
+
+
+def is_permanent_broadcast_failure(error_msg):
+    """Return True when Telegram indicates this recipient should stay excluded."""
+    lowered = error_msg.lower()
+    permanent_error_terms = [
+        "blocked",
+        "deactivated",
+        "chat not found",
+        "user is bot",
+        "forbidden",
+    ]
+    return any(term in lowered for term in permanent_error_terms)
+
+
+def get_retry_after(error):
+    """Return the ``retry_after`` seconds of a 429 error, or None for other errors."""
+    result_json = getattr(error, "result_json", None)
+    if isinstance(result_json, dict):
+        retry_after = (result_json.get("parameters") or {}).get("retry_after")
+        if isinstance(retry_after, (int, float)) and retry_after >= 0:
+            return min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+
+    match = re.search(r"retry after (\d+)", str(error), flags=re.IGNORECASE)
+    if match:
+        return min(float(match.group(1)), MAX_RETRY_AFTER_SECONDS)
+    return None
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def delay(self, now):
+        """Seconds until a token is available (0 when one is available now)."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+
+class NotificationJob:
+    """Progress of a batch of messages submitted together."""
+
+    def __init__(self, total, on_progress=None, on_complete=None):
+        self.total = total
+        self.succeeded = []
+        self.failed = {}
+        self.permanent_failures = set()
+        self._on_progress = on_progress
+        self._on_complete = on_complete
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        if total == 0:
+            self._finish()
+
+    @property
+    def processed(self):
+        return len(self.succeeded) + len(self.failed)
+
+    def progress(self):
+        with self._lock:
+            return {
+                "total": self.total,
+                "processed": self.processed,
+                "succeeded": len(self.succeeded),
+                "failed": len(self.failed),
+                "permanent_failures": len(self.permanent_failures),
+            }
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def _record(self, chat_id, error=None):
+        with self._lock:
+            if error is None:
+                self.succeeded.append(chat_id)
+            else:
+                error_msg = str(error)
+                self.failed[chat_id] = error_msg
+                if is_permanent_broadcast_failure(error_msg):
+                    self.permanent_failures.add(chat_id)
+            finished = self.processed >= self.total
+
+        if self._on_progress is not None:
+            try:
+                self._on_progress(self)
+            except Exception as e:
+                print(f"Notification job progress callback failed: {e}")
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        if self._on_complete is not None:
+            try:
+                self._on_complete(self)
+            except Exception as e:
+                print(f"Notification job completion callback failed: {e}")
+        self._done.set()
+
+
+class _Delivery:
+    __slots__ = ("send", "chat_id", "args", "kwargs", "job", "future", "attempts")
+
+    def __init__(self, send, chat_id, args, kwargs, job):
+        self.send = send
+        self.chat_id = chat_id
+        self.args = args
+        self.kwargs = kwargs
+        self.job = job
+        self.future = Future()
+        self.attempts = 0
+
+
+class NotificationDispatcher:
+    """Rate-limited queue drained by a small pool of daemon worker threads.
+
+    Interactive messages (single alerts and notices) are served before bulk
+    broadcast messages, so a large broadcast does not delay them.
+    """
+
+    def __init__(self, global_rate=None, per_chat_interval=DEFAULT_PER_CHAT_INTERVAL_SECONDS,
+                 workers=None, max_retries=DEFAULT_MAX_RETRIES):
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(global_rate or get_global_rate())
+        self._worker_count = workers or get_worker_count()
+        self._queues = {PRIORITY_INTERACTIVE: [], PRIORITY_BULK: []}
+        self._sequence = itertools.count()
+        self._chat_ready = {}
+        self._paused_until = 0
+        self._condition = threading.Condition()
+        self._threads = []
+
+    def submit(self, send, chat_id, *args, priority=PRIORITY_INTERACTIVE, job=None, **kwargs):
+        """Queue ``send(chat_id, *args, **kwargs)`` and return a Future for its result."""
+        delivery = _Delivery(send, chat_id, args, kwargs, job)
+        with self._condition:
+            self._push(priority, time.monotonic(), delivery)
+            self._ensure_workers()
+        return delivery.future
+
+    def submit_many(self, send, chat_ids, *args, on_progress=None, on_complete=None, **kwargs):
+        """Queue the same message for many chats at bulk priority and return its job."""
+        chat_ids = list(chat_ids)
+        job = NotificationJob(len(chat_ids), on_progress=on_progress, on_complete=on_complete)
+        now = time.monotonic()
+        with self._condition:
+            for chat_id in chat_ids:
+                self._push(PRIORITY_BULK, now, _Delivery(send, chat_id, args, kwargs, job))
+            self._ensure_workers()
+        return job
+
+    def send(self, send, chat_id, *args, timeout=None, **kwargs):
+        """Send through the queue and wait; re-raises the final send error."""
+        return self.submit(send, chat_id, *args, **kwargs).result(timeout)
+
+    def pending(self):
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def _push(self, priority, ready_at, delivery):
+        heapq.heappush(self._queues[priority], (ready_at, next(self._sequence), delivery))
+        self._condition.notify()
+
+    def _ensure_workers(self):
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        while len(self._threads) < self._worker_count:
+            thread = threading.Thread(target=self._worker, name="dijiq-notify", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _take_ready(self, queue, now):
+        while queue:
+            ready_at, sequence, delivery = queue[0]
+            if ready_at > now:
+                return None, ready_at
+            chat_ready_at = self._chat_ready.get(delivery.chat_id, 0)
+            if chat_ready_at > now:
+                heapq.heapreplace(queue, (chat_ready_at, sequence, delivery))
+                continue
+            heapq.heappop(queue)
+            return delivery, None
+        return None, None
+
+    def _next_delivery(self):
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._paused_until > now:
+                    self._condition.wait(self._paused_until - now)
+                    continue
+
+                next_ready_at = None
+                for priority in sorted(self._queues):
+                    queue = self._queues[priority]
+                    if not queue:
+                        continue
+                    if queue[0][0] <= now:
+                        delay = self._bucket.delay(now)
+                        if delay > 0:
+                            next_ready_at = now + delay
+                            break
+                    delivery, ready_at = self._take_ready(queue, now)
+                    if delivery is not None:
+                        self._bucket.consume()
+                        self._mark_chat(delivery.chat_id, now)
+                        return delivery
+                    if ready_at is not None:
+                        next_ready_at = ready_at if next_ready_at is None else min(next_ready_at, ready_at)
+
+                self._condition.wait(None if next_ready_at is None else max(0, next_ready_at - now))
+
+    def _mark_chat(self, chat_id, now):
+        if not self.per_chat_interval:
+            return
+        if len(self._chat_ready) > 10000:
+            self._chat_ready = {key: value for key, value in self._chat_ready.items() if value > now}
+        self._chat_ready[chat_id] = now + self.per_chat_interval
+
+    def _worker(self):
+        while True:
+            delivery = self._next_delivery()
+            try:
+                result = delivery.send(delivery.chat_id, *delivery.args, **delivery.kwargs)
+            except Exception as e:
+                retry_after = get_retry_after(e)
+                if retry_after is not None and delivery.attempts < self.max_retries:
+                    delivery.attempts += 1
+                    priority = PRIORITY_INTERACTIVE if delivery.job is None else PRIORITY_BULK
+                    with self._condition:
+                        resume_at = time.monotonic() + retry_after
+                        self._paused_until = max(self._paused_until, resume_at)
+                        self._push(priority, resume_at, delivery)
+                        self._condition.notify_all()
+                    continue
+                delivery.future.set_exception(e)
+                if delivery.job is not None:
+                    delivery.job._record(delivery.chat_id, e)
+            else:
+                delivery.future.set_result(result)
+                if delivery.job is not None:
+                    delivery.job._record(delivery.chat_id)
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+        return _dispatcher
+
+
+def send_message(bot, chat_id, text, **kwargs):
+    """Send one message through the shared queue and wait for the outcome."""
+    return get_notification_dispatcher().send(bot.send_message, chat_id, text, **kwargs)
+
+
+def broadcast_message(bot, chat_ids, text, on_progress=None, on_complete=None, **kwargs):
+    """Queue ``text`` for every chat in ``chat_ids`` and return the NotificationJob."""
+    return get_notification_dispatcher().submit_many(
+        bot.send_message,
+        chat_ids,
+        text,
+        on_progress=on_progress,
+        on_complete=on_complete,
+        **kwargs,
+    )
@@ -1,183 +1,892 @@
+import copy
 import json
 import os
+import sqlite3
+import sys
 import threading
+from contextlib import contextmanager
 from datetime import datetime
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows fallback
+    fcntl = None
+
 PAYMENTS_FILE = '/etc/dijiq/core/scripts/telegrambot/payments.json'
+PAYMENTS_DB_FILE = '/etc/dijiq/core/scripts/telegrambot/payments.sqlite3'
+PAYMENTS_JOURNAL_FILE = '/etc/dijiq/core/scripts/telegrambot/payments.journal.jsonl'
+PAYMENT_JOURNAL_COMPACT_BYTES = 1024 * 1024
+PAYMENT_STORE_ENV = 'DIJIQ_PAYMENT_STORE'
+PAYMENT_STORE_BACKENDS = {'json', 'sqlite', 'journal'}
 payment_lock = threading.Lock()
+_thread_local = threading.local()
 
-def load_payments():
-    with payment_lock:
+
+def _now_str():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def get_payment_store_backend():
+    """Return the configured payment store backend (``json``, ``sqlite`` or ``journal``)."""
+    backend = str(os.getenv(PAYMENT_STORE_ENV, 'json') or 'json').strip().lower()
+    return backend if backend in PAYMENT_STORE_BACKENDS else 'json'
+
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+def _write_json_atomic(path, payments):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(payments, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
         try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    return json.load(f)
-        except Exception:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
             pass
-        return {}
 
-def save_payments(payments):
-    with payment_lock:
-        os.makedirs(os.path.dirname(PAYMENTS_FILE), exist_ok=True)
-        with open(PAYMENTS_FILE, 'w') as f:
-            json.dump(payments, f, indent=4)
 
-def add_payment_record(payment_id, data):
-    # Load and save handle locking, but we need to ensure atomicity of read-modify-write
-    with payment_lock:
+def _user_key(user_id):
+    return str(user_id)
+
+
+# Record fields a gateway order id can be matched against. Webhooks that carry
+# only an ``order_id`` are resolved through this index on every delivery, so
+# the receiver never loads and scans the whole payment history.
+_ORDER_FIELDS = ('order_id', 'payment_id')
+
+
+class _PaymentIndex:
+    """Parsed ``payments.json`` plus user_id, status and order_id secondary indexes."""
+
+    def __init__(self, payments, signature):
+        self.payments = payments
+        self.signature = signature
+        self.by_user = {}
+        self.by_status = {}
+        self.by_order = {}
+        self.positions = {}
+        self.journal_offset = 0
+        for payment_id, payment in payments.items():
+            self.positions[payment_id] = len(self.positions)
+            self.add(payment_id, payment)
+
+    @staticmethod
+    def _keys(payment):
+        if not isinstance(payment, dict):
+            return None, None
+        return _user_key(payment.get('user_id')), str(payment.get('status'))
+
+    @staticmethod
+    def _order_keys(payment):
+        return {str(payment[field]) for field in _ORDER_FIELDS if payment.get(field)}
+
+    def add(self, payment_id, payment):
+        user_key, status = self._keys(payment)
+        if user_key is None:
+            return
+        self.by_user.setdefault(user_key, {})[payment_id] = None
+        self.by_status.setdefault(status, {})[payment_id] = None
+        for order_key in self._order_keys(payment):
+            self.by_order.setdefault(order_key, {})[payment_id] = None
+
+    def discard(self, payment_id, payment):
+        user_key, status = self._keys(payment)
+        if user_key is None:
+            return
+        self.by_user.get(user_key, {}).pop(payment_id, None)
+        self.by_status.get(status, {}).pop(payment_id, None)
+        for order_key in self._order_keys(payment):
+            self.by_order.get(order_key, {}).pop(payment_id, None)
+
+    def order_matches(self, order_id):
+        """Payment ids whose ``order_id`` or ``payment_id`` field is ``order_id``."""
+        return list(self.by_order.get(str(order_id), {}))
+
+    def replace(self, payment_id, payment):
+        self.discard(payment_id, self.payments.get(payment_id))
+        if payment_id not in self.positions:
+            self.positions[payment_id] = len(self.positions)
+        self.payments[payment_id] = payment
+        self.add(payment_id, payment)
+
+    def records(self, payment_ids):
+        """Return deep copies of ``payment_ids`` in document order."""
+        ordered = sorted(
+            (payment_id for payment_id in payment_ids if payment_id in self.payments),
+            key=self.positions.__getitem__,
+        )
+        return {payment_id: copy.deepcopy(self.payments[payment_id]) for payment_id in ordered}
+
+
+# Process-wide parsed payments keyed by file path. Entries are reused while the
+# file's (mtime, size, inode) signature matches, so writes from another process
+# (or a direct JSON rewrite) invalidate them. Guarded by ``payment_lock``.
+_json_payment_cache = {}
+
+
+class JsonPaymentStore:
+    """Payment records kept in one ``payments.json`` document."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def _write(self, payments):
+        _write_json_atomic(self.path, payments)
+
+    def _indexed(self):
+        """Return the cached index, reparsing when the file changed on disk."""
+        signature = _file_signature(self.path)
+        cached = _json_payment_cache.get(self.path)
+        if cached is not None and signature is not None and cached.signature == signature:
+            return cached
+        _json_payment_cache.pop(self.path, None)
+        payments = self._read()
+        if payments is None:
+            return None
+        cached = _PaymentIndex(payments, signature)
+        _json_payment_cache[self.path] = cached
+        return cached
+
+    def _write_indexed(self, index):
         try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    payments = json.load(f)
-            else:
-                payments = {}
+            self._write(index.payments)
         except Exception:
-            payments = {}
-            
-        data['created_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        data['updates'] = []  # Add history tracking
-        payments[payment_id] = data
-        
-        os.makedirs(os.path.dirname(PAYMENTS_FILE), exist_ok=True)
-        with open(PAYMENTS_FILE, 'w') as f:
-            json.dump(payments, f, indent=4)
+            _json_payment_cache.pop(self.path, None)
+            raise
+        index.signature = _file_signature(self.path)
+        _json_payment_cache[self.path] = index
 
-def update_payment_status(payment_id, status):
-    with payment_lock:
+    def load_all(self):
         try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    payments = json.load(f)
-            else:
-                return False
+            payments = self._read()
         except Exception:
-            return False
+            return {}
+        return payments if payments is not None else {}
 
-        if payment_id in payments:
-            current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Add update to history
-            update = {
-                'status': status,
-                'timestamp': current_time,
-                'previous_status': payments[payment_id].get('status', 'unknown')
-            }
-            
-            payments[payment_id]['status'] = status
-            payments[payment_id]['updated_at'] = current_time
-            updates = payments[payment_id].setdefault('updates', [])
-            if not isinstance(updates, list):
-                updates = []
-                payments[payment_id]['updates'] = updates
-            updates.append(update)
-            
-            with open(PAYMENTS_FILE, 'w') as f:
-                json.dump(payments, f, indent=4)
-            return True
-        return False
+    def save_all(self, payments):
+        _json_payment_cache.pop(self.path, None)
+        self._write(payments)
 
-def update_payment_record_fields(payment_id, fields):
-    with payment_lock:
+    def put(self, payment_id, data):
         try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    payments = json.load(f)
-            else:
-                return False
+            index = self._indexed()
         except Exception:
-            return False
+            index = None
+        if index is None:
+            index = _PaymentIndex({}, None)
+        index.replace(payment_id, copy.deepcopy(data))
+        self._write_indexed(index)
 
-        if payment_id not in payments or not isinstance(fields, dict):
+    def mutate(self, payment_id, mutator):
+        try:
+            index = self._indexed()
+        except Exception:
+            return False
+        if index is None or payment_id not in index.payments:
+            return False
+        payment = copy.deepcopy(index.payments[payment_id])
+        if not mutator(payment):
             return False
+        index.replace(payment_id, payment)
+        self._write_indexed(index)
+        return True
 
-        payments[payment_id].update(fields)
-        payments[payment_id]['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(PAYMENTS_FILE, 'w') as f:
-            json.dump(payments, f, indent=4)
+    def mutate_many(self, payment_ids, mutator):
+        """Apply ``mutator(payment_id, payment)`` to each payment and rewrite the file once."""
+        try:
+            index = self._indexed()
+        except Exception:
+            return set()
+        if index is None:
+            return set()
+        changed = set()
+        for payment_id in payment_ids:
+            if payment_id not in index.payments or payment_id in changed:
+                continue
+            payment = copy.deepcopy(index.payments[payment_id])
+            if mutator(payment_id, payment):
+                index.replace(payment_id, payment)
+                changed.add(payment_id)
+        if changed:
+            self._write_indexed(index)
+        return changed
+
+    def get(self, payment_id):
+        try:
+            index = self._indexed()
+        except Exception:
+            return None
+        if index is None:
+            return None
+        return index.records([payment_id]).get(payment_id)
+
+    def get_user_payments(self, user_id):
+        try:
+            index = self._indexed()
+        except Exception:
+            return {}
+        if index is None:
+            return {}
+        return index.records(list(index.by_user.get(_user_key(user_id), {})))
+
+    def get_payments_by_status(self, statuses):
+        try:
+            index = self._indexed()
+        except Exception:
+            return {}
+        if index is None:
+            return {}
+        payment_ids = set()
+        for status in statuses:
+            payment_ids.update(index.by_status.get(str(status), {}))
+        return index.records(payment_ids)
+
+    def get_payments_by_order_id(self, order_id):
+        try:
+            index = self._indexed()
+        except Exception:
+            return {}
+        if index is None:
+            return {}
+        return index.records(index.order_matches(order_id))
+
+
+class SqlitePaymentStore:
+    """Payment records kept one row per payment in a WAL-mode SQLite database.
+
+    The full record is stored as JSON in ``data``; ``user_key``, ``status`` and
+    ``created_at`` are indexed copies used for lookups.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS payments ('
+        ' payment_id TEXT PRIMARY KEY,'
+        ' user_key TEXT,'
+        ' status TEXT,'
+        ' created_at TEXT,'
+        ' updated_at TEXT,'
+        ' data TEXT NOT NULL'
+        ')',
+        'CREATE INDEX IF NOT EXISTS idx_payments_user_key ON payments(user_key)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_status ON payments(status)',
+        'CREATE INDEX IF NOT EXISTS idx_payments_created_at ON payments(created_at)',
+        "CREATE INDEX IF NOT EXISTS idx_payments_order_id ON payments(json_extract(data, '$.order_id'))",
+        "CREATE INDEX IF NOT EXISTS idx_payments_record_payment_id ON payments(json_extract(data, '$.payment_id'))",
+    )
+    UPSERT_SQL = (
+        'INSERT INTO payments (payment_id, user_key, status, created_at, updated_at, data) '
+        'VALUES (?, ?, ?, ?, ?, ?) '
+        'ON CONFLICT(payment_id) DO UPDATE SET '
+        'user_key = excluded.user_key, status = excluded.status, created_at = excluded.created_at, '
+        'updated_at = excluded.updated_at, data = excluded.data'
+    )
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+
+    def _connect(self):
+        connections = getattr(_thread_local, 'payment_connections', None)
+        if connections is None:
+            connections = {}
+            _thread_local.payment_connections = connections
+
+        connection = connections.get(self.path)
+        if connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            is_new = not os.path.exists(self.path)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            connections[self.path] = connection
+            if is_new and self.json_path and os.path.exists(self.json_path):
+                self._import_json(connection, self.json_path)
+        return connection
+
+    @staticmethod
+    def _row(payment_id, data):
+        return (
+            str(payment_id),
+            _user_key(data.get('user_id')),
+            None if data.get('status') is None else str(data.get('status')),
+            data.get('created_at'),
+            data.get('updated_at'),
+            json.dumps(data),
+        )
+
+    def _import_json(self, connection, json_path):
+        try:
+            with open(json_path, 'r') as f:
+                payments = json.load(f)
+        except Exception as e:
+            print(f"[payment_records] Failed to import {json_path}: {e}")
+            return 0
+        if not isinstance(payments, dict):
+            return 0
+        self._replace_all(connection, payments)
+        return len(payments)
+
+    def _replace_all(self, connection, payments):
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM payments')
+            connection.executemany(
+                self.UPSERT_SQL,
+                [self._row(payment_id, data) for payment_id, data in payments.items() if isinstance(data, dict)],
+            )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def load_all(self):
+        try:
+            rows = self._connect().execute('SELECT payment_id, data FROM payments ORDER BY rowid').fetchall()
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to load payments: {e}")
+            return {}
+        return {payment_id: json.loads(data) for payment_id, data in rows}
+
+    def save_all(self, payments):
+        self._replace_all(self._connect(), payments)
+
+    def import_json(self, json_path):
+        connection = self._connect()
+        return self._import_json(connection, json_path)
+
+    def put(self, payment_id, data):
+        self._connect().execute(self.UPSERT_SQL, self._row(payment_id, data))
+
+    def mutate(self, payment_id, mutator):
+        try:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to open payment transaction: {e}")
+            return False
+        try:
+            row = connection.execute('SELECT data FROM payments WHERE payment_id = ?', (str(payment_id),)).fetchone()
+            if row is None:
+                connection.execute('ROLLBACK')
+                return False
+            payment = json.loads(row[0])
+            if not mutator(payment):
+                connection.execute('ROLLBACK')
+                return False
+            connection.execute(self.UPSERT_SQL, self._row(payment_id, payment))
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
         return True
 
-def complete_payment_record(payment_id, fields, status='completed'):
-    with payment_lock:
+    def mutate_many(self, payment_ids, mutator):
+        """Apply ``mutator`` to each payment in one transaction."""
+        try:
+            connection = self._connect()
+            connection.execute('BEGIN IMMEDIATE')
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to open payment transaction: {e}")
+            return set()
+        changed = set()
         try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    payments = json.load(f)
-            else:
+            for payment_id in payment_ids:
+                payment_id = str(payment_id)
+                if payment_id in changed:
+                    continue
+                row = connection.execute('SELECT data FROM payments WHERE payment_id = ?', (payment_id,)).fetchone()
+                if row is None:
+                    continue
+                payment = json.loads(row[0])
+                if mutator(payment_id, payment):
+                    connection.execute(self.UPSERT_SQL, self._row(payment_id, payment))
+                    changed.add(payment_id)
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return changed
+
+    def get(self, payment_id):
+        try:
+            row = self._connect().execute(
+                'SELECT data FROM payments WHERE payment_id = ?', (str(payment_id),)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to load payment {payment_id}: {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def get_user_payments(self, user_id):
+        try:
+            rows = self._connect().execute(
+                'SELECT payment_id, data FROM payments WHERE user_key = ? ORDER BY rowid',
+                (_user_key(user_id),),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to load payments for {user_id}: {e}")
+            return {}
+        return {payment_id: json.loads(data) for payment_id, data in rows}
+
+    def get_payments_by_status(self, statuses):
+        statuses = [str(status) for status in statuses]
+        if not statuses:
+            return {}
+        placeholders = ', '.join('?' for _ in statuses)
+        try:
+            rows = self._connect().execute(
+                f'SELECT payment_id, data FROM payments WHERE status IN ({placeholders}) ORDER BY rowid',
+                statuses,
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to load payments by status: {e}")
+            return {}
+        return {payment_id: json.loads(data) for payment_id, data in rows}
+
+    def get_payments_by_order_id(self, order_id):
+        try:
+            rows = self._connect().execute(
+                "SELECT payment_id, data FROM payments "
+                "WHERE json_extract(data, '$.order_id') = ? OR json_extract(data, '$.payment_id') = ? "
+                "ORDER BY rowid",
+                (str(order_id), str(order_id)),
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"[payment_records] Failed to load payments for order {order_id}: {e}")
+            return {}
+        return {payment_id: json.loads(data) for payment_id, data in rows}
+
+
+# Snapshot plus replayed journal keyed by snapshot path. Guarded by
+# ``payment_lock`` in-process and by the journal's ``fcntl`` lock across
+# processes.
+_journal_payment_cache = {}
+_journal_compaction_threads = {}
+
+
+class JournalPaymentStore:
+    """Payment records kept as a ``payments.json`` snapshot plus an append-only journal.
+
+    Every write appends the full updated record as one fsync'd JSON line, so a
+    status change costs O(record) instead of rewriting every payment. Reads
+    replay the journal on top of the snapshot; later lines win, so replaying a
+    line twice is harmless. Once the journal grows past
+    ``PAYMENT_JOURNAL_COMPACT_BYTES`` a background thread folds it into a new
+    snapshot. Until then it is also an audit trail of every transition.
+    """
+
+    def __init__(self, path, journal_path):
+        self.path = path
+        self.journal_path = journal_path
+
+    @contextmanager
+    def _locked_journal(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, 'ab') as handle:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                yield handle
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r') as f:
+            payments = json.load(f)
+        return payments if isinstance(payments, dict) else {}
+
+    def _replay(self, index):
+        """Apply the complete journal lines past ``index.journal_offset``."""
+        with open(self.journal_path, 'rb') as f:
+            f.seek(index.journal_offset)
+            chunk = f.read()
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            try:
+                entry = json.loads(line)
+                payment_id = str(entry['payment_id'])
+                record = entry['record']
+            except (ValueError, KeyError, TypeError):
+                continue
+            if isinstance(record, dict):
+                index.replace(payment_id, record)
+        index.journal_offset += end
+
+    def _indexed(self, handle):
+        """Return the snapshot index with the journal replayed up to its end.
+
+        Must be called with the journal locked through ``handle``.
+        """
+        signature = _file_signature(self.path)
+        journal_size = os.fstat(handle.fileno()).st_size
+        cached = _journal_payment_cache.get(self.path)
+        if cached is None or cached.signature != signature or journal_size < cached.journal_offset:
+            _journal_payment_cache.pop(self.path, None)
+            cached = _PaymentIndex(self._read_snapshot(), signature)
+            _journal_payment_cache[self.path] = cached
+        if journal_size > cached.journal_offset:
+            self._replay(cached)
+        return cached
+
+    def _append(self, handle, index, payment_id, payment):
+        entry = {
+            'ts': _now_str(),
+            'payment_id': payment_id,
+            'status': payment.get('status'),
+            'record': payment,
+        }
+        line = (json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8')
+        if index is not None and os.fstat(handle.fileno()).st_size > index.journal_offset:
+            # Terminate a torn line left behind by a crash mid-append.
+            line = b'\n' + line
+        handle.write(line)
+        handle.flush()
+        os.fsync(handle.fileno())
+        if index is None:
+            _journal_payment_cache.pop(self.path, None)
+            return
+        index.replace(payment_id, payment)
+        index.journal_offset = os.fstat(handle.fileno()).st_size
+        self._schedule_compaction(index)
+
+    def _schedule_compaction(self, index):
+        if index.journal_offset < PAYMENT_JOURNAL_COMPACT_BYTES:
+            return
+        thread = _journal_compaction_threads.get(self.path)
+        if thread is not None and thread.is_alive():
+            return
+        thread = threading.Thread(
+            target=_compact_journal_in_background,
+            args=(self.path, self.journal_path),
+            name='payment-journal-compaction',
+            daemon=True,
+        )
+        _journal_compaction_threads[self.path] = thread
+        thread.start()
+
+    def compact(self):
+        """Write the replayed view as the new snapshot and truncate the journal.
+
+        Returns the number of journal bytes folded into the snapshot.
+        """
+        with self._locked_journal() as handle:
+            index = self._indexed(handle)
+            journal_size = os.fstat(handle.fileno()).st_size
+            if journal_size == 0:
+                return 0
+            _write_json_atomic(self.path, index.payments)
+            handle.truncate(0)
+            os.fsync(handle.fileno())
+            index.signature = _file_signature(self.path)
+            index.journal_offset = 0
+            return journal_size
+
+    def load_all(self):
+        try:
+            with self._locked_journal() as handle:
+                return copy.deepcopy(self._indexed(handle).payments)
+        except Exception:
+            return {}
+
+    def save_all(self, payments):
+        with self._locked_journal() as handle:
+            _journal_payment_cache.pop(self.path, None)
+            _write_json_atomic(self.path, payments)
+            handle.truncate(0)
+            os.fsync(handle.fileno())
+
+    def put(self, payment_id, data):
+        with self._locked_journal() as handle:
+            try:
+                index = self._indexed(handle)
+            except Exception:
+                index = None
+            self._append(handle, index, payment_id, copy.deepcopy(data))
+
+    def mutate(self, payment_id, mutator):
+        with self._locked_journal() as handle:
+            try:
+                index = self._indexed(handle)
+            except Exception:
+                return False
+            if payment_id not in index.payments:
                 return False
+            payment = copy.deepcopy(index.payments[payment_id])
+            if not mutator(payment):
+                return False
+            self._append(handle, index, payment_id, payment)
+            return True
+
+    def mutate_many(self, payment_ids, mutator):
+        """Apply ``mutator`` to each payment under one journal lock, one line per change."""
+        changed = set()
+        with self._locked_journal() as handle:
+            try:
+                index = self._indexed(handle)
+            except Exception:
+                return changed
+            for payment_id in payment_ids:
+                if payment_id not in index.payments or payment_id in changed:
+                    continue
+                payment = copy.deepcopy(index.payments[payment_id])
+                if mutator(payment_id, payment):
+                    self._append(handle, index, payment_id, payment)
+                    changed.add(payment_id)
+        return changed
+
+    def _lookup(self, select):
+        try:
+            with self._locked_journal() as handle:
+                index = self._indexed(handle)
+                return index.records(select(index))
         except Exception:
-            return False
+            return {}
+
+    def get(self, payment_id):
+        return self._lookup(lambda index: [payment_id]).get(payment_id)
+
+    def get_user_payments(self, user_id):
+        return self._lookup(lambda index: list(index.by_user.get(_user_key(user_id), {})))
+
+    def get_payments_by_status(self, statuses):
+        def select(index):
+            payment_ids = set()
+            for status in statuses:
+                payment_ids.update(index.by_status.get(str(status), {}))
+            return payment_ids
+
+        return self._lookup(select)
+
+    def get_payments_by_order_id(self, order_id):
+        return self._lookup(lambda index: index.order_matches(order_id))
+
+
+def _compact_journal_in_background(path, journal_path):
+    try:
+        with payment_lock:
+            JournalPaymentStore(path, journal_path).compact()
+    except Exception as e:
+        print(f"[payment_records] Payment journal compaction failed: {e}")
+
+
+def get_payment_store():
+    backend = get_payment_store_backend()
+    if backend == 'sqlite':
+        return SqlitePaymentStore(PAYMENTS_DB_FILE, json_path=PAYMENTS_FILE)
+    if backend == 'journal':
+        return JournalPaymentStore(PAYMENTS_FILE, PAYMENTS_JOURNAL_FILE)
+    return JsonPaymentStore(PAYMENTS_FILE)
+
+
+def _append_status_update(payment, status, previous_status, timestamp):
+    updates = payment.setdefault('updates', [])
+    if not isinstance(updates, list):
+        updates = []
+        payment['updates'] = updates
+    updates.append({
+        'status': status,
+        'timestamp': timestamp,
+        'previous_status': previous_status
+    })
+
+
+def load_payments():
+    with payment_lock:
+        return get_payment_store().load_all()
+
+def save_payments(payments):
+    with payment_lock:
+        get_payment_store().save_all(payments)
+
+def add_payment_record(payment_id, data):
+    # The store performs the read-modify-write under the lock
+    with payment_lock:
+        data['created_at'] = _now_str()
+        data['updates'] = []  # Add history tracking
+        get_payment_store().put(payment_id, data)
+
+def update_payment_status(payment_id, status):
+    def mutate(payment):
+        current_time = _now_str()
+        previous_status = payment.get('status', 'unknown')
+        payment['status'] = status
+        payment['updated_at'] = current_time
+        _append_status_update(payment, status, previous_status, current_time)
+        return True
+
+    with payment_lock:
+        return get_payment_store().mutate(payment_id, mutate)
+
+def apply_payment_status_transitions(transitions, expected_statuses=None):
+    """Apply ``{payment_id: status}`` in one store write; returns the changed ids.
 
-        if payment_id not in payments or not isinstance(fields, dict):
+    With ``expected_statuses`` only payments currently in one of those
+    statuses are changed, so a payment claimed meanwhile is left alone.
+    """
+    transitions = {str(payment_id): status for payment_id, status in transitions.items()}
+    if expected_statuses is not None:
+        expected_statuses = {str(s) for s in expected_statuses}
+
+    def mutate(payment_id, payment):
+        previous_status = payment.get('status', 'unknown')
+        if expected_statuses is not None and str(previous_status) not in expected_statuses:
             return False
+        status = transitions[str(payment_id)]
+        current_time = _now_str()
+        payment['status'] = status
+        payment['updated_at'] = current_time
+        _append_status_update(payment, status, previous_status, current_time)
+        return True
+
+    with payment_lock:
+        return get_payment_store().mutate_many(list(transitions), mutate)
+
+def update_payment_statuses(payment_ids, status, expected_statuses=None):
+    """Set ``status`` on many payments in one store write; returns the changed ids."""
+    return apply_payment_status_transitions(
+        {payment_id: status for payment_id in payment_ids},
+        expected_statuses=expected_statuses,
+    )
+
+def update_payment_record_fields(payment_id, fields, remove=()):
+    if not isinstance(fields, dict):
+        return False
+
+    def mutate(payment):
+        payment.update(fields)
+        for key in remove:
+            payment.pop(key, None)
+        payment['updated_at'] = _now_str()
+        return True
+
+    with payment_lock:
+        return get_payment_store().mutate(payment_id, mutate)
+
+def complete_payment_record(payment_id, fields, status='completed'):
+    if not isinstance(fields, dict):
+        return False
 
-        payment = payments[payment_id]
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    def mutate(payment):
+        current_time = _now_str()
         previous_status = payment.get('status', 'unknown')
         payment.update(fields)
         payment['status'] = status
         payment['updated_at'] = current_time
-
-        updates = payment.setdefault('updates', [])
-        if not isinstance(updates, list):
-            updates = []
-            payment['updates'] = updates
-        updates.append({
-            'status': status,
-            'timestamp': current_time,
-            'previous_status': previous_status
-        })
-
-        os.makedirs(os.path.dirname(PAYMENTS_FILE), exist_ok=True)
-        with open(PAYMENTS_FILE, 'w') as f:
-            json.dump(payments, f, indent=4)
+        _append_status_update(payment, status, previous_status, current_time)
         return True
 
-def claim_payment_for_processing(payment_id, allowed_statuses=None):
     with payment_lock:
-        try:
-            if os.path.exists(PAYMENTS_FILE):
-                with open(PAYMENTS_FILE, 'r') as f:
-                    payments = json.load(f)
-            else:
-                return False
-        except Exception:
-            return False
+        return get_payment_store().mutate(payment_id, mutate)
 
-        payment = payments.get(payment_id)
+def claim_payment_for_processing(payment_id, allowed_statuses=None):
+    if allowed_statuses is None:
+        allowed_statuses = {'pending'}
+    else:
+        allowed_statuses = {str(s) for s in allowed_statuses}
+
+    def mutate(payment):
         if not payment:
             return False
-
-        if allowed_statuses is None:
-            allowed_statuses = {'pending'}
-        else:
-            allowed_statuses = {str(s) for s in allowed_statuses}
-
         current_status = str(payment.get('status', ''))
         if current_status not in allowed_statuses:
             return False
-
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        update = {
-            'status': 'processing',
-            'timestamp': current_time,
-            'previous_status': current_status
-        }
+        current_time = _now_str()
         payment['status'] = 'processing'
         payment['updated_at'] = current_time
-        payment.setdefault('updates', []).append(update)
-
-        with open(PAYMENTS_FILE, 'w') as f:
-            json.dump(payments, f, indent=4)
+        _append_status_update(payment, 'processing', current_status, current_time)
         return True
 
+    with payment_lock:
+        return get_payment_store().mutate(payment_id, mutate)
+
 def get_payment_record(payment_id):
-    payments = load_payments()
-    return payments.get(payment_id)
+    with payment_lock:
+        return get_payment_store().get(payment_id)
 
 def get_user_payments(user_id):
-    payments = load_payments()
-    user_payments = {}
-    for payment_id, payment_data in payments.items():
-        if payment_data.get('user_id') == user_id:
-            user_payments[payment_id] = payment_data
-    return user_payments
+    with payment_lock:
+        return get_payment_store().get_user_payments(user_id)
+
+def get_payments_by_status(*statuses):
+    with payment_lock:
+        return get_payment_store().get_payments_by_status(statuses)
+
+def get_payment_by_order_id(order_id):
+    """Return ``(payment_id, record)`` for a gateway order id, or ``(None, None)``."""
+    if not order_id:
+        return None, None
+    with payment_lock:
+        matches = get_payment_store().get_payments_by_order_id(order_id)
+    for payment_id, record in matches.items():
+        return payment_id, record
+    return None, None
+
+
+def migrate_json_to_sqlite(json_path=None, db_path=None):
+    """Replace the SQLite payment store contents with ``payments.json``.
+
+    Returns the number of imported records.
+    """
+    json_path = json_path or PAYMENTS_FILE
+    db_path = db_path or PAYMENTS_DB_FILE
+    with payment_lock:
+        return SqlitePaymentStore(db_path).import_json(json_path)
+
+
+def export_payments_json(json_path=None, db_path=None):
+    """Write the SQLite payment store back to the ``payments.json`` layout.
+
+    Returns the number of exported records.
+    """
+    json_path = json_path or PAYMENTS_FILE
+    db_path = db_path or PAYMENTS_DB_FILE
+    with payment_lock:
+        payments = SqlitePaymentStore(db_path).load_all()
+        _write_json_atomic(json_path, payments)
+        return len(payments)
+
+
+def compact_payment_journal(json_path=None, journal_path=None):
+    """Fold the payment journal into ``payments.json`` and truncate it.
+
+    Returns the number of journal bytes folded into the snapshot.
+    """
+    json_path = json_path or PAYMENTS_FILE
+    journal_path = journal_path or PAYMENTS_JOURNAL_FILE
+    with payment_lock:
+        return JournalPaymentStore(json_path, journal_path).compact()
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'migrate':
+        print(f"Imported {migrate_json_to_sqlite()} payment records into {PAYMENTS_DB_FILE}")
+    elif command == 'export':
+        print(f"Exported {export_payments_json()} payment records to {PAYMENTS_FILE}")
+    elif command == 'compact':
+        print(f"Folded {compact_payment_journal()} journal bytes into {PAYMENTS_FILE}")
+    else:
+        print("Usage: payment_records.py migrate|export|compact")
+        sys.exit(1)
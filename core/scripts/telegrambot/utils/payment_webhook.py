@@ -0,0 +1,231 @@
+"""
+Embedded HTTP receiver for crypto gateway webhooks.
+
+When ``DIJIQ_PAYMENT_WEBHOOK_PORT`` is set, new invoices carry a callback URL
+(``DIJIQ_PAYMENT_WEBHOOK_URL``) and the gateway POSTs every status change to
+this receiver. A body whose ``sign`` verifies under the gateway's webhook
+signing scheme (``CryptoPayment.verify_webhook_sign``) is acknowledged right
+away and handed to ``process_payment_webhook`` on a small worker pool.
+Invoices created with a callback URL are marked ``webhook`` and the
+pending-payment poller checks them at a reduced rate (at least
+``CRYPTO_WEBHOOK_POLL_INTERVAL`` apart) as a safety net for lost webhooks;
+every other invoice keeps the full-rate, age-based schedule.
+
+Paid -> delivered latency is kept per confirmation source in in-memory
+histograms (``get_delivery_latency_histograms()``). For webhooks the clock
+starts at the invoice's ``paid_at``/``updated_at`` timestamp from the body,
+falling back to the arrival time when the gateway sends neither.
+"""
+
+import asyncio
+import datetime
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.payments import CryptoPayment
+
+try:
+    from aiohttp import web
+except ImportError:  # pragma: no cover - the receiver stays off without aiohttp
+    web = None
+
+
+LATENCY_BUCKETS_SECONDS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+_latency_lock = threading.Lock()
+_latency_histograms = {}
+
+_receiver = None
+_receiver_lock = threading.Lock()
+
+
+def _int_env(name, default, minimum=1):
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+def record_delivery_latency(source, seconds):
+    """Count one paid -> delivered latency for ``source`` ("webhook", "poll")."""
+    seconds = max(0.0, float(seconds))
+    with _latency_lock:
+        histogram = _latency_histograms.setdefault(source, {
+            "count": 0,
+            "sum": 0.0,
+            "max": 0.0,
+            "buckets": [0] * (len(LATENCY_BUCKETS_SECONDS) + 1),
+        })
+        histogram["count"] += 1
+        histogram["sum"] += seconds
+        histogram["max"] = max(histogram["max"], seconds)
+        index = len(LATENCY_BUCKETS_SECONDS)
+        for position, bound in enumerate(LATENCY_BUCKETS_SECONDS):
+            if seconds <= bound:
+                index = position
+                break
+        histogram["buckets"][index] += 1
+
+
+def get_delivery_latency_histograms() -> dict:
+    """Return ``{source: {"count", "sum", "max", "buckets"}}``.
+
+    ``buckets`` maps each upper bound in seconds (and ``"+Inf"``) to the
+    number of deliveries that took at most that long and more than the
+    previous bound.
+    """
+    bounds = [*LATENCY_BUCKETS_SECONDS, "+Inf"]
+    with _latency_lock:
+        return {
+            source: {
+                "count": histogram["count"],
+                "sum": histogram["sum"],
+                "max": histogram["max"],
+                "buckets": dict(zip(bounds, histogram["buckets"])),
+            }
+            for source, histogram in _latency_histograms.items()
+        }
+
+
+def reset_delivery_latency_histograms():
+    with _latency_lock:
+        _latency_histograms.clear()
+
+
+def _webhook_paid_at(payload, received_at):
+    """Epoch seconds the invoice was paid or last updated, else ``received_at``."""
+    for field in ("paid_at", "updated_at"):
+        value = payload.get(field)
+        if not value:
+            continue
+        try:
+            stamp = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        return min(stamp.timestamp(), received_at)
+    return received_at
+
+
+def _process_payment_webhook(data):
+    from utils.purchase_plan import process_payment_webhook
+    return process_payment_webhook(data)
+
+
+class PaymentWebhookReceiver:
+    """aiohttp server on its own event loop thread.
+
+    The handler only parses and verifies the body; processing (panel calls,
+    Telegram messages) runs on ``workers`` threads so a slow delivery never
+    holds up the gateway's request.
+    """
+
+    def __init__(self, host="0.0.0.0", port=0, path="/payments/crypto/webhook", handler=None, workers=2, payment=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.handler = handler or _process_payment_webhook
+        self.payment = payment or CryptoPayment()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dijiq-payment-webhook")
+        self._loop = None
+        self._thread = None
+        self._runner = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="dijiq-payment-webhook-http", daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        try:
+            app = web.Application()
+            app.router.add_post(self.path, self._handle)
+            self._runner = web.AppRunner(app, access_log=None)
+            loop.run_until_complete(self._runner.setup())
+            site = web.TCPSite(self._runner, self.host, self.port)
+            loop.run_until_complete(site.start())
+            self.port = self._runner.addresses[0][1]
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            loop.close()
+            return
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(self._runner.cleanup())
+            loop.close()
+
+    async def _handle(self, request):
+        received_at = time.time()
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.json_response({"error": "invalid JSON"}, status=400)
+        if not isinstance(data, dict):
+            return web.json_response({"error": "invalid payload"}, status=400)
+        if not self.payment.verify_webhook_sign(data):
+            print(f"[payment_webhook] Rejected webhook with bad signature from {request.remote}")
+            return web.json_response({"error": "invalid sign"}, status=401)
+        payload = {key: value for key, value in data.items() if key != "sign"}
+        self.executor.submit(self._dispatch, payload, _webhook_paid_at(payload, received_at))
+        return web.json_response({"state": 0})
+
+    def _dispatch(self, payload, paid_at):
+        try:
+            delivered = self.handler(payload)
+        except Exception as e:
+            print(f"[payment_webhook] Processing webhook for {payload.get('uuid') or payload.get('order_id')} failed: {e}")
+            return
+        if delivered:
+            record_delivery_latency("webhook", time.time() - paid_at)
+
+    def close(self):
+        loop, self._loop = self._loop, None
+        if loop is not None and loop.is_running():
+            loop.call_soon_threadsafe(loop.stop)
+        if self._thread is not None:
+            self._thread.join(5)
+        self.executor.shutdown(wait=True)
+
+
+def start_payment_webhook_receiver():
+    """Start the receiver when ``DIJIQ_PAYMENT_WEBHOOK_PORT`` is set; returns it or ``None``."""
+    global _receiver
+    port = _int_env("DIJIQ_PAYMENT_WEBHOOK_PORT", 0)
+    if not port:
+        return None
+    if web is None:
+        print("[payment_webhook] aiohttp is not installed; relying on polling for crypto payments")
+        return None
+    with _receiver_lock:
+        if _receiver is None:
+            _receiver = PaymentWebhookReceiver(
+                host=os.getenv("DIJIQ_PAYMENT_WEBHOOK_HOST", "0.0.0.0"),
+                port=port,
+                path=os.getenv("DIJIQ_PAYMENT_WEBHOOK_PATH", "/payments/crypto/webhook"),
+                workers=_int_env("DIJIQ_PAYMENT_WEBHOOK_WORKERS", 2),
+            )
+        return _receiver.start()
+
+
+def stop_payment_webhook_receiver():
+    global _receiver
+    with _receiver_lock:
+        if _receiver is not None:
+            _receiver.close()
+            _receiver = None
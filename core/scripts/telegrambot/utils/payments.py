@@ -1,10 +1,15 @@
 import base64
+import datetime
+import hmac
 import json
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from hashlib import md5
 import requests
 import os
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 load_dotenv()
 
@@ -21,11 +26,79 @@ def get_crypto_api_timeout_seconds():
     return _float_env("DIJIQ_CRYPTO_API_TIMEOUT_SECONDS", 10)
 
 
+def _int_env(name, default, minimum=1):
+    try:
+        value = int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+    return value if value >= minimum else default
+
+
+_session = None
+_session_lock = threading.Lock()
+
+# Gateway invoice status -> payment-store status for invoices that can no
+# longer be paid.
+GATEWAY_FINAL_STATUSES = {
+    'cancel': 'expired',
+    'fail': 'failed',
+    'system_fail': 'failed',
+}
+
+# The history window opens this long before the oldest local ``created_at``
+# so clock and timezone differences with the gateway cannot hide an invoice.
+HISTORY_WINDOW_SLACK = datetime.timedelta(days=1)
+
+# Set once the gateway answers the history endpoint with 404/405; every later
+# reconciliation goes straight to per-invoice checks.
+_history_unavailable = False
+
+
+def get_payment_webhook_url():
+    """Public callback URL of the embedded webhook receiver, or ``None`` when it is off.
+
+    The receiver listens on ``DIJIQ_PAYMENT_WEBHOOK_PORT``; ``DIJIQ_PAYMENT_WEBHOOK_URL``
+    is the address the gateway can reach it on (usually through a reverse proxy).
+    """
+    if not _int_env("DIJIQ_PAYMENT_WEBHOOK_PORT", 0):
+        return None
+    return os.getenv("DIJIQ_PAYMENT_WEBHOOK_URL", "").strip() or None
+
+
+def payment_status_of(result):
+    """Lower-cased gateway status of an invoice ``result``/history item, or ``None``."""
+    if not isinstance(result, dict):
+        return None
+    status = result.get('status') or result.get('payment_status') or result.get('paymentStatus')
+    return str(status).lower() if status else None
+
+
+def get_crypto_session():
+    """Return the process-wide keep-alive session for the payment gateway.
+
+    Every gateway call goes to one host, so one connection pool sized for the
+    pending-invoice poller (``DIJIQ_CRYPTO_POLL_WORKERS``) is shared by all
+    threads.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = _int_env("DIJIQ_CRYPTO_POLL_WORKERS", 8)
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
 class CryptoPayment:
-    def __init__(self):
+    def __init__(self, session=None):
         self.merchant_id = os.getenv('CRYPTO_MERCHANT_ID')
         self.payment_api_key = os.getenv('CRYPTO_API_KEY')
         self.base_url = "https://api.heleket.com/v1/payment"
+        self.session = session or get_crypto_session()
+        self.callback_url = get_payment_webhook_url()
 
     def _check_credentials(self):
         if not self.merchant_id or not self.payment_api_key:
@@ -38,6 +111,26 @@ class CryptoPayment:
         ).decode("utf-8")
         return md5(f"{encoded_data}{self.payment_api_key}".encode("utf-8")).hexdigest()
 
+    def _generate_webhook_sign(self, payload):
+        """Sign ``payload`` the way the gateway signs its webhooks.
+
+        The gateway hashes PHP's ``json_encode($data, JSON_UNESCAPED_UNICODE)``:
+        compact separators, raw unicode and ``/`` escaped as ``\\/``.
+        """
+        encoded = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).replace("/", "\\/")
+        encoded_data = base64.b64encode(encoded.encode("utf-8")).decode("utf-8")
+        return md5(f"{encoded_data}{self.payment_api_key}".encode("utf-8")).hexdigest()
+
+    def verify_webhook_sign(self, data):
+        """Check a webhook body's ``sign`` field against ``_generate_webhook_sign``."""
+        if not self._check_credentials() or not isinstance(data, dict):
+            return False
+        sign = data.get("sign")
+        if not isinstance(sign, str):
+            return False
+        payload = {key: value for key, value in data.items() if key != "sign"}
+        return hmac.compare_digest(sign, self._generate_webhook_sign(payload))
+
     def create_payment(self, amount, plan_gb, user_id, currency="USD", network=None, to_currency=None, url_return=None, url_success=None, url_callback=None, is_payment_multiple=False, lifetime=3600, additional_data=None, subtract=None, accuracy_payment_percent=None, currencies=None, except_currencies=None, course_source=None, from_referral_code=None, discount_percent=None, is_refresh=False):
         if not self._check_credentials():
             return {"error": "Payment credentials not configured"}
@@ -50,6 +143,8 @@ class CryptoPayment:
             "is_payment_multiple": is_payment_multiple,
             "lifetime": lifetime
         }
+        if url_callback is None:
+            url_callback = self.callback_url
         # Optional parameters
         if network:
             payload["network"] = network
@@ -93,7 +188,7 @@ class CryptoPayment:
                 "sign": self._generate_sign(payload)
             }
 
-            response = requests.post(
+            response = self.session.post(
                 self.base_url,  # Fixed endpoint
                 json=payload,
                 headers=headers,
@@ -124,7 +219,7 @@ class CryptoPayment:
             # the info endpoint is exposed as /info, so call {base_url}/info
             info_url = f"{self.base_url}/info"
 
-            response = requests.post(
+            response = self.session.post(
                 info_url,
                 json=payload,
                 headers=headers,
@@ -137,3 +232,94 @@ class CryptoPayment:
             return {"error": f"API Error: {response.status_code} - {response.text}", "status_code": response.status_code}
         except Exception as e:
             return {"error": f"Request Error: {str(e)}"}
+
+    def list_payments(self, date_from=None, date_to=None, cursor=None):
+        """Fetch one page of the merchant's payment history."""
+        if not self._check_credentials():
+            return {"error": "Payment credentials not configured"}
+
+        payload = {}
+        if date_from is not None:
+            payload["date_from"] = _format_gateway_time(date_from)
+        if date_to is not None:
+            payload["date_to"] = _format_gateway_time(date_to)
+
+        try:
+            headers = {
+                "merchant": self.merchant_id,
+                "sign": self._generate_sign(payload)
+            }
+
+            response = self.session.post(
+                f"{self.base_url}/list",
+                json=payload,
+                headers=headers,
+                params={"cursor": cursor} if cursor else None,
+                timeout=get_crypto_api_timeout_seconds(),
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            return {"error": f"API Error: {response.status_code} - {response.text}", "status_code": response.status_code}
+        except Exception as e:
+            return {"error": f"Request Error: {str(e)}"}
+
+    def check_payment_statuses(self, payment_ids, since=None, max_workers=None):
+        """Return ``{payment_id: status}`` for many invoices in as few calls as possible.
+
+        The history endpoint is paged from ``since`` (the oldest invoice's
+        creation time) until every invoice is found. Invoices the history did
+        not cover - or all of them, when the gateway has no history endpoint -
+        are checked one by one on up to ``max_workers`` threads. Invoices whose
+        status could not be fetched are left out of the result.
+        """
+        payment_ids = [str(payment_id) for payment_id in payment_ids]
+        statuses = {}
+        if payment_ids and not _history_unavailable:
+            statuses.update(self._statuses_from_history(set(payment_ids), since))
+
+        remaining = [payment_id for payment_id in payment_ids if payment_id not in statuses]
+        if not remaining:
+            return statuses
+        workers = min(max_workers or _int_env("DIJIQ_CRYPTO_POLL_WORKERS", 8), len(remaining))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dijiq-crypto-status") as executor:
+            for payment_id, response in zip(remaining, executor.map(self.check_payment_status, remaining)):
+                if "error" in response:
+                    continue
+                status = payment_status_of(response.get('result'))
+                if status:
+                    statuses[payment_id] = status
+        return statuses
+
+    def _statuses_from_history(self, wanted, since):
+        global _history_unavailable
+        date_from = since - HISTORY_WINDOW_SLACK if since is not None else None
+        max_pages = _int_env("DIJIQ_CRYPTO_HISTORY_MAX_PAGES", 20)
+        found = {}
+        cursor = None
+        for _ in range(max_pages):
+            response = self.list_payments(date_from=date_from, cursor=cursor)
+            if "error" in response:
+                if response.get("status_code") in (404, 405):
+                    _history_unavailable = True
+                break
+            result = response.get('result') or {}
+            for item in result.get('items') or []:
+                if not isinstance(item, dict):
+                    continue
+                payment_id = str(item.get('uuid'))
+                status = payment_status_of(item)
+                if payment_id in wanted and status:
+                    found[payment_id] = status
+            if len(found) == len(wanted):
+                break
+            cursor = (result.get('paginate') or {}).get('nextCursor')
+            if not cursor:
+                break
+        return found
+
+
+def _format_gateway_time(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value)
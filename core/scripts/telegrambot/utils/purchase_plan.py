@@ -5,12 +5,16 @@ from telebot import types
 from utils.command import bot, ADMIN_USER_IDS, is_admin
 from utils.common import create_main_markup
 from utils.edit_plans import load_plans
-from utils.payments import CryptoPayment
+from utils.payments import CryptoPayment, GATEWAY_FINAL_STATUSES
+from utils.payment_webhook import record_delivery_latency
 from utils.payment_records import (
     add_payment_record,
     update_payment_status,
     get_payment_record,
     load_payments,
+    get_payments_by_status,
+    get_payment_by_order_id,
+    apply_payment_status_transitions,
     claim_payment_for_processing,
     get_user_payments,
     update_payment_record_fields,
@@ -39,6 +43,7 @@ import qrcode
 import io
 import os
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal, ROUND_HALF_UP
 from dotenv import load_dotenv
@@ -73,6 +78,17 @@ PAYMENT_JOB_EXECUTOR = ThreadPoolExecutor(
     max_workers=_int_env("DIJIQ_PAYMENT_JOB_WORKERS", 2),
     thread_name_prefix="dijiq-payment",
 )
+CRYPTO_POLL_WORKERS = _int_env("DIJIQ_CRYPTO_POLL_WORKERS", 8)
+CRYPTO_PAYMENT_MAX_AGE = datetime.timedelta(hours=24)
+CRYPTO_POLL_BACKOFF_FACTOR = 0.25
+CRYPTO_POLL_MAX_INTERVAL = datetime.timedelta(hours=1)
+# Invoices created with a webhook callback wait at least this long between
+# checks; polling them is only a safety net for lost webhooks.
+CRYPTO_WEBHOOK_POLL_INTERVAL = datetime.timedelta(seconds=_int_env("DIJIQ_CRYPTO_WEBHOOK_POLL_SECONDS", 600))
+# payment_id -> earliest datetime its invoice is checked again.
+_crypto_poll_next_check = {}
+# payment_id -> last datetime the gateway reported its invoice unpaid.
+_crypto_poll_last_unpaid = {}
 
 
 def apply_crypto_discount(amount):
@@ -953,6 +969,7 @@ def _handle_customer_renewal_crypto(call, offer):
         'order_id': gateway_order_id,
         'status': 'pending',
         'payment_method': 'Crypto',
+        'webhook': bool(payment_handler.callback_url),
         **customer_payment_metadata(offer),
         **discount_metadata,
     }
@@ -1115,6 +1132,7 @@ def handle_crypto_payment(call, plan_gb, answer_callback=True):
                 'order_id': gateway_order_id,
                 'status': 'pending',
                 'payment_method': 'Crypto',
+                'webhook': bool(payment_handler.callback_url),
                 **discount_metadata,
             }
             add_payment_record(payment_id, payment_record)
@@ -1803,16 +1821,11 @@ def handle_check_payment(call):
 def process_payment_webhook(request_data):
     try:
         status = request_data.get('status') or request_data.get('payment_status') or request_data.get('paymentStatus')
-        payments = load_payments()
         record_key = None
         if request_data.get('uuid'):
             record_key = request_data.get('uuid')
         elif request_data.get('order_id'):
-            incoming_order = request_data.get('order_id')
-            for k, v in payments.items():
-                if v.get('order_id') == incoming_order or v.get('payment_id') == incoming_order:
-                    record_key = k
-                    break
+            record_key, _record = get_payment_by_order_id(request_data.get('order_id'))
         if not record_key:
             return False
         if status and status.lower() == 'paid':
@@ -1937,158 +1950,237 @@ def process_payment_webhook(request_data):
         print(f"Error processing webhook: {str(e)}")
         return False
 
-def check_pending_payments():
+def _parse_payment_created_at(value):
     try:
-        payments = load_payments()
-        payment_handler = CryptoPayment()
-        
-        for payment_id, record in payments.items():
-            if record.get('status') == 'pending':
-                # Check if payment is not too old (e.g., > 24 hours) — mark as expired
-                created_at_str = record.get('created_at')
-                if created_at_str:
-                    try:
-                        created_at = datetime.datetime.strptime(created_at_str, '%Y-%m-%d %H:%M:%S')
-                        if datetime.datetime.now() - created_at > datetime.timedelta(hours=24):
-                            update_payment_status(payment_id, 'expired')
-                            continue
-                    except ValueError:
-                        pass
+        return datetime.datetime.strptime(str(value), '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def _crypto_poll_interval(age, webhook=False):
+    """How long to wait before checking an invoice of ``age`` again.
+
+    The interval grows with the invoice's age, so invoices opened in the last
+    few minutes are checked on every pass and day-old ones roughly hourly.
+    Invoices the gateway also reports through the webhook receiver wait at
+    least ``CRYPTO_WEBHOOK_POLL_INTERVAL``.
+    """
+    interval = min(CRYPTO_POLL_MAX_INTERVAL, max(datetime.timedelta(0), age) * CRYPTO_POLL_BACKOFF_FACTOR)
+    if webhook:
+        return max(interval, CRYPTO_WEBHOOK_POLL_INTERVAL)
+    return interval
+
+
+def _select_due_crypto_payments(pending, now):
+    """Split pending payments into ``(due, stale)``.
+
+    ``due`` is ``(payment_id, record, created_at)`` for invoices whose backoff
+    has elapsed, freshest first; ``stale`` lists invoices past
+    ``CRYPTO_PAYMENT_MAX_AGE`` that should be expired.
+    """
+    due = []
+    stale = []
+    for payment_id, record in pending.items():
+        if not isinstance(record, dict):
+            continue
+        created_at = _parse_payment_created_at(record.get('created_at'))
+        if created_at is not None and now - created_at > CRYPTO_PAYMENT_MAX_AGE:
+            stale.append(payment_id)
+            continue
+        next_check = _crypto_poll_next_check.get(payment_id)
+        if next_check is None and record.get('webhook') and created_at is not None:
+            next_check = created_at + CRYPTO_WEBHOOK_POLL_INTERVAL
+        if next_check is not None and next_check > now:
+            continue
+        due.append((payment_id, record, created_at or now))
 
-                # Check status
-                try:
-                    response = payment_handler.check_payment_status(payment_id)
-                    if "error" in response:
-                        continue
-                        
-                    result = response.get('result', {})
-                    status = result.get('status') or result.get('payment_status') or result.get('paymentStatus')
-                    
-                    if status and status.lower() == 'paid':
-                        if not claim_payment_for_processing(payment_id, allowed_statuses={'pending'}):
-                            continue
-                        record = get_payment_record(payment_id) or record
-                        # Process payment
-                        user_id = record.get('user_id')
-                        plan_gb = record.get('plan_gb')
-                        
-                        if record.get('type') == 'settlement' or plan_gb == 'Settlement':
-                            success, credited_amount, remaining_debt = _apply_reseller_settlement_payment(user_id, record)
-                            if not success:
-                                _release_processing_for_retry(payment_id, 'pending', "settlement credit failed")
-                                continue
-                            update_payment_status(payment_id, 'completed')
-                            _send_reseller_settlement_admin_notification(
-                                user_id,
-                                payment_id,
-                                record,
-                                credited_amount=credited_amount,
-                                payment_method="Crypto",
-                            )
-                            try:
-                                user_language = get_user_language(user_id)
-                                bot.send_message(
-                                    user_id,
-                                    _settlement_approved_message(user_language, user_id, credited_amount, remaining_debt),
-                                    parse_mode="Markdown"
-                                )
-                            except:
-                                pass
-                            continue
-
-                        if record.get('type') == 'renewal':
-                            telegram_username = None
-                            try:
-                                chat = bot.get_chat(user_id)
-                                telegram_username = chat.username
-                            except:
-                                pass
-                            _process_customer_renewal_payment(
-                                payment_id,
-                                record,
-                                notify_chat_id=user_id,
-                                payment_method="Crypto",
-                                telegram_username=telegram_username,
-                            )
-                            continue
-
-                        days = record.get('days')
-                        price = record.get('price')
-                        
-                        unlimited = record.get('unlimited')
-                        if unlimited is None:
-                            plans = load_plans()
-                            if plan_gb in plans:
-                                unlimited = plans[plan_gb].get('unlimited', False)
-                            else:
-                                unlimited = False
-                        
-                        api_client = APIClient()
-                        username, add_result, api_client = create_sale_user_with_note(
-                            api_client,
-                            user_id,
-                            plan_gb,
-                            days,
-                            unlimited,
-                        )
-                        
-                        if add_result:
-                            if not _complete_sale_payment_or_notify(payment_id, user_id, username, api_client):
-                                continue
-                            telegram_username = None
-                            try:
-                                chat = bot.get_chat(user_id)
-                                telegram_username = chat.username
-                            except:
-                                pass
-                            send_admin_payment_notification(
-                                user_id,
-                                username,
-                                plan_gb,
-                                price,
-                                payment_id,
-                                "Crypto",
-                                telegram_username=telegram_username,
-                                server_name=getattr(api_client, 'server_name', None),
-                                server_id=getattr(api_client, 'server_id', None),
-                            )
-                            add_referral_reward(user_id, price)
-                            user_uri_data = api_client.get_user_uri(username)
-
-                            user_language = get_user_language(user_id)
-                            
-                            if user_uri_data and 'normal_sub' in user_uri_data:
-                                sub_url = user_uri_data['normal_sub']
-                                ipv4_url = user_uri_data.get('ipv4', '')
-                                ipv4_info = f"IPv4 URL: `{ipv4_url}`\n\n" if ipv4_url else ""
-
-                                qr = qrcode.make(ipv4_url or sub_url)
-                                bio = io.BytesIO()
-                                qr.save(bio, 'PNG')
-                                bio.seek(0)
-                                success_message = get_message_text(user_language, "payment_completed").format(plan_gb=plan_gb, username=username, sub_url=sub_url, ipv4_info=ipv4_info)
-                                try:
-                                    bot.send_photo(
-                                        user_id,
-                                        photo=bio,
-                                        caption=success_message,
-                                        parse_mode="Markdown"
-                                    )
-                                except Exception as e:
-                                    print(f"Failed to send success message to user {user_id}: {e}")
-                            else:
-                                try:
-                                    bot.send_message(
-                                        user_id,
-                                        get_message_text(user_language, "payment_completed_no_url"),
-                                        parse_mode="Markdown"
-                                    )
-                                except Exception as e:
-                                    print(f"Failed to send success message to user {user_id}: {e}")
-                        else:
-                            _record_crypto_sale_creation_failure(payment_id, username=username, api_client=api_client)
-                except Exception as e:
-                    print(f"Error checking pending payment {payment_id}: {e}")
+    for schedule in (_crypto_poll_next_check, _crypto_poll_last_unpaid):
+        for payment_id in list(schedule):
+            if payment_id not in pending:
+                schedule.pop(payment_id, None)
+    due.sort(key=lambda item: item[2], reverse=True)
+    return due, stale
+
+
+def _process_paid_crypto_payment(payment_id, record):
+    """Claim and fulfil a paid crypto invoice; ``True`` once the buyer has been served."""
+    if not claim_payment_for_processing(payment_id, allowed_statuses={'pending'}):
+        return False
+    record = get_payment_record(payment_id) or record
+    # Process payment
+    user_id = record.get('user_id')
+    plan_gb = record.get('plan_gb')
+
+    if record.get('type') == 'settlement' or plan_gb == 'Settlement':
+        success, credited_amount, remaining_debt = _apply_reseller_settlement_payment(user_id, record)
+        if not success:
+            _release_processing_for_retry(payment_id, 'pending', "settlement credit failed")
+            return False
+        update_payment_status(payment_id, 'completed')
+        _send_reseller_settlement_admin_notification(
+            user_id,
+            payment_id,
+            record,
+            credited_amount=credited_amount,
+            payment_method="Crypto",
+        )
+        try:
+            user_language = get_user_language(user_id)
+            bot.send_message(
+                user_id,
+                _settlement_approved_message(user_language, user_id, credited_amount, remaining_debt),
+                parse_mode="Markdown"
+            )
+        except:
+            pass
+        return True
+
+    if record.get('type') == 'renewal':
+        telegram_username = None
+        try:
+            chat = bot.get_chat(user_id)
+            telegram_username = chat.username
+        except:
+            pass
+        return _process_customer_renewal_payment(
+            payment_id,
+            record,
+            notify_chat_id=user_id,
+            payment_method="Crypto",
+            telegram_username=telegram_username,
+        )
+
+    days = record.get('days')
+    price = record.get('price')
+
+    unlimited = record.get('unlimited')
+    if unlimited is None:
+        plans = load_plans()
+        if plan_gb in plans:
+            unlimited = plans[plan_gb].get('unlimited', False)
+        else:
+            unlimited = False
+
+    api_client = APIClient()
+    username, add_result, api_client = create_sale_user_with_note(
+        api_client,
+        user_id,
+        plan_gb,
+        days,
+        unlimited,
+    )
+
+    if add_result:
+        if not _complete_sale_payment_or_notify(payment_id, user_id, username, api_client):
+            return False
+        telegram_username = None
+        try:
+            chat = bot.get_chat(user_id)
+            telegram_username = chat.username
+        except:
+            pass
+        send_admin_payment_notification(
+            user_id,
+            username,
+            plan_gb,
+            price,
+            payment_id,
+            "Crypto",
+            telegram_username=telegram_username,
+            server_name=getattr(api_client, 'server_name', None),
+            server_id=getattr(api_client, 'server_id', None),
+        )
+        add_referral_reward(user_id, price)
+        user_uri_data = api_client.get_user_uri(username)
+
+        user_language = get_user_language(user_id)
+
+        if user_uri_data and 'normal_sub' in user_uri_data:
+            sub_url = user_uri_data['normal_sub']
+            ipv4_url = user_uri_data.get('ipv4', '')
+            ipv4_info = f"IPv4 URL: `{ipv4_url}`\n\n" if ipv4_url else ""
+
+            qr = qrcode.make(ipv4_url or sub_url)
+            bio = io.BytesIO()
+            qr.save(bio, 'PNG')
+            bio.seek(0)
+            success_message = get_message_text(user_language, "payment_completed").format(plan_gb=plan_gb, username=username, sub_url=sub_url, ipv4_info=ipv4_info)
+            try:
+                bot.send_photo(
+                    user_id,
+                    photo=bio,
+                    caption=success_message,
+                    parse_mode="Markdown"
+                )
+            except Exception as e:
+                print(f"Failed to send success message to user {user_id}: {e}")
+        else:
+            try:
+                bot.send_message(
+                    user_id,
+                    get_message_text(user_language, "payment_completed_no_url"),
+                    parse_mode="Markdown"
+                )
+            except Exception as e:
+                print(f"Failed to send success message to user {user_id}: {e}")
+        return True
+    _record_crypto_sale_creation_failure(payment_id, username=username, api_client=api_client)
+    return False
+
+
+def poll_pending_crypto_payments(now=None):
+    """Reconcile due crypto invoices with the gateway in one pass.
+
+    Statuses for every due invoice come from ``CryptoPayment.check_payment_statuses``
+    (the gateway's history endpoint, or at most ``CRYPTO_POLL_WORKERS``
+    concurrent checks). Stale invoices and invoices the gateway reports as
+    cancelled or failed are moved in one store write; paid invoices are then
+    processed freshest first.
+
+    A delivery's "poll" latency is measured from the last pass that saw the
+    invoice unpaid (or its creation), so it is an upper bound.
+    """
+    started = time.monotonic()
+    now = now or datetime.datetime.now()
+    due, stale = _select_due_crypto_payments(get_payments_by_status('pending'), now)
+    transitions = {payment_id: 'expired' for payment_id in stale}
+    paid = []
+    if due:
+        statuses = CryptoPayment().check_payment_statuses(
+            [payment_id for payment_id, _record, _created_at in due],
+            since=min(created_at for _payment_id, _record, created_at in due),
+            max_workers=CRYPTO_POLL_WORKERS,
+        )
+        for payment_id, record, created_at in due:
+            _crypto_poll_next_check[payment_id] = now + _crypto_poll_interval(now - created_at, bool(record.get('webhook')))
+            status = statuses.get(payment_id)
+            if status == 'paid':
+                paid.append((payment_id, record, _crypto_poll_last_unpaid.get(payment_id, created_at)))
+            elif status in GATEWAY_FINAL_STATUSES:
+                transitions[payment_id] = GATEWAY_FINAL_STATUSES[status]
+            elif status is not None:
+                _crypto_poll_last_unpaid[payment_id] = now
+
+    if transitions:
+        apply_payment_status_transitions(transitions, expected_statuses={'pending'})
+        for payment_id in transitions:
+            _crypto_poll_next_check.pop(payment_id, None)
+            _crypto_poll_last_unpaid.pop(payment_id, None)
+
+    for payment_id, record, unpaid_at in paid:
+        try:
+            if _process_paid_crypto_payment(payment_id, record):
+                record_delivery_latency(
+                    "poll",
+                    (now - unpaid_at).total_seconds() + (time.monotonic() - started),
+                )
+        except Exception as e:
+            print(f"Error checking pending payment {payment_id}: {e}")
+
+
+def check_pending_payments():
+    try:
+        poll_pending_crypto_payments()
 
         # Also run reseller debt reminders/escalations on the same monitoring cycle.
         debt_events = evaluate_reseller_debt_policies()
@@ -1,10 +1,10 @@
-import json
 import os
 import threading
 import uuid
 from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
 from dotenv import load_dotenv
+from utils import json_store
 
 
 TELEGRAM_ENV_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '.env'))
@@ -148,21 +148,13 @@ def get_card_number_for_receipt_type(receipt_type):
 
 def load_checker_settlements():
     with checker_settlement_lock:
-        try:
-            if os.path.exists(CHECKER_SETTLEMENTS_FILE):
-                with open(CHECKER_SETTLEMENTS_FILE, 'r') as f:
-                    data = json.load(f)
-                    return data if isinstance(data, list) else []
-        except Exception:
-            pass
-        return []
+        data = json_store.load(CHECKER_SETTLEMENTS_FILE, [])
+        return data if isinstance(data, list) else []
 
 
 def save_checker_settlements(settlements):
     with checker_settlement_lock:
-        os.makedirs(os.path.dirname(CHECKER_SETTLEMENTS_FILE), exist_ok=True)
-        with open(CHECKER_SETTLEMENTS_FILE, 'w') as f:
-            json.dump(settlements, f, indent=4)
+        json_store.write(CHECKER_SETTLEMENTS_FILE, settlements)
 
 
 def add_checker_settlement(amount, admin_user_id, stats_snapshot, checker_id=None, open_account_amount=None):
@@ -1,10 +1,9 @@
-import json
-import os
 import threading
 import random
 import string
 import uuid
 from datetime import datetime
+from utils import json_store
 
 REFERRALS_FILE = '/etc/dijiq/core/scripts/telegrambot/referrals.json'
 referral_lock = threading.RLock()
@@ -49,20 +48,14 @@ def _safe_int(value, default=0):
 
 def load_referrals():
     with referral_lock:
-        try:
-            if os.path.exists(REFERRALS_FILE):
-                with open(REFERRALS_FILE, 'r') as f:
-                    data = json.load(f)
-                    return _ensure_referrals_shape(data)
-        except Exception:
-            pass
+        data = json_store.load(REFERRALS_FILE)
+        if isinstance(data, dict):
+            return _ensure_referrals_shape(data)
         return _default_referrals_data()
 
 def save_referrals(data):
     with referral_lock:
-        os.makedirs(os.path.dirname(REFERRALS_FILE), exist_ok=True)
-        with open(REFERRALS_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        json_store.write(REFERRALS_FILE, data)
 
 def generate_unique_code():
     chars = string.ascii_letters + string.digits
@@ -288,16 +281,13 @@ def mark_withdrawal_request_paid(request_id, admin_user_id):
 
 def _get_invitee_payments(invitee_user_id):
     try:
-        from utils.payment_records import load_payments
-        payments = load_payments()
+        from utils.payment_records import get_user_payments
+        payments = get_user_payments(invitee_user_id)
     except Exception:
         payments = {}
 
     invitee_payments = []
     for payment_id, payment_data in payments.items():
-        if str(payment_data.get("user_id")) != str(invitee_user_id):
-            continue
-
         invitee_payments.append({
             "payment_id": payment_id,
             "status": payment_data.get("status"),
@@ -1,10 +1,10 @@
 import hashlib
-import json
-import os
+from collections.abc import Mapping
 from datetime import datetime, timedelta
 
+from utils import json_store, reseller_store
+
 
-PAYMENTS_FILE = '/etc/dijiq/core/scripts/telegrambot/payments.json'
 RESELLERS_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.json'
 STATE_FILE = '/etc/dijiq/core/scripts/telegrambot/expired_user_cleanup.json'
 
@@ -15,20 +15,25 @@ DELETE_RESULTS = {'deleted', 'already_missing'}
 
 
 def _load_json_file(path, default):
+    return json_store.load(path, default)
+
+
+def _save_json_file(path, data):
+    json_store.write(path, data)
+
+
+def _load_reseller_record(reseller_id):
     try:
-        if os.path.exists(path):
-            with open(path, 'r') as f:
-                data = json.load(f)
-                return data if data is not None else default
+        record = reseller_store.get_reseller_store(RESELLERS_FILE).get(reseller_id)
     except Exception:
-        pass
-    return default
+        return {}
+    return record if isinstance(record, dict) else {}
 
 
-def _save_json_file(path, data):
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w') as f:
-        json.dump(data, f, indent=4)
+def _load_user_payment_records(user_id):
+    from utils.payment_records import get_user_payments
+
+    return get_user_payments(user_id)
 
 
 def _safe_int(value, default=None):
@@ -81,7 +86,7 @@ def _parse_account_creation_time(value):
 
 
 def _expiration_deadline(user_data):
-    if not isinstance(user_data, dict):
+    if not isinstance(user_data, Mapping):
         return None
     expiration_days = _safe_int(user_data.get('expiration_days'))
     created_at = _parse_account_creation_time(user_data.get('account_creation_date'))
@@ -157,7 +162,7 @@ def expected_after_state(plan_gb, days):
 
 
 def is_user_expired(user_data, now=None):
-    if not isinstance(user_data, dict):
+    if not isinstance(user_data, Mapping):
         return False
     if not bool(user_data.get('blocked', False)):
         return False
@@ -316,7 +321,7 @@ def _build_offer(record, source, username, server_id, api_client, user_data, pla
 
 
 def _matching_customer_records(user_id, username=None, server_id=None, payments=None):
-    payments = payments if payments is not None else _load_json_file(PAYMENTS_FILE, {})
+    payments = payments if payments is not None else _load_user_payment_records(user_id)
     records = []
     for record_id, record in (payments or {}).items():
         if not _is_paid_customer_record(record) or _is_deleted_record(record):
@@ -377,13 +382,12 @@ def resolve_customer_renewal_token(user_id, token, plans, multi_api=None, paymen
     from utils.api_client import MultiServerAPI
 
     multi_api = multi_api or MultiServerAPI()
-    payments = payments if payments is not None else _load_json_file(PAYMENTS_FILE, {})
     for record_id, record in _matching_customer_records(user_id, payments=payments):
         username = _record_username(record)
         server_id = _record_server_id(record)
         if customer_renewal_token(user_id, record_id, username, server_id) != token:
             continue
-        api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id)
+        api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id, full_user=False)
         return _build_offer(
             record,
             'customer',
@@ -403,17 +407,26 @@ def resolve_customer_renewal_token(user_id, token, plans, multi_api=None, paymen
 
 def _iter_reseller_configs(reseller_id, reseller_data=None):
     if reseller_data is None:
-        resellers = _load_json_file(RESELLERS_FILE, {})
-        reseller_data = resellers.get(str(reseller_id), {})
+        reseller_data = _load_reseller_record(reseller_id)
     configs = reseller_data.get('configs', []) if isinstance(reseller_data, dict) else []
     if not isinstance(configs, list):
         return []
     return [(index, config) for index, config in enumerate(configs) if isinstance(config, dict)]
 
 
+def _get_reseller_config_at(reseller_id, config_index, reseller_data=None):
+    if reseller_data is None:
+        reseller_data = _load_reseller_record(reseller_id)
+    configs = reseller_data.get('configs', []) if isinstance(reseller_data, dict) else []
+    if not isinstance(configs, list) or not isinstance(config_index, int):
+        return None
+    if 0 <= config_index < len(configs) and isinstance(configs[config_index], dict):
+        return configs[config_index]
+    return None
+
+
 def find_reseller_renewal_offer(reseller_id, config_index, api_client, user_data, plans, reseller_data=None):
-    configs = dict(_iter_reseller_configs(reseller_id, reseller_data=reseller_data))
-    config = configs.get(config_index)
+    config = _get_reseller_config_at(reseller_id, config_index, reseller_data=reseller_data)
     if not config or _is_deleted_record(config):
         return {'eligible': False, 'reason': 'renewal_ineligible_missing', 'source': 'reseller_customer'}
 
@@ -442,8 +455,7 @@ def resolve_reseller_renewal_token(reseller_id, token, plans, multi_api=None, re
 
     multi_api = multi_api or MultiServerAPI()
     if reseller_data is None:
-        resellers = _load_json_file(RESELLERS_FILE, {})
-        reseller_data = resellers.get(str(reseller_id), {})
+        reseller_data = _load_reseller_record(reseller_id)
 
     for config_index, config in _iter_reseller_configs(reseller_id, reseller_data=reseller_data):
         if _is_deleted_record(config):
@@ -452,7 +464,7 @@ def resolve_reseller_renewal_token(reseller_id, token, plans, multi_api=None, re
         server_id = config.get('server_id')
         if reseller_renewal_token(reseller_id, config_index, username, server_id) != token:
             continue
-        api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id)
+        api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id, full_user=False)
         return find_reseller_renewal_offer(
             reseller_id,
             config_index,
@@ -501,22 +513,20 @@ def _mark_cleanup_state_renewed(username, server_id):
 def _mark_payment_record_renewed(record_id, after_state):
     if not record_id:
         return
-    payments = _load_json_file(PAYMENTS_FILE, {})
-    record = payments.get(str(record_id)) if isinstance(payments, dict) else None
-    if not isinstance(record, dict):
-        return
-    record['cleanup_status'] = 'renewed'
-    record['cleanup_error'] = None
-    record['cleanup_last_state'] = after_state
-    record['updated_at'] = _now_str()
-    _save_json_file(PAYMENTS_FILE, payments)
+    from utils.payment_records import update_payment_record_fields
+
+    update_payment_record_fields(str(record_id), {
+        'cleanup_status': 'renewed',
+        'cleanup_error': None,
+        'cleanup_last_state': after_state,
+    })
 
 
 def _execute_reset(username, server_id, plan_record, source, multi_api=None):
     from utils.api_client import MultiServerAPI
 
     multi_api = multi_api or MultiServerAPI()
-    api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id)
+    api_client, user_data = multi_api.find_user(username, preferred_server_id=server_id, full_user=False)
     if not api_client or not user_data:
         return {'success': False, 'reason': 'renewal_ineligible_missing'}
 
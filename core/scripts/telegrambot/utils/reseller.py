@@ -1,13 +1,8 @@
-import json
 import os
 import threading
 from datetime import datetime, timedelta
-from contextlib import contextmanager
 
-try:
-    import fcntl
-except ImportError:  # pragma: no cover - Windows fallback
-    fcntl = None
+from utils import reseller_store
 
 RESELLERS_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.json'
 reseller_lock = threading.RLock()
@@ -113,48 +108,8 @@ def _parse_time(value):
         return None
 
 
-def _resellers_lock_path():
-    return f"{RESELLERS_FILE}.lock"
-
-
-@contextmanager
-def _resellers_file_lock():
-    os.makedirs(os.path.dirname(RESELLERS_FILE), exist_ok=True)
-    lock_file = open(_resellers_lock_path(), 'a')
-    try:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-        yield
-    finally:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-        lock_file.close()
-
-
-def _read_resellers_file():
-    if not os.path.exists(RESELLERS_FILE):
-        return {}
-    with open(RESELLERS_FILE, 'r') as f:
-        data = json.load(f)
-    return data if isinstance(data, dict) else {}
-
-
-def _write_resellers_file(resellers):
-    os.makedirs(os.path.dirname(RESELLERS_FILE), exist_ok=True)
-    tmp_path = f"{RESELLERS_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
-    try:
-        with open(tmp_path, 'w') as f:
-            json.dump(resellers if isinstance(resellers, dict) else {}, f, indent=4)
-            f.write('\n')
-            f.flush()
-            os.fsync(f.fileno())
-        os.replace(tmp_path, RESELLERS_FILE)
-    finally:
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except OSError:
-            pass
+def _reseller_store():
+    return reseller_store.get_reseller_store(RESELLERS_FILE)
 
 
 def _is_removed_config(config):
@@ -243,8 +198,7 @@ def _restore_auto_suspended_if_debt_cleared(data):
 def load_resellers():
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                return _read_resellers_file()
+            return _reseller_store().load_all()
         except Exception:
             pass
         return {}
@@ -252,13 +206,15 @@ def load_resellers():
 
 def save_resellers(resellers):
     with reseller_lock:
-        with _resellers_file_lock():
-            _write_resellers_file(resellers)
+        _reseller_store().save_all(resellers)
 
 
 def get_reseller_data(user_id):
-    resellers = load_resellers()
-    data = resellers.get(str(user_id))
+    with reseller_lock:
+        try:
+            data = _reseller_store().get(user_id)
+        except Exception:
+            data = None
     if not data:
         return None
     return _ensure_reseller_defaults(data)
@@ -276,10 +232,9 @@ def update_reseller_status(user_id, status, telegram_username=None, suspended_re
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                resellers = _read_resellers_file()
-
-                current = _ensure_reseller_defaults(resellers.get(user_id, {}))
+            store = _reseller_store()
+            with store.lock():
+                current = _ensure_reseller_defaults(store.get(user_id) or {})
                 previous_status = current.get('status')
                 previous_reason = current.get('suspended_reason')
                 current['status'] = status
@@ -293,9 +248,7 @@ def update_reseller_status(user_id, status, telegram_username=None, suspended_re
                 if telegram_username is not None:
                     username_clean = str(telegram_username).strip().lstrip('@')
                     current['telegram_username'] = username_clean or None
-                resellers[user_id] = _ensure_reseller_defaults(current)
-
-                _write_resellers_file(resellers)
+                store.put(user_id, _ensure_reseller_defaults(current))
                 return True
         except Exception:
             return False
@@ -305,13 +258,14 @@ def add_reseller_debt(user_id, amount, config_data):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id in resellers:
-                    current = _ensure_reseller_defaults(resellers[user_id])
+                if record is not None:
+                    current = _ensure_reseller_defaults(record)
                     before = _safe_float(current.get('debt', 0.0))
                     amount_value = _safe_float(amount, 0.0)
                     current['debt'] = before + amount_value
@@ -324,10 +278,7 @@ def add_reseller_debt(user_id, amount, config_data):
                     if before < DEBT_SETTLEMENT_THRESHOLD and current['debt'] >= DEBT_SETTLEMENT_THRESHOLD:
                         current['debt_since'] = _now_str()
 
-                    current = _ensure_reseller_defaults(current)
-                    resellers[user_id] = current
-
-                    _write_resellers_file(resellers)
+                    store.put(user_id, _ensure_reseller_defaults(current))
                     return True
                 return False
         except Exception:
@@ -343,37 +294,25 @@ def reseller_config_is_recorded(user_id, username, server_id=None):
 
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                reseller_data = _read_resellers_file().get(user_id)
+            return bool(_reseller_store().find_configs(target_username, target_server_id, reseller_id=user_id))
         except Exception:
             return False
 
-    configs = reseller_data.get('configs', []) if isinstance(reseller_data, dict) else []
-    if not isinstance(configs, list):
-        return False
-    for config in configs:
-        if not isinstance(config, dict):
-            continue
-        username_value = str(config.get('username') or '').strip().lower()
-        server_id_value = str(config.get('server_id') or '').strip()
-        if username_value == target_username and (not target_server_id or server_id_value == target_server_id):
-            return True
-    return False
-
 
 def add_reseller_renewal_debt(user_id, username, amount, renewal_data, server_id=None):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id not in resellers:
+                if record is None:
                     return False
 
-                current = _ensure_reseller_defaults(resellers[user_id])
+                current = _ensure_reseller_defaults(record)
                 configs = current.get('configs', [])
                 if not isinstance(configs, list):
                     return False
@@ -411,10 +350,7 @@ def add_reseller_renewal_debt(user_id, username, amount, renewal_data, server_id
                 if before < DEBT_SETTLEMENT_THRESHOLD and current['debt'] >= DEBT_SETTLEMENT_THRESHOLD:
                     current['debt_since'] = _now_str()
 
-                current = _ensure_reseller_defaults(current)
-                resellers[user_id] = current
-
-                _write_resellers_file(resellers)
+                store.put(user_id, _ensure_reseller_defaults(current))
                 return True
         except Exception:
             return False
@@ -424,18 +360,17 @@ def clear_reseller_debt(user_id):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id in resellers:
-                    current = _ensure_reseller_defaults(resellers[user_id])
+                if record is not None:
+                    current = _ensure_reseller_defaults(record)
                     current['debt'] = 0.0
                     current = _restore_auto_suspended_if_debt_cleared(current)
-                    current = _ensure_reseller_defaults(current)
-                    resellers[user_id] = current
-                    _write_resellers_file(resellers)
+                    store.put(user_id, _ensure_reseller_defaults(current))
                     return True
                 return False
         except Exception:
@@ -446,13 +381,14 @@ def set_reseller_debt(user_id, amount):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id in resellers:
-                    current = _ensure_reseller_defaults(resellers[user_id])
+                if record is not None:
+                    current = _ensure_reseller_defaults(record)
                     previous_debt = _safe_float(current.get('debt', 0.0))
                     new_debt = _safe_float(amount, 0.0)
                     current['debt'] = max(0.0, new_debt)
@@ -463,9 +399,7 @@ def set_reseller_debt(user_id, amount):
                         current['debt_since'] = None
                         current = _restore_auto_suspended_if_debt_cleared(current)
 
-                    current = _ensure_reseller_defaults(current)
-                    resellers[user_id] = current
-                    _write_resellers_file(resellers)
+                    store.put(user_id, _ensure_reseller_defaults(current))
                     return True
                 return False
         except Exception:
@@ -477,16 +411,16 @@ def delete_reseller(user_id):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id not in resellers:
+                if record is None:
                     return False
 
-                del resellers[user_id]
-                _write_resellers_file(resellers)
+                store.delete(user_id)
                 return True
         except Exception:
             return False
@@ -531,18 +465,17 @@ def cleanup_banned_reseller_users(user_id, multi_api):
     """Delete unpaid customer configs for a banned reseller and tag local history."""
     user_id = str(user_id)
     with reseller_lock:
+        store = _reseller_store()
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
-                    return False, {'reason': 'Reseller not found'}
-                resellers = _read_resellers_file()
+            if not store.exists():
+                return False, {'reason': 'Reseller not found'}
+            stored_reseller = store.get(user_id)
         except Exception:
             return False, {'reason': 'Unable to load resellers'}
 
-        if user_id not in resellers:
+        if stored_reseller is None:
             return False, {'reason': 'Reseller not found'}
 
-        stored_reseller = resellers[user_id]
         had_explicit_total_paid = isinstance(stored_reseller, dict) and 'total_paid' in stored_reseller
         current = _ensure_reseller_defaults(stored_reseller)
         if current.get('status') != 'banned':
@@ -567,15 +500,22 @@ def cleanup_banned_reseller_users(user_id, multi_api):
         failed = []
         tagged_status_by_index = {}
 
+        to_delete = []
         for candidate in candidates:
             username = candidate['username']
-            api_client, live_user = multi_api.find_user(username, preferred_server_id=candidate.get('server_id'))
+            api_client, live_user = multi_api.find_user(
+                username, preferred_server_id=candidate.get('server_id'), full_user=False
+            )
             if api_client is None or live_user is None:
                 already_missing.append(candidate)
                 tagged_status_by_index[candidate['config_index']] = REMOVAL_STATUS_ALREADY_MISSING
                 continue
+            to_delete.append((candidate, api_client))
 
-            result = api_client.delete_user(username)
+        delete_results = multi_api.bulk_delete_users(
+            [(api_client, candidate['username']) for candidate, api_client in to_delete]
+        ) if to_delete else []
+        for (candidate, _), (_, _, result) in zip(to_delete, delete_results):
             if result is None:
                 failed.append(candidate)
                 continue
@@ -605,10 +545,7 @@ def cleanup_banned_reseller_users(user_id, multi_api):
             current.pop('trust_limit', None)
         current = _ensure_reseller_defaults(current)
         try:
-            with _resellers_file_lock():
-                latest_resellers = _read_resellers_file()
-                latest_resellers[user_id] = current
-                _write_resellers_file(latest_resellers)
+            store.put(user_id, current)
         except Exception:
             return False, {'reason': 'Unable to save cleanup result'}
 
@@ -629,12 +566,13 @@ def apply_reseller_payment(user_id, amount):
     user_id = str(user_id)
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return False, None
-                resellers = _read_resellers_file()
+                record = store.get(user_id)
 
-                if user_id not in resellers:
+                if record is None:
                     return False, None
 
                 try:
@@ -642,7 +580,7 @@ def apply_reseller_payment(user_id, amount):
                 except (TypeError, ValueError):
                     return False, None
 
-                current = _ensure_reseller_defaults(resellers[user_id])
+                current = _ensure_reseller_defaults(record)
                 current_debt = _safe_float(current.get('debt', 0.0))
                 credited_amount = max(0.0, min(paid_amount, current_debt))
                 new_debt = max(0.0, current_debt - paid_amount)
@@ -655,10 +593,7 @@ def apply_reseller_payment(user_id, amount):
                     current['debt_since'] = None
                     current = _restore_auto_suspended_if_debt_cleared(current)
 
-                current = _ensure_reseller_defaults(current)
-                resellers[user_id] = current
-
-                _write_resellers_file(resellers)
+                store.put(user_id, _ensure_reseller_defaults(current))
                 return True, new_debt
         except Exception:
             return False, None
@@ -697,15 +632,17 @@ def _compute_debt_state_with_deadline(debt, debt_since, now):
 def evaluate_reseller_debt_policies():
     with reseller_lock:
         try:
-            with _resellers_file_lock():
-                if not os.path.exists(RESELLERS_FILE):
+            store = _reseller_store()
+            with store.lock():
+                if not store.exists():
                     return []
-                resellers = _read_resellers_file()
+                resellers = store.load_all()
 
                 now = datetime.now()
                 reminder_delta = timedelta(hours=DEBT_REMINDER_INTERVAL_HOURS)
                 events = []
                 changed = False
+                updated = {}
 
                 for user_id, record in resellers.items():
                     current = _ensure_reseller_defaults(record)
@@ -801,7 +738,7 @@ def evaluate_reseller_debt_policies():
 
                     if current != record:
                         changed = True
-                        resellers[user_id] = current
+                        updated[user_id] = current
 
                     # Build event for notifications
                     if remind_due or admin_alert_due or auto_suspended or auto_banned:
@@ -840,7 +777,7 @@ def evaluate_reseller_debt_policies():
                         })
 
                 if changed:
-                    _write_resellers_file(resellers)
+                    store.put_many(updated)
 
                 return events
         except Exception:
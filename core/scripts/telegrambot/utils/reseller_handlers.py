@@ -7,6 +7,7 @@ import os
 import re
 import logging
 import threading
+from collections.abc import Mapping
 from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
@@ -149,7 +150,7 @@ def _iter_users_from_snapshot_entries(entries):
                 yield client, username, data
         elif isinstance(users, list):
             for data in users:
-                if isinstance(data, dict):
+                if isinstance(data, Mapping):
                     yield client, data.get("username"), data
 
 
@@ -919,6 +920,7 @@ def handle_reseller_payment(call):
                 'status': 'pending',
                 'type': 'settlement',
                 'payment_method': 'Crypto',
+                'webhook': bool(payment_handler.callback_url),
                 'settlement_amount': amount_to_pay,
                 **discount_metadata,
             }
@@ -1142,11 +1144,11 @@ def _load_reseller_live_users(force_refresh=False):
 
         if isinstance(users, dict):
             for username, data in users.items():
-                if username and isinstance(data, dict):
+                if username and isinstance(data, Mapping):
                     live_users[str(username)] = data
         elif isinstance(users, list):
             for data in users:
-                if isinstance(data, dict) and data.get("username"):
+                if isinstance(data, Mapping) and data.get("username"):
                     live_users[str(data["username"])] = data
 
     return live_users, unavailable_server_ids
@@ -0,0 +1,396 @@
+"""
+Storage backends for reseller records.
+
+``DIJIQ_RESELLER_STORE`` selects where reseller records live:
+
+* ``json`` (default) keeps every reseller in ``resellers.json``.
+* ``sqlite`` keeps one row per reseller in ``resellers.sqlite3`` (WAL mode), so
+  a debt change rewrites a single reseller instead of the whole file.  A new
+  database imports ``resellers.json`` on first use.
+
+Both backends serve reads from a process-wide cache: the JSON document is
+revalidated by its file signature (through ``json_store``) and SQLite rows by
+``PRAGMA data_version``, which changes whenever another process commits.
+Records returned by ``get`` and ``load_all`` are private copies; ``read``
+returns the shared cached record for read-only hot paths.
+
+Each store also keeps a ``ResellerConfigIndex`` over the cached records so
+``find_configs`` resolves a customer username (optionally with its server) to
+``(reseller_id, config_index)`` without scanning config lists.  The index is
+rebuilt lazily when the cache is reloaded and patched in place on every write
+made through the store.
+
+Run ``python3 reseller_store.py migrate|export`` to copy records between
+``resellers.json`` and the database; backup.sh and restore.sh rely on it.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+try:
+    from utils import json_store
+except ImportError:  # run as a script from the utils directory
+    import json_store
+
+RESELLERS_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.json'
+RESELLERS_DB_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.sqlite3'
+RESELLER_STORE_ENV = 'DIJIQ_RESELLER_STORE'
+RESELLER_STORE_BACKENDS = {'json', 'sqlite'}
+
+_store_lock = threading.RLock()
+# One shared connection per database path, plus the rows parsed through it.
+# Guarded by ``_store_lock``.
+_sqlite_states = {}
+# ``ResellerConfigIndex`` per JSON path, valid while its ``records`` is the
+# document ``json_store.read`` currently returns. Guarded by ``_store_lock``.
+_json_config_indexes = {}
+
+
+def get_reseller_store_backend():
+    """Return the configured reseller store backend (``json`` or ``sqlite``)."""
+    backend = str(os.getenv(RESELLER_STORE_ENV, 'json') or 'json').strip().lower()
+    return backend if backend in RESELLER_STORE_BACKENDS else 'json'
+
+
+def _config_key(username, server_id=None):
+    return str(username or '').strip().lower(), str(server_id or '').strip()
+
+
+class ResellerConfigIndex:
+    """Map customer ``(server_id, username)`` to ``(reseller_id, config_index)``.
+
+    Usernames match case-insensitively.  Lookups without a server id match
+    every server, like the linear scans this replaces.  Refs of one reseller
+    stay in config order.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.by_key = {}
+        self.by_username = {}
+        self.keys_by_reseller = {}
+        for reseller_id, record in records.items():
+            self._add(str(reseller_id), record)
+
+    def _add(self, reseller_id, record):
+        configs = record.get('configs') if isinstance(record, dict) else None
+        if not isinstance(configs, list):
+            return
+        keys = []
+        for index, config in enumerate(configs):
+            if not isinstance(config, dict):
+                continue
+            username, server_id = _config_key(config.get('username'), config.get('server_id'))
+            if not username:
+                continue
+            ref = (reseller_id, index)
+            self.by_key.setdefault((server_id, username), []).append(ref)
+            self.by_username.setdefault(username, []).append(ref)
+            keys.append((server_id, username))
+        if keys:
+            self.keys_by_reseller[reseller_id] = keys
+
+    def _discard(self, reseller_id):
+        for key in self.keys_by_reseller.pop(reseller_id, []):
+            for bucket, bucket_key in ((self.by_key, key), (self.by_username, key[1])):
+                refs = [ref for ref in bucket.get(bucket_key, []) if ref[0] != reseller_id]
+                if refs:
+                    bucket[bucket_key] = refs
+                else:
+                    bucket.pop(bucket_key, None)
+
+    def update(self, records, reseller_ids):
+        """Re-index ``reseller_ids`` from ``records`` and rebind to it."""
+        self.records = records
+        for reseller_id in reseller_ids:
+            reseller_id = str(reseller_id)
+            self._discard(reseller_id)
+            if reseller_id in records:
+                self._add(reseller_id, records[reseller_id])
+
+    def find(self, username, server_id=None, reseller_id=None):
+        """Return matching ``(reseller_id, config_index)`` refs."""
+        username, server_id = _config_key(username, server_id)
+        if server_id:
+            refs = self.by_key.get((server_id, username), [])
+        else:
+            refs = self.by_username.get(username, [])
+        if reseller_id is not None:
+            refs = [ref for ref in refs if ref[0] == str(reseller_id)]
+        return list(refs)
+
+    def find_configs(self, username, server_id=None, reseller_id=None):
+        """Return ``(reseller_id, config_index, config)`` for every match."""
+        matches = []
+        for match_reseller_id, index in self.find(username, server_id, reseller_id):
+            matches.append((match_reseller_id, index, self.records[match_reseller_id]['configs'][index]))
+        return matches
+
+
+class JsonResellerStore:
+    """Reseller records kept in one ``resellers.json`` document."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def lock(self):
+        return json_store.file_lock(self.path)
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def _document(self):
+        data = json_store.read(self.path, {}, strict=True)
+        return data if isinstance(data, dict) else {}
+
+    def _config_index(self):
+        document = self._document()
+        with _store_lock:
+            index = _json_config_indexes.get(self.path)
+            if index is None or index.records is not document:
+                index = ResellerConfigIndex(document)
+                _json_config_indexes[self.path] = index
+            return index
+
+    def _update(self, mutator, reseller_ids):
+        """Apply ``mutator`` to a copy of the cached document and write it back.
+
+        Only the records for ``reseller_ids`` are deep-copied; the rest are
+        shared with the cached parse, so the file is parsed at most once per
+        on-disk version rather than again for every write.
+        """
+        reseller_ids = [str(reseller_id) for reseller_id in reseller_ids]
+        with self.lock():
+            previous = self._document()
+            document = dict(previous)
+            for reseller_id in reseller_ids:
+                if reseller_id in document:
+                    document[reseller_id] = copy.deepcopy(document[reseller_id])
+            mutator(document)
+            json_store.write(self.path, document, cache=True)
+            with _store_lock:
+                index = _json_config_indexes.get(self.path)
+                if index is not None and index.records is previous:
+                    index.update(document, reseller_ids)
+
+    def read(self, reseller_id):
+        return self._document().get(str(reseller_id))
+
+    def get(self, reseller_id):
+        record = self.read(reseller_id)
+        return copy.deepcopy(record) if record is not None else None
+
+    def load_all(self):
+        data = json_store.load(self.path, {}, strict=True)
+        return data if isinstance(data, dict) else {}
+
+    def save_all(self, resellers):
+        json_store.write(self.path, resellers if isinstance(resellers, dict) else {})
+
+    def put(self, reseller_id, record):
+        self.put_many({reseller_id: record})
+
+    def put_many(self, records):
+        self._update(
+            lambda data: data.update((str(rid), record) for rid, record in records.items()),
+            records.keys(),
+        )
+
+    def delete(self, reseller_id):
+        self._update(lambda data: data.pop(str(reseller_id), None), [reseller_id])
+
+    def find_configs(self, username, server_id=None, reseller_id=None):
+        """Return shared ``(reseller_id, config_index, config)`` matches (read-only)."""
+        return self._config_index().find_configs(username, server_id, reseller_id)
+
+
+class SqliteResellerStore:
+    """Reseller records kept one row per reseller in a WAL-mode SQLite database."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS resellers ('
+        ' reseller_id TEXT PRIMARY KEY,'
+        ' status TEXT,'
+        ' data TEXT NOT NULL'
+        ')',
+        'CREATE INDEX IF NOT EXISTS idx_resellers_status ON resellers(status)',
+    )
+    UPSERT_SQL = (
+        'INSERT INTO resellers (reseller_id, status, data) VALUES (?, ?, ?) '
+        'ON CONFLICT(reseller_id) DO UPDATE SET status = excluded.status, data = excluded.data'
+    )
+
+    def __init__(self, path, json_path=None):
+        self.path = path
+        self.json_path = json_path
+
+    def _state(self):
+        state = _sqlite_states.get(self.path)
+        if state is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            is_new = not os.path.exists(self.path)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+            state = {'connection': connection, 'depth': 0, 'version': None, 'records': None, 'index': None}
+            _sqlite_states[self.path] = state
+            if is_new and self.json_path and os.path.exists(self.json_path):
+                self._import_json(self.json_path)
+        return state
+
+    def _records(self, state):
+        """Return the cached ``{reseller_id: record}`` map, reloading after external commits."""
+        connection = state['connection']
+        version = connection.execute('PRAGMA data_version').fetchone()[0]
+        if state['records'] is None or state['version'] != version:
+            rows = connection.execute('SELECT reseller_id, data FROM resellers ORDER BY rowid').fetchall()
+            state['records'] = {reseller_id: json.loads(data) for reseller_id, data in rows}
+            state['version'] = version
+            state['index'] = None
+        return state['records']
+
+    def _config_index(self, state):
+        records = self._records(state)
+        if state['index'] is None:
+            state['index'] = ResellerConfigIndex(records)
+        return state['index']
+
+    @staticmethod
+    def _row(reseller_id, record):
+        status = record.get('status') if isinstance(record, dict) else None
+        return str(reseller_id), None if status is None else str(status), json.dumps(record)
+
+    @contextmanager
+    def lock(self):
+        """Run the enclosed reads and writes in one ``BEGIN IMMEDIATE`` transaction."""
+        with _store_lock:
+            state = self._state()
+            connection = state['connection']
+            if state['depth'] == 0:
+                connection.execute('BEGIN IMMEDIATE')
+            state['depth'] += 1
+            try:
+                yield
+            except BaseException:
+                state['depth'] -= 1
+                if state['depth'] == 0:
+                    connection.execute('ROLLBACK')
+                    state['records'] = None
+                    state['index'] = None
+                raise
+            state['depth'] -= 1
+            if state['depth'] == 0:
+                connection.execute('COMMIT')
+
+    def exists(self):
+        return True
+
+    def _import_json(self, json_path):
+        try:
+            resellers = json_store.load(json_path, {}, strict=True)
+        except json_store.JsonStoreError as e:
+            print(f"[reseller_store] Failed to import {json_path}: {e}")
+            return 0
+        if not isinstance(resellers, dict):
+            return 0
+        self.save_all(resellers)
+        return len(resellers)
+
+    def read(self, reseller_id):
+        with _store_lock:
+            return self._records(self._state()).get(str(reseller_id))
+
+    def get(self, reseller_id):
+        record = self.read(reseller_id)
+        return copy.deepcopy(record) if record is not None else None
+
+    def load_all(self):
+        with _store_lock:
+            return copy.deepcopy(self._records(self._state()))
+
+    def save_all(self, resellers):
+        resellers = resellers if isinstance(resellers, dict) else {}
+        with self.lock():
+            state = self._state()
+            state['connection'].execute('DELETE FROM resellers')
+            state['connection'].executemany(
+                self.UPSERT_SQL,
+                [self._row(reseller_id, record) for reseller_id, record in resellers.items()],
+            )
+            state['records'] = {str(reseller_id): copy.deepcopy(record) for reseller_id, record in resellers.items()}
+            state['index'] = None
+
+    def put(self, reseller_id, record):
+        self.put_many({reseller_id: record})
+
+    def put_many(self, records):
+        with self.lock():
+            state = self._state()
+            cached = self._records(state)
+            state['connection'].executemany(
+                self.UPSERT_SQL,
+                [self._row(reseller_id, record) for reseller_id, record in records.items()],
+            )
+            for reseller_id, record in records.items():
+                cached[str(reseller_id)] = copy.deepcopy(record)
+            if state['index'] is not None:
+                state['index'].update(cached, records.keys())
+
+    def delete(self, reseller_id):
+        with self.lock():
+            state = self._state()
+            state['connection'].execute('DELETE FROM resellers WHERE reseller_id = ?', (str(reseller_id),))
+            self._records(state).pop(str(reseller_id), None)
+            if state['index'] is not None:
+                state['index'].update(state['records'], [reseller_id])
+
+    def find_configs(self, username, server_id=None, reseller_id=None):
+        """Return shared ``(reseller_id, config_index, config)`` matches (read-only)."""
+        with _store_lock:
+            return self._config_index(self._state()).find_configs(username, server_id, reseller_id)
+
+
+def get_reseller_store(json_path=None, db_path=None):
+    json_path = json_path or RESELLERS_FILE
+    if get_reseller_store_backend() == 'sqlite':
+        return SqliteResellerStore(db_path or RESELLERS_DB_FILE, json_path=json_path)
+    return JsonResellerStore(json_path)
+
+
+def migrate_json_to_sqlite(json_path=None, db_path=None):
+    """Replace the SQLite reseller store contents with ``resellers.json``.
+
+    Returns the number of imported records.
+    """
+    store = SqliteResellerStore(db_path or RESELLERS_DB_FILE)
+    with _store_lock:
+        store._state()
+        return store._import_json(json_path or RESELLERS_FILE)
+
+
+def export_resellers_json(json_path=None, db_path=None):
+    """Write the SQLite reseller store back to the ``resellers.json`` layout.
+
+    Returns the number of exported records.
+    """
+    resellers = SqliteResellerStore(db_path or RESELLERS_DB_FILE).load_all()
+    json_store.write(json_path or RESELLERS_FILE, resellers)
+    return len(resellers)
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    if command == 'migrate':
+        print(f"Imported {migrate_json_to_sqlite()} reseller records into {RESELLERS_DB_FILE}")
+    elif command == 'export':
+        print(f"Exported {export_resellers_json()} reseller records to {RESELLERS_FILE}")
+    else:
+        print("Usage: reseller_store.py migrate|export")
+        sys.exit(1)
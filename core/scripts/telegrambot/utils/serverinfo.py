@@ -48,6 +48,10 @@ def _load_cli_api_module():
     return cli_api
 
 
+def start_cpu_sampler():
+    _load_cli_api_module().start_cpu_sampler()
+
+
 def _normalize_server_info_section(section):
     valid_sections = {key for key, _label in SERVER_INFO_SECTIONS}
     section = str(section or SERVER_INFO_DEFAULT_SECTION).lower()
@@ -1,4 +1,3 @@
-import json
 import os
 import datetime
 import time
@@ -18,7 +17,7 @@ from utils.username_utils import (
     build_user_note,
 )
 from utils.telegram_safe import safe_answer_callback_query, safe_edit_message_text, safe_send_message, safe_send_photo
-from utils import test_config_store
+from utils import json_store, test_config_store
 
 TEST_CONFIGS_FILE = '/etc/dijiq/core/scripts/telegrambot/test_configs.json'
 TEST_SETTINGS_FILE = '/etc/dijiq/core/scripts/telegrambot/test_settings.json'
@@ -44,19 +43,14 @@ TEST_CONFIG_EXECUTOR = ThreadPoolExecutor(
 )
 
 def load_test_settings():
-    try:
-        if os.path.exists(TEST_SETTINGS_FILE):
-            with open(TEST_SETTINGS_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
-        pass
+    settings = json_store.read(TEST_SETTINGS_FILE)
+    if settings is not None:
+        return dict(settings)
     return {"creation_disabled": False}
 
 def save_test_settings(settings):
-    os.makedirs(os.path.dirname(TEST_SETTINGS_FILE), exist_ok=True)
     try:
-        with open(TEST_SETTINGS_FILE, 'w') as f:
-            json.dump(settings, f, indent=4)
+        json_store.write(TEST_SETTINGS_FILE, settings)
     except Exception:
         pass
 
@@ -72,18 +66,16 @@ def save_test_configs(configs):
 
 def load_waiting_users():
     try:
-        if os.path.exists(TEST_WAITING_LIST_FILE):
-            with open(TEST_WAITING_LIST_FILE, 'r') as f:
-                return json.load(f)
-    except Exception:
+        users = json_store.load(TEST_WAITING_LIST_FILE, strict=True)
+        if users is not None:
+            return users
+    except json_store.JsonStoreError:
         pass
     save_waiting_users({})
     return {}
 
 def save_waiting_users(users):
-    os.makedirs(os.path.dirname(TEST_WAITING_LIST_FILE), exist_ok=True)
-    with open(TEST_WAITING_LIST_FILE, 'w') as f:
-        json.dump(users, f, indent=4)
+    json_store.write(TEST_WAITING_LIST_FILE, users)
 
 def _parse_config_time(value):
     if not value:
@@ -448,73 +440,94 @@ def _send_created_test_config(chat_id, username, user_uri_data, is_automatic=Fal
             parse_mode="Markdown"
         )
 
-def _create_test_config_with_client(
-    user_id,
-    chat_id,
-    api_client,
-    existing_usernames,
-    test_configs,
-    is_automatic=False,
-    language=None,
-    telegram_username=None,
-):
-    if _has_used_test_config_from(test_configs, user_id):
-        return False
-    if not _claim_test_config_creation(user_id):
-        return False
-
-    try:
-        username = allocate_username("t", user_id, existing_usernames)
-        note_payload = build_user_note(
+def _test_user_options(username, with_note=True):
+    options = {
+        "traffic_limit": TEST_TRAFFIC_GB,
+        "expiration_days": TEST_DAYS,
+        "unlimited": True,
+    }
+    if with_note:
+        options["note"] = build_user_note(
             username=username,
             traffic_limit=TEST_TRAFFIC_GB,
             expiration_days=TEST_DAYS,
             unlimited=True,
             note_text="test_config",
         )
-        result = api_client.add_user(
-            username,
-            TEST_TRAFFIC_GB,
-            TEST_DAYS,
-            unlimited=True,
-            note=note_payload,
-        )
-        if result is None:
-            result = api_client.add_user(username, TEST_TRAFFIC_GB, TEST_DAYS, unlimited=True)
-            if result is not None:
-                logging.getLogger("dijiq.usernames").warning(
-                    "Created test user without note fallback. user_id=%s username=%s",
-                    user_id,
-                    username,
-                )
-    except Exception:
-        _release_test_config_creation(user_id)
-        raise
+    return options
 
-    if not result:
-        _release_test_config_creation(user_id)
-        return False
+def _create_waiting_test_configs(waiting, existing_usernames, server_states, test_configs):
+    """Create test configs for ``(user_key, user_id, language, telegram_username)`` rows in one batch.
 
-    mark_test_config_used(
-        user_id,
-        username=username,
-        language=language,
-        telegram_username=telegram_username,
-        server_id=api_client.server_id,
-    )
-    _mark_test_config_used_in_memory(
-        test_configs,
-        user_id,
-        username=username,
-        language=language,
-        telegram_username=telegram_username,
-        server_id=api_client.server_id,
-    )
-    existing_usernames.add(username)
+    Users are spread over ``server_states`` by load and created through the
+    bulk API, so panels are called in parallel and caches are updated once.
+    Returns the set of ``user_key`` values whose config was created and sent.
+    """
+    planned = []
+    for user_key, user_id, language, telegram_username in waiting:
+        if _has_used_test_config_from(test_configs, user_id) or not _claim_test_config_creation(user_id):
+            continue
+        server_state = _select_bulk_server_state(server_states)
+        username = allocate_username("t", user_id, existing_usernames)
+        existing_usernames.add(username)
+        server_state["active_count"] += 1
+        planned.append((user_key, user_id, language, telegram_username, server_state, username))
 
-    user_uri_data = api_client.get_user_uri(username)
-    _send_created_test_config(chat_id, username, user_uri_data, is_automatic=is_automatic)
-    return True
+    if not planned:
+        return set()
+
+    multi_api = MultiServerAPI()
+    results = {}
+    retry = list(planned)
+    for with_note in (True, False):
+        batch = multi_api.bulk_add_users(
+            (row[4]["client"], row[5], _test_user_options(row[5], with_note=with_note))
+            for row in retry
+        )
+        for row, (_, _, result) in zip(retry, batch):
+            if result is not None:
+                results[row[0]] = result
+                if not with_note:
+                    logging.getLogger("dijiq.usernames").warning(
+                        "Created test user without note fallback. user_id=%s username=%s",
+                        row[1],
+                        row[5],
+                    )
+        retry = [row for row in retry if row[0] not in results]
+        if not retry:
+            break
+
+    created = set()
+    for user_key, user_id, language, telegram_username, server_state, username in planned:
+        api_client = server_state["client"]
+        if not results.get(user_key):
+            _release_test_config_creation(user_id)
+            existing_usernames.discard(username)
+            server_state["active_count"] -= 1
+            continue
+        try:
+            mark_test_config_used(
+                user_id,
+                username=username,
+                language=language,
+                telegram_username=telegram_username,
+                server_id=api_client.server_id,
+            )
+            _mark_test_config_used_in_memory(
+                test_configs,
+                user_id,
+                username=username,
+                language=language,
+                telegram_username=telegram_username,
+                server_id=api_client.server_id,
+            )
+            user_uri_data = api_client.get_user_uri(username)
+            _send_created_test_config(user_id, username, user_uri_data, is_automatic=True)
+            created.add(user_key)
+        except Exception as e:
+            print(f"Waiting list create failed for {user_id}: {e}")
+        time.sleep(0.1)
+    return created
 
 def create_test_config(user_id, chat_id, is_automatic=False, language=None, telegram_username=None, ignore_creation_disabled=False):
     # Check if test creation is disabled
@@ -892,44 +905,44 @@ def handle_waiting_chunk(call):
             )
             return
 
+    rows = []
     for user_key, user_data in selected_users:
         user_id = user_data.get("telegram_id") or int(user_key)
         language = user_data.get("language") or get_user_language(user_id)
-        telegram_username = user_data.get("telegram_username")
-        success = False
+        rows.append((user_key, user_id, language, user_data.get("telegram_username")))
 
+    if action == "create":
         try:
-            if action == "create":
-                server_state = _select_bulk_server_state(server_states)
-                success = _create_test_config_with_client(
-                    user_id,
-                    user_id,
-                    server_state["client"],
-                    existing_usernames,
-                    test_configs,
-                    is_automatic=True,
-                    language=language,
-                    telegram_username=telegram_username,
-                )
-                if success:
-                    server_state["active_count"] += 1
-            elif action == "notify":
+            created = _create_waiting_test_configs(rows, existing_usernames, server_states, test_configs)
+        except Exception as e:
+            print(f"Waiting list create failed: {e}")
+            created = set()
+        for user_key, _, _, _ in rows:
+            if user_key in created:
+                waiting_users.pop(user_key, None)
+                state_changed = True
+                processed_count += 1
+            else:
+                failure_count += 1
+    else:
+        for user_key, user_id, language, _ in rows:
+            try:
                 bot.send_message(user_id, get_message_text(language, "test_config_waitlist_eligible"))
                 success = True
-        except Exception as e:
-            print(f"Waiting list {action} failed for {user_id}: {e}")
-            success = False
-
-        if success:
-            waiting_users.pop(user_key, None)
-            state_changed = True
-            processed_count += 1
-            if processed_count % 25 == 0:
-                save_waiting_users(waiting_users)
-        else:
-            failure_count += 1
-
-        time.sleep(0.1)
+            except Exception as e:
+                print(f"Waiting list {action} failed for {user_id}: {e}")
+                success = False
+
+            if success:
+                waiting_users.pop(user_key, None)
+                state_changed = True
+                processed_count += 1
+                if processed_count % 25 == 0:
+                    save_waiting_users(waiting_users)
+            else:
+                failure_count += 1
+
+            time.sleep(0.1)
 
     if state_changed:
         save_waiting_users(waiting_users)
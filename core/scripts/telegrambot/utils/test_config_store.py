@@ -1,12 +1,6 @@
-import json
-import os
 import threading
-from contextlib import contextmanager
 
-try:
-    import fcntl
-except ImportError:  # pragma: no cover - Windows fallback
-    fcntl = None
+from utils import json_store
 
 
 class TestConfigStoreError(RuntimeError):
@@ -16,33 +10,15 @@ class TestConfigStoreError(RuntimeError):
 _store_lock = threading.RLock()
 
 
-def _parent_dir(path):
-    return os.path.dirname(os.path.abspath(path))
-
-
-@contextmanager
 def _file_lock(path):
-    parent = _parent_dir(path)
-    os.makedirs(parent, exist_ok=True)
-    lock_file = open(f"{path}.lock", "a")
-    try:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
-        yield
-    finally:
-        if fcntl is not None:
-            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
-        lock_file.close()
+    return json_store.file_lock(path)
 
 
 def _read_unlocked(path):
-    if not os.path.exists(path):
-        return {}
     try:
-        with open(path, "r", encoding="utf-8") as handle:
-            data = json.load(handle)
-    except Exception as exc:
-        raise TestConfigStoreError(f"Failed to read test config database: {exc}") from exc
+        data = json_store.load(path, {}, strict=True)
+    except json_store.JsonStoreError as exc:
+        raise TestConfigStoreError(f"Failed to read test config database: {exc.__cause__ or exc}") from exc
     if not isinstance(data, dict):
         raise TestConfigStoreError("Test config database must contain a JSON object.")
     return data
@@ -51,31 +27,7 @@ def _read_unlocked(path):
 def _write_unlocked(path, configs):
     if not isinstance(configs, dict):
         raise TestConfigStoreError("Test config database must contain a JSON object.")
-
-    parent = _parent_dir(path)
-    os.makedirs(parent, exist_ok=True)
-    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
-    try:
-        with open(tmp_path, "w", encoding="utf-8") as handle:
-            json.dump(configs, handle, indent=4, ensure_ascii=False)
-            handle.write("\n")
-            handle.flush()
-            os.fsync(handle.fileno())
-        os.replace(tmp_path, path)
-        try:
-            directory_fd = os.open(parent, os.O_RDONLY)
-            try:
-                os.fsync(directory_fd)
-            finally:
-                os.close(directory_fd)
-        except OSError:
-            pass
-    finally:
-        try:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
-        except OSError:
-            pass
+    json_store.write(path, configs, ensure_ascii=False)
 
 
 def load_test_configs(path):
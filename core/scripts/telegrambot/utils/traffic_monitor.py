@@ -1,13 +1,13 @@
-import json
-import os
 import re
 import threading
 from datetime import datetime
 
+from utils import json_store, notification_queue, reseller_store
 from utils.api_client import MultiServerAPI
 from utils.command import bot
-from utils.language import get_user_language
+from utils.language import get_user_language, get_user_languages
 from utils.translations import get_message_text
+from utils.user_record import UserRecord
 
 ALERTS_FILE = '/etc/dijiq/core/scripts/telegrambot/traffic_alerts.json'
 RESELLERS_FILE = '/etc/dijiq/core/scripts/telegrambot/resellers.json'
@@ -15,24 +15,22 @@ ALERT_THRESHOLDS = [80, 90]
 ALERT_RESET_RATIO = 0.05
 
 _alerts_lock = threading.Lock()
+_snapshot_lock = threading.Lock()
+# (server_id, username) -> usage signature seen by the previous monitor pass
+_usage_snapshots = {}
+# MultiServerAPI change-log version the signatures above are current with
+_change_version = None
 
 
 def _load_alerts():
     with _alerts_lock:
-        if os.path.exists(ALERTS_FILE):
-            try:
-                with open(ALERTS_FILE, 'r') as f:
-                    return json.load(f)
-            except Exception:
-                return {}
-        return {}
+        alerts = json_store.load(ALERTS_FILE, {})
+        return alerts if isinstance(alerts, dict) else {}
 
 
 def _save_alerts(alerts):
     with _alerts_lock:
-        os.makedirs(os.path.dirname(ALERTS_FILE), exist_ok=True)
-        with open(ALERTS_FILE, 'w') as f:
-            json.dump(alerts, f, indent=2)
+        json_store.write(ALERTS_FILE, alerts, indent=2)
 
 
 def _extract_telegram_id(username):
@@ -102,28 +100,6 @@ def _extract_reseller_id(username):
     return None
 
 
-def _get_reseller_config(reseller_id, username):
-    """Look up the reseller record for a client config.
-
-    Searches the reseller's configs list in resellers.json by username.
-    Returns the matching config dict, or an empty dict if not found.
-    """
-    try:
-        if not os.path.exists(RESELLERS_FILE):
-            return {}
-        with open(RESELLERS_FILE, 'r') as f:
-            resellers = json.load(f)
-        record = resellers.get(str(reseller_id))
-        if not record:
-            return {}
-        for cfg in record.get('configs', []):
-            if cfg.get('username') == username:
-                return cfg
-    except Exception:
-        pass
-    return {}
-
-
 def _valid_reseller_customer_name(value):
     name = str(value or "").strip()
     if re.match(r"^[a-zA-Z0-9]{1,8}$", name):
@@ -165,158 +141,279 @@ def _should_reset_days_alerts(state, total_days, expiration_days):
     return False
 
 
-def monitor_user_traffic():
-    multi_api = MultiServerAPI()
-    if not multi_api.servers:
-        return
+def _usage_signature(user_data, telegram_id, reseller_id):
+    """Summarize the parts of a user's usage that can change an alert decision.
 
-    alerts = _load_alerts()
-    changed = False
-
-    for api_client, username, user_data in multi_api.iter_all_users(include_disabled=False):
-        if not username or not user_data:
-            continue
+    GB usage is reduced to the number of thresholds crossed and whether it sits
+    in the reset zone, so traffic growth between two thresholds keeps the same
+    signature. Expiration days are kept as-is since they move at most daily.
+    """
+    max_download_bytes = user_data.quota_bytes or 0
+    total_usage_bytes = user_data.total_bytes
 
-        # ── Regular user GB alerts ──────────────────────────────────────────
-        telegram_id = _extract_telegram_id(username)
-        if telegram_id is not None:
-            max_download_bytes = user_data.get('max_download_bytes', 0) or 0
-            if max_download_bytes > 0:
-                upload_bytes = user_data.get('upload_bytes', 0) or 0
-                download_bytes = user_data.get('download_bytes', 0) or 0
-                total_usage_bytes = upload_bytes + download_bytes
-
-                if total_usage_bytes > 0:
-                    usage_percent = (total_usage_bytes / max_download_bytes) * 100
-
-                    state = alerts.get(username, {})
-                    if _should_reset_alerts(state, max_download_bytes, total_usage_bytes):
-                        state = {}
-                        changed = True
+    gb_signature = (max_download_bytes, None, None)
+    if max_download_bytes > 0 and total_usage_bytes > 0:
+        usage_percent = (total_usage_bytes / max_download_bytes) * 100
+        crossed = sum(1 for threshold in ALERT_THRESHOLDS if usage_percent >= threshold)
+        in_reset_zone = total_usage_bytes <= max_download_bytes * ALERT_RESET_RATIO
+        gb_signature = (max_download_bytes, crossed, in_reset_zone)
 
-                    notified = set(state.get('notified', []))
-
-                    alert_threshold, handled_thresholds = _select_threshold_alert(usage_percent, notified)
-                    if alert_threshold is not None:
-                        language = get_user_language(telegram_id)
-                        message = get_message_text(language, "traffic_quota_alert").format(
-                            percent=int(usage_percent),
-                            username=username,
-                            used_gb=total_usage_bytes / (1024 ** 3),
-                            limit_gb=max_download_bytes / (1024 ** 3),
-                        )
-                        try:
-                            bot.send_message(telegram_id, message, parse_mode="Markdown")
-                        except Exception as e:
-                            print(f"Failed to notify user {telegram_id} for {username}: {e}")
-                        else:
-                            notified.update(handled_thresholds)
-                            changed = True
-
-                    if notified:
-                        state['notified'] = sorted(notified)
-                    else:
-                        state.pop('notified', None)
+    expiration_days = user_data.expiration_days if reseller_id is not None else None
+    return telegram_id, reseller_id, gb_signature, expiration_days
 
-                    state['max_download_bytes'] = max_download_bytes
-                    state['last_usage_bytes'] = total_usage_bytes
-                    state['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    alerts[username] = state
 
-        # ── Reseller client alerts (GB + days) ─────────────────────────────
-        reseller_id = _extract_reseller_id(username)
-        if reseller_id is None:
+def _get_reseller_configs(clients):
+    """Resolve reseller configs for many ``(reseller_id, username)`` pairs at once."""
+    configs = {}
+    try:
+        store = reseller_store.get_reseller_store(RESELLERS_FILE)
+    except Exception:
+        return configs
+
+    for reseller_id, username in clients:
+        try:
+            for _, _, cfg in store.find_configs(username, reseller_id=reseller_id):
+                if cfg.get('username') == username:
+                    configs[username] = cfg
+                    break
+        except Exception:
             continue
+    return configs
+
+
+def _evaluate_user_alerts(alerts, username, user_data, telegram_id, reseller_id, languages, reseller_config):
+    """Apply the alert rules for one user.
 
-        language = get_user_language(reseller_id)
-        state = alerts.get(username, {})
-        reseller_config = _get_reseller_config(reseller_id, username)
-        customer_name = _resolve_reseller_customer_name(reseller_config, user_data)
+    Returns ``(changed, delivered)``. ``delivered`` is False when a notification
+    failed, so the user is evaluated again on the next pass.
+    """
+    changed = False
+    delivered = True
 
-        # — GB alert for reseller client —
-        max_download_bytes = user_data.get('max_download_bytes', 0) or 0
+    # ── Regular user GB alerts ──────────────────────────────────────────
+    if telegram_id is not None:
+        max_download_bytes = user_data.quota_bytes or 0
         if max_download_bytes > 0:
-            upload_bytes = user_data.get('upload_bytes', 0) or 0
-            download_bytes = user_data.get('download_bytes', 0) or 0
-            total_usage_bytes = upload_bytes + download_bytes
+            total_usage_bytes = user_data.total_bytes
 
             if total_usage_bytes > 0:
                 usage_percent = (total_usage_bytes / max_download_bytes) * 100
 
+                state = alerts.get(username, {})
                 if _should_reset_alerts(state, max_download_bytes, total_usage_bytes):
-                    # Only reset GB-related keys, keep days keys intact
-                    state.pop('gb_notified', None)
-                    state.pop('max_download_bytes', None)
-                    state.pop('last_usage_bytes', None)
+                    state = {}
                     changed = True
 
-                gb_notified = set(state.get('gb_notified', []))
+                notified = set(state.get('notified', []))
 
-                alert_threshold, handled_thresholds = _select_threshold_alert(usage_percent, gb_notified)
+                alert_threshold, handled_thresholds = _select_threshold_alert(usage_percent, notified)
                 if alert_threshold is not None:
-                    message = get_message_text(language, "reseller_client_traffic_alert").format(
+                    language = languages.get(telegram_id) or get_user_language(telegram_id)
+                    message = get_message_text(language, "traffic_quota_alert").format(
                         percent=int(usage_percent),
-                        customer_name=customer_name,
                         username=username,
                         used_gb=total_usage_bytes / (1024 ** 3),
                         limit_gb=max_download_bytes / (1024 ** 3),
                     )
                     try:
-                        bot.send_message(reseller_id, message, parse_mode="Markdown")
+                        notification_queue.send_message(bot, telegram_id, message, parse_mode="Markdown")
                     except Exception as e:
-                        print(f"Failed to notify reseller {reseller_id} for client {username} (GB): {e}")
+                        delivered = False
+                        print(f"Failed to notify user {telegram_id} for {username}: {e}")
                     else:
-                        gb_notified.update(handled_thresholds)
+                        notified.update(handled_thresholds)
                         changed = True
 
-                state['gb_notified'] = sorted(gb_notified)
+                if notified:
+                    state['notified'] = sorted(notified)
+                else:
+                    state.pop('notified', None)
+
                 state['max_download_bytes'] = max_download_bytes
                 state['last_usage_bytes'] = total_usage_bytes
+                state['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                alerts[username] = state
+
+    # ── Reseller client alerts (GB + days) ─────────────────────────────
+    if reseller_id is None:
+        return changed, delivered
+
+    language = languages.get(reseller_id) or get_user_language(reseller_id)
+    state = alerts.get(username, {})
+    customer_name = _resolve_reseller_customer_name(reseller_config, user_data)
+
+    # — GB alert for reseller client —
+    max_download_bytes = user_data.quota_bytes or 0
+    if max_download_bytes > 0:
+        total_usage_bytes = user_data.total_bytes
+
+        if total_usage_bytes > 0:
+            usage_percent = (total_usage_bytes / max_download_bytes) * 100
+
+            if _should_reset_alerts(state, max_download_bytes, total_usage_bytes):
+                # Only reset GB-related keys, keep days keys intact
+                state.pop('gb_notified', None)
+                state.pop('max_download_bytes', None)
+                state.pop('last_usage_bytes', None)
+                changed = True
+
+            gb_notified = set(state.get('gb_notified', []))
+
+            alert_threshold, handled_thresholds = _select_threshold_alert(usage_percent, gb_notified)
+            if alert_threshold is not None:
+                message = get_message_text(language, "reseller_client_traffic_alert").format(
+                    percent=int(usage_percent),
+                    customer_name=customer_name,
+                    username=username,
+                    used_gb=total_usage_bytes / (1024 ** 3),
+                    limit_gb=max_download_bytes / (1024 ** 3),
+                )
+                try:
+                    notification_queue.send_message(bot, reseller_id, message, parse_mode="Markdown")
+                except Exception as e:
+                    delivered = False
+                    print(f"Failed to notify reseller {reseller_id} for client {username} (GB): {e}")
+                else:
+                    gb_notified.update(handled_thresholds)
+                    changed = True
 
-        # — Days alert for reseller client —
-        expiration_days = user_data.get('expiration_days', None)
-        if expiration_days is not None:
-            try:
-                expiration_days = int(expiration_days)
-            except (TypeError, ValueError):
-                expiration_days = None
-
-        if expiration_days is not None and expiration_days >= 0:
-            total_days = _get_reseller_total_days(reseller_config)
-            if total_days and total_days > 0:
-                days_used = total_days - expiration_days
-                days_percent = (days_used / total_days) * 100
-
-                if _should_reset_days_alerts(state, total_days, expiration_days):
-                    state.pop('days_notified', None)
-                    state.pop('total_days', None)
+            state['gb_notified'] = sorted(gb_notified)
+            state['max_download_bytes'] = max_download_bytes
+            state['last_usage_bytes'] = total_usage_bytes
+
+    # — Days alert for reseller client —
+    expiration_days = user_data.expiration_days
+    if expiration_days is not None and expiration_days >= 0:
+        total_days = _get_reseller_total_days(reseller_config)
+        if total_days and total_days > 0:
+            days_used = total_days - expiration_days
+            days_percent = (days_used / total_days) * 100
+
+            if _should_reset_days_alerts(state, total_days, expiration_days):
+                state.pop('days_notified', None)
+                state.pop('total_days', None)
+                changed = True
+
+            days_notified = set(state.get('days_notified', []))
+
+            alert_threshold, handled_thresholds = _select_threshold_alert(days_percent, days_notified)
+            if alert_threshold is not None:
+                message = get_message_text(language, "reseller_client_days_alert").format(
+                    percent=int(days_percent),
+                    customer_name=customer_name,
+                    username=username,
+                    days_used=max(0, days_used),
+                    total_days=total_days,
+                    days_remaining=expiration_days,
+                )
+                try:
+                    notification_queue.send_message(bot, reseller_id, message, parse_mode="Markdown")
+                except Exception as e:
+                    delivered = False
+                    print(f"Failed to notify reseller {reseller_id} for client {username} (days): {e}")
+                else:
+                    days_notified.update(handled_thresholds)
                     changed = True
 
-                days_notified = set(state.get('days_notified', []))
+            state['days_notified'] = sorted(days_notified)
+            state['total_days'] = total_days
+
+    state['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    alerts[username] = state
+
+    return changed, delivered
+
+
+def reset_traffic_monitor_snapshot():
+    """Forget the previous pass so the next one evaluates every user."""
+    global _usage_snapshots, _change_version
+    with _snapshot_lock:
+        _usage_snapshots = {}
+        _change_version = None
 
-                alert_threshold, handled_thresholds = _select_threshold_alert(days_percent, days_notified)
-                if alert_threshold is not None:
-                    message = get_message_text(language, "reseller_client_days_alert").format(
-                        percent=int(days_percent),
-                        customer_name=customer_name,
-                        username=username,
-                        days_used=max(0, days_used),
-                        total_days=total_days,
-                        days_remaining=expiration_days,
-                    )
-                    try:
-                        bot.send_message(reseller_id, message, parse_mode="Markdown")
-                    except Exception as e:
-                        print(f"Failed to notify reseller {reseller_id} for client {username} (days): {e}")
-                    else:
-                        days_notified.update(handled_thresholds)
-                        changed = True
 
-                state['days_notified'] = sorted(days_notified)
-                state['total_days'] = total_days
+def monitor_user_traffic(full_scan=False):
+    """Send quota and expiry alerts to users whose usage crossed a threshold.
 
-        state['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        alerts[username] = state
+    Each pass remembers a usage signature per user; users whose signature is
+    unchanged since the previous pass are skipped unless ``full_scan`` is set.
+    Between full scans only the users in the snapshot's change log are
+    visited. Languages and reseller configs are resolved once for the
+    remaining users.
+    """
+    global _usage_snapshots, _change_version
+    multi_api = MultiServerAPI()
+    if not multi_api.servers:
+        return
+
+    with _snapshot_lock:
+        previous = {} if full_scan else _usage_snapshots
+        since_version = None if full_scan else _change_version
+
+    version, changes = multi_api.get_user_changes(since_version, include_disabled=False)
+    if changes is None:
+        users = multi_api.iter_all_users(include_disabled=False)
+        signatures = {}
+    else:
+        users = changes
+        signatures = dict(previous)
+
+    pending = []
+    retry = False
+    for api_client, username, user_data in users:
+        if not username:
+            continue
+        user_data = UserRecord.of(user_data)
+        if not user_data:
+            signatures.pop((getattr(api_client, 'server_id', None), username), None)
+            continue
+
+        telegram_id = _extract_telegram_id(username)
+        reseller_id = _extract_reseller_id(username)
+        if telegram_id is None and reseller_id is None:
+            continue
 
-    if changed:
-        _save_alerts(alerts)
+        key = (getattr(api_client, 'server_id', None), username)
+        signature = _usage_signature(user_data, telegram_id, reseller_id)
+        signatures[key] = signature
+        if previous.get(key) != signature:
+            pending.append((key, username, user_data, telegram_id, reseller_id))
+
+    if pending:
+        alerts = _load_alerts()
+        changed = False
+        languages = get_user_languages({
+            user_id
+            for _, _, _, telegram_id, reseller_id in pending
+            for user_id in (telegram_id, reseller_id)
+            if user_id is not None
+        })
+        reseller_configs = _get_reseller_configs(
+            (reseller_id, username)
+            for _, username, _, _, reseller_id in pending
+            if reseller_id is not None
+        )
+
+        for key, username, user_data, telegram_id, reseller_id in pending:
+            user_changed, delivered = _evaluate_user_alerts(
+                alerts,
+                username,
+                user_data,
+                telegram_id,
+                reseller_id,
+                languages,
+                reseller_configs.get(username, {}),
+            )
+            changed = changed or user_changed
+            if not delivered:
+                signatures.pop(key, None)
+                retry = True
+
+        if changed:
+            _save_alerts(alerts)
+
+    with _snapshot_lock:
+        _usage_snapshots = signatures
+        # A failed notification is not in the change log any more; fall back
+        # to a full pass so the user is evaluated again.
+        _change_version = None if retry else version
@@ -0,0 +1,185 @@
+"""
+Compact, immutable user records for the in-memory fleet snapshot.
+
+The users-list reader turns every panel user into one ``UserRecord`` when a
+server is fetched, and every consumer of the snapshot shares that object.
+Normalized values are computed once, on construction:
+
+* ``total_bytes`` / ``quota_bytes`` / ``remaining_bytes`` - non-negative
+  byte counts (a ``quota_bytes`` of 0 means unlimited traffic).
+* ``deadline`` - ``account_creation_date + expiration_days`` or ``None``.
+* ``blocked`` - a real bool.
+
+A record is also a read-only mapping over every panel field in
+``PANEL_FIELDS`` (``record["account_creation_date"]``, ``dict(record)``), so
+code written against the raw panel dicts keeps working. A field the panel
+left out reads as ``None``; ``get()`` returns its default for it instead.
+"""
+
+from collections.abc import Mapping
+from datetime import datetime, timedelta
+
+# Panel field name -> attribute holding its (normalized) value.
+PANEL_FIELDS = {
+    "username": "username",
+    "max_download_bytes": "quota_bytes",
+    "upload_bytes": "upload_bytes",
+    "download_bytes": "download_bytes",
+    "expiration_days": "expiration_days",
+    "account_creation_date": "account_creation_date",
+    "blocked": "blocked",
+    "unlimited_user": "unlimited_user",
+    "note": "note",
+    "status": "status",
+}
+
+
+def _int_or_none(value):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _bytes_or_none(value):
+    value = _int_or_none(value)
+    return None if value is None else max(0, value)
+
+
+def parse_account_creation_time(value):
+    if isinstance(value, datetime):
+        return value
+    if not value:
+        return None
+    text = str(value).strip()
+    if not text:
+        return None
+    if text.endswith('Z'):
+        text = f"{text[:-1]}+00:00"
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return None
+
+
+class UserRecord(Mapping):
+    """One panel user, normalized once and shared read-only."""
+
+    __slots__ = (
+        "username",
+        "quota_bytes",
+        "upload_bytes",
+        "download_bytes",
+        "expiration_days",
+        "account_creation_date",
+        "blocked",
+        "unlimited_user",
+        "note",
+        "status",
+        "deadline",
+    )
+
+    def __init__(self, data: Mapping):
+        get = data.get
+        blocked = get("blocked")
+        unlimited = get("unlimited_user")
+        expiration_days = _int_or_none(get("expiration_days"))
+        creation_date = get("account_creation_date")
+        deadline = None
+        if expiration_days is not None and expiration_days >= 0:
+            created_at = parse_account_creation_time(creation_date)
+            if created_at is not None:
+                deadline = created_at + timedelta(days=expiration_days)
+
+        setattr_ = object.__setattr__
+        setattr_(self, "username", get("username"))
+        setattr_(self, "quota_bytes", _bytes_or_none(get("max_download_bytes")))
+        setattr_(self, "upload_bytes", _bytes_or_none(get("upload_bytes")))
+        setattr_(self, "download_bytes", _bytes_or_none(get("download_bytes")))
+        setattr_(self, "expiration_days", expiration_days)
+        setattr_(self, "account_creation_date", creation_date)
+        setattr_(self, "blocked", None if blocked is None else bool(blocked))
+        setattr_(self, "unlimited_user", None if unlimited is None else bool(unlimited))
+        setattr_(self, "note", get("note"))
+        setattr_(self, "status", get("status"))
+        setattr_(self, "deadline", deadline)
+
+    @classmethod
+    def of(cls, value):
+        """Return ``value`` as a ``UserRecord``; ``None`` when it is not a mapping."""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, Mapping):
+            return cls(value)
+        return None
+
+    def __setattr__(self, name, value):
+        raise AttributeError("UserRecord is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("UserRecord is immutable")
+
+    def __reduce__(self):
+        return (type(self), (self.as_dict(),))
+
+    @property
+    def total_bytes(self) -> int:
+        return (self.upload_bytes or 0) + (self.download_bytes or 0)
+
+    @property
+    def remaining_bytes(self) -> int | None:
+        """Bytes left before the quota, or ``None`` for unlimited traffic."""
+        if not self.quota_bytes:
+            return None
+        return max(0, self.quota_bytes - self.total_bytes)
+
+    @property
+    def is_active(self) -> bool:
+        return not self.blocked
+
+    def days_remaining(self, now: datetime | None = None) -> int | None:
+        if self.deadline is None:
+            return self.expiration_days
+        return (self.deadline.date() - (now or datetime.now()).date()).days
+
+    def __eq__(self, other):
+        if isinstance(other, UserRecord):
+            return all(getattr(self, attribute) == getattr(other, attribute) for attribute in _COMPARED)
+        if isinstance(other, Mapping):
+            # A panel field missing from ``other`` compares as None.
+            return set(other) <= PANEL_FIELDS.keys() and all(self[field] == other.get(field) for field in PANEL_FIELDS)
+        return NotImplemented
+
+    __hash__ = None
+
+    # Read-only mapping over the original panel field names.
+
+    def __getitem__(self, key):
+        attribute = PANEL_FIELDS.get(key)
+        if attribute is None:
+            raise KeyError(key)
+        return getattr(self, attribute)
+
+    def get(self, key, default=None):
+        attribute = PANEL_FIELDS.get(key)
+        value = None if attribute is None else getattr(self, attribute)
+        return default if value is None else value
+
+    def __iter__(self):
+        return iter(PANEL_FIELDS)
+
+    def __len__(self):
+        return len(PANEL_FIELDS)
+
+    def as_dict(self) -> dict:
+        """A private, mutable copy of the panel fields."""
+        return {field: getattr(self, attribute) for field, attribute in PANEL_FIELDS.items()}
+
+    def __repr__(self):
+        return f"UserRecord({self.as_dict()!r})"
+
+
+# ``deadline`` is derived from the panel fields, so equality skips it.
+_COMPARED = tuple(PANEL_FIELDS.values())
@@ -1,5 +1,6 @@
 import datetime
 import json
+from collections.abc import Mapping
 
 
 def format_username_timestamp():
@@ -15,13 +16,13 @@ def format_readable_timestamp():
 def extract_existing_usernames(users_payload):
     """Collect usernames from API responses (dict or list forms)."""
     usernames = set()
-    if isinstance(users_payload, dict):
+    if isinstance(users_payload, Mapping):
         for username in users_payload.keys():
             if isinstance(username, str) and username:
                 usernames.add(username)
     elif isinstance(users_payload, list):
         for item in users_payload:
-            if not isinstance(item, dict):
+            if not isinstance(item, Mapping):
                 continue
             username = item.get("username")
             if isinstance(username, str) and username:
@@ -40,11 +40,18 @@ def _format_status_line(status):
     active_text = str(active_count) if active_count is not None else "N/A"
     ratio_text = f"{load_ratio:.2f}" if load_ratio is not None else "N/A"
     weight = status.get("weight", 1)
-    return (
+    text = (
         f"*{status.get('name', status.get('id'))}* (`{status.get('id')}`)\n"
         f"Status: `{enabled}` | Health: `{health}`\n"
         f"Active configs: `{active_text}` | Weight: `{weight}` | Load: `{ratio_text}`"
     )
+    breaker = status.get("breaker")
+    if breaker:
+        breaker_text = breaker.get("state", "closed")
+        if breaker.get("retry_in") is not None:
+            breaker_text += f", retry in {int(breaker['retry_in'])}s"
+        text += f"\nBreaker: `{breaker_text}` | Failures: `{breaker.get('failure_rate', 0):.0%}`"
+    return text
 
 
 def _build_servers_menu():
@@ -7,6 +7,23 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 EDITUSER_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "edituser.py"
+SEARCH_PATH = EDITUSER_PATH.with_name("search.py")
+USER_RECORD_PATH = EDITUSER_PATH.with_name("user_record.py")
+
+user_record_spec = importlib.util.spec_from_file_location("user_record_display_under_test", USER_RECORD_PATH)
+user_record = importlib.util.module_from_spec(user_record_spec)
+user_record_spec.loader.exec_module(user_record)
+
+# A snapshot record for a user the panel listed without a creation date.
+UNDATED_USER = user_record.UserRecord({
+    "username": "alice",
+    "upload_bytes": 0,
+    "download_bytes": 0,
+    "status": "active",
+    "max_download_bytes": 10 * (1024 ** 3),
+    "expiration_days": 30,
+    "blocked": False,
+})
 
 
 class DummyMarkup:
@@ -31,6 +48,13 @@ class DummyQR:
 class DummyBot:
     def __init__(self):
         self.sent_photos = []
+        self.inline_answers = []
+
+    def inline_handler(self, *args, **kwargs):
+        return lambda func: func
+
+    def answer_inline_query(self, query_id, results, **kwargs):
+        self.inline_answers.append((query_id, results, kwargs))
 
     def callback_query_handler(self, *args, **kwargs):
         return lambda func: func
@@ -90,6 +114,18 @@ def load_edituser():
     return module, bot
 
 
+def load_search():
+    edituser, bot = load_edituser()
+    sys.modules["telebot"].types.InlineQueryResultArticle = lambda **kwargs: kwargs
+    sys.modules["telebot"].types.InputTextMessageContent = lambda message_text: message_text
+
+    spec = importlib.util.spec_from_file_location("search_server_display_under_test", SEARCH_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module, bot
+
+
 class AdminServerDisplayTests(unittest.TestCase):
     def test_show_user_displays_escaped_server_name_and_id(self):
         edituser, bot = load_edituser()
@@ -121,6 +157,34 @@ class AdminServerDisplayTests(unittest.TestCase):
         caption = bot.sent_photos[0][1]["caption"]
         self.assertIn("🌐 Server: Germany \\*West\\* (`de-1`)", caption)
 
+    def test_show_user_renders_a_snapshot_record_without_creation_date(self):
+        edituser, bot = load_edituser()
+        api_client = types.SimpleNamespace(
+            server_name="Germany",
+            server_id="de-1",
+            get_user_uri=lambda _username: {"normal_sub": "https://sub.example/alice"},
+        )
+        edituser.MultiServerAPI = lambda: types.SimpleNamespace(find_user=lambda _username: (api_client, UNDATED_USER))
+        message = types.SimpleNamespace(text="alice", chat=types.SimpleNamespace(id=555), from_user=types.SimpleNamespace(id=1))
+
+        edituser.process_show_user(message)
+
+        self.assertIn("⏳ Creation: None", bot.sent_photos[0][1]["caption"])
+
+    def test_inline_search_renders_a_snapshot_record_without_creation_date(self):
+        search, bot = load_search()
+        search.MultiServerAPI = lambda: types.SimpleNamespace(
+            servers=[{"id": "de-1"}],
+            iter_all_users=lambda: iter([(None, "alice", UNDATED_USER)]),
+        )
+        query = types.SimpleNamespace(id="q1", query="ali", from_user=types.SimpleNamespace(id=1))
+
+        search.handle_inline_query(query)
+
+        results = bot.inline_answers[0][1]
+        self.assertEqual([result["id"] for result in results], ["alice"])
+        self.assertIn("Account Creation: None", results[0]["input_message_content"])
+
     def test_server_label_falls_back_to_id(self):
         edituser, _bot = load_edituser()
 
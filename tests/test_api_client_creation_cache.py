@@ -1,4 +1,5 @@
 import importlib.util
+import json
 import os
 import sys
 import tempfile
@@ -6,6 +7,7 @@ import threading
 import time
 import types
 import unittest
+from datetime import datetime
 from pathlib import Path
 
 
@@ -18,6 +20,16 @@ MODULE_PATH = (
     / "api_client.py"
 )
 
+USER_RECORD_PATH = MODULE_PATH.with_name("user_record.py")
+if "utils" not in sys.modules:
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+user_record_spec = importlib.util.spec_from_file_location("utils.user_record", USER_RECORD_PATH)
+user_record = importlib.util.module_from_spec(user_record_spec)
+sys.modules[user_record_spec.name] = user_record
+user_record_spec.loader.exec_module(user_record)
+sys.modules["utils"].user_record = user_record
 spec = importlib.util.spec_from_file_location("api_client_under_test", MODULE_PATH)
 api_client = importlib.util.module_from_spec(spec)
 sys.modules[spec.name] = api_client
@@ -36,7 +48,12 @@ class FakeClient:
         self.add_results = list(add_results or [])
         self.delay = delay
         self.get_users_calls = 0
+        self.get_user_calls = []
         self.add_user_calls = []
+        self.available = True
+
+    def is_available(self):
+        return self.available
 
     def get_users(self):
         self.get_users_calls += 1
@@ -44,6 +61,11 @@ class FakeClient:
             time.sleep(self.delay)
         return self.users
 
+    def get_user(self, username):
+        self.get_user_calls.append(username)
+        users = self.users if isinstance(self.users, dict) else {}
+        return users.get(username)
+
     def add_user(self, username, traffic_limit, expiration_days, unlimited=False, note=None):
         self.add_user_calls.append({
             "username": username,
@@ -184,23 +206,68 @@ class MultiServerCreationCacheTests(unittest.TestCase):
         self.assertEqual(clients["s1"].get_users_calls, 1)
         self.assertEqual(clients["s2"].get_users_calls, 1)
 
-    def test_record_created_user_invalidates_read_snapshots_and_is_idempotent(self):
+    def test_find_user_fetches_the_full_record_from_the_owning_server_only(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": True, "password": "secret", "account_creation_date": None}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        list(multi_api.iter_all_users())
+
+        client, user = multi_api.find_user("beta")
+
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(user, {"blocked": True, "password": "secret", "account_creation_date": None})
+        self.assertEqual(clients["s1"].get_user_calls, [])
+        self.assertEqual(clients["s2"].get_user_calls, ["beta"])
+
+    def test_record_created_user_writes_through_to_read_snapshots_and_is_idempotent(self):
         clients = {
             "s1": FakeClient("s1", {}),
             "s2": FakeClient("s2", {}),
         }
         multi_api = self.make_multi_api(clients)
         multi_api.prepare_new_user_creation()
-        api_client.MultiServerAPI._user_snapshot_cache = {True: {"stale": True}}
+        list(multi_api.iter_all_users())
 
-        api_client.MultiServerAPI.record_created_user("s1", "newuser")
+        api_client.MultiServerAPI.record_created_user("s1", "newuser", {"blocked": False, "expiration_days": 30})
         api_client.MultiServerAPI.record_created_user("s1", "newuser")
         creation = multi_api.prepare_new_user_creation()
 
-        self.assertEqual(api_client.MultiServerAPI._user_snapshot_cache, {})
         self.assertIn("newuser", creation["existing_usernames"])
         server_state = next(state for state in creation["server_states"] if state["client"].server_id == "s1")
         self.assertEqual(server_state["active_count"], 1)
+        client, user = multi_api.find_user("newuser", full_user=False)
+        self.assertIs(client, clients["s1"])
+        self.assertEqual(api_client.UserRecord(user), {"blocked": False, "expiration_days": 30})
+        self.assertIn("newuser", multi_api.get_all_usernames())
+        self.assertEqual(clients["s1"].get_users_calls, 2)
+        self.assertEqual(clients["s2"].get_users_calls, 2)
+
+    def test_updates_and_deletes_write_through_without_refetching(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}, "beta": {"blocked": False}}),
+            "s2": FakeClient("s2", {"gamma": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        multi_api.prepare_new_user_creation()
+        list(multi_api.iter_all_users())
+
+        api_client.MultiServerAPI.record_updated_user("s1", "alpha", "alpha", {"blocked": True})
+        api_client.MultiServerAPI.record_updated_user("s1", "beta", "beta2", {"blocked": False})
+        api_client.MultiServerAPI.record_deleted_user("s2", "gamma")
+        creation = multi_api.prepare_new_user_creation()
+
+        self.assertEqual(multi_api.get_all_usernames(), {"alpha", "beta2"})
+        self.assertEqual(api_client.UserRecord(multi_api.find_user("alpha", full_user=False)[1]), {"blocked": True})
+        self.assertEqual(creation["existing_usernames"], {"alpha", "beta2"})
+        self.assertEqual(
+            {state["client"].server_id: state["active_count"] for state in creation["server_states"]},
+            {"s1": 1, "s2": 0},
+        )
+        self.assertEqual(clients["s1"].users, {"alpha": {"blocked": False}, "beta": {"blocked": False}})
+        self.assertEqual(clients["s1"].get_users_calls, 2)
+        self.assertEqual(clients["s2"].get_users_calls, 2)
 
     def test_rapid_create_user_with_retry_allocates_distinct_usernames_inside_ttl(self):
         def run_prefix(prefix):
@@ -275,6 +342,199 @@ class MultiServerCreationCacheTests(unittest.TestCase):
         self.assertEqual(default_usernames, ["active", "disabled"])
         self.assertEqual(enabled_usernames, ["active"])
 
+    def test_find_user_answers_from_fresh_snapshot_index(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"Beta": {"blocked": True}, "alpha": {"blocked": True}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        list(multi_api.iter_all_users())
+
+        client, user = multi_api.find_user("beta", full_user=False)
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(api_client.UserRecord(user), {"blocked": True})
+        client, _ = multi_api.find_user("alpha", preferred_server_id="s2", full_user=False)
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(multi_api.find_user("missing", full_user=False), (None, None))
+
+        self.assertEqual(clients["s1"].get_user_calls, [])
+        self.assertEqual(clients["s2"].get_user_calls, [])
+
+    def test_find_user_queries_single_server_when_snapshot_is_stale(self):
+        current_time = [100.0]
+        api_client.time.monotonic = lambda: current_time[0]
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        list(multi_api.iter_all_users())
+        current_time[0] += 31
+        clients["s2"].users = {"beta": {"blocked": True}}
+
+        client, user = multi_api.find_user("beta")
+
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(user, {"blocked": True})
+        self.assertEqual(clients["s1"].get_user_calls, [])
+        self.assertEqual(clients["s2"].get_user_calls, ["beta"])
+
+    def test_find_user_serves_stale_snapshot_while_server_circuit_is_open(self):
+        current_time = [100.0]
+        api_client.time.monotonic = lambda: current_time[0]
+        clients = {"s1": FakeClient("s1", {"beta": {"blocked": False}})}
+        multi_api = self.make_multi_api(clients)
+        list(multi_api.iter_all_users())
+        current_time[0] += 31
+        clients["s1"].available = False
+
+        client, user = multi_api.find_user("beta")
+
+        self.assertEqual(client.server_id, "s1")
+        self.assertEqual(user, {"blocked": False})
+        self.assertEqual(clients["s1"].get_user_calls, [])
+
+    def test_find_user_without_snapshot_falls_back_to_serial_lookup(self):
+        clients = {
+            "s1": FakeClient("s1", {}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+
+        client, _ = multi_api.find_user("beta")
+
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(clients["s1"].get_user_calls, ["beta"])
+        self.assertEqual(clients["s1"].get_users_calls, 0)
+
+    def start_refresher(self):
+        refresher = api_client.UserSnapshotRefresher(interval_seconds=3600)
+        api_client._snapshot_refresher = refresher
+        self.addCleanup(setattr, api_client, "_snapshot_refresher", None)
+        self.addCleanup(refresher.stop)
+        refresher.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not api_client.MultiServerAPI._user_snapshot_cache.get(True):
+            time.sleep(0.01)
+        return refresher
+
+    def test_background_refresher_serves_last_good_snapshot_past_ttl(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        self.start_refresher()
+        current_time = [time.monotonic() + 100]
+        api_client.time.monotonic = lambda: current_time[0]
+
+        usernames = [username for _, username, _ in multi_api.iter_all_users()]
+
+        self.assertEqual(usernames, ["alpha", "beta"])
+        self.assertTrue(multi_api.last_user_snapshot_cache_hit)
+        self.assertEqual(clients["s1"].get_users_calls, 1)
+        self.assertEqual(clients["s2"].get_users_calls, 1)
+        self.assertGreaterEqual(multi_api.get_user_snapshot_age(), 100)
+
+    def test_stalled_background_refresher_falls_back_to_a_synchronous_refresh(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        refresher = self.start_refresher()
+        clients["s2"].users = {"beta": {"blocked": False}, "gamma": {"blocked": False}}
+        current_time = [time.monotonic() + refresher.stall_timeout() + 1]
+        api_client.time.monotonic = lambda: current_time[0]
+
+        usernames = [username for _, username, _ in multi_api.iter_all_users()]
+
+        self.assertEqual(usernames, ["alpha", "beta", "gamma"])
+        self.assertFalse(multi_api.last_user_snapshot_cache_hit)
+        self.assertEqual(clients["s2"].get_users_calls, 2)
+        self.assertLess(multi_api.get_user_snapshot_age(), 1)
+
+    def test_failing_panel_does_not_make_a_publishing_refresher_look_stalled(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        refresher = self.start_refresher()
+        servers = api_client.get_server_configs()
+        current_time = [time.monotonic() + refresher.stall_timeout() + 1]
+        api_client.time.monotonic = lambda: current_time[0]
+
+        clients["s2"].users = None
+        refresher.refresh_server(servers[1])
+        self.assertGreaterEqual(multi_api.get_user_snapshot_age(), refresher.stall_timeout())
+        usernames = [username for _, username, _ in multi_api.iter_all_users()]
+
+        self.assertEqual(usernames, ["alpha", "beta"])
+        self.assertTrue(multi_api.last_user_snapshot_cache_hit)
+        self.assertEqual(clients["s1"].get_users_calls, 1)
+        self.assertEqual(clients["s2"].get_users_calls, 2)
+
+    def test_background_refresher_updates_servers_independently_and_keeps_last_good(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        refresher = self.start_refresher()
+        servers = api_client.get_server_configs()
+
+        clients["s1"].users = {"alpha": {"blocked": True}, "gamma": {"blocked": False}}
+        refresher.refresh_server(servers[0])
+        clients["s2"].users = None
+        refresher.refresh_server(servers[1])
+
+        users = {username: data for _, username, data in multi_api.iter_all_users()}
+        self.assertEqual(users, {
+            "alpha": {"blocked": True},
+            "gamma": {"blocked": False},
+            "beta": {"blocked": False},
+        })
+        entries = multi_api.get_user_snapshot_entries()
+        self.assertEqual([entry["error"] for entry in entries], [None, "refresh failed"])
+
+    def test_write_invalidation_drops_refresher_data_fetched_before_it(self):
+        clients = {"s1": FakeClient("s1", {"alpha": {"blocked": False}})}
+        multi_api = self.make_multi_api(clients)
+        self.start_refresher()
+
+        api_client.MultiServerAPI.invalidate_all_caches()
+        clients["s1"].users = {"alpha": {"blocked": True}}
+
+        users = {username: data for _, username, data in multi_api.iter_all_users()}
+        self.assertEqual(users, {"alpha": {"blocked": True}})
+
+    def test_refresher_keeps_written_through_changes_over_older_fetches(self):
+        clients = {
+            "s1": FakeClient("s1", {"alpha": {"blocked": False}, "delta": {"blocked": False}}),
+            "s2": FakeClient("s2", {"beta": {"blocked": False}}),
+        }
+        multi_api = self.make_multi_api(clients)
+        refresher = self.start_refresher()
+        servers = api_client.get_server_configs()
+
+        api_client.MultiServerAPI.record_deleted_user("s1", "alpha")
+        refresher.refresh_server(servers[1])
+        self.assertEqual(multi_api.get_all_usernames(), {"delta", "beta"})
+
+        stale_get_users = clients["s1"].get_users
+
+        def get_users_racing_a_write():
+            users = dict(stale_get_users())
+            api_client.MultiServerAPI.record_deleted_user("s1", "delta")
+            return users
+
+        clients["s1"].get_users = get_users_racing_a_write
+        refresher.refresh_server(servers[0])
+
+        self.assertEqual(multi_api.get_all_usernames(), {"beta"})
+        self.assertEqual(refresher._next_due["s1"], 0)
+
     def test_iter_all_users_reuses_cached_snapshot_inside_ttl(self):
         clients = {
             "s1": FakeClient("s1", {"active": {"blocked": False}}),
@@ -464,9 +724,16 @@ class APIClientPoolingTests(unittest.TestCase):
         sessions = []
 
         class FakeResponse:
+            status_code = 200
+            headers = {}
+            content = b"{}"
+
             def raise_for_status(self):
                 return None
 
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
             def json(self):
                 return {}
 
@@ -498,15 +765,22 @@ class APIClientPoolingTests(unittest.TestCase):
         self.assertIs(first.session, second.session)
         self.assertEqual([call[0] for call in sessions[0].request_calls], ["GET", "GET"])
 
-    def test_read_write_timeouts_and_write_invalidation_are_applied(self):
+    def test_read_write_timeouts_and_write_through_are_applied(self):
         os.environ["DIJIQ_API_READ_TIMEOUT_SECONDS"] = "2.5"
         os.environ["DIJIQ_API_WRITE_TIMEOUT_SECONDS"] = "7.5"
         sessions = []
 
         class FakeResponse:
+            status_code = 200
+            headers = {}
+            content = b"{}"
+
             def raise_for_status(self):
                 return None
 
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
             def json(self):
                 return {"ok": True}
 
@@ -532,26 +806,34 @@ class APIClientPoolingTests(unittest.TestCase):
 
         client.get_users()
         api_client.MultiServerAPI._creation_cache = {"usernames": set(), "servers": [], "signature": ()}
-        api_client.MultiServerAPI._user_snapshot_cache = {True: {"stale": True}}
-        client.update_user("alice", {"blocked": True})
-        api_client.MultiServerAPI._creation_cache = {"usernames": set(), "servers": [], "signature": ()}
-        api_client.MultiServerAPI._user_snapshot_cache = {True: {"stale": True}}
-        client.delete_user("alice")
-
-        self.assertEqual(sessions[0].request_calls[0][2]["timeout"], 2.5)
-        self.assertEqual(sessions[0].request_calls[1][2]["timeout"], 7.5)
-        self.assertEqual(sessions[0].request_calls[2][2]["timeout"], 7.5)
-        self.assertIsNone(api_client.MultiServerAPI._creation_cache)
-        self.assertEqual(api_client.MultiServerAPI._user_snapshot_cache, {})
+        client.update_user("alice", {"new_username": "alice2"})
+        self.assertEqual(api_client.MultiServerAPI._creation_cache["usernames"], {"alice2"})
+        client.delete_user("alice2")
+
+        calls = [(method, url.rsplit("/", 1)[-1], kwargs["timeout"]) for method, url, kwargs in sessions[0].request_calls]
+        self.assertEqual(calls, [
+            ("GET", "", 2.5),
+            ("PATCH", "alice", 7.5),
+            ("GET", "alice2", 2.5),
+            ("DELETE", "alice2", 7.5),
+        ])
+        self.assertEqual(api_client.MultiServerAPI._creation_cache["usernames"], set())
 
     def test_reset_user_uses_documented_mutating_get_endpoint(self):
         os.environ["DIJIQ_API_WRITE_TIMEOUT_SECONDS"] = "7.5"
         sessions = []
 
         class FakeResponse:
+            status_code = 200
+            headers = {}
+            content = b"{}"
+
             def raise_for_status(self):
                 return None
 
+            def iter_content(self, chunk_size=1):
+                yield self.content
+
             def json(self):
                 return {"detail": "User has been reset."}
 
@@ -580,15 +862,261 @@ class APIClientPoolingTests(unittest.TestCase):
         result = client.reset_user("alice")
 
         self.assertEqual(result, {"detail": "User has been reset."})
-        self.assertEqual(len(sessions[0].request_calls), 1)
+        self.assertEqual(len(sessions[0].request_calls), 2)
         method, url, kwargs = sessions[0].request_calls[0]
         self.assertEqual(method, "GET")
         self.assertEqual(url, "https://s1.test/api/v1/users/alice/reset")
         self.assertEqual(kwargs["timeout"], 7.5)
         self.assertIsNone(kwargs.get("json"))
         self.assertNotIn("Content-Type", kwargs["headers"])
-        self.assertIsNone(api_client.MultiServerAPI._creation_cache)
-        self.assertEqual(api_client.MultiServerAPI._user_snapshot_cache, {})
+        self.assertEqual(sessions[0].request_calls[1][:2], ("GET", "https://s1.test/api/v1/users/alice"))
+        self.assertIsNotNone(api_client.MultiServerAPI._creation_cache)
+
+
+class FakePanelResponse:
+    headers = {}
+
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self.payload = payload
+        self.content = json.dumps(payload).encode("utf-8")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise api_client.requests.exceptions.HTTPError(f"{self.status_code} error")
+
+    def json(self):
+        return self.payload
+
+    def iter_content(self, chunk_size=1):
+        yield self.content
+
+
+class FakePanels:
+    """Thread-safe stand-in for several panels reached through pooled sessions."""
+
+    def __init__(self, users_by_host, delay=0):
+        self.users_by_host = users_by_host
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.requests = []
+        self.active = {}
+        self.max_active = {}
+
+    def session(self):
+        panels = self
+
+        class Session:
+            def mount(self, *_args, **_kwargs):
+                return None
+
+            def request(self, method, url, **kwargs):
+                return panels.handle(method, url, kwargs.get("json"))
+
+        return Session()
+
+    def handle(self, method, url, data):
+        host = url.split("/")[2].split(".")[0]
+        username = url.rstrip("/").rsplit("/", 1)[-1]
+        with self.lock:
+            self.requests.append((method, host))
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        try:
+            if method != "GET" and self.delay:
+                time.sleep(self.delay)
+            with self.lock:
+                users = self.users_by_host[host]
+                if method == "GET" and username == "users":
+                    return FakePanelResponse(200, dict(users))
+                if method == "GET":
+                    record = users.get(username)
+                    return FakePanelResponse(200 if record else 404, dict(record or {}))
+                if method == "POST":
+                    users[data["username"]] = {"blocked": False}
+                    return FakePanelResponse(200, {"created": data["username"]})
+                if username not in users:
+                    return FakePanelResponse(404, None)
+                if method == "DELETE":
+                    del users[username]
+                    return FakePanelResponse(200, {"deleted": username})
+                users[username].update(data)
+                return FakePanelResponse(200, {"updated": username})
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+
+class BulkUserMutationTests(unittest.TestCase):
+    def setUp(self):
+        self.original_session_factory = api_client.requests.Session
+        self.original_get_server_configs = api_client.get_server_configs
+        self.original_workers = os.environ.get("DIJIQ_BULK_WORKERS_PER_SERVER")
+        os.environ["DIJIQ_BULK_WORKERS_PER_SERVER"] = "2"
+        api_client._thread_local.api_sessions = {}
+        api_client.reset_circuit_breakers()
+        api_client._conditional_cache.clear()
+        api_client.MultiServerAPI._creation_cache = None
+        api_client.MultiServerAPI._user_snapshot_cache = {}
+
+        self.panels = FakePanels({
+            "s1": {"old1": {"blocked": False}, "old2": {"blocked": False}},
+            "s2": {"keep": {"blocked": False}},
+        }, delay=0.05)
+        api_client.requests.Session = self.panels.session
+        # The fake panels sit behind requests sessions, so keep reads on the thread pool.
+        self.original_async_api = api_client.get_async_multi_server_api
+        api_client.get_async_multi_server_api = lambda: None
+        servers = [
+            {"id": server_id, "name": server_id, "url": f"https://{server_id}.test", "token": "token", "enabled": True, "weight": 1}
+            for server_id in ("s1", "s2")
+        ]
+        api_client.get_server_configs = lambda: servers
+
+    def tearDown(self):
+        api_client.requests.Session = self.original_session_factory
+        api_client.get_server_configs = self.original_get_server_configs
+        api_client.get_async_multi_server_api = self.original_async_api
+        api_client._thread_local.api_sessions = {}
+        api_client.MultiServerAPI._creation_cache = None
+        api_client.MultiServerAPI._user_snapshot_cache = {}
+        if self.original_workers is None:
+            os.environ.pop("DIJIQ_BULK_WORKERS_PER_SERVER", None)
+        else:
+            os.environ["DIJIQ_BULK_WORKERS_PER_SERVER"] = self.original_workers
+
+    def test_bulk_add_and_delete_patch_snapshots_instead_of_refetching(self):
+        multi_api = api_client.MultiServerAPI()
+        multi_api.prepare_new_user_creation()
+        list(multi_api.iter_all_users())
+        s1, s2 = multi_api.get_client("s1"), multi_api.get_client("s2")
+        gets_before = sum(1 for method, _ in self.panels.requests if method == "GET")
+
+        added = multi_api.bulk_add_users(
+            [(s1, f"new{index}", {"traffic_limit": 1, "expiration_days": 30}) for index in range(5)]
+            + [(s2, "new5", {"traffic_limit": 2, "expiration_days": 7, "unlimited": True})]
+        )
+        deleted = multi_api.bulk_delete_users([(s1, "old1"), (s2, "missing"), (None, "nobody")])
+
+        self.assertEqual([username for _, username, _ in added], ["new0", "new1", "new2", "new3", "new4", "new5"])
+        self.assertTrue(all(result is not None for _, _, result in added))
+        self.assertEqual([result is not None for _, _, result in deleted], [True, False, False])
+        self.assertEqual(self.panels.max_active["s1"], 2)
+
+        usernames = multi_api.get_all_usernames()
+        self.assertIn("new5", usernames)
+        self.assertNotIn("old1", usernames)
+        client, user = multi_api.find_user("new5", full_user=False)
+        self.assertEqual(client.server_id, "s2")
+        self.assertEqual(user["max_download_bytes"], 2 * 1024 ** 3)
+        self.assertIs(user.get("unlimited_user"), True)
+        self.assertEqual(user["account_creation_date"], datetime.now().strftime("%Y-%m-%d"))
+        self.assertEqual(api_client.UserRecord(user).days_remaining(), 7)
+        creation = api_client.MultiServerAPI._creation_cache
+        self.assertEqual({state["client"].server_id: state["active_count"] for state in creation["servers"]}, {"s1": 6, "s2": 2})
+        self.assertEqual(sum(1 for method, _ in self.panels.requests if method == "GET"), gets_before)
+
+    def test_bulk_update_writes_records_back_once(self):
+        multi_api = api_client.MultiServerAPI()
+        list(multi_api.iter_all_users())
+        s1 = multi_api.get_client("s1")
+        users_gets = sum(1 for method, host in self.panels.requests if method == "GET")
+
+        results = multi_api.bulk_update_users([(s1, "old1", {"blocked": True}), (s1, "old2", {"blocked": True})])
+
+        self.assertTrue(all(result is not None for _, _, result in results))
+        self.assertTrue(self.panels.users_by_host["s1"]["old2"]["blocked"])
+        self.assertEqual(api_client.UserRecord(multi_api.find_user("old2", full_user=False)[1]), {"blocked": True})
+        self.assertEqual(sum(1 for method, host in self.panels.requests if method == "GET"), users_gets + 2)
+
+
+class CircuitBreakerTests(unittest.TestCase):
+    def setUp(self):
+        self.original_monotonic = api_client.time.monotonic
+        self.original_session_factory = api_client.requests.Session
+        self.original_thread_sessions = getattr(api_client._thread_local, "api_sessions", None)
+        self.now = [100.0]
+        api_client.time.monotonic = lambda: self.now[0]
+        api_client._thread_local.api_sessions = {}
+        api_client.reset_circuit_breakers()
+
+    def tearDown(self):
+        api_client.time.monotonic = self.original_monotonic
+        api_client.requests.Session = self.original_session_factory
+        api_client._thread_local.api_sessions = self.original_thread_sessions or {}
+        api_client.reset_circuit_breakers()
+
+    def make_breaker(self):
+        return api_client.CircuitBreaker(
+            "s1",
+            window=4,
+            min_calls=4,
+            failure_rate=0.5,
+            slow_call_seconds=1,
+            slow_call_rate=0.75,
+            open_seconds=30,
+        )
+
+    def test_breaker_opens_on_failure_rate_and_closes_after_good_probe(self):
+        breaker = self.make_breaker()
+        for success in (True, False, True, False):
+            self.assertTrue(breaker.allow_request())
+            breaker.record(success, 0.1)
+
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+        self.assertEqual(breaker.snapshot()["retry_in"], 30)
+
+        self.now[0] += 30
+        self.assertEqual(breaker.state, "half-open")
+        self.assertTrue(breaker.allow_request())
+        self.assertFalse(breaker.allow_request())
+        breaker.record(True, 0.1)
+        self.assertEqual(breaker.state, "closed")
+
+    def test_breaker_opens_on_slow_calls_and_reopens_after_bad_probe(self):
+        breaker = self.make_breaker()
+        for _ in range(4):
+            breaker.record(True, 2)
+        self.assertEqual(breaker.state, "open")
+
+        self.now[0] += 30
+        self.assertTrue(breaker.allow_request())
+        breaker.record(False, 0.1)
+        self.assertEqual(breaker.state, "open")
+        self.assertFalse(breaker.allow_request())
+
+    def test_open_breaker_skips_requests_and_is_reported_in_server_statuses(self):
+        requests_sent = []
+
+        class FailingSession:
+            def mount(self, *_args, **_kwargs):
+                return None
+
+            def request(self, method, url, **kwargs):
+                requests_sent.append(url)
+                raise api_client.requests.exceptions.ConnectTimeout("timed out")
+
+        api_client.requests.Session = FailingSession
+        server = {"id": "s1", "name": "s1", "url": "https://s1.test", "token": "token", "enabled": True, "weight": 1}
+        original_get_server_configs = api_client.get_server_configs
+        api_client.get_server_configs = lambda: [server]
+        self.addCleanup(setattr, api_client, "get_server_configs", original_get_server_configs)
+        client = api_client.APIClient(server)
+        breaker = client.breaker
+        breaker.min_calls = 2
+
+        self.assertIsNone(client.get_users())
+        self.assertIsNone(client.get_user("alice"))
+        self.assertEqual(len(requests_sent), 2)
+        self.assertFalse(client.is_available())
+
+        statuses = api_client.MultiServerAPI().get_server_statuses()
+
+        self.assertEqual(len(requests_sent), 2)
+        self.assertFalse(statuses[0]["healthy"])
+        self.assertEqual(statuses[0]["breaker"]["state"], "open")
+        self.assertIs(api_client.APIClient(server).breaker, breaker)
 
 
 class ServerConfigPersistenceTests(unittest.TestCase):
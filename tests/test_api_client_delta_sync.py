@@ -0,0 +1,215 @@
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import types
+import unittest
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "api_client.py"
+)
+
+if "dotenv" not in sys.modules:
+    dotenv_stub = types.ModuleType("dotenv")
+    dotenv_stub.load_dotenv = lambda *args, **kwargs: None
+    sys.modules["dotenv"] = dotenv_stub
+USER_RECORD_PATH = MODULE_PATH.with_name("user_record.py")
+if "utils" not in sys.modules:
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+user_record_spec = importlib.util.spec_from_file_location("utils.user_record", USER_RECORD_PATH)
+user_record = importlib.util.module_from_spec(user_record_spec)
+sys.modules[user_record_spec.name] = user_record
+user_record_spec.loader.exec_module(user_record)
+sys.modules["utils"].user_record = user_record
+spec = importlib.util.spec_from_file_location("api_client_delta_under_test", MODULE_PATH)
+api_client = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = api_client
+spec.loader.exec_module(api_client)
+
+
+class StandInPanel:
+    """Minimal users endpoint that honours If-None-Match like a panel with ETags."""
+
+    def __init__(self, users):
+        self.users = users
+        self.body_bytes_sent = 0
+        self.not_modified = 0
+        panel = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(panel.users, sort_keys=True).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    panel.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                panel.body_bytes_sent += len(body)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DeltaSyncTests(unittest.TestCase):
+    def setUp(self):
+        self.original_ttl = os.environ.get("SERVER_USERS_CACHE_TTL_SECONDS")
+        self.original_get_server_configs = api_client.get_server_configs
+        os.environ["SERVER_USERS_CACHE_TTL_SECONDS"] = "0"
+        api_client._conditional_cache.clear()
+        api_client.reset_transfer_stats()
+        api_client._thread_local.api_sessions = {}
+        api = api_client.MultiServerAPI
+        api._creation_cache = None
+        api._user_snapshot_cache = {}
+        api._user_payloads = {}
+        api._user_change_log = deque(maxlen=api_client.USER_CHANGE_LOG_LIMIT)
+        api._user_change_version = 0
+        api._user_change_floor = 0
+
+        self.panel = StandInPanel({
+            "alpha": {"upload_bytes": 1, "blocked": False},
+            "beta": {"upload_bytes": 2, "blocked": False},
+            "gamma": {"upload_bytes": 3, "blocked": False},
+        })
+        self.addCleanup(self.panel.close)
+        servers = [{"id": "s1", "name": "s1", "url": self.panel.url, "token": "token", "enabled": True, "weight": 1}]
+        api_client.get_server_configs = lambda: servers
+
+    def tearDown(self):
+        api_client.get_server_configs = self.original_get_server_configs
+        for session in api_client._thread_local.api_sessions.values():
+            session.close()
+        api_client._thread_local.api_sessions = {}
+        if self.original_ttl is None:
+            os.environ.pop("SERVER_USERS_CACHE_TTL_SECONDS", None)
+        else:
+            os.environ["SERVER_USERS_CACHE_TTL_SECONDS"] = self.original_ttl
+
+    def test_unchanged_users_list_is_revalidated_without_a_body(self):
+        client = api_client.MultiServerAPI().get_client("s1")
+
+        first = client.get_users()
+        second = client.get_users()
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.panel.not_modified, 1)
+        stats = api_client.get_transfer_stats("s1")
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["not_modified"], 1)
+        self.assertEqual(stats["bytes"], self.panel.body_bytes_sent)
+        self.assertEqual(stats["bytes_saved"], self.panel.body_bytes_sent)
+
+    def test_change_stream_lists_only_modified_users(self):
+        multi_api = api_client.MultiServerAPI()
+        version, changes = multi_api.get_user_changes()
+        self.assertIsNone(changes)
+
+        self.panel.users = {
+            "alpha": {"upload_bytes": 1, "blocked": False},
+            "beta": {"upload_bytes": 200, "blocked": False},
+            "delta": {"upload_bytes": 0, "blocked": False},
+        }
+        version, changes = multi_api.get_user_changes(version)
+        self.assertEqual(
+            sorted((client.server_id, username, record) for client, username, record in changes),
+            [
+                ("s1", "beta", {"upload_bytes": 200, "blocked": False}),
+                ("s1", "delta", {"upload_bytes": 0, "blocked": False}),
+                ("s1", "gamma", None),
+            ],
+        )
+
+        body_bytes = self.panel.body_bytes_sent
+        version_after, changes = multi_api.get_user_changes(version)
+        self.assertEqual((version_after, changes), (version, []))
+        self.assertEqual(self.panel.body_bytes_sent, body_bytes)
+        self.assertEqual(api_client.get_transfer_stats("s1")["not_modified"], 1)
+
+    def test_outdated_version_requires_a_full_scan(self):
+        multi_api = api_client.MultiServerAPI()
+        version, _ = multi_api.get_user_changes()
+
+        self.assertIsNone(multi_api.get_user_changes(version + 5)[1])
+        api_client.MultiServerAPI._user_change_floor = version + 1
+        self.assertIsNone(multi_api.get_user_changes(version)[1])
+
+
+
+class UsersStreamReaderTests(unittest.TestCase):
+    def read(self, body, chunk_size):
+        reader = api_client.UsersStreamReader()
+        for start in range(0, len(body), chunk_size):
+            reader.feed(body[start:start + chunk_size])
+        return reader.close(), reader.size
+
+    def test_records_split_across_chunks_are_decoded_and_compacted(self):
+        users = {
+            "alice": {"upload_bytes": 12345, "blocked": False, "note": "caf\u00e9 \u2603", "password": "secret", "sub": {"x": [1, 2]}},
+            "bob": {"max_download_bytes": 1073741824, "expiration_days": 30, "status": "Online"},
+        }
+        body = json.dumps(users, indent=1).encode("utf-8")
+
+        for chunk_size in (1, 3, 7, len(body)):
+            with self.subTest(chunk_size=chunk_size):
+                payload, size = self.read(body, chunk_size)
+                self.assertEqual(payload, {
+                    "alice": {"upload_bytes": 12345, "blocked": False, "note": "caf\u00e9 \u2603"},
+                    "bob": {"max_download_bytes": 1073741824, "expiration_days": 30, "status": "Online"},
+                })
+                self.assertEqual(size, len(body))
+
+    def test_list_payloads_keep_their_shape(self):
+        body = json.dumps([{"username": "alice", "download_bytes": 5, "uuid": "u1"}, {"username": "bob"}]).encode("utf-8")
+
+        payload, _ = self.read(body, 4)
+
+        self.assertEqual(payload, [{"username": "alice", "download_bytes": 5}, {"username": "bob"}])
+
+    def test_truncated_or_malformed_bodies_are_rejected(self):
+        for body in (b'{"alice": {"blocked": false}', b'{"alice" {"blocked": false}}', b'[1, 2] trailing', b""):
+            with self.subTest(body=body):
+                with self.assertRaises(ValueError):
+                    self.read(body, 5)
+
+    def test_client_stores_compact_records(self):
+        panel = StandInPanel({"alpha": {"upload_bytes": 1, "blocked": False, "password": "p"}})
+        self.addCleanup(panel.close)
+        client = api_client.APIClient({"id": "stream", "name": "stream", "url": panel.url, "token": "token"})
+        self.addCleanup(client.session.close)
+
+        self.assertEqual(client.get_users(), {"alpha": {"upload_bytes": 1, "blocked": False}})
+        self.assertEqual(api_client.get_transfer_stats("stream")["bytes"], panel.body_bytes_sent)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import types
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "api_client.py"
+)
+
+if "dotenv" not in sys.modules:
+    dotenv_stub = types.ModuleType("dotenv")
+    dotenv_stub.load_dotenv = lambda *args, **kwargs: None
+    sys.modules["dotenv"] = dotenv_stub
+USER_RECORD_PATH = MODULE_PATH.with_name("user_record.py")
+if "utils" not in sys.modules:
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+user_record_spec = importlib.util.spec_from_file_location("utils.user_record", USER_RECORD_PATH)
+user_record = importlib.util.module_from_spec(user_record_spec)
+sys.modules[user_record_spec.name] = user_record
+user_record_spec.loader.exec_module(user_record)
+sys.modules["utils"].user_record = user_record
+spec = importlib.util.spec_from_file_location("api_client_async_under_test", MODULE_PATH)
+api_client = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = api_client
+spec.loader.exec_module(api_client)
+
+
+def tearDownModule():
+    if api_client._async_api is not None:
+        api_client._async_api.close()
+
+
+class SlowPanel:
+    """Users endpoint that answers after ``delay`` seconds and honours ETags."""
+
+    def __init__(self, users, delay=0):
+        self.users = users
+        self.delay = delay
+        self.requests = 0
+        self.not_modified = 0
+        panel = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                panel.requests += 1
+                time.sleep(panel.delay)
+                body = json.dumps(panel.users, sort_keys=True).encode("utf-8")
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    panel.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class AsyncFanOutTests(unittest.TestCase):
+    def setUp(self):
+        self.original_get_server_configs = api_client.get_server_configs
+        self.original_executor = api_client.ThreadPoolExecutor
+        self.original_ttl = os.environ.get("SERVER_USERS_CACHE_TTL_SECONDS")
+        os.environ["SERVER_USERS_CACHE_TTL_SECONDS"] = "0"
+        api_client._conditional_cache.clear()
+        api_client.reset_transfer_stats()
+        api_client.reset_circuit_breakers()
+        api_client._thread_local.api_sessions = {}
+        api_client.MultiServerAPI._creation_cache = None
+        api_client.MultiServerAPI._user_snapshot_cache = {}
+
+        self.panels = []
+        servers = []
+        for index in range(6):
+            panel = SlowPanel({f"user{index}": {"blocked": False}}, delay=0.3)
+            self.addCleanup(panel.close)
+            self.panels.append(panel)
+            servers.append({"id": f"s{index}", "name": f"s{index}", "url": panel.url, "token": "token", "enabled": True, "weight": 1})
+        api_client.get_server_configs = lambda: servers
+
+    def tearDown(self):
+        api_client.get_server_configs = self.original_get_server_configs
+        api_client.ThreadPoolExecutor = self.original_executor
+        for session in api_client._thread_local.api_sessions.values():
+            session.close()
+        api_client._thread_local.api_sessions = {}
+        if self.original_ttl is None:
+            os.environ.pop("SERVER_USERS_CACHE_TTL_SECONDS", None)
+        else:
+            os.environ["SERVER_USERS_CACHE_TTL_SECONDS"] = self.original_ttl
+
+    def test_fleet_fetch_is_bounded_by_the_slowest_server_without_worker_threads(self):
+        def no_threads(*args, **kwargs):
+            raise AssertionError("fan-out must not start a thread pool")
+
+        api_client.ThreadPoolExecutor = no_threads
+        self.panels[-1].delay = 0.6
+
+        started = time.monotonic()
+        entries = api_client.MultiServerAPI().fetch_server_users(include_disabled=True)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual([entry["users"] for entry in entries], [{f"user{index}": {"blocked": False}} for index in range(6)])
+        self.assertLess(elapsed, 1.2)
+        self.assertTrue(all(isinstance(entry["client"], api_client.APIClient) for entry in entries))
+
+    def test_async_reads_share_etag_cache_and_transfer_stats_with_sync_client(self):
+        for panel in self.panels:
+            panel.delay = 0
+        multi_api = api_client.MultiServerAPI()
+        self.assertIsNotNone(multi_api.get_client("s0").get_users())
+
+        multi_api.fetch_server_users(include_disabled=True)
+
+        self.assertEqual(self.panels[0].not_modified, 1)
+        self.assertEqual(api_client.get_transfer_stats("s0")["not_modified"], 1)
+        self.assertEqual(self.panels[1].not_modified, 0)
+
+    def test_open_circuit_skips_the_server(self):
+        for panel in self.panels:
+            panel.delay = 0
+        multi_api = api_client.MultiServerAPI()
+        breaker = multi_api.get_client("s2").breaker
+        breaker._open(time.monotonic())
+
+        entries = multi_api.fetch_server_users(include_disabled=True)
+
+        self.assertIsNone(entries[2]["users"])
+        self.assertEqual(self.panels[2].requests, 0)
+        self.assertEqual(entries[3]["users"], {"user3": {"blocked": False}})
+
+
+if __name__ == "__main__":
+    unittest.main()
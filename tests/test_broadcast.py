@@ -6,6 +6,8 @@ import types
 import unittest
 from pathlib import Path
 
+from utils_loader import install_utils_package, load_utils_module
+
 
 MODULE_PATH = (
     Path(__file__).resolve().parents[1]
@@ -49,6 +51,12 @@ class DummyBot:
     def message_handler(self, *args, **kwargs):
         return lambda func: func
 
+    def callback_query_handler(self, *args, **kwargs):
+        return lambda func: func
+
+    def answer_callback_query(self, *args, **kwargs):
+        pass
+
     def reply_to(self, *args, **kwargs):
         return DummyStatusMessage()
 
@@ -70,12 +78,16 @@ def install_stubs():
     telebot_stub.types = types.SimpleNamespace(
         ReplyKeyboardMarkup=DummyMarkup,
         KeyboardButton=DummyButton,
+        InlineKeyboardMarkup=DummyMarkup,
+        InlineKeyboardButton=DummyButton,
     )
     sys.modules["telebot"] = telebot_stub
 
-    utils_pkg = types.ModuleType("utils")
-    utils_pkg.__path__ = []
-    sys.modules["utils"] = utils_pkg
+    utils_pkg = install_utils_package()
+    load_utils_module(utils_pkg, "json_store")
+    notification_queue = load_utils_module(utils_pkg, "notification_queue")
+    notification_queue._dispatcher = notification_queue.NotificationDispatcher(per_chat_interval=0)
+    load_utils_module(utils_pkg, "broadcast_jobs")
 
     command_stub = types.ModuleType("utils.command")
     command_stub.bot = DummyBot()
@@ -192,7 +204,7 @@ class BroadcastSendTests(unittest.TestCase):
                 super().__init__()
                 self.sent_documents = 0
 
-            def send_message(self, user_id, text):
+            def send_message(self, user_id, text, **kwargs):
                 if user_id == 1:
                     raise Exception("Too Many Requests: retry after 10")
                 if user_id == 2:
@@ -212,7 +224,15 @@ class BroadcastSendTests(unittest.TestCase):
                 log_file.write("log")
             broadcast.generate_broadcast_log = lambda **kwargs: log_path
 
-            broadcast.send_broadcast(self.make_message("hello"), "all", "All Paid Users")
+            broadcast.notification_queue._dispatcher = broadcast.notification_queue.NotificationDispatcher(
+                per_chat_interval=0,
+                max_retries=0,
+            )
+            broadcast.broadcast_jobs.BROADCAST_JOBS_DIR = tmpdir
+            runner = broadcast.send_broadcast(self.make_message("hello"), "all", "All Paid Users")
+            runner.join(5)
+            self.assertFalse(runner.is_alive())
+            self.assertEqual(broadcast.broadcast_jobs.list_jobs(), [])
 
         self.assertEqual(saved_failed_users, ["2"])
         self.assertEqual(broadcast.bot.sent_documents, 1)
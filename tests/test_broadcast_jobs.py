@@ -0,0 +1,170 @@
+import importlib.util
+import json
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from pathlib import Path
+
+
+UTILS_DIR = Path(__file__).resolve().parents[1] / "core" / "scripts" / "telegrambot" / "utils"
+MODULE_PATH = UTILS_DIR / "broadcast_jobs.py"
+JSON_STORE_PATH = UTILS_DIR / "json_store.py"
+
+
+def load_broadcast_jobs():
+    utils_pkg = sys.modules.get("utils")
+    if utils_pkg is None:
+        utils_pkg = types.ModuleType("utils")
+        utils_pkg.__path__ = []
+        sys.modules["utils"] = utils_pkg
+
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
+    spec = importlib.util.spec_from_file_location("broadcast_jobs_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FinishedChunk:
+    def __init__(self, chat_ids, failures):
+        self.succeeded = [chat_id for chat_id in chat_ids if chat_id not in failures]
+        self.failed = {chat_id: failures[chat_id] for chat_id in chat_ids if chat_id in failures}
+        self.permanent_failures = {chat_id for chat_id, error in self.failed.items() if "blocked" in error}
+
+    def wait(self, timeout=None):
+        return True
+
+
+class BroadcastJobTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.jobs = load_broadcast_jobs()
+        self.jobs.BROADCAST_JOBS_DIR = self.tmpdir.name
+        self.sent = []
+        self.failures = {}
+
+    def submit(self, chat_ids, text):
+        self.sent.extend(chat_ids)
+        return FinishedChunk(chat_ids, self.failures)
+
+    def run_job(self, job_id, **kwargs):
+        finished = []
+        runner = self.jobs.BroadcastJobRunner(job_id, self.submit, on_finish=finished.append, **kwargs)
+        runner.run()
+        return runner, finished
+
+    def read_state(self, job_id):
+        return json.loads((Path(self.tmpdir.name) / f"broadcast_job_{job_id}.json").read_text(encoding="utf-8"))
+
+    def test_job_checkpoints_each_chunk_and_reports_from_checkpoint(self):
+        self.failures = {2: "Forbidden: bot was blocked by the user", 4: "Bad Request: chat not found"}
+        state = self.jobs.create_job(["1", "2", "3", "4", "5"], "hello", chat_id=9, total_pool=5)
+        checkpoints = []
+
+        runner = self.jobs.BroadcastJobRunner(
+            state["id"],
+            self.submit,
+            on_progress=lambda current: checkpoints.append(current["cursor"]),
+            checkpoint_every=2,
+        )
+        runner.run()
+
+        saved = self.read_state(state["id"])
+        self.assertEqual(checkpoints, [2, 4, 5])
+        self.assertEqual(saved["status"], "completed")
+        self.assertEqual(saved["succeeded"], 3)
+        self.assertEqual(saved["failed_by_error"], {"Bot was blocked by the user": ["2"], "Chat not found": ["4"]})
+        self.assertEqual(saved["permanent_failures"], ["2"])
+        self.assertEqual(self.jobs.success_users(saved), ["1", "3", "5"])
+
+    def test_running_job_resumes_from_cursor_after_restart(self):
+        state = self.jobs.create_job(["1", "2", "3", "4", "5"], "hello")
+
+        class PausingRunner(self.jobs.BroadcastJobRunner):
+            def _checkpoint(runner, current):
+                super()._checkpoint(current)
+                runner.requested_status = runner.requested_status or "paused"
+
+        PausingRunner(state["id"], self.submit, checkpoint_every=2).run()
+        self.assertEqual(self.sent, [1, 2])
+        self.assertEqual(self.read_state(state["id"])["cursor"], 2)
+
+        # Simulate a crash while running: the file still says "running".
+        saved = self.read_state(state["id"])
+        saved["status"] = "running"
+        self.jobs.json_store.write(Path(self.tmpdir.name) / f"broadcast_job_{state['id']}.json", saved)
+        self.assertEqual([job["id"] for job in self.jobs.pending_jobs()], [state["id"]])
+
+        _, finished = self.run_job(state["id"], checkpoint_every=2)
+
+        self.assertEqual(self.sent, [1, 2, 3, 4, 5])
+        self.assertEqual(finished[0]["status"], "completed")
+        self.assertEqual(self.jobs.pending_jobs(), [])
+
+    def test_resume_right_after_pause_withdraws_the_pending_pause(self):
+        state = self.jobs.create_job(["1", "2", "3", "4"], "hello")
+        self.jobs.BROADCAST_CHECKPOINT_EVERY = 2
+        entered = threading.Event()
+        release = threading.Event()
+
+        def gated_submit(chat_ids, text):
+            entered.set()
+            release.wait(5)
+            return self.submit(chat_ids, text)
+
+        finished = []
+        runner = self.jobs.start_job(state["id"], gated_submit, on_finish=finished.append)
+        self.assertTrue(entered.wait(5))
+
+        self.jobs.pause_job(state["id"])
+        resumed = self.jobs.resume_job(state["id"], gated_submit, on_finish=finished.append)
+        release.set()
+        runner.join(5)
+
+        self.assertIs(resumed, runner)
+        self.assertEqual(self.sent, [1, 2, 3, 4])
+        self.assertEqual(self.read_state(state["id"])["status"], "completed")
+        self.assertEqual([current["status"] for current in finished], ["completed"])
+
+    def test_resume_after_the_pause_took_effect_starts_a_new_runner(self):
+        state = self.jobs.create_job(["1", "2", "3", "4"], "hello")
+        self.jobs.BROADCAST_CHECKPOINT_EVERY = 2
+        paused = threading.Event()
+        runner = self.jobs.start_job(state["id"], self.submit, on_progress=lambda current: paused.wait(5))
+        self.jobs.pause_job(state["id"])
+        paused.set()
+        runner.join(5)
+        self.assertEqual(self.read_state(state["id"])["status"], "paused")
+
+        resumed = self.jobs.resume_job(state["id"], self.submit)
+        resumed.join(5)
+
+        self.assertIsNot(resumed, runner)
+        self.assertEqual(self.sent, [1, 2, 3, 4])
+        self.assertEqual(self.read_state(state["id"])["status"], "completed")
+
+    def test_paused_job_can_be_cancelled_and_deleted(self):
+        state = self.jobs.create_job(["1", "2"], "hello")
+        self.assertEqual(self.jobs.pause_job(state["id"])["status"], "paused")
+        self.assertEqual(self.jobs.pending_jobs(), [])
+
+        cancelled, stopped = self.jobs.cancel_job(state["id"])
+        self.assertTrue(stopped)
+        self.assertEqual(cancelled["status"], "cancelled")
+        self.assertIsNone(self.jobs.resume_job(state["id"], self.submit))
+
+        self.jobs.delete_job(state["id"])
+        self.assertEqual(self.jobs.list_jobs(), [])
+        self.assertEqual(self.sent, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import datetime
 import importlib.util
 import sys
 import types
@@ -92,6 +93,7 @@ class DummyBot:
 class FakeCryptoPayment:
     calls = []
     statuses = {}
+    callback_url = None
 
     def create_payment(self, amount, plan_gb, user_id):
         self.calls.append({"amount": amount, "plan_gb": plan_gb, "user_id": user_id})
@@ -106,6 +108,12 @@ class FakeCryptoPayment:
     def check_payment_status(self, payment_id):
         return self.statuses.get(payment_id, {"result": {"status": "pending"}})
 
+    def check_payment_statuses(self, payment_ids, since=None, max_workers=None):
+        return {
+            payment_id: self.check_payment_status(payment_id)["result"]["status"]
+            for payment_id in payment_ids
+        }
+
 
 def clear_test_modules():
     for name in list(sys.modules):
@@ -147,13 +155,21 @@ def install_common_stubs(bot, payment_records):
 
     payments_stub = types.ModuleType("utils.payments")
     payments_stub.CryptoPayment = FakeCryptoPayment
+    payments_stub.GATEWAY_FINAL_STATUSES = {"cancel": "expired", "fail": "failed", "system_fail": "failed"}
     sys.modules["utils.payments"] = payments_stub
 
+    payment_webhook_stub = types.ModuleType("utils.payment_webhook")
+    payment_webhook_stub.record_delivery_latency = lambda source, seconds: None
+    sys.modules["utils.payment_webhook"] = payment_webhook_stub
+
     payment_records_stub = types.ModuleType("utils.payment_records")
     payment_records_stub.add_payment_record = lambda payment_id, record: payment_records.append((payment_id, record))
     payment_records_stub.update_payment_status = lambda *args, **kwargs: True
     payment_records_stub.get_payment_record = lambda *args, **kwargs: None
     payment_records_stub.load_payments = lambda: {}
+    payment_records_stub.get_payments_by_status = lambda *statuses: {}
+    payment_records_stub.get_payment_by_order_id = lambda order_id: (None, None)
+    payment_records_stub.apply_payment_status_transitions = lambda *args, **kwargs: set()
     payment_records_stub.claim_payment_for_processing = lambda *args, **kwargs: True
     payment_records_stub.get_user_payments = lambda *args, **kwargs: {}
     payment_records_stub.update_payment_record_fields = lambda *args, **kwargs: True
@@ -445,6 +461,30 @@ def install_payment_store(purchase_plan, store):
         statuses.append((payment_id, status))
         return True
 
+    def get_payments_by_status(*wanted):
+        return {
+            payment_id: dict(record)
+            for payment_id, record in store.items()
+            if record.get("status") in wanted
+        }
+
+    def get_payment_by_order_id(order_id):
+        for payment_id, record in store.items():
+            if order_id in (record.get("order_id"), record.get("payment_id")):
+                return payment_id, dict(record)
+        return None, None
+
+    def apply_payment_status_transitions(transitions, expected_statuses=None):
+        changed = set()
+        for payment_id, status in transitions.items():
+            record = store.get(payment_id)
+            if record is None or (expected_statuses is not None and record.get("status") not in expected_statuses):
+                continue
+            record["status"] = status
+            statuses.append((payment_id, status))
+            changed.add(payment_id)
+        return changed
+
     def update_payment_record_fields(payment_id, fields):
         if payment_id not in store:
             return False
@@ -480,6 +520,9 @@ def install_payment_store(purchase_plan, store):
 
     purchase_plan.get_payment_record = get_payment_record
     purchase_plan.load_payments = load_payments
+    purchase_plan.get_payments_by_status = get_payments_by_status
+    purchase_plan.get_payment_by_order_id = get_payment_by_order_id
+    purchase_plan.apply_payment_status_transitions = apply_payment_status_transitions
     purchase_plan.update_payment_status = update_payment_status
     purchase_plan.update_payment_record_fields = update_payment_record_fields
     purchase_plan.complete_payment_record = complete_payment_record
@@ -1002,6 +1045,101 @@ class CryptoPaymentDiscountTests(unittest.TestCase):
         self.assertEqual(admin_notifications[0][1]["server_name"], "Germany")
         self.assertEqual(admin_notifications[0][1]["server_id"], "s1")
 
+    def test_pending_poll_reconciles_in_one_batch_and_backs_off(self):
+        purchase_plan = load_purchase_plan(DummyBot(), [])
+        now = datetime.datetime(2026, 5, 1, 12, 0, 0)
+
+        def created(delta):
+            return (now - delta).strftime("%Y-%m-%d %H:%M:%S")
+
+        store = {
+            "fresh": {"status": "pending", "user_id": 1, "created_at": created(datetime.timedelta(minutes=1))},
+            "recent": {"status": "pending", "user_id": 2, "created_at": created(datetime.timedelta(minutes=10))},
+            "old": {"status": "pending", "user_id": 3, "created_at": created(datetime.timedelta(hours=2))},
+            "stale": {"status": "pending", "user_id": 4, "created_at": created(datetime.timedelta(hours=30))},
+            "done": {"status": "completed", "user_id": 5, "created_at": created(datetime.timedelta(minutes=1))},
+        }
+        statuses, _field_updates, _claims = install_payment_store(purchase_plan, store)
+        batches = []
+        transition_calls = []
+        apply_transitions = purchase_plan.apply_payment_status_transitions
+        purchase_plan.apply_payment_status_transitions = lambda transitions, **kwargs: (
+            transition_calls.append(dict(transitions)) or apply_transitions(transitions, **kwargs)
+        )
+
+        class BatchCryptoPayment(FakeCryptoPayment):
+            def check_payment_statuses(self, payment_ids, since=None, max_workers=None):
+                batches.append((list(payment_ids), since))
+                return super().check_payment_statuses(payment_ids, since, max_workers)
+
+        purchase_plan.CryptoPayment = BatchCryptoPayment
+        FakeCryptoPayment.statuses = {"recent": {"result": {"status": "cancel"}}}
+
+        purchase_plan.poll_pending_crypto_payments(now)
+
+        self.assertEqual(batches, [(["fresh", "recent", "old"], now - datetime.timedelta(hours=2))])
+        self.assertEqual(transition_calls, [{"stale": "expired", "recent": "expired"}])
+        self.assertEqual(sorted(statuses), [("recent", "expired"), ("stale", "expired")])
+        self.assertEqual(store["fresh"]["status"], "pending")
+
+        batches.clear()
+        purchase_plan.poll_pending_crypto_payments(now + datetime.timedelta(minutes=2))
+
+        self.assertEqual([ids for ids, _since in batches], [["fresh"]])
+
+    def test_webhook_invoices_are_polled_at_a_reduced_rate(self):
+        purchase_plan = load_purchase_plan(DummyBot(), [])
+        now = datetime.datetime(2026, 5, 1, 12, 0, 0)
+        created = (now - datetime.timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+        store = {
+            "hooked": {"status": "pending", "user_id": 1, "created_at": created, "webhook": True},
+            "polled": {"status": "pending", "user_id": 2, "created_at": created},
+        }
+        install_payment_store(purchase_plan, store)
+        batches = []
+
+        class BatchCryptoPayment(FakeCryptoPayment):
+            def check_payment_statuses(self, payment_ids, since=None, max_workers=None):
+                batches.append(list(payment_ids))
+                return super().check_payment_statuses(payment_ids, since, max_workers)
+
+        purchase_plan.CryptoPayment = BatchCryptoPayment
+
+        for minutes in (0, 1, 5, 9, 12):
+            purchase_plan.poll_pending_crypto_payments(now + datetime.timedelta(minutes=minutes))
+
+        polled_passes = [batch for batch in batches if "polled" in batch]
+        hooked_passes = [batch for batch in batches if "hooked" in batch]
+        self.assertEqual(len(polled_passes), 5)
+        self.assertEqual(len(hooked_passes), 1)
+        self.assertEqual(batches[3], ["hooked", "polled"])
+
+    def test_polled_delivery_latency_is_timed_from_last_unpaid_check(self):
+        purchase_plan = load_purchase_plan(DummyBot(), [])
+        now = datetime.datetime(2026, 5, 1, 12, 0, 0)
+        created = (now - datetime.timedelta(minutes=1)).strftime("%Y-%m-%d %H:%M:%S")
+        store = {"polled": {"status": "pending", "user_id": 2, "created_at": created}}
+        install_payment_store(purchase_plan, store)
+        latencies = []
+        processed = []
+
+        def process_paid(payment_id, record):
+            processed.append(payment_id)
+            store[payment_id]["status"] = "completed"
+            return True
+
+        purchase_plan.record_delivery_latency = lambda source, seconds: latencies.append((source, seconds))
+        purchase_plan._process_paid_crypto_payment = process_paid
+
+        purchase_plan.poll_pending_crypto_payments(now)
+        FakeCryptoPayment.statuses = {"polled": {"result": {"status": "paid"}}}
+        purchase_plan.poll_pending_crypto_payments(now + datetime.timedelta(minutes=5))
+
+        self.assertEqual(processed, ["polled"])
+        self.assertEqual([source for source, _seconds in latencies], ["poll"])
+        self.assertGreaterEqual(latencies[0][1], 300)
+        self.assertLess(latencies[0][1], 310)
+
     def test_crypto_check_completes_sale_with_username_and_server(self):
         bot = DummyBot()
         purchase_plan = load_purchase_plan(bot, [])
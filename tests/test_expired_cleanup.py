@@ -2,10 +2,13 @@ import importlib.util
 import json
 import sys
 import tempfile
+import threading
+import time
 import types
 import unittest
 from datetime import datetime, timedelta
 from pathlib import Path
+from unittest import mock
 
 
 MODULE_PATH = (
@@ -18,6 +21,11 @@ MODULE_PATH = (
 )
 TRANSLATIONS_PATH = MODULE_PATH.with_name("translations.py")
 TEST_CONFIG_STORE_PATH = MODULE_PATH.with_name("test_config_store.py")
+JSON_STORE_PATH = MODULE_PATH.with_name("json_store.py")
+NOTIFICATION_QUEUE_PATH = MODULE_PATH.with_name("notification_queue.py")
+RESELLER_STORE_PATH = MODULE_PATH.with_name("reseller_store.py")
+USER_RECORD_PATH = MODULE_PATH.with_name("user_record.py")
+PAYMENT_RECORDS_PATH = MODULE_PATH.with_name("payment_records.py")
 
 
 class DummyBot:
@@ -101,6 +109,42 @@ class FakeMultiAPI:
         for server_id, client in self.clients.items():
             yield {"id": server_id, "enabled": True}, client
 
+    def bulk_delete_users(self, items):
+        return [(client, username, client.delete_user(username)) for client, username in items]
+
+
+class ChangeStreamFakeMultiAPI(FakeMultiAPI):
+    """FakeMultiAPI with the snapshot change stream of MultiServerAPI."""
+
+    def __init__(self, clients):
+        super().__init__(clients)
+        self.version = 0
+        self.changed = []
+
+    def change(self, server_id, username, user_data):
+        users = self.clients[server_id].users
+        if user_data is None:
+            users.pop(username, None)
+        else:
+            users[username] = user_data
+        self.version += 1
+        self.changed.append((self.version, server_id, username))
+
+    def get_user_changes(self, since_version=None, include_disabled=True):
+        if since_version is None:
+            return self.version, None
+        return self.version, [
+            (self.clients[server_id], username, self.clients[server_id].users.get(username))
+            for version, server_id, username in self.changed
+            if version > since_version
+        ]
+
+    def get_user_snapshot_entries(self, include_disabled=True):
+        return [
+            {"server": {"id": server_id}, "client": client, "users": client.users}
+            for server_id, client in self.clients.items()
+        ]
+
 
 class ImmediateExecutor:
     def submit(self, fn, *args, **kwargs):
@@ -119,6 +163,37 @@ def load_module():
     utils_pkg.__path__ = []
     sys.modules["utils"] = utils_pkg
 
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
+    notification_queue_spec = importlib.util.spec_from_file_location("utils.notification_queue", NOTIFICATION_QUEUE_PATH)
+    notification_queue = importlib.util.module_from_spec(notification_queue_spec)
+    sys.modules[notification_queue_spec.name] = notification_queue
+    notification_queue_spec.loader.exec_module(notification_queue)
+    notification_queue._dispatcher = notification_queue.NotificationDispatcher(per_chat_interval=0)
+    utils_pkg.notification_queue = notification_queue
+
+    reseller_store_spec = importlib.util.spec_from_file_location("utils.reseller_store", RESELLER_STORE_PATH)
+    reseller_store = importlib.util.module_from_spec(reseller_store_spec)
+    sys.modules[reseller_store_spec.name] = reseller_store
+    reseller_store_spec.loader.exec_module(reseller_store)
+    utils_pkg.reseller_store = reseller_store
+
+    user_record_spec = importlib.util.spec_from_file_location("utils.user_record", USER_RECORD_PATH)
+    user_record = importlib.util.module_from_spec(user_record_spec)
+    sys.modules[user_record_spec.name] = user_record
+    user_record_spec.loader.exec_module(user_record)
+    utils_pkg.user_record = user_record
+
+    payment_records_spec = importlib.util.spec_from_file_location("utils.payment_records", PAYMENT_RECORDS_PATH)
+    payment_records = importlib.util.module_from_spec(payment_records_spec)
+    sys.modules[payment_records_spec.name] = payment_records
+    payment_records_spec.loader.exec_module(payment_records)
+    utils_pkg.payment_records = payment_records
+
     store_spec = importlib.util.spec_from_file_location("utils.test_config_store", TEST_CONFIG_STORE_PATH)
     store_module = importlib.util.module_from_spec(store_spec)
     sys.modules[store_spec.name] = store_module
@@ -169,10 +244,13 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.base = Path(self.tmpdir.name)
         self.cleanup = load_module()
         self.cleanup.TEST_CONFIGS_FILE = str(self.base / "test_configs.json")
-        self.cleanup.PAYMENTS_FILE = str(self.base / "payments.json")
+        self.payment_records = sys.modules["utils.payment_records"]
+        self.payment_records.PAYMENTS_FILE = str(self.base / "payments.json")
+        self.payment_records.PAYMENTS_DB_FILE = str(self.base / "payments.sqlite3")
         self.cleanup.RESELLERS_FILE = str(self.base / "resellers.json")
         self.cleanup.STATE_FILE = str(self.base / "expired_user_cleanup.json")
         self.cleanup.SCHEDULE_FILE = str(self.base / "expired_cleanup_schedule.json")
+        self.cleanup.INDEX_FILE = str(self.base / "expired_cleanup_index.json")
         self.now = datetime(2026, 6, 9, 12, 0, 0)
 
     def write_json(self, path, data):
@@ -183,7 +261,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def write_default_files(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
 
     def callback_data_from_markup(self, markup):
@@ -333,7 +411,7 @@ class ExpiredCleanupTests(unittest.TestCase):
                 "used_at": "2026-06-08 10:00:00",
             }
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t12345": self.recovered_test_user()})
 
@@ -472,7 +550,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s2", {"t101": self.expired_user()})
 
@@ -494,7 +572,7 @@ class ExpiredCleanupTests(unittest.TestCase):
                 "cleanup_status": "notified",
             }
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         self.write_json(self.cleanup.STATE_FILE, {
             "primary:t101": {
@@ -524,7 +602,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "shared"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         active_user = {
             "blocked": False,
@@ -553,7 +631,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         clients = {
             "s2": FakeClient("s2", {"t101": self.expired_user()}),
@@ -580,7 +658,7 @@ class ExpiredCleanupTests(unittest.TestCase):
                 "cleanup_delete_result": "deleted",
             }
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         self.write_json(self.cleanup.STATE_FILE, {
             "s1:t101": {
@@ -620,7 +698,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()})
 
@@ -644,7 +722,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {
+        self.write_json(self.payment_records.PAYMENTS_FILE, {
             "pay1": {"status": "completed", "user_id": 202, "username": "s202", "server_id": "s1"},
             "settlement": {"status": "completed", "type": "settlement", "username": "ignored"},
         })
@@ -661,7 +739,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def test_reseller_cleanup_metadata_save_preserves_new_configs_added_during_scan(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {
             "303": {
                 "status": "approved",
@@ -692,11 +770,48 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.assertEqual(saved_configs[0]["cleanup_status"], "notified")
         self.assertNotIn("cleanup_status", saved_configs[1])
 
+    def test_reseller_cleanup_metadata_save_builds_config_index_only_for_moved_configs(self):
+        stale = {
+            "303": {"configs": [
+                {"username": "r303", "server_id": "s1", "cleanup_status": "notified"},
+                {"username": "r304", "server_id": "s1", "cleanup_status": "notified"},
+            ]}
+        }
+        refs = {("reseller", "303", 0), ("reseller", "303", 1)}
+        real_index = self.cleanup.reseller_store.ResellerConfigIndex
+        builds = []
+
+        def counted_index(records):
+            builds.append(records)
+            return real_index(records)
+
+        self.write_json(self.cleanup.RESELLERS_FILE, {
+            "303": {"configs": [{"username": "r303", "server_id": "s1"}, {"username": "r304", "server_id": "s1"}]}
+        })
+        with mock.patch.object(self.cleanup.reseller_store, "ResellerConfigIndex", counted_index):
+            self.cleanup._save_reseller_cleanup_metadata(stale, refs)
+        self.assertEqual(builds, [])
+
+        self.write_json(self.cleanup.RESELLERS_FILE, {
+            "303": {"configs": [
+                {"username": "r302", "server_id": "s1"},
+                {"username": "r303", "server_id": "s1"},
+                {"username": "r304", "server_id": "s1"},
+            ]}
+        })
+        with mock.patch.object(self.cleanup.reseller_store, "ResellerConfigIndex", counted_index):
+            self.cleanup._save_reseller_cleanup_metadata(stale, refs)
+
+        saved_configs = self.read_json(self.cleanup.RESELLERS_FILE)["303"]["configs"]
+        self.assertEqual(len(builds), 1)
+        self.assertNotIn("cleanup_status", saved_configs[0])
+        self.assertEqual([config.get("cleanup_status") for config in saved_configs[1:]], ["notified", "notified"])
+
     def test_first_expired_detection_notifies_and_waits_to_delete(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()})
 
@@ -813,7 +928,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def test_paid_customer_notification_includes_account_type(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {
+        self.write_json(self.payment_records.PAYMENTS_FILE, {
             "pay1": {"status": "completed", "user_id": 202, "username": "p202", "server_id": "s1"}
         })
         self.write_json(self.cleanup.RESELLERS_FILE, {})
@@ -823,12 +938,39 @@ class ExpiredCleanupTests(unittest.TestCase):
 
         self.assertEqual(len(self.cleanup._test_bot.sent_messages), 1)
         self.assertIn("your paid account", self.cleanup._test_bot.sent_messages[0][1])
-        saved_payment = self.read_json(self.cleanup.PAYMENTS_FILE)["pay1"]
+        saved_payment = self.read_json(self.payment_records.PAYMENTS_FILE)["pay1"]
         self.assertEqual(saved_payment["cleanup_last_state"]["status"], "expired")
 
+    def check_payment_cleanup_save_keeps_concurrent_changes(self):
+        self.write_json(self.payment_records.PAYMENTS_FILE, {
+            "pay1": {"status": "completed", "user_id": 202, "username": "p202", "server_id": "s1", "cleanup_error": "timeout"}
+        })
+        stores = self.cleanup._load_cleanup_record_stores()
+        self.payment_records.update_payment_record_fields("pay1", {"receipt_message_refs": [[202, 9]]})
+        self.payment_records.add_payment_record("pay2", {"status": "pending", "user_id": 303})
+
+        candidate = {"_record_ref": ("payment", "pay1")}
+        self.cleanup._update_candidate_record(candidate, {"cleanup_status": "notified", "cleanup_error": None}, stores=stores)
+        self.cleanup._save_dirty_cleanup_record_stores(stores)
+
+        latest = self.payment_records.load_payments()
+        self.assertEqual(latest["pay2"]["status"], "pending")
+        self.assertEqual(latest["pay1"]["receipt_message_refs"], [[202, 9]])
+        self.assertEqual(latest["pay1"]["cleanup_status"], "notified")
+        self.assertNotIn("cleanup_error", latest["pay1"])
+        self.assertEqual(stores["_payment_dirty_ids"], set())
+
+    def test_payment_cleanup_save_writes_only_dirty_metadata_to_json(self):
+        self.check_payment_cleanup_save_keeps_concurrent_changes()
+
+    def test_payment_cleanup_save_writes_only_dirty_metadata_to_sqlite_store(self):
+        self.payment_records.get_payment_store_backend = lambda: "sqlite"
+
+        self.check_payment_cleanup_save_keeps_concurrent_changes()
+
     def test_reseller_customer_notification_includes_account_type(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {
             "303": {"configs": [{"username": "r303", "server_id": "s1"}]}
         })
@@ -846,7 +988,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "missing101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {})
 
@@ -866,7 +1008,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "missing101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {
+        self.write_json(self.payment_records.PAYMENTS_FILE, {
             "pay1": {"status": "completed", "user_id": 202, "username": "missing202", "server_id": "s1"}
         })
         self.write_json(self.cleanup.RESELLERS_FILE, {})
@@ -890,7 +1032,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         self.write_json(self.cleanup.STATE_FILE, {
             "s1:t101": {
@@ -926,7 +1068,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()})
 
@@ -955,7 +1097,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1", "cleanup_status": "notified"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         self.write_json(self.cleanup.STATE_FILE, {
             "s1:t101": {
@@ -985,7 +1127,7 @@ class ExpiredCleanupTests(unittest.TestCase):
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1", "cleanup_status": "notified"},
             "102": {"telegram_id": 102, "username": "t102", "server_id": "s1", "cleanup_status": "notified"},
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         self.write_json(self.cleanup.STATE_FILE, {
             "s1:t101": {
@@ -1068,7 +1210,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()})
 
@@ -1090,7 +1232,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()}, delete_result=None)
 
@@ -1108,7 +1250,7 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
             "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
         })
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {})
         client = FakeClient("s1", {"t101": self.expired_user()})
 
@@ -1150,7 +1292,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def test_due_cleanup_uses_bulk_scan_when_single_user_lookup_misses_existing_user(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {
             "303": {"configs": [{"username": "r303", "server_id": "s1"}]}
         })
@@ -1187,7 +1329,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def test_refresh_repairs_already_missing_when_bulk_scan_finds_existing_user(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {
             "303": {"configs": [{
                 "username": "r303",
@@ -1233,7 +1375,7 @@ class ExpiredCleanupTests(unittest.TestCase):
 
     def test_refresh_clears_stale_missing_reason_when_repaired_user_is_still_pending(self):
         self.write_json(self.cleanup.TEST_CONFIGS_FILE, {})
-        self.write_json(self.cleanup.PAYMENTS_FILE, {})
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
         self.write_json(self.cleanup.RESELLERS_FILE, {
             "303": {"configs": [{
                 "username": "r303",
@@ -1901,6 +2043,142 @@ class ExpiredCleanupTests(unittest.TestCase):
         self.assertEqual({record["username"] for record in all_payload}, {"pending", "deleted", "duplicate"})
         self.assertIn("reason_code", pending_payload[0])
 
+    def test_incremental_pass_only_visits_due_and_changed_users(self):
+        self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
+            "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"},
+            "202": {"telegram_id": 202, "username": "t202", "server_id": "s1"},
+            "303": {"telegram_id": 303, "username": "t303", "server_id": "s1"},
+        })
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
+        self.write_json(self.cleanup.RESELLERS_FILE, {})
+        healthy = {**self.expired_user(), "blocked": False, "expiration_days": 30}
+        paused = {**healthy, "blocked": True, "account_creation_date": "2026-05-20"}
+        client = FakeClient("s1", {"t101": self.expired_user(), "t202": healthy, "t303": paused})
+        multi_api = ChangeStreamFakeMultiAPI({"s1": client})
+        self.cleanup.FULL_RECONCILE_INTERVAL_SECONDS = 30 * 24 * 3600
+
+        self.cleanup.run_expired_user_cleanup(now=self.now, multi_api=multi_api)
+        index = self.read_json(self.cleanup.INDEX_FILE)
+        self.assertEqual(index["full_reconcile_at"], "2026-06-09 12:00:00")
+        self.assertEqual(
+            sorted(index["deadlines"]),
+            [["2026-06-11 12:00:00", "s1", "t101"], ["2026-06-19 00:00:00", "s1", "t303"]],
+        )
+
+        load_record_stores = self.cleanup._load_cleanup_record_stores
+        self.cleanup._load_cleanup_record_stores = lambda: self.fail("idle pass must not load record stores")
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=1), multi_api=multi_api)
+        self.cleanup._load_cleanup_record_stores = load_record_stores
+
+        multi_api.change("s1", "t202", self.expired_user())
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=2), multi_api=multi_api)
+        self.assertEqual(self.read_json(self.cleanup.STATE_FILE)["s1:t202"]["cleanup_status"], "notified")
+
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=49), multi_api=multi_api)
+        self.assertEqual(client.deleted, ["t101"])
+
+        self.cleanup.run_expired_user_cleanup(now=datetime(2026, 6, 19, 0, 30), multi_api=multi_api)
+        state = self.read_json(self.cleanup.STATE_FILE)
+        self.assertEqual(state["s1:t303"]["cleanup_status"], "notified")
+        self.assertEqual(state["s1:t202"]["cleanup_status"], "deleted")
+        self.assertEqual(client.get_users_calls, 1)
+        self.assertEqual(client.get_user_calls, [])
+        self.assertEqual(len(self.cleanup._test_bot.sent_messages), 3)
+        self.assertEqual(self.read_json(self.cleanup.TEST_CONFIGS_FILE)["101"]["cleanup_status"], "deleted")
+
+    def test_changed_renewal_is_applied_incrementally_and_full_reconcile_is_periodic(self):
+        self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
+            "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"}
+        })
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
+        self.write_json(self.cleanup.RESELLERS_FILE, {})
+        client = FakeClient("s1", {"t101": self.expired_user()})
+        multi_api = ChangeStreamFakeMultiAPI({"s1": client})
+
+        self.cleanup.run_expired_user_cleanup(now=self.now, multi_api=multi_api)
+        multi_api.change("s1", "t101", {**self.expired_user(), "blocked": False})
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=1), multi_api=multi_api)
+
+        self.assertEqual(self.read_json(self.cleanup.STATE_FILE), {})
+        self.assertEqual(self.read_json(self.cleanup.TEST_CONFIGS_FILE)["101"]["cleanup_status"], "renewed")
+        self.assertEqual(client.get_users_calls, 1)
+
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=25), multi_api=multi_api)
+        self.assertEqual(client.get_users_calls, 2)
+        self.assertEqual(self.read_json(self.cleanup.INDEX_FILE)["full_reconcile_at"], "2026-06-10 13:00:00")
+
+        self.cleanup._user_change_version = None
+        self.cleanup.run_expired_user_cleanup(now=self.now + timedelta(hours=26), multi_api=multi_api)
+        self.assertEqual(client.get_users_calls, 3)
+
+    def test_notices_go_out_in_parallel_and_are_folded_into_state(self):
+        self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
+            str(index): {"telegram_id": index, "username": f"t{index}", "server_id": "s1"}
+            for index in range(101, 105)
+        })
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
+        self.write_json(self.cleanup.RESELLERS_FILE, {})
+        client = FakeClient("s1", {f"t{index}": self.expired_user() for index in range(101, 105)})
+        lock = threading.Lock()
+        in_flight = []
+        peak = []
+
+        def slow_notify(candidate, grace_hours, last_state=None, missing=False):
+            with lock:
+                in_flight.append(candidate["username"])
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.remove(candidate["username"])
+            return "chat not found" if candidate["username"] == "t104" else None
+
+        self.cleanup._notify_candidate = slow_notify
+        self.cleanup.run_expired_user_cleanup(now=self.now, multi_api=FakeMultiAPI({"s1": client}))
+
+        state = self.read_json(self.cleanup.STATE_FILE)
+        report = self.cleanup.get_last_cleanup_pass_report()
+        self.assertGreater(max(peak), 1)
+        self.assertEqual({entry["cleanup_status"] for entry in state.values()}, {"notified"})
+        self.assertEqual(state["s1:t104"]["notification_error"], "chat not found")
+        self.assertEqual(self.read_json(self.cleanup.TEST_CONFIGS_FILE)["104"]["cleanup_notification_error"], "chat not found")
+        self.assertEqual((report["notified"], report["notification_failed"]), (3, 1))
+        self.assertEqual(set(report["timings"]), {"discover", "process", "delete", "notify", "save"})
+
+    def test_dry_run_reports_the_pass_without_sending_deleting_or_saving(self):
+        self.write_json(self.cleanup.TEST_CONFIGS_FILE, {
+            "101": {"telegram_id": 101, "username": "t101", "server_id": "s1"},
+            "202": {"telegram_id": 202, "username": "t202", "server_id": "s1"},
+        })
+        self.write_json(self.payment_records.PAYMENTS_FILE, {})
+        self.write_json(self.cleanup.RESELLERS_FILE, {})
+        self.write_json(self.cleanup.STATE_FILE, {
+            "s1:t101": {
+                "username": "t101",
+                "server_id": "s1",
+                "source": "test",
+                "telegram_user_id": "101",
+                "notified_at": "2026-06-01 12:00:00",
+                "delete_after": "2026-06-03 12:00:00",
+                "cleanup_status": "notified",
+            }
+        })
+        client = FakeClient("s1", {"t101": self.expired_user(), "t202": self.expired_user()})
+        before = {
+            path: Path(path).read_text(encoding="utf-8")
+            for path in (self.cleanup.STATE_FILE, self.cleanup.TEST_CONFIGS_FILE)
+        }
+
+        state = self.cleanup.run_expired_user_cleanup(now=self.now, multi_api=FakeMultiAPI({"s1": client}), dry_run=True)
+
+        self.assertEqual(client.deleted, [])
+        self.assertEqual(self.cleanup._test_bot.sent_messages, [])
+        for path, text in before.items():
+            self.assertEqual(Path(path).read_text(encoding="utf-8"), text)
+        self.assertEqual(state["s1:t202"]["cleanup_status"], "notified")
+        report = self.cleanup.get_last_cleanup_pass_report()
+        self.assertTrue(report["dry_run"])
+        self.assertEqual((report["notified"], report["deleted"]), (1, 1))
+
     def test_expired_cleanup_notices_do_not_offer_renewal(self):
         spec = importlib.util.spec_from_file_location("translations_under_test", TRANSLATIONS_PATH)
         translations = importlib.util.module_from_spec(spec)
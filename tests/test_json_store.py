@@ -0,0 +1,105 @@
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "json_store.py"
+)
+
+
+def load_json_store():
+    spec = importlib.util.spec_from_file_location("json_store_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class JsonStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "state.json"
+        self.store = load_json_store()
+
+    def test_read_is_cached_until_the_file_changes(self):
+        self.path.write_text(json.dumps({"a": 1}), encoding="utf-8")
+
+        first = self.store.read(self.path, {})
+        second = self.store.read(self.path, {})
+        self.assertIs(first, second)
+
+        self.path.write_text(json.dumps({"a": 2, "b": 3}), encoding="utf-8")
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(self.store.read(self.path, {}), {"a": 2, "b": 3})
+        stats = self.store.get_stats(self.path)
+        self.assertEqual(stats["reads"], 2)
+        self.assertEqual(stats["cache_hits"], 1)
+
+    def test_missing_or_corrupt_file_returns_default_unless_strict(self):
+        self.assertEqual(self.store.read(self.path, {"x": []}), {"x": []})
+
+        self.path.write_text("{broken", encoding="utf-8")
+        self.assertEqual(self.store.load(self.path, []), [])
+        with self.assertRaises(self.store.JsonStoreError):
+            self.store.load(self.path, [], strict=True)
+
+    def test_load_returns_private_copy(self):
+        self.store.write(self.path, {"items": [1]})
+
+        loaded = self.store.load(self.path)
+        loaded["items"].append(2)
+
+        self.assertEqual(self.store.read(self.path), {"items": [1]})
+
+    def test_concurrent_updates_are_serialized(self):
+        def bump(data):
+            data["count"] = data.get("count", 0) + 1
+
+        threads = [
+            threading.Thread(target=lambda: [self.store.update(self.path, bump, default={}) for _ in range(20)])
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"count": 100})
+        self.assertEqual(self.store.read(self.path), {"count": 100})
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.endswith(".tmp")])
+
+    def test_compact_mode_drops_indentation(self):
+        self.store.write(self.path, {"a": [1, 2]}, compact=True)
+        self.assertEqual(self.path.read_text(encoding="utf-8"), '{"a":[1,2]}')
+
+        with mock.patch.dict(os.environ, {"DIJIQ_JSON_STORE_COMPACT": "1"}):
+            self.store.write(self.path, {"b": 1})
+        self.assertEqual(self.path.read_text(encoding="utf-8"), '{"b":1}')
+
+        self.store.write(self.path, {"c": 1}, indent=2)
+        self.assertEqual(self.path.read_text(encoding="utf-8"), '{\n  "c": 1\n}\n')
+
+    def test_non_ascii_text_is_escaped_like_json_dump_unless_asked(self):
+        self.store.write(self.path, {"note": "caf\u00e9"})
+        self.assertEqual(self.path.read_text(encoding="utf-8"), '{\n    "note": "caf\\u00e9"\n}\n')
+
+        self.store.write(self.path, {"note": "caf\u00e9"}, compact=True, ensure_ascii=False)
+        self.assertEqual(self.path.read_text(encoding="utf-8"), '{"note":"caf\u00e9"}')
+        self.assertEqual(self.store.read(self.path), {"note": "caf\u00e9"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+UTILS_DIR = Path(__file__).resolve().parents[1] / "core" / "scripts" / "telegrambot" / "utils"
+MODULE_PATH = UTILS_DIR / "language.py"
+JSON_STORE_PATH = UTILS_DIR / "json_store.py"
+
+
+class DummyBot:
+    def message_handler(self, *args, **kwargs):
+        return lambda func: func
+
+    def callback_query_handler(self, *args, **kwargs):
+        return lambda func: func
+
+
+def install_stubs():
+    telebot_stub = types.ModuleType("telebot")
+    telebot_stub.types = types.SimpleNamespace()
+    sys.modules["telebot"] = telebot_stub
+
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+
+    store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(store_spec)
+    sys.modules[store_spec.name] = json_store
+    store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
+    command_stub = types.ModuleType("utils.command")
+    command_stub.bot = DummyBot()
+    sys.modules["utils.command"] = command_stub
+
+    translations_stub = types.ModuleType("utils.translations")
+    translations_stub.LANGUAGES = {"en": "English", "fa": "Persian"}
+    translations_stub.BUTTON_TRANSLATIONS = {"en": {"language": "Language"}}
+    sys.modules["utils.translations"] = translations_stub
+
+
+def load_language_module():
+    install_stubs()
+    spec = importlib.util.spec_from_file_location("language_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class LanguagePreferenceCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / "user_languages.json"
+        self.language = load_language_module()
+        self.language.LANGUAGE_PREFS_FILE = str(self.path)
+
+    def write_preferences(self, data):
+        self.path.write_text(json.dumps(data), encoding="utf-8")
+
+    def test_preferences_are_parsed_once_while_file_is_unchanged(self):
+        self.write_preferences({"1": "fa"})
+        json_store = sys.modules["utils.json_store"]
+
+        self.assertEqual(self.language.get_user_language(1), "fa")
+        self.assertEqual(self.language.get_user_language("1"), "fa")
+        self.assertEqual(self.language.get_user_language(2), "en")
+
+        stats = json_store.get_stats(self.path)
+        self.assertEqual(stats["reads"], 1)
+        self.assertEqual(stats["cache_hits"], 2)
+
+    def test_external_file_change_is_reloaded(self):
+        self.write_preferences({"1": "fa"})
+        self.assertEqual(self.language.get_user_language(1), "fa")
+
+        self.write_preferences({"1": "en", "2": "fa"})
+        stat = self.path.stat()
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertEqual(self.language.get_user_languages([1, 2, 3]), {1: "en", 2: "fa", 3: "en"})
+
+    def test_set_user_language_writes_through_atomically(self):
+        self.language.set_user_language(5, "fa")
+        self.language.set_user_language(6, "en")
+
+        self.assertEqual(json.loads(self.path.read_text(encoding="utf-8")), {"5": "fa", "6": "en"})
+        self.assertEqual(self.language.get_user_language(5), "fa")
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.endswith(".tmp")])
+
+    def test_loaded_preferences_can_be_mutated_without_touching_cache(self):
+        self.write_preferences({"1": "fa"})
+
+        self.language.load_user_languages()["1"] = "en"
+
+        self.assertEqual(self.language.get_user_language(1), "fa")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import importlib.util
+import threading
+import time
+import unittest
+from pathlib import Path
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "notification_queue.py"
+)
+
+
+def load_notification_queue():
+    spec = importlib.util.spec_from_file_location("notification_queue_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TooManyRequests(Exception):
+    def __init__(self, retry_after):
+        super().__init__("Too Many Requests")
+        self.result_json = {"parameters": {"retry_after": retry_after}}
+
+
+class RecordingSender:
+    def __init__(self, failures=None):
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, chat_id, text, **kwargs):
+        with self.lock:
+            self.calls.append((chat_id, time.monotonic()))
+            failure = self.failures.get(chat_id)
+            if isinstance(failure, list):
+                failure = failure.pop(0) if failure else None
+        if failure is not None:
+            raise failure
+        return chat_id
+
+
+class NotificationDispatcherTests(unittest.TestCase):
+    def setUp(self):
+        self.queue = load_notification_queue()
+
+    def test_retry_after_is_honored_before_resending(self):
+        sender = RecordingSender({1: [TooManyRequests(0.2)]})
+        dispatcher = self.queue.NotificationDispatcher(per_chat_interval=0)
+
+        self.assertEqual(dispatcher.send(sender, 1, "hi", timeout=5), 1)
+
+        self.assertEqual(len(sender.calls), 2)
+        self.assertGreaterEqual(sender.calls[1][1] - sender.calls[0][1], 0.2)
+
+    def test_job_reports_progress_and_classifies_permanent_failures(self):
+        sender = RecordingSender({
+            2: Exception("Forbidden: bot was blocked by the user"),
+            3: Exception("Bad Request: message text is empty"),
+        })
+        dispatcher = self.queue.NotificationDispatcher(per_chat_interval=0)
+        progress = []
+
+        job = dispatcher.submit_many(
+            sender,
+            [1, 2, 3, 4],
+            "hello",
+            on_progress=lambda current: progress.append(current.processed),
+        )
+
+        self.assertTrue(job.wait(5))
+        self.assertEqual(sorted(job.succeeded), [1, 4])
+        self.assertEqual(sorted(job.failed), [2, 3])
+        self.assertEqual(job.permanent_failures, {2})
+        self.assertEqual(sorted(progress), [1, 2, 3, 4])
+        self.assertEqual(len(sender.calls), 4)
+
+    def test_global_rate_and_per_chat_interval_are_enforced(self):
+        sender = RecordingSender()
+        dispatcher = self.queue.NotificationDispatcher(global_rate=20, per_chat_interval=0.3, workers=4)
+
+        started = time.monotonic()
+        job = dispatcher.submit_many(sender, list(range(30)), "hello")
+        self.assertTrue(job.wait(10))
+        self.assertGreaterEqual(time.monotonic() - started, 0.45)
+
+        first = dispatcher.submit(sender, "same", "a")
+        second = dispatcher.submit(sender, "same", "b")
+        first.result(5)
+        second.result(5)
+        same_chat = [sent_at for chat_id, sent_at in sender.calls if chat_id == "same"]
+        self.assertGreaterEqual(same_chat[1] - same_chat[0], 0.3)
+
+    def test_retry_after_is_parsed_from_error_text(self):
+        self.assertEqual(self.queue.get_retry_after(Exception("Too Many Requests: retry after 7")), 7)
+        self.assertIsNone(self.queue.get_retry_after(Exception("Forbidden")))
+
+
+if __name__ == "__main__":
+    unittest.main()
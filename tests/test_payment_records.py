@@ -1,6 +1,7 @@
 import importlib.util
 import json
 import tempfile
+import threading
 import unittest
 from pathlib import Path
 
@@ -22,6 +23,19 @@ def load_module():
     return module
 
 
+def check_order_lookup(test, payment_records):
+    payment_records.add_payment_record("inv-1", {"status": "pending", "user_id": 7, "order_id": "order-1", "payment_id": "inv-1"})
+    payment_records.add_payment_record("card-1", {"status": "pending", "user_id": 8, "payment_id": "card-ref"})
+
+    test.assertEqual(payment_records.get_payment_by_order_id("order-1")[0], "inv-1")
+    test.assertEqual(payment_records.get_payment_by_order_id("card-ref")[0], "card-1")
+    test.assertEqual(payment_records.get_payment_by_order_id("missing"), (None, None))
+    payment_records.update_payment_record_fields("inv-1", {"order_id": "order-2"})
+    test.assertEqual(payment_records.get_payment_by_order_id("order-1"), (None, None))
+    payment_id, record = payment_records.get_payment_by_order_id("order-2")
+    test.assertEqual((payment_id, record["user_id"]), ("inv-1", 7))
+
+
 class PaymentRecordsTests(unittest.TestCase):
     def setUp(self):
         self.tmpdir = tempfile.TemporaryDirectory()
@@ -79,6 +93,242 @@ class PaymentRecordsTests(unittest.TestCase):
         self.assertEqual(record["updates"][-1]["previous_status"], "pending")
         self.assertEqual(record["updates"][-1]["status"], "expired")
 
+    def test_user_and_status_lookups_follow_every_write_path(self):
+        self.write_payments({
+            "pay-1": {"status": "pending", "user_id": 7},
+            "pay-2": {"status": "completed", "user_id": 8},
+        })
+
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1"])
+        self.payment_records.add_payment_record("pay-3", {"status": "pending", "user_id": "7"})
+        self.assertTrue(self.payment_records.claim_payment_for_processing("pay-1"))
+        self.assertTrue(self.payment_records.update_payment_record_fields("pay-2", {"user_id": 7}))
+
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1", "pay-2", "pay-3"])
+        self.assertEqual(self.payment_records.get_user_payments(8), {})
+        self.assertEqual(list(self.payment_records.get_payments_by_status("pending")), ["pay-3"])
+        self.assertEqual(list(self.payment_records.get_payments_by_status("processing", "completed")), ["pay-1", "pay-2"])
+
+    def test_batch_status_update_writes_once_and_skips_claimed_records(self):
+        self.write_payments({
+            "pay-1": {"status": "pending", "user_id": 7},
+            "pay-2": {"status": "processing", "user_id": 7},
+            "pay-3": {"status": "pending", "user_id": 8},
+        })
+        store_class = self.payment_records.JsonPaymentStore
+        writes = []
+        original_write = store_class._write
+
+        def counting_write(store, payments):
+            writes.append(1)
+            original_write(store, payments)
+
+        store_class._write = counting_write
+
+        changed = self.payment_records.update_payment_statuses(
+            ["pay-1", "pay-2", "pay-3", "missing"], "expired", expected_statuses={"pending"}
+        )
+
+        self.assertEqual(changed, {"pay-1", "pay-3"})
+        self.assertEqual(len(writes), 1)
+        payments = self.read_payments()
+        self.assertEqual([payments[pid]["status"] for pid in ("pay-1", "pay-2", "pay-3")], ["expired", "processing", "expired"])
+        self.assertEqual(payments["pay-1"]["updates"][-1]["previous_status"], "pending")
+
+    def test_order_id_lookup_follows_writes(self):
+        check_order_lookup(self, self.payment_records)
+
+    def test_lookups_return_copies_of_cached_records(self):
+        self.write_payments({"pay-1": {"status": "pending", "user_id": 7}})
+
+        self.payment_records.get_user_payments(7)["pay-1"]["status"] = "tampered"
+        self.payment_records.get_payment_record("pay-1")["status"] = "tampered"
+
+        self.assertEqual(self.payment_records.get_payment_record("pay-1")["status"], "pending")
+
+    def test_index_reloads_when_file_changes_outside_the_process(self):
+        self.write_payments({"pay-1": {"status": "pending", "user_id": 7}})
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1"])
+
+        self.write_payments({
+            "pay-1": {"status": "pending", "user_id": 7},
+            "pay-2": {"status": "pending", "user_id": 7, "note": "written by another process"},
+        })
+
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1", "pay-2"])
+
+
+    def test_failed_write_leaves_previous_file_intact(self):
+        self.write_payments({"pay-1": {"status": "pending", "user_id": 7}})
+
+        with self.assertRaises(TypeError):
+            self.payment_records.update_payment_record_fields("pay-1", {"bad": object()})
+
+        self.assertEqual(self.read_payments(), {"pay-1": {"status": "pending", "user_id": 7}})
+        self.assertEqual(self.payment_records.get_payment_record("pay-1")["status"], "pending")
+        self.assertEqual(sorted(path.name for path in self.path.parent.iterdir()), ["payments.json"])
+
+class SqlitePaymentStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.json_path = Path(self.tmpdir.name) / "payments.json"
+        self.db_path = Path(self.tmpdir.name) / "payments.sqlite3"
+        self.payment_records = load_module()
+        self.payment_records.PAYMENTS_FILE = str(self.json_path)
+        self.payment_records.PAYMENTS_DB_FILE = str(self.db_path)
+        self.payment_records.get_payment_store_backend = lambda: "sqlite"
+
+    def test_first_use_imports_existing_json_records(self):
+        self.json_path.write_text(json.dumps({
+            "pay-1": {"status": "pending", "user_id": 7},
+            "pay-2": {"status": "completed", "user_id": 8},
+        }), encoding="utf-8")
+
+        self.assertEqual(self.payment_records.get_payment_record("pay-2")["status"], "completed")
+        self.assertEqual(list(self.payment_records.load_payments()), ["pay-1", "pay-2"])
+        self.assertTrue(self.db_path.exists())
+
+    def test_claim_and_status_updates_are_row_level(self):
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+        self.payment_records.add_payment_record("pay-2", {"status": "pending", "user_id": "7"})
+
+        self.assertTrue(self.payment_records.claim_payment_for_processing("pay-1"))
+        self.assertFalse(self.payment_records.claim_payment_for_processing("pay-1"))
+        self.assertFalse(self.payment_records.claim_payment_for_processing("missing"))
+        self.assertTrue(self.payment_records.complete_payment_record("pay-1", {"username": "s7"}))
+
+        record = self.payment_records.get_payment_record("pay-1")
+        self.assertEqual(record["status"], "completed")
+        self.assertEqual(record["username"], "s7")
+        self.assertEqual([item["status"] for item in record["updates"]], ["processing", "completed"])
+        self.assertEqual(self.payment_records.get_payment_record("pay-2")["status"], "pending")
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1", "pay-2"])
+        self.assertEqual(list(self.payment_records.get_payments_by_status("pending")), ["pay-2"])
+
+    def test_batch_status_update_is_one_transaction(self):
+        for payment_id, status in (("pay-1", "pending"), ("pay-2", "completed"), ("pay-3", "pending")):
+            self.payment_records.add_payment_record(payment_id, {"status": status, "user_id": 7})
+
+        changed = self.payment_records.apply_payment_status_transitions(
+            {"pay-1": "expired", "pay-2": "expired", "pay-3": "failed"},
+            expected_statuses=["pending"],
+        )
+
+        self.assertEqual(changed, {"pay-1", "pay-3"})
+        self.assertEqual(list(self.payment_records.get_payments_by_status("expired")), ["pay-1"])
+        self.assertEqual(list(self.payment_records.get_payments_by_status("failed")), ["pay-3"])
+        self.assertEqual(self.payment_records.get_payment_record("pay-2")["status"], "completed")
+
+    def test_order_id_lookup_follows_writes(self):
+        check_order_lookup(self, self.payment_records)
+
+    def test_concurrent_claims_only_succeed_once(self):
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+        results = []
+
+        def claim():
+            results.append(self.payment_records.claim_payment_for_processing("pay-1"))
+
+        threads = [threading.Thread(target=claim) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), 1)
+
+    def test_export_and_migrate_round_trip_json_layout(self):
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+        self.payment_records.update_payment_status("pay-1", "expired")
+
+        exported = self.payment_records.export_payments_json()
+
+        self.assertEqual(exported, 1)
+        payments = json.loads(self.json_path.read_text(encoding="utf-8"))
+        self.assertEqual(payments["pay-1"]["status"], "expired")
+
+        payments["pay-9"] = {"status": "completed", "user_id": 9}
+        self.json_path.write_text(json.dumps(payments), encoding="utf-8")
+        self.assertEqual(self.payment_records.migrate_json_to_sqlite(), 2)
+        self.assertEqual(self.payment_records.get_user_payments(9)["pay-9"]["status"], "completed")
+
+
+class JournalPaymentStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.json_path = Path(self.tmpdir.name) / "payments.json"
+        self.journal_path = Path(self.tmpdir.name) / "payments.journal.jsonl"
+        self.payment_records = load_module()
+        self.payment_records.PAYMENTS_FILE = str(self.json_path)
+        self.payment_records.PAYMENTS_JOURNAL_FILE = str(self.journal_path)
+        self.payment_records.get_payment_store_backend = lambda: "journal"
+
+    def journal_entries(self):
+        return [json.loads(line) for line in self.journal_path.read_text(encoding="utf-8").splitlines()]
+
+    def test_order_id_lookup_follows_writes(self):
+        check_order_lookup(self, self.payment_records)
+
+    def test_updates_append_to_journal_without_rewriting_snapshot(self):
+        self.json_path.write_text(json.dumps({
+            "pay-1": {"status": "pending", "user_id": 7},
+            "pay-2": {"status": "pending", "user_id": 8},
+        }), encoding="utf-8")
+        snapshot = self.json_path.read_text(encoding="utf-8")
+
+        self.assertTrue(self.payment_records.claim_payment_for_processing("pay-1"))
+        self.assertTrue(self.payment_records.update_payment_record_fields("pay-1", {"username": "s7"}))
+        self.payment_records.add_payment_record("pay-3", {"status": "pending", "user_id": 7})
+
+        self.assertEqual(self.json_path.read_text(encoding="utf-8"), snapshot)
+        self.assertEqual(
+            [(entry["payment_id"], entry["status"]) for entry in self.journal_entries()],
+            [("pay-1", "processing"), ("pay-1", "processing"), ("pay-3", "pending")],
+        )
+        record = self.payment_records.get_payment_record("pay-1")
+        self.assertEqual(record["username"], "s7")
+        self.assertEqual(list(self.payment_records.load_payments()), ["pay-1", "pay-2", "pay-3"])
+        self.assertEqual(list(self.payment_records.get_user_payments(7)), ["pay-1", "pay-3"])
+
+    def test_fresh_process_replays_journal_and_skips_torn_line(self):
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+        self.payment_records.update_payment_status("pay-1", "completed")
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"payment_id": "pay-1", "rec')
+
+        reloaded = load_module()
+        reloaded.PAYMENTS_FILE = str(self.json_path)
+        reloaded.PAYMENTS_JOURNAL_FILE = str(self.journal_path)
+        reloaded.get_payment_store_backend = lambda: "journal"
+
+        self.assertEqual(reloaded.get_payment_record("pay-1")["status"], "completed")
+        self.assertTrue(reloaded.update_payment_status("pay-1", "refunded"))
+        self.assertEqual(self.payment_records.get_payment_record("pay-1")["status"], "refunded")
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+        self.payment_records.update_payment_status("pay-1", "expired")
+
+        self.assertGreater(self.payment_records.compact_payment_journal(), 0)
+
+        self.assertEqual(self.journal_path.stat().st_size, 0)
+        payments = json.loads(self.json_path.read_text(encoding="utf-8"))
+        self.assertEqual(payments["pay-1"]["status"], "expired")
+        self.assertEqual(self.payment_records.get_payment_record("pay-1")["status"], "expired")
+        self.assertEqual(self.payment_records.compact_payment_journal(), 0)
+
+    def test_journal_over_threshold_is_compacted_in_background(self):
+        self.payment_records.PAYMENT_JOURNAL_COMPACT_BYTES = 1
+        self.payment_records.add_payment_record("pay-1", {"status": "pending", "user_id": 7})
+
+        for thread in list(self.payment_records._journal_compaction_threads.values()):
+            thread.join(timeout=5)
+
+        self.assertEqual(self.journal_path.stat().st_size, 0)
+        self.assertEqual(json.loads(self.json_path.read_text(encoding="utf-8"))["pay-1"]["status"], "pending")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,140 @@
+import base64
+import datetime
+import importlib.util
+import json
+import os
+import sys
+import types
+import unittest
+from hashlib import md5
+from unittest import mock
+from pathlib import Path
+
+import requests
+
+
+UTILS_DIR = Path(__file__).resolve().parents[1] / "core" / "scripts" / "telegrambot" / "utils"
+MODULE_PATH = UTILS_DIR / "payment_webhook.py"
+PAYMENTS_PATH = UTILS_DIR / "payments.py"
+
+
+def load_payment_webhook():
+    """Load payment_webhook.py against the real payments.py.
+
+    Callers patch ``sys.modules`` first; the stub ``utils`` package, ``dotenv``
+    and ``utils.payments`` installed here are dropped again on cleanup.
+    """
+    if "dotenv" not in sys.modules:
+        dotenv_stub = types.ModuleType("dotenv")
+        dotenv_stub.load_dotenv = lambda *args, **kwargs: None
+        sys.modules["dotenv"] = dotenv_stub
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+
+    payments_spec = importlib.util.spec_from_file_location("utils.payments", PAYMENTS_PATH)
+    payments = importlib.util.module_from_spec(payments_spec)
+    sys.modules[payments_spec.name] = payments
+    payments_spec.loader.exec_module(payments)
+    utils_pkg.payments = payments
+
+    spec = importlib.util.spec_from_file_location("payment_webhook_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# A webhook body exactly as the gateway sends it: PHP ``json_encode`` with
+# JSON_UNESCAPED_UNICODE (compact separators, raw unicode, ``\\/``), signed
+# as md5(base64(body without sign) + API key) with the API key "secret".
+GATEWAY_BODY = (
+    '{"type":"payment","uuid":"62f88b36-a9d5-4fa6-aa26-e040c3dbf26d",'
+    '"order_id":"97a75bf8eda5cca41ba9d2e104840fcd","amount":"3.00000000",'
+    '"payment_amount":"3.00000000","merchant_amount":"2.94000000","network":"tron",'
+    '"currency":"USDT","payer_currency":"USDT","status":"paid","is_final":true,'
+    '"additional_data":"{\\"plan_gb\\":\\"40\\",\\"note\\":\\"caf\u00e9\\"}",'
+    '"txid":"https:\\/\\/tronscan.org\\/#\\/transaction\\/'
+    '6f0d9c8374db57cac0d806251473de754f361c83a03cd805f74aa9da3193486b"}'
+)
+GATEWAY_SIGN = "04d858e692af411059b31739004af4a1"
+
+
+def signed_body(body, sign):
+    return f'{body[:-1]},"sign":"{sign}"}}'.encode("utf-8")
+
+
+class PaymentWebhookReceiverTests(unittest.TestCase):
+    def setUp(self):
+        for patcher in (
+            mock.patch.dict(sys.modules),
+            mock.patch.dict(os.environ, {"CRYPTO_MERCHANT_ID": "merchant", "CRYPTO_API_KEY": "secret"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.webhook = load_payment_webhook()
+        self.handled = []
+        self.receiver = self.webhook.PaymentWebhookReceiver(
+            host="127.0.0.1",
+            handler=lambda payload: self.handled.append(payload) or payload.get("status") == "paid",
+        ).start()
+        self.addCleanup(self.receiver.close)
+        self.url = f"http://127.0.0.1:{self.receiver.port}{self.receiver.path}"
+
+    def post(self, body):
+        return requests.post(self.url, data=body, headers={"Content-Type": "application/json"}, timeout=5)
+
+    def test_gateway_signed_webhook_is_processed_and_timed(self):
+        self.assertEqual(md5(base64.b64encode(GATEWAY_BODY.encode("utf-8")) + b"secret").hexdigest(), GATEWAY_SIGN)
+
+        response = self.post(signed_body(GATEWAY_BODY, GATEWAY_SIGN))
+        self.assertEqual(response.status_code, 200)
+        self.receiver.close()
+
+        self.assertEqual(self.handled, [json.loads(GATEWAY_BODY)])
+        histograms = self.webhook.get_delivery_latency_histograms()
+        self.assertEqual(list(histograms), ["webhook"])
+        self.assertEqual(histograms["webhook"]["count"], 1)
+        self.assertEqual(histograms["webhook"]["buckets"][1], 1)
+
+    def test_webhook_latency_is_timed_from_the_invoice_update(self):
+        updated_at = datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=3))) - datetime.timedelta(seconds=90)
+        body = f'{GATEWAY_BODY[:-1]},"updated_at":"{updated_at.isoformat(timespec="seconds")}"}}'
+        sign = md5(base64.b64encode(body.encode("utf-8")) + b"secret").hexdigest()
+
+        self.assertEqual(self.post(signed_body(body, sign)).status_code, 200)
+        self.receiver.close()
+
+        webhook = self.webhook.get_delivery_latency_histograms()["webhook"]
+        self.assertEqual(webhook["count"], 1)
+        self.assertGreaterEqual(webhook["max"], 90)
+        self.assertEqual(webhook["buckets"][120], 1)
+
+    def test_unsigned_or_malformed_webhooks_are_rejected(self):
+        payload = json.loads(GATEWAY_BODY)
+        python_encoded_sign = md5(base64.b64encode(json.dumps(payload).encode("utf-8")) + b"secret").hexdigest()
+        tampered = GATEWAY_BODY.replace("3.00000000", "30.00000000", 1)
+
+        self.assertEqual(self.post(signed_body(GATEWAY_BODY, python_encoded_sign)).status_code, 401)
+        self.assertEqual(self.post(signed_body(tampered, GATEWAY_SIGN)).status_code, 401)
+        self.assertEqual(self.post(GATEWAY_BODY.encode("utf-8")).status_code, 401)
+        self.assertEqual(self.post(b"{not json").status_code, 400)
+        self.receiver.close()
+
+        self.assertEqual(self.handled, [])
+        self.assertEqual(self.webhook.get_delivery_latency_histograms(), {})
+
+    def test_latency_buckets_are_per_source(self):
+        for seconds in (0.5, 3, 45, 4000):
+            self.webhook.record_delivery_latency("poll", seconds)
+
+        poll = self.webhook.get_delivery_latency_histograms()["poll"]
+
+        self.assertEqual(poll["count"], 4)
+        self.assertEqual(poll["max"], 4000)
+        self.assertEqual({bound: count for bound, count in poll["buckets"].items() if count}, {1: 1, 5: 1, 60: 1, "+Inf": 1})
+        self.webhook.reset_delivery_latency_histograms()
+        self.assertEqual(self.webhook.get_delivery_latency_histograms(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import datetime
+import importlib.util
+import json
+import os
+import sys
+import threading
+import time
+import types
+import unittest
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "payments.py"
+)
+
+
+def load_payments_module():
+    if "dotenv" not in sys.modules:
+        dotenv_stub = types.ModuleType("dotenv")
+        dotenv_stub.load_dotenv = lambda *args, **kwargs: None
+        sys.modules["dotenv"] = dotenv_stub
+    spec = importlib.util.spec_from_file_location("payments_reconcile_under_test", MODULE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeGateway:
+    """Payment gateway stand-in serving ``/list`` pages and ``/info`` lookups."""
+
+    def __init__(self, invoices, page_size=2, history=True, info_delay=0):
+        self.invoices = invoices
+        self.page_size = page_size
+        self.history = history
+        self.info_delay = info_delay
+        self.requests = Counter()
+        self.list_bodies = []
+        gateway = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                endpoint = url.path.rsplit("/", 1)[-1]
+                gateway.requests[endpoint] += 1
+                if endpoint == "list":
+                    gateway.list_bodies.append(body)
+                    if not gateway.history:
+                        return self.reply(404, {"message": "Not found"})
+                    cursor = int(parse_qs(url.query).get("cursor", ["0"])[0])
+                    items = [{"uuid": uuid, "payment_status": status} for uuid, status in gateway.invoices.items()]
+                    page = items[cursor:cursor + gateway.page_size]
+                    next_cursor = cursor + gateway.page_size if cursor + gateway.page_size < len(items) else None
+                    return self.reply(200, {"state": 0, "result": {"items": page, "paginate": {"nextCursor": next_cursor}}})
+                if endpoint == "info":
+                    time.sleep(gateway.info_delay)
+                    status = gateway.invoices.get(body.get("uuid"))
+                    if status is None:
+                        return self.reply(404, {"message": "Payment not found"})
+                    return self.reply(200, {"state": 0, "result": {"uuid": body["uuid"], "payment_status": status}})
+                self.reply(404, {})
+
+            def reply(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/payment"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class GatewayReconciliationTests(unittest.TestCase):
+    def setUp(self):
+        self.original_env = {
+            name: os.environ.get(name)
+            for name in ("CRYPTO_MERCHANT_ID", "CRYPTO_API_KEY", "DIJIQ_CRYPTO_HISTORY_MAX_PAGES")
+        }
+        os.environ["CRYPTO_MERCHANT_ID"] = "merchant"
+        os.environ["CRYPTO_API_KEY"] = "secret"
+        os.environ.pop("DIJIQ_CRYPTO_HISTORY_MAX_PAGES", None)
+        self.payments = load_payments_module()
+        self.invoices = {
+            "inv-1": "paid",
+            "inv-2": "check",
+            "other-1": "paid",
+            "inv-3": "cancel",
+            "other-2": "fail",
+        }
+
+    def tearDown(self):
+        for name, value in self.original_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    def gateway(self, **kwargs):
+        gateway = FakeGateway(self.invoices, **kwargs)
+        self.addCleanup(gateway.close)
+        return gateway
+
+    def client(self, gateway):
+        payment = self.payments.CryptoPayment()
+        payment.base_url = gateway.url
+        return payment
+
+    def test_history_pages_answer_every_pending_invoice_without_info_calls(self):
+        gateway = self.gateway()
+        since = datetime.datetime(2026, 5, 1, 12, 0, 0)
+
+        statuses = self.client(gateway).check_payment_statuses(["inv-1", "inv-2", "inv-3"], since=since)
+
+        self.assertEqual(statuses, {"inv-1": "paid", "inv-2": "check", "inv-3": "cancel"})
+        self.assertEqual(gateway.requests, Counter({"list": 2}))
+        self.assertEqual(gateway.list_bodies[0], {"date_from": "2026-04-30 12:00:00"})
+
+    def test_invoices_missing_from_history_fall_back_to_info(self):
+        gateway = self.gateway()
+        self.invoices["older"] = "paid"
+        os.environ["DIJIQ_CRYPTO_HISTORY_MAX_PAGES"] = "1"
+
+        statuses = self.client(gateway).check_payment_statuses(["inv-1", "older", "unknown"])
+
+        self.assertEqual(statuses, {"inv-1": "paid", "older": "paid"})
+        self.assertEqual(gateway.requests, Counter({"list": 1, "info": 2}))
+
+    def test_missing_history_endpoint_fans_out_concurrently_and_is_remembered(self):
+        gateway = self.gateway(history=False, info_delay=0.2)
+        payment_ids = ["inv-1", "inv-2", "inv-3", "other-1", "other-2"]
+
+        started = time.monotonic()
+        statuses = self.client(gateway).check_payment_statuses(payment_ids, max_workers=5)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(statuses, {payment_id: self.invoices[payment_id] for payment_id in payment_ids})
+        self.assertLess(elapsed, 0.6)
+        self.client(gateway).check_payment_statuses(["inv-1"])
+        self.assertEqual(gateway.requests, Counter({"list": 1, "info": 6}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -56,18 +56,14 @@ class CryptoPaymentTimeoutTests(unittest.TestCase):
             def json(self):
                 return {"result": {"status": "pending"}}
 
-        def post(url, **kwargs):
-            calls.append((url, kwargs))
-            return Response()
+        class Session:
+            def post(self, url, **kwargs):
+                calls.append((url, kwargs))
+                return Response()
 
-        original_post = payments.requests.post
-        payments.requests.post = post
-        try:
-            payment = payments.CryptoPayment()
-            self.assertIn("result", payment.create_payment(10, "40", 123))
-            self.assertIn("result", payment.check_payment_status("payment-id"))
-        finally:
-            payments.requests.post = original_post
+        payment = payments.CryptoPayment(session=Session())
+        self.assertIn("result", payment.create_payment(10, "40", 123))
+        self.assertIn("result", payment.check_payment_status("payment-id"))
 
         self.assertEqual(calls[0][1]["timeout"], 4.5)
         self.assertEqual(calls[1][1]["timeout"], 4.5)
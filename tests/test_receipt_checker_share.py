@@ -17,12 +17,23 @@ MODULE_PATH = (
     / "utils"
     / "receipt_checker.py"
 )
+JSON_STORE_PATH = MODULE_PATH.with_name("json_store.py")
 
 
 def load_receipt_checker():
     dotenv_stub = types.ModuleType("dotenv")
     dotenv_stub.load_dotenv = lambda *args, **kwargs: None
     sys.modules["dotenv"] = dotenv_stub
+    utils_pkg = sys.modules.get("utils")
+    if utils_pkg is None:
+        utils_pkg = types.ModuleType("utils")
+        utils_pkg.__path__ = []
+        sys.modules["utils"] = utils_pkg
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
     spec = importlib.util.spec_from_file_location("receipt_checker_under_test", MODULE_PATH)
     module = importlib.util.module_from_spec(spec)
     sys.modules[spec.name] = module
@@ -10,9 +10,20 @@ from pathlib import Path
 ROOT = Path(__file__).resolve().parents[1]
 REFERRAL_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "referral.py"
 REFERRAL_HANDLERS_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "referral_handlers.py"
+JSON_STORE_PATH = REFERRAL_PATH.with_name("json_store.py")
 
 
 def load_referral_module():
+    utils_pkg = sys.modules.get("utils")
+    if utils_pkg is None:
+        utils_pkg = types.ModuleType("utils")
+        utils_pkg.__path__ = []
+        sys.modules["utils"] = utils_pkg
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
     spec = importlib.util.spec_from_file_location("referral_admin_under_test", REFERRAL_PATH)
     module = importlib.util.module_from_spec(spec)
     sys.modules[spec.name] = module
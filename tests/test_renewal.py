@@ -6,9 +6,12 @@ import types
 import unittest
 from pathlib import Path
 
+from utils_loader import install_utils_package, load_utils_module
+
 
 ROOT = Path(__file__).resolve().parents[1]
 RENEWAL_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "renewal.py"
+USER_RECORD_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "user_record.py"
 GB_BYTES = 1024 ** 3
 
 
@@ -43,7 +46,7 @@ class FakeMultiAPI:
     def __init__(self, clients):
         self.clients = dict(clients)
 
-    def find_user(self, username, preferred_server_id=None):
+    def find_user(self, username, preferred_server_id=None, full_user=True):
         if preferred_server_id:
             client = self.clients.get(preferred_server_id)
             if client and client.get_user(username):
@@ -60,9 +63,9 @@ def load_renewal_module():
         if name == "utils" or name.startswith("utils."):
             sys.modules.pop(name, None)
 
-    utils_pkg = types.ModuleType("utils")
-    utils_pkg.__path__ = []
-    sys.modules["utils"] = utils_pkg
+    utils_pkg = install_utils_package()
+    load_utils_module(utils_pkg, "json_store")
+    load_utils_module(utils_pkg, "reseller_store")
 
     api_client_stub = types.ModuleType("utils.api_client")
     api_client_stub.MultiServerAPI = lambda: FakeMultiAPI({})
@@ -91,6 +94,8 @@ def load_renewal_module():
     }.get(key, key)
     sys.modules["utils.translations"] = translations_stub
 
+    load_utils_module(utils_pkg, "payment_records")
+
     spec = importlib.util.spec_from_file_location("renewal_under_test", RENEWAL_PATH)
     module = importlib.util.module_from_spec(spec)
     sys.modules[spec.name] = module
@@ -104,7 +109,8 @@ class RenewalTests(unittest.TestCase):
         self.addCleanup(self.tmpdir.cleanup)
         self.base = Path(self.tmpdir.name)
         self.renewal = load_renewal_module()
-        self.renewal.PAYMENTS_FILE = str(self.base / "payments.json")
+        self.payments_file = str(self.base / "payments.json")
+        sys.modules["utils.payment_records"].PAYMENTS_FILE = self.payments_file
         self.renewal.RESELLERS_FILE = str(self.base / "resellers.json")
         self.renewal.STATE_FILE = str(self.base / "expired_user_cleanup.json")
         self.plans = {
@@ -189,6 +195,25 @@ class RenewalTests(unittest.TestCase):
         self.assertTrue(offer["eligible"])
         self.assertLessEqual(offer["before_state"]["days_remaining"], 0)
 
+    def test_customer_offer_accepts_snapshot_user_records(self):
+        spec = importlib.util.spec_from_file_location("renewal_user_record_under_test", USER_RECORD_PATH)
+        user_record = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(user_record)
+        payments = {"base-1": self.base_payment()}
+        expired = user_record.UserRecord({
+            **self.expired_user(),
+            "expiration_days": 30,
+            "account_creation_date": "2000-01-01T00:00:00Z",
+        })
+        client = FakeClient("s1", {"alice": expired})
+
+        self.assertTrue(self.renewal.is_user_expired(expired))
+        offer = self.renewal.find_customer_renewal_offer(123, "alice", client, expired, self.plans, payments=payments)
+
+        self.assertTrue(offer["eligible"])
+        self.assertEqual(offer["before_state"]["gb_limit"], 5.0)
+        self.assertLessEqual(offer["before_state"]["days_remaining"], 0)
+
     def test_customer_offer_rejects_missing_active_blocked_active_deleted_and_plan_mismatch(self):
         payments = {"base-1": self.base_payment()}
         client = FakeClient("s1", {"alice": self.expired_user()})
@@ -338,7 +363,7 @@ class RenewalTests(unittest.TestCase):
     def test_customer_renewal_resets_existing_user_and_clears_cleanup_state(self):
         client = FakeClient("s1", {"alice": self.expired_user()})
         multi_api = FakeMultiAPI({"s1": client})
-        self.write_json(self.renewal.PAYMENTS_FILE, {"base-1": self.base_payment()})
+        self.write_json(self.payments_file, {"base-1": self.base_payment()})
         self.write_json(self.renewal.STATE_FILE, {
             "s1:alice": {"username": "alice", "server_id": "s1", "cleanup_status": "notified"}
         })
@@ -361,7 +386,7 @@ class RenewalTests(unittest.TestCase):
         self.assertFalse(client.get_user("alice")["blocked"])
         self.assertEqual(result["before_state"]["status"], "expired")
         self.assertEqual(result["after_state"]["status"], "active")
-        saved_payments = self.read_json(self.renewal.PAYMENTS_FILE)
+        saved_payments = self.read_json(self.payments_file)
         self.assertEqual(saved_payments["base-1"]["cleanup_status"], "renewed")
         self.assertEqual(self.read_json(self.renewal.STATE_FILE), {})
 
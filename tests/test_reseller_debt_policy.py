@@ -1,6 +1,8 @@
 import importlib.util
 import json
+import sys
 import tempfile
+import types
 import unittest
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -8,9 +10,28 @@ from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[1]
 RESELLER_PATH = ROOT / "core" / "scripts" / "telegrambot" / "utils" / "reseller.py"
+JSON_STORE_PATH = RESELLER_PATH.with_name("json_store.py")
+RESELLER_STORE_PATH = RESELLER_PATH.with_name("reseller_store.py")
 
 
 def load_reseller_module():
+    utils_pkg = sys.modules.get("utils")
+    if utils_pkg is None:
+        utils_pkg = types.ModuleType("utils")
+        utils_pkg.__path__ = []
+        sys.modules["utils"] = utils_pkg
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
+    reseller_store_spec = importlib.util.spec_from_file_location("utils.reseller_store", RESELLER_STORE_PATH)
+    reseller_store = importlib.util.module_from_spec(reseller_store_spec)
+    sys.modules[reseller_store_spec.name] = reseller_store
+    reseller_store_spec.loader.exec_module(reseller_store)
+    utils_pkg.reseller_store = reseller_store
+
     spec = importlib.util.spec_from_file_location("reseller_policy_under_test", RESELLER_PATH)
     module = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(module)
@@ -473,13 +494,16 @@ class ResellerDebtPolicyTests(unittest.TestCase):
                 self.success_client = FakeClient({"ok": True})
                 self.failed_client = FakeClient(None)
 
-            def find_user(self, username, preferred_server_id=None):
+            def find_user(self, username, preferred_server_id=None, full_user=True):
                 if username == "deleted":
                     return self.success_client, {"username": username}
                 if username == "failed":
                     return self.failed_client, {"username": username}
                 return None, None
 
+            def bulk_delete_users(self, items):
+                return [(client, username, client.delete_user(username)) for client, username in items]
+
         self.write_resellers({
             "1988": {
                 "status": "banned",
@@ -521,7 +545,7 @@ class ResellerDebtPolicyTests(unittest.TestCase):
 
     def test_cleanup_reduces_debt_no_below_zero(self):
         class MissingMultiAPI:
-            def find_user(self, username, preferred_server_id=None):
+            def find_user(self, username, preferred_server_id=None, full_user=True):
                 return None, None
 
         self.write_resellers({
@@ -556,11 +580,14 @@ class ResellerDebtPolicyTests(unittest.TestCase):
                 return self.delete_result
 
         class FakeMultiAPI:
-            def find_user(self, username, preferred_server_id=None):
+            def find_user(self, username, preferred_server_id=None, full_user=True):
                 if username == "removed":
                     return FakeClient({"ok": True}), {"username": username}
                 return FakeClient(None), {"username": username}
 
+            def bulk_delete_users(self, items):
+                return [(client, username, client.delete_user(username)) for client, username in items]
+
         self.write_resellers({
             "1988": {
                 "status": "banned",
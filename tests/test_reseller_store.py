@@ -0,0 +1,191 @@
+import importlib.util
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+
+UTILS_DIR = Path(__file__).resolve().parents[1] / "core" / "scripts" / "telegrambot" / "utils"
+RESELLER_PATH = UTILS_DIR / "reseller.py"
+RESELLER_STORE_PATH = UTILS_DIR / "reseller_store.py"
+JSON_STORE_PATH = UTILS_DIR / "json_store.py"
+
+
+def load_utils_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_reseller_modules():
+    utils_pkg = sys.modules.get("utils")
+    if utils_pkg is None:
+        utils_pkg = types.ModuleType("utils")
+        utils_pkg.__path__ = []
+        sys.modules["utils"] = utils_pkg
+    utils_pkg.json_store = load_utils_module("utils.json_store", JSON_STORE_PATH)
+    utils_pkg.reseller_store = load_utils_module("utils.reseller_store", RESELLER_STORE_PATH)
+    reseller = load_utils_module("reseller_store_under_test", RESELLER_PATH)
+    return reseller, utils_pkg.reseller_store
+
+
+class SqliteResellerStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.json_path = Path(self.tmpdir.name) / "resellers.json"
+        self.db_path = Path(self.tmpdir.name) / "resellers.sqlite3"
+        self.reseller, self.store = load_reseller_modules()
+        self.reseller.RESELLERS_FILE = str(self.json_path)
+        self.store.RESELLERS_FILE = str(self.json_path)
+        self.store.RESELLERS_DB_FILE = str(self.db_path)
+        self.store.get_reseller_store_backend = lambda: "sqlite"
+        self.addCleanup(self.close_connections)
+
+    def close_connections(self):
+        for state in self.store._sqlite_states.values():
+            state["connection"].close()
+
+    def write_resellers(self, data):
+        self.json_path.write_text(json.dumps(data), encoding="utf-8")
+
+    def test_first_use_imports_json_and_writes_single_rows(self):
+        self.write_resellers({
+            "1": {"status": "approved", "debt": 0.0, "configs": []},
+            "2": {"status": "approved", "debt": 0.0, "configs": []},
+        })
+
+        self.assertTrue(self.reseller.add_reseller_debt(1, 4.0, {"username": "reseller1tabc", "price": 4.0}))
+
+        self.assertEqual(self.reseller.get_reseller_data(1)["debt"], 4.0)
+        self.assertTrue(self.reseller.reseller_config_is_recorded(1, "reseller1tabc"))
+        self.assertEqual(self.reseller.get_reseller_data(2)["debt"], 0.0)
+        self.assertEqual(json.loads(self.json_path.read_text(encoding="utf-8"))["1"]["configs"], [])
+        with sqlite3.connect(self.db_path) as connection:
+            rows = dict(connection.execute("SELECT reseller_id, status FROM resellers").fetchall())
+        self.assertEqual(rows, {"1": "approved", "2": "approved"})
+
+    def test_cache_sees_commits_from_other_connections(self):
+        self.write_resellers({"1": {"status": "approved", "debt": 0.0}})
+        self.assertEqual(self.reseller.get_reseller_data(1)["status"], "approved")
+
+        with sqlite3.connect(self.db_path) as connection:
+            connection.execute(
+                "UPDATE resellers SET status = ?, data = ? WHERE reseller_id = ?",
+                ("banned", json.dumps({"status": "banned", "debt": 0.0}), "1"),
+            )
+
+        self.assertEqual(self.reseller.get_reseller_data(1)["status"], "banned")
+
+    def test_failed_transaction_rolls_back_rows_and_cache(self):
+        self.write_resellers({"1": {"status": "approved", "debt": 0.0}})
+        store = self.store.get_reseller_store(str(self.json_path))
+
+        with self.assertRaises(RuntimeError):
+            with store.lock():
+                store.put("1", {"status": "banned", "debt": 9.0})
+                raise RuntimeError("boom")
+
+        self.assertEqual(store.get("1"), {"status": "approved", "debt": 0.0})
+
+    def test_export_and_migrate_round_trip_json_layout(self):
+        self.write_resellers({"1": {"status": "approved", "debt": 0.0}})
+        self.assertTrue(self.reseller.set_reseller_debt(1, 12.5))
+
+        self.assertEqual(self.store.export_resellers_json(), 1)
+        exported = json.loads(self.json_path.read_text(encoding="utf-8"))
+        self.assertEqual(exported["1"]["debt"], 12.5)
+
+        exported["2"] = {"status": "pending"}
+        self.write_resellers(exported)
+        self.assertEqual(self.store.migrate_json_to_sqlite(), 2)
+        self.assertEqual(self.reseller.get_reseller_data(2)["status"], "pending")
+
+
+class ResellerConfigIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.json_path = Path(self.tmpdir.name) / "resellers.json"
+        self.reseller, self.store_module = load_reseller_modules()
+        self.reseller.RESELLERS_FILE = str(self.json_path)
+        self.store = self.store_module.JsonResellerStore(str(self.json_path))
+
+    def write_resellers(self, data):
+        self.json_path.write_text(json.dumps(data), encoding="utf-8")
+
+    def test_lookup_matches_username_case_insensitively_and_optional_server(self):
+        self.write_resellers({
+            "1": {"configs": [
+                {"username": "reseller1tabc", "server_id": "s1"},
+                {"username": "Reseller1tABC", "server_id": "s2"},
+                "not-a-config",
+            ]},
+            "2": {"configs": [{"username": "reseller1tabc", "server_id": "s1"}]},
+        })
+
+        refs = [(rid, index) for rid, index, _ in self.store.find_configs("RESELLER1TABC")]
+        self.assertEqual(sorted(refs), [("1", 0), ("1", 1), ("2", 0)])
+        self.assertEqual(
+            [(rid, index) for rid, index, _ in self.store.find_configs("reseller1tabc", "s2", reseller_id=1)],
+            [("1", 1)],
+        )
+        self.assertEqual(self.store.find_configs("missing"), [])
+
+    def test_writes_patch_the_index_instead_of_rebuilding_it(self):
+        self.write_resellers({
+            "1": {"configs": [{"username": "alpha", "server_id": "s1"}]},
+            "2": {"configs": [{"username": "beta", "server_id": "s1"}]},
+        })
+        self.assertTrue(self.store.find_configs("alpha"))
+        index = self.store_module._json_config_indexes[str(self.json_path)]
+
+        self.store.put("1", {"configs": [{"username": "gamma", "server_id": "s1"}]})
+        self.store.delete("2")
+
+        self.assertEqual(self.store.find_configs("alpha"), [])
+        self.assertEqual(self.store.find_configs("beta"), [])
+        self.assertEqual([(rid, i) for rid, i, _ in self.store.find_configs("gamma", "s1")], [("1", 0)])
+        self.assertIs(self.store_module._json_config_indexes[str(self.json_path)], index)
+
+    def test_writes_reuse_the_cached_parse(self):
+        self.write_resellers({
+            "1": {"configs": [{"username": "alpha", "server_id": "s1"}]},
+            "2": {"configs": [{"username": "beta", "server_id": "s1"}]},
+        })
+        json_store = sys.modules["utils.json_store"]
+        json_store.reset_stats()
+
+        self.store.put("1", {"configs": [{"username": "gamma", "server_id": "s1"}]})
+        self.store.delete("2")
+        self.store.put("3", {"configs": []})
+
+        self.assertEqual(json_store.get_stats(self.json_path)["reads"], 1)
+        self.assertEqual(json_store.get_stats(self.json_path)["writes"], 3)
+        self.assertEqual(json.loads(self.json_path.read_text(encoding="utf-8")), {
+            "1": {"configs": [{"username": "gamma", "server_id": "s1"}]},
+            "3": {"configs": []},
+        })
+        self.assertEqual([(rid, i) for rid, i, _ in self.store.find_configs("gamma")], [("1", 0)])
+
+    def test_external_file_change_rebuilds_the_index(self):
+        self.write_resellers({"1": {"configs": [{"username": "alpha"}]}})
+        self.assertTrue(self.reseller.reseller_config_is_recorded(1, "alpha"))
+
+        self.write_resellers({"1": {"configs": [{"username": "delta", "server_id": "s9"}]}})
+        stat = self.json_path.stat()
+        os.utime(self.json_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        self.assertFalse(self.reseller.reseller_config_is_recorded(1, "alpha"))
+        self.assertTrue(self.reseller.reseller_config_is_recorded(1, "DELTA", server_id="s9"))
+        self.assertFalse(self.reseller.reseller_config_is_recorded(1, "delta", server_id="s1"))
+
+
+if __name__ == "__main__":
+    unittest.main()
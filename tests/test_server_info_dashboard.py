@@ -79,6 +79,15 @@ def load_cli_api(payments=None, servers=None, clients=None, online_response=None
                 if include_disabled or server.get("enabled", True):
                     yield server, clients[server["id"]]
 
+        def get_user_snapshot_entries(self, include_disabled=True):
+            return [
+                {"server": server, "client": client, "index": index, "users": client.get_users()}
+                for index, (server, client) in enumerate(self.iter_clients(include_disabled=include_disabled))
+            ]
+
+        def get_user_snapshot_age(self, include_disabled=True):
+            return 42.0
+
         @staticmethod
         def active_user_count(users):
             if isinstance(users, dict):
@@ -133,6 +142,46 @@ class ServerInfoDashboardTests(unittest.TestCase):
         self.assertIn("⚠️ Pending Payments: 1", text)
         self.assertIn("Backup: unhealthy", text)
 
+    def test_snapshot_uses_shared_user_snapshot_and_never_blocks_on_cpu(self):
+        cli_api = load_cli_api()
+        intervals = []
+        cli_api.psutil = types.SimpleNamespace(
+            cpu_percent=lambda interval=1: intervals.append(interval) or 7.0,
+            virtual_memory=cli_api.psutil.virtual_memory,
+            disk_usage=cli_api.psutil.disk_usage,
+        )
+        cli_api._cpu_sampler = cli_api._CpuSampler(interval=60)
+
+        snapshot = cli_api.build_server_info_snapshot(now=datetime(2026, 6, 4, 12, 0, 0))
+
+        self.assertIsNone(snapshot["system"]["cpu_percent"])
+        self.assertTrue(all(interval is None for interval in intervals))
+        self.assertIn("CPU: N/A", cli_api.format_server_info_section(snapshot, "tech"))
+        self.assertEqual(snapshot["vpn"]["snapshot_age_seconds"], 42.0)
+        self.assertIn("User Snapshot: 42s ago", cli_api.format_server_info_section(snapshot, "tech"))
+
+        cli_api._cpu_sampler.percent = 7.0
+        snapshot = cli_api.build_server_info_snapshot(now=datetime(2026, 6, 4, 12, 0, 0))
+
+        self.assertEqual(snapshot["system"]["cpu_percent"], 7.0)
+        self.assertIn("CPU: 7.0%", cli_api.format_server_info_section(snapshot, "tech"))
+        self.assertTrue(all(interval is None for interval in intervals))
+
+    def test_one_shot_cli_takes_a_short_blocking_cpu_sample_before_the_first_background_sample(self):
+        cli_api = load_cli_api()
+        intervals = []
+        cli_api.psutil = types.SimpleNamespace(
+            cpu_percent=lambda interval=1: intervals.append(interval) or 9.0,
+            virtual_memory=cli_api.psutil.virtual_memory,
+            disk_usage=cli_api.psutil.disk_usage,
+        )
+        cli_api._cpu_sampler = cli_api._CpuSampler(interval=60)
+
+        text = cli_api.server_info("tech")
+
+        self.assertIn("CPU: 9.0%", text)
+        self.assertIn(cli_api.CPU_BLOCKING_SAMPLE_SECONDS, intervals)
+
     def test_sold_traffic_counts_direct_and_reseller_configs_only(self):
         payments = {
             "direct": {"status": "completed", "price": 10, "updated_at": "2026-06-04", "plan_gb": 10, "username": "direct1", "server_id": "primary"},
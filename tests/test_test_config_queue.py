@@ -17,6 +17,7 @@ MODULE_PATH = (
     / "test_config.py"
 )
 TEST_CONFIG_STORE_PATH = MODULE_PATH.with_name("test_config_store.py")
+JSON_STORE_PATH = MODULE_PATH.with_name("json_store.py")
 
 
 class DummyBot:
@@ -86,6 +87,12 @@ def install_stubs():
     utils_pkg.__path__ = []
     sys.modules["utils"] = utils_pkg
 
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
     store_spec = importlib.util.spec_from_file_location("utils.test_config_store", TEST_CONFIG_STORE_PATH)
     store_module = importlib.util.module_from_spec(store_spec)
     sys.modules[store_spec.name] = store_module
@@ -1,9 +1,13 @@
 import importlib.util
 import json
+import sys
 import tempfile
 import threading
 import unittest
 from pathlib import Path
+from unittest import mock
+
+from utils_loader import install_utils_package, load_utils_module
 
 
 STORE_PATH = (
@@ -16,13 +20,16 @@ STORE_PATH = (
 )
 
 
-spec = importlib.util.spec_from_file_location("test_config_store_under_test", STORE_PATH)
-store = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(store)
-
-
 class TestConfigStoreTests(unittest.TestCase):
     def setUp(self):
+        patcher = mock.patch.dict(sys.modules)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        load_utils_module(install_utils_package(), "json_store")
+        spec = importlib.util.spec_from_file_location("test_config_store_under_test", STORE_PATH)
+        self.store = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.store)
+
         self.tmpdir = tempfile.TemporaryDirectory()
         self.addCleanup(self.tmpdir.cleanup)
         self.path = Path(self.tmpdir.name) / "test_configs.json"
@@ -33,7 +40,7 @@ class TestConfigStoreTests(unittest.TestCase):
         def add_user(user_id):
             def mutate(configs):
                 configs[str(user_id)] = {"telegram_id": user_id, "username": f"t{user_id}"}
-            store.update_test_configs(str(self.path), mutate)
+            self.store.update_test_configs(str(self.path), mutate)
 
         for user_id in range(100, 125):
             thread = threading.Thread(target=add_user, args=(user_id,))
@@ -42,7 +49,7 @@ class TestConfigStoreTests(unittest.TestCase):
         for thread in threads:
             thread.join()
 
-        configs = store.load_test_configs(str(self.path))
+        configs = self.store.load_test_configs(str(self.path))
         self.assertEqual(len(configs), 25)
         self.assertEqual(configs["100"]["username"], "t100")
         self.assertEqual(configs["124"]["username"], "t124")
@@ -51,10 +58,10 @@ class TestConfigStoreTests(unittest.TestCase):
         malformed = '{"123": '
         self.path.write_text(malformed, encoding="utf-8")
 
-        with self.assertRaises(store.TestConfigStoreError):
-            store.load_test_configs(str(self.path))
-        with self.assertRaises(store.TestConfigStoreError):
-            store.update_test_configs(str(self.path), lambda configs: configs.update({"456": {}}))
+        with self.assertRaises(self.store.TestConfigStoreError):
+            self.store.load_test_configs(str(self.path))
+        with self.assertRaises(self.store.TestConfigStoreError):
+            self.store.update_test_configs(str(self.path), lambda configs: configs.update({"456": {}}))
 
         self.assertEqual(self.path.read_text(encoding="utf-8"), malformed)
 
@@ -74,10 +81,10 @@ class TestConfigStoreTests(unittest.TestCase):
             "history_record": {"username": "t123", "server_id": "s1"},
         }
 
-        first = store.upsert_recovered_test_users(str(self.path), [recovered])
-        second = store.upsert_recovered_test_users(str(self.path), [recovered])
+        first = self.store.upsert_recovered_test_users(str(self.path), [recovered])
+        second = self.store.upsert_recovered_test_users(str(self.path), [recovered])
 
-        entry = store.load_test_configs(str(self.path))["123"]
+        entry = self.store.load_test_configs(str(self.path))["123"]
         self.assertEqual(first, {"created": 0, "history_added": 1})
         self.assertEqual(second, {"created": 0, "history_added": 0})
         self.assertEqual(entry["username"], "t123a")
@@ -86,9 +93,9 @@ class TestConfigStoreTests(unittest.TestCase):
         self.assertEqual(entry["historical_configs"], [{"username": "t123", "server_id": "s1"}])
 
     def test_atomic_write_leaves_no_temporary_files(self):
-        store.save_test_configs(str(self.path), {"123": {"telegram_id": 123}})
+        self.store.save_test_configs(str(self.path), {"123": {"telegram_id": 123}})
 
-        self.assertEqual(store.load_test_configs(str(self.path))["123"]["telegram_id"], 123)
+        self.assertEqual(self.store.load_test_configs(str(self.path))["123"]["telegram_id"], 123)
         self.assertEqual(list(Path(self.tmpdir.name).glob("*.tmp")), [])
 
 
@@ -15,6 +15,10 @@ MODULE_PATH = (
     / "utils"
     / "traffic_monitor.py"
 )
+JSON_STORE_PATH = MODULE_PATH.with_name("json_store.py")
+NOTIFICATION_QUEUE_PATH = MODULE_PATH.with_name("notification_queue.py")
+RESELLER_STORE_PATH = MODULE_PATH.with_name("reseller_store.py")
+USER_RECORD_PATH = MODULE_PATH.with_name("user_record.py")
 
 GB = 1024 ** 3
 
@@ -37,6 +41,9 @@ class FakeMultiServerAPI:
         self.users = users
         self.include_disabled_calls = []
 
+    def get_user_changes(self, since_version=None, include_disabled=True):
+        return 0, None
+
     def iter_all_users(self, include_disabled=True):
         self.include_disabled_calls.append(include_disabled)
         for enabled, username, data in self.users:
@@ -49,6 +56,31 @@ def install_stubs():
     utils_pkg.__path__ = []
     sys.modules["utils"] = utils_pkg
 
+    json_store_spec = importlib.util.spec_from_file_location("utils.json_store", JSON_STORE_PATH)
+    json_store = importlib.util.module_from_spec(json_store_spec)
+    sys.modules[json_store_spec.name] = json_store
+    json_store_spec.loader.exec_module(json_store)
+    utils_pkg.json_store = json_store
+
+    notification_queue_spec = importlib.util.spec_from_file_location("utils.notification_queue", NOTIFICATION_QUEUE_PATH)
+    notification_queue = importlib.util.module_from_spec(notification_queue_spec)
+    sys.modules[notification_queue_spec.name] = notification_queue
+    notification_queue_spec.loader.exec_module(notification_queue)
+    notification_queue._dispatcher = notification_queue.NotificationDispatcher(per_chat_interval=0)
+    utils_pkg.notification_queue = notification_queue
+
+    reseller_store_spec = importlib.util.spec_from_file_location("utils.reseller_store", RESELLER_STORE_PATH)
+    reseller_store = importlib.util.module_from_spec(reseller_store_spec)
+    sys.modules[reseller_store_spec.name] = reseller_store
+    reseller_store_spec.loader.exec_module(reseller_store)
+    utils_pkg.reseller_store = reseller_store
+
+    user_record_spec = importlib.util.spec_from_file_location("utils.user_record", USER_RECORD_PATH)
+    user_record = importlib.util.module_from_spec(user_record_spec)
+    sys.modules[user_record_spec.name] = user_record
+    user_record_spec.loader.exec_module(user_record)
+    utils_pkg.user_record = user_record
+
     api_client_stub = types.ModuleType("utils.api_client")
     api_client_stub.MultiServerAPI = lambda: FakeMultiServerAPI([])
     sys.modules["utils.api_client"] = api_client_stub
@@ -59,6 +91,7 @@ def install_stubs():
 
     language_stub = types.ModuleType("utils.language")
     language_stub.get_user_language = lambda user_id: "en"
+    language_stub.get_user_languages = lambda user_ids: {user_id: "en" for user_id in user_ids}
     sys.modules["utils.language"] = language_stub
 
     translations_stub = types.ModuleType("utils.translations")
@@ -196,6 +229,68 @@ class TrafficMonitorTests(unittest.TestCase):
         self.assertEqual(multi_api.include_disabled_calls, [False])
         self.assertEqual(self.bot.sent_messages, [])
 
+    def test_unchanged_usage_bucket_is_skipped_until_next_threshold(self):
+        loads = []
+        load_alerts = self.monitor._load_alerts
+        self.monitor._load_alerts = lambda: loads.append(1) or load_alerts()
+
+        self.run_monitor([
+            (True, "s123", {"upload_bytes": 81 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB}),
+        ])
+        self.run_monitor([
+            (True, "s123", {"upload_bytes": 85 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB}),
+        ])
+        self.assertEqual(len(self.bot.sent_messages), 1)
+        self.assertEqual(len(loads), 1)
+
+        self.run_monitor([
+            (True, "s123", {"upload_bytes": 91 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB}),
+        ])
+        self.assertEqual(len(self.bot.sent_messages), 2)
+        self.assertIn("regular s123 91", self.bot.sent_messages[1][1])
+        self.assertEqual(self.read_alerts()["s123"]["notified"], [80, 90])
+
+    def test_failed_notification_is_retried_on_next_pass(self):
+        users = [(True, "s123", {"upload_bytes": 95 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB})]
+
+        def fail(*args, **kwargs):
+            raise RuntimeError("telegram down")
+
+        self.bot.send_message = fail
+        self.run_monitor(users)
+        self.assertEqual(self.bot.sent_messages, [])
+
+        del self.bot.send_message
+        self.run_monitor(users)
+        self.assertEqual(len(self.bot.sent_messages), 1)
+        self.assertEqual(self.read_alerts()["s123"]["notified"], [80, 90])
+
+    def test_languages_are_resolved_once_per_pass(self):
+        self.write_reseller_config(456, "r456")
+        calls = []
+        self.monitor.get_user_languages = lambda ids: calls.append(set(ids)) or {user_id: "en" for user_id in ids}
+        self.monitor.get_user_language = lambda user_id: self.fail("per-user language lookup")
+
+        self.run_monitor([
+            (True, "s123", {"upload_bytes": 95 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB}),
+            (True, "r456", {"upload_bytes": 95 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB}),
+        ])
+
+        self.assertEqual(calls, [{123, 456}])
+        self.assertEqual(len(self.bot.sent_messages), 2)
+
+    def test_full_scan_reevaluates_unchanged_users(self):
+        users = [(True, "s123", {"upload_bytes": 95 * GB, "download_bytes": 0, "max_download_bytes": 100 * GB})]
+        self.run_monitor(users)
+        self.write_alerts({})
+
+        self.run_monitor(users)
+        self.assertEqual(len(self.bot.sent_messages), 1)
+
+        self.monitor.MultiServerAPI = lambda: FakeMultiServerAPI(users)
+        self.monitor.monitor_user_traffic(full_scan=True)
+        self.assertEqual(len(self.bot.sent_messages), 2)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,94 @@
+import importlib.util
+import pickle
+import sys
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+
+MODULE_PATH = (
+    Path(__file__).resolve().parents[1]
+    / "core"
+    / "scripts"
+    / "telegrambot"
+    / "utils"
+    / "user_record.py"
+)
+
+spec = importlib.util.spec_from_file_location("user_record_under_test", MODULE_PATH)
+user_record = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = user_record
+spec.loader.exec_module(user_record)
+UserRecord = user_record.UserRecord
+
+username_spec = importlib.util.spec_from_file_location("username_utils_under_test", MODULE_PATH.with_name("username_utils.py"))
+username_utils = importlib.util.module_from_spec(username_spec)
+username_spec.loader.exec_module(username_utils)
+
+GB = 1024 ** 3
+
+
+class UserRecordTests(unittest.TestCase):
+    def test_fields_are_normalized_once(self):
+        record = UserRecord({
+            "username": "alice",
+            "max_download_bytes": str(10 * GB),
+            "upload_bytes": 2 * GB,
+            "download_bytes": -5,
+            "expiration_days": "30",
+            "account_creation_date": "2026-01-01T10:00:00Z",
+            "blocked": 0,
+            "password": "dropped",
+        })
+
+        self.assertEqual(record.quota_bytes, 10 * GB)
+        self.assertEqual(record.total_bytes, 2 * GB)
+        self.assertEqual(record.remaining_bytes, 8 * GB)
+        self.assertIs(record.blocked, False)
+        self.assertEqual(record.deadline.date().isoformat(), "2026-01-31")
+        self.assertEqual(record.days_remaining(datetime(2026, 1, 21, 23, 59)), 10)
+
+        unlimited = UserRecord({"max_download_bytes": 0, "expiration_days": "bad", "account_creation_date": "never"})
+        self.assertIsNone(unlimited.remaining_bytes)
+        self.assertIsNone(unlimited.deadline)
+        self.assertIsNone(unlimited.days_remaining())
+
+    def test_record_reads_like_the_panel_dict(self):
+        panel = {"username": "bob", "blocked": True, "note": "vip", "upload_bytes": 7, "uuid": "x"}
+        record = UserRecord(panel)
+
+        self.assertEqual(record["blocked"], True)
+        self.assertEqual(record.get("max_download_bytes", 0), 0)
+        self.assertIsNone(record.get("uuid"))
+        self.assertIsNone(record["account_creation_date"])
+        self.assertIn("download_bytes", record)
+        self.assertEqual(set(dict(record)), set(user_record.PANEL_FIELDS))
+        self.assertIsNone(dict(record)["download_bytes"])
+        self.assertEqual(record, {"username": "bob", "blocked": True, "note": "vip", "upload_bytes": 7})
+        self.assertNotEqual(record, {**panel, "uuid": "x"})
+        self.assertEqual(record, UserRecord(dict(record)))
+        self.assertNotEqual(record, UserRecord({**panel, "blocked": False}))
+        with self.assertRaises(KeyError):
+            record["uuid"]
+
+    def test_records_are_immutable_and_shared(self):
+        record = UserRecord({"username": "carol", "blocked": False})
+
+        with self.assertRaises(AttributeError):
+            record.blocked = True
+        with self.assertRaises(AttributeError):
+            record.extra = 1
+        self.assertIs(UserRecord.of(record), record)
+        self.assertIsNone(UserRecord.of(None))
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_list_payload_records_count_as_taken_usernames(self):
+        payload = [UserRecord({"username": "s7"}), UserRecord({"username": "s7a"}), {"username": "other"}]
+
+        self.assertEqual(username_utils.extract_existing_usernames(payload), {"s7", "s7a", "other"})
+        self.assertEqual(username_utils.allocate_username("s", 7, username_utils.extract_existing_usernames(payload)), "s7b")
+
+
+if __name__ == "__main__":
+    unittest.main()
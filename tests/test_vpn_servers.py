@@ -151,6 +151,18 @@ class VpnServersTests(unittest.TestCase):
         self.assertIn("Server 1", bot.edits[0][0][0])
         self.assertEqual(FakeMultiServerAPI.calls, ["statuses"])
 
+    def test_status_line_shows_open_breaker(self):
+        module, _ = load_vpn_servers_module()
+
+        line = module._format_status_line({
+            "id": "s1",
+            "name": "Server 1",
+            "healthy": False,
+            "breaker": {"state": "open", "failure_rate": 0.6, "retry_in": 12.4},
+        })
+
+        self.assertIn("Breaker: `open, retry in 12s` | Failures: `60%`", line)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,25 @@
+import importlib.util
+import sys
+import types
+from pathlib import Path
+
+
+UTILS_DIR = Path(__file__).resolve().parents[1] / "core" / "scripts" / "telegrambot" / "utils"
+
+
+def install_utils_package():
+    """Register a fresh, empty ``utils`` package in ``sys.modules`` and return it."""
+    utils_pkg = types.ModuleType("utils")
+    utils_pkg.__path__ = []
+    sys.modules["utils"] = utils_pkg
+    return utils_pkg
+
+
+def load_utils_module(utils_pkg, name):
+    """Load the real ``utils/<name>.py`` as ``utils.<name>`` and attach it to ``utils_pkg``."""
+    spec = importlib.util.spec_from_file_location(f"utils.{name}", UTILS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    setattr(utils_pkg, name, module)
+    return module
@@ -9,6 +9,8 @@ FILES=(
     /etc/dijiq/*.json
     /etc/dijiq/core/scripts/telegrambot/*.env
     /etc/dijiq/core/scripts/telegrambot/*.json
+    /etc/dijiq/core/scripts/telegrambot/*.sqlite3*
+    /etc/dijiq/core/scripts/telegrambot/*.jsonl
 )
 shopt -u nullglob dotglob
 